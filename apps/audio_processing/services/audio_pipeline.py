@@ -4,6 +4,7 @@ Combina FFmpeg, SoX, librosa y noisereduce para mejoras profesionales.
 MEJORADO con mejores prácticas del ejemplo externo que funciona bien.
 """
 import os
+import shutil
 import subprocess
 import tempfile
 import logging
@@ -14,6 +15,8 @@ import numpy as np
 import librosa
 import soundfile as sf
 
+from helpers.cache_artefactos import get_cache_artefactos, ETAPA_WAV_16K
+
 try:
     import noisereduce as nr
     NOISEREDUCE_AVAILABLE = True
@@ -152,6 +155,15 @@ def ensure_wav_optimized(input_path: str, output_dir: Optional[str] = None) -> s
         logger.info(f"Archivo WAV optimizado ya existe: {output_path}")
         return str(output_path)
     
+    # Reutilizar la conversión de una ejecución anterior del mismo audio
+    cache = get_cache_artefactos()
+    clave = cache.clave(str(input_path), {'sample_rate': DEFAULT_SAMPLE_RATE, 'canales': 1, 'formato': 'pcm_s16le'})
+    entrada = cache.obtener(ETAPA_WAV_16K, clave)
+    if entrada and entrada.archivo:
+        shutil.copyfile(entrada.archivo, output_path)
+        logger.info(f"Audio WAV optimizado recuperado de la caché: {output_path}")
+        return str(output_path)
+    
     # ✅ COMANDO FFMPEG OPTIMIZADO (del ejemplo)
     cmd = [
         FFMPEG, "-y", "-i", str(input_path),
@@ -171,6 +183,7 @@ def ensure_wav_optimized(input_path: str, output_dir: Optional[str] = None) -> s
             text=True
         )
         logger.info(f"Audio convertido a WAV optimizado: {output_path}")
+        cache.guardar(ETAPA_WAV_16K, clave, archivo=str(output_path))
         return str(output_path)
         
     except subprocess.CalledProcessError as e:
@@ -424,10 +437,27 @@ def improve_audio_optimized(input_path: str, output_path: str,
 def improve_audio(input_path: str, output_path: str, 
                  apply_noise_reduction: bool = True,
                  use_sox_effects: bool = True,
-                 target_sample_rate: int = DEFAULT_SAMPLE_RATE) -> Dict:
+                 target_sample_rate: int = DEFAULT_SAMPLE_RATE,
+                 streaming: Optional[bool] = None) -> Dict:
     """
     Pipeline completo de mejora de audio (versión original como fallback).
+    
+    Con ``streaming`` (o ``AUDIO_PIPELINE_STREAMING`` para audios largos) se usa
+    el pipeline por bloques, que mantiene la memoria acotada.
     """
+    from .audio_streaming import decidir_streaming, improve_audio_streaming
+    
+    usar_streaming, original_info = decidir_streaming(input_path, streaming)
+    if usar_streaming:
+        try:
+            return improve_audio_streaming(
+                input_path, output_path,
+                apply_noise_reduction, use_sox_effects, target_sample_rate,
+                original_info=original_info
+            )
+        except Exception as e:
+            logger.warning(f"Pipeline en streaming falló, usando pipeline optimizado: {e}")
+    
     try:
         # Intentar pipeline optimizado primero
         return improve_audio_optimized(
@@ -641,7 +671,8 @@ class AudioProcessor:
             input_path, output_path,
             apply_noise_reduction=options.get('noise_reduction', True),
             use_sox_effects=options.get('sox_effects', True),
-            target_sample_rate=options.get('sample_rate', DEFAULT_SAMPLE_RATE)
+            target_sample_rate=options.get('sample_rate', DEFAULT_SAMPLE_RATE),
+            streaming=options.get('streaming')
         )
         
         return output_path, metadata
@@ -0,0 +1,608 @@
+"""
+Pipeline de mejora de audio en streaming.
+
+Versión por bloques de ``improve_audio_optimized`` pensada para sesiones
+largas: FFmpeg entrega PCM por una tubería, cada etapa procesa bloques de
+numpy conservando su estado entre bloques (filtros, perfil de ruido,
+envolvente del compresor) y el resultado se escribe directamente en el WAV
+de salida. La memoria queda acotada por el tamaño de bloque, no por la
+duración de la sesión.
+
+Como la normalización por pico necesita el pico global, el audio se recorre
+dos veces: una pasada de análisis que sólo mide y otra que escribe.
+"""
+import os
+import logging
+import subprocess
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+from scipy.ndimage import uniform_filter1d
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+from django.conf import settings
+
+from .audio_pipeline import (
+    AudioPipelineError,
+    DEFAULT_SAMPLE_RATE,
+    FFMPEG,
+    get_audio_info,
+)
+
+try:
+    import webrtcvad
+    WEBRTCVAD_AVAILABLE = True
+except ImportError:
+    WEBRTCVAD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_VERSION_STREAMING = "v2.2_streaming"
+
+
+def get_config_streaming() -> Dict:
+    config = {
+        'HABILITADO': False,
+        'DURACION_MINIMA': 1800,
+        'DURACION_BLOQUE': 30,
+    }
+    config.update(getattr(settings, 'AUDIO_PIPELINE_STREAMING', {}) or {})
+    return config
+
+
+def decidir_streaming(input_path: str, streaming: Optional[bool] = None) -> Tuple[bool, Optional[Dict]]:
+    """
+    Decide si se usa el pipeline en streaming: por parámetro explícito o, si
+    está habilitado en settings, para audios de al menos ``DURACION_MINIMA``
+    segundos.
+
+    Returns:
+        (usar_streaming, info del audio original si hubo que consultarla)
+    """
+    if streaming is not None:
+        return bool(streaming), None
+
+    config = get_config_streaming()
+    if not config['HABILITADO']:
+        return False, None
+    try:
+        info = get_audio_info(input_path)
+    except AudioPipelineError:
+        return False, None
+    return info['duration'] >= config['DURACION_MINIMA'], info
+
+
+def leer_pcm_ffmpeg(input_path: str, sample_rate: int, muestras_bloque: int) -> Iterator[np.ndarray]:
+    """Decodifica con FFmpeg a PCM mono float32 y entrega bloques de ``muestras_bloque``"""
+    cmd = [
+        FFMPEG, "-nostdin", "-v", "error", "-i", str(input_path),
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-vn",
+        "-f", "f32le",
+        "-acodec", "pcm_f32le",
+        "-",
+    ]
+    try:
+        proceso = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise AudioPipelineError("FFmpeg no está instalado o no está en el PATH")
+
+    bytes_bloque = muestras_bloque * 4
+    try:
+        while True:
+            datos = proceso.stdout.read(bytes_bloque)
+            if not datos:
+                break
+            util = len(datos) - len(datos) % 4
+            if util:
+                yield np.frombuffer(datos[:util], dtype=np.float32).astype(np.float64)
+    finally:
+        proceso.stdout.close()
+        error = proceso.stderr.read().decode(errors='ignore')
+        proceso.stderr.close()
+        codigo = proceso.wait()
+
+    if codigo != 0:
+        raise AudioPipelineError(f"ffmpeg falló: {error[:500] or 'Error desconocido'}")
+
+
+class Etapa:
+    """Etapa de procesamiento por bloques con estado entre bloques"""
+
+    nombre = ''
+
+    def procesar(self, bloque: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def finalizar(self) -> np.ndarray:
+        """Vacía las muestras retenidas al terminar el audio"""
+        return np.zeros(0)
+
+
+class RecortadorSilencios(Etapa):
+    """
+    Eliminación de silencios equivalente a ``resemblyzer.preprocess_wav``:
+    VAD en ventanas de 30 ms, media móvil de 8 ventanas y dilatación de 6.
+    Las ventanas se deciden con un retraso de ``RETARDO`` ventanas, que es lo
+    que necesitan la media móvil y la dilatación para mirar hacia adelante.
+    """
+
+    nombre = 'silence_trimming'
+    ANCHO_MEDIA = 8
+    MAX_SILENCIO = 6
+    RETARDO = ANCHO_MEDIA // 2 + MAX_SILENCIO // 2
+
+    def __init__(self, sample_rate: int, ventana_ms: int = 30, rango_db: float = 40.0):
+        self.muestras_ventana = int(sample_rate * ventana_ms / 1000)
+        self.vad = None
+        if WEBRTCVAD_AVAILABLE and sample_rate in (8000, 16000, 32000, 48000):
+            self.vad = webrtcvad.Vad(mode=3)
+        self.sample_rate = sample_rate
+        self.rango_db = rango_db
+        self.pico_rms_db = -np.inf
+        self._resto = np.zeros(0)
+        self._flags: List[bool] = []  # flags crudos desde la ventana self._base
+        self._base = 0
+        self._ventanas: deque = deque()  # audio de las ventanas aún sin decidir
+        self._siguiente = 0  # índice global de la primera ventana sin decidir
+        self.muestras_eliminadas = 0
+
+    def _es_voz(self, ventanas: np.ndarray) -> List[bool]:
+        if self.vad is not None:
+            pcm = (np.clip(ventanas, -1.0, 1.0) * 32767).astype(np.int16)
+            return [self.vad.is_speech(v.tobytes(), sample_rate=self.sample_rate) for v in pcm]
+        # Respaldo por energía relativa al pico visto hasta ahora
+        rms_db = 10 * np.log10(np.mean(ventanas ** 2, axis=1) + 1e-12)
+        self.pico_rms_db = max(self.pico_rms_db, float(np.max(rms_db)))
+        return list(rms_db > self.pico_rms_db - self.rango_db)
+
+    def _decidir(self, hasta: int, final: bool) -> np.ndarray:
+        """Decide las ventanas [self._siguiente, hasta) y devuelve el audio conservado"""
+        desde = self._siguiente
+        if hasta <= desde:
+            return np.zeros(0)
+
+        total = self._base + len(self._flags)
+        izq, der = (self.ANCHO_MEDIA - 1) // 2, self.ANCHO_MEDIA // 2
+        dil = self.MAX_SILENCIO // 2
+
+        # Flags crudos de [desde - izq - dil, hasta + der + dil) con ceros fuera de rango
+        lo = desde - izq - dil
+        hi = hasta + der + dil
+        crudos = np.zeros(hi - lo)
+        for g in range(max(lo, self._base, 0), min(hi, total)):
+            crudos[g - lo] = self._flags[g - self._base]
+
+        # Media móvil → máscara para [desde - dil, hasta + dil)
+        acumulado = np.concatenate(([0.0], np.cumsum(crudos)))
+        media = (acumulado[self.ANCHO_MEDIA:] - acumulado[:-self.ANCHO_MEDIA]) / self.ANCHO_MEDIA
+        mascara = np.round(media).astype(bool)
+        indices = np.arange(desde - dil, desde - dil + len(mascara))
+        mascara[(indices < 0) | (final & (indices >= total))] = False
+
+        # Dilatación binaria con ventana de MAX_SILENCIO + 1
+        ventana = np.lib.stride_tricks.sliding_window_view(mascara, 2 * dil + 1)
+        conservar = ventana.any(axis=1)[:hasta - desde]
+
+        partes = []
+        for mantener in conservar:
+            audio = self._ventanas.popleft()
+            if mantener:
+                partes.append(audio)
+            else:
+                self.muestras_eliminadas += len(audio)
+        self._siguiente = hasta
+
+        # Sólo se necesita la historia previa a la primera ventana sin decidir
+        sobrantes = self._siguiente - izq - dil - self._base
+        if sobrantes > 0:
+            del self._flags[:sobrantes]
+            self._base += sobrantes
+
+        return np.concatenate(partes) if partes else np.zeros(0)
+
+    def procesar(self, bloque):
+        datos = np.concatenate((self._resto, bloque))
+        n = len(datos) // self.muestras_ventana
+        self._resto = datos[n * self.muestras_ventana:]
+        if n == 0:
+            return np.zeros(0)
+
+        ventanas = datos[:n * self.muestras_ventana].reshape(n, self.muestras_ventana)
+        self._flags.extend(self._es_voz(ventanas))
+        self._ventanas.extend(ventanas)
+        total = self._base + len(self._flags)
+        return self._decidir(total - self.RETARDO, final=False)
+
+    def finalizar(self):
+        # Como resemblyzer, la última ventana incompleta se descarta
+        self.muestras_eliminadas += len(self._resto)
+        self._resto = np.zeros(0)
+        return self._decidir(self._base + len(self._flags), final=True)
+
+
+class PreEnfasis(Etapa):
+    """y[n] = x[n] - coef * x[n-1], arrastrando la última muestra del bloque anterior"""
+
+    nombre = 'preemphasis_filter'
+
+    def __init__(self, coef: float = 0.97):
+        self.coef = coef
+        self._anterior = None
+
+    def procesar(self, bloque):
+        if len(bloque) == 0:
+            return bloque
+        anterior = self._anterior if self._anterior is not None else 2 * bloque[0] - bloque[min(1, len(bloque) - 1)]
+        salida = bloque - self.coef * np.concatenate(([anterior], bloque[:-1]))
+        self._anterior = bloque[-1]
+        return salida
+
+
+class ReductorRuido(Etapa):
+    """
+    Compuerta espectral estacionaria (como ``noisereduce`` con
+    ``stationary=True``) en STFT con solapamiento-suma entre bloques.
+
+    El perfil de ruido (media y desviación en dB por frecuencia) se acumula
+    con las tramas de menor energía de cada bloque y se arrastra entre
+    bloques; un bin se conserva si supera ``media + n_std * desviación``. La máscara se suaviza
+    en frecuencia y, de forma causal, en el tiempo.
+    """
+
+    nombre = 'noise_reduction'
+
+    def __init__(self, sample_rate: int, n_fft: int = 1024, n_std: float = 1.5,
+                 suavizado_hz: float = 500.0, suavizado_tramas: int = 3, percentil_ruido: float = 20.0):
+        self.n_fft = n_fft
+        self.percentil_ruido = percentil_ruido
+        self.hop = n_fft // 4
+        self.n_std = n_std
+        self.ventana = np.hanning(n_fft + 1)[:-1]
+        # Suma de ventanas al cuadrado con 75% de solapamiento (hann periódica)
+        self.normalizacion = np.sum(self.ventana ** 2) / self.hop
+        self.bins_suavizado = max(1, int(suavizado_hz / (sample_rate / n_fft)))
+        self.suavizado_tramas = max(1, suavizado_tramas)
+
+        # Estado arrastrado entre bloques
+        self._entrada = np.zeros(n_fft - self.hop)  # relleno inicial como center=True
+        self._salida = np.zeros(n_fft - self.hop)
+        self._mascaras = np.zeros((0, n_fft // 2 + 1))
+        self._conteo = 0
+        self._suma = np.zeros(n_fft // 2 + 1)
+        self._suma_cuadrados = np.zeros(n_fft // 2 + 1)
+        self._pendiente_inicio = n_fft - self.hop  # muestras de relleno a descartar al inicio
+        self._muestras_entrada = 0
+        self._muestras_salida = 0
+
+    def _procesar_tramas(self) -> np.ndarray:
+        n_tramas = 1 + (len(self._entrada) - self.n_fft) // self.hop if len(self._entrada) >= self.n_fft else 0
+        if n_tramas <= 0:
+            return np.zeros(0)
+
+        tramas = np.lib.stride_tricks.sliding_window_view(self._entrada, self.n_fft)[::self.hop][:n_tramas]
+        espectro = np.fft.rfft(tramas * self.ventana, axis=1)
+        db = 20 * np.log10(np.abs(espectro) + 1e-10)
+
+        # Perfil de ruido acumulado con las tramas de menor energía de cada bloque
+        energia = np.sum(np.abs(espectro) ** 2, axis=1)
+        ruido = db[energia <= np.percentile(energia, self.percentil_ruido)] if n_tramas >= 10 else db
+        self._conteo += len(ruido)
+        self._suma += ruido.sum(axis=0)
+        self._suma_cuadrados += (ruido ** 2).sum(axis=0)
+        media = self._suma / self._conteo
+        desviacion = np.sqrt(np.maximum(self._suma_cuadrados / self._conteo - media ** 2, 0.0))
+        umbral = media + self.n_std * desviacion
+
+        mascara = (db > umbral).astype(np.float64)
+        mascara = uniform_filter1d(mascara, self.bins_suavizado, axis=1, mode='constant')
+        if self.suavizado_tramas > 1:
+            previa = self._mascaras[-(self.suavizado_tramas - 1):]
+            extendida = np.vstack((previa, mascara))
+            acumulada = np.vstack((np.zeros((1, extendida.shape[1])), np.cumsum(extendida, axis=0)))
+            ancho = np.minimum(np.arange(len(previa) + 1, len(previa) + 1 + n_tramas), self.suavizado_tramas)
+            fin = np.arange(len(previa) + 1, len(previa) + 1 + n_tramas)
+            suavizada = (acumulada[fin] - acumulada[fin - ancho]) / ancho[:, None]
+            self._mascaras = extendida[-(self.suavizado_tramas - 1):]
+            mascara = suavizada
+
+        tramas_salida = np.fft.irfft(espectro * mascara, n=self.n_fft, axis=1) * self.ventana
+
+        # Solapamiento-suma sobre el buffer de salida arrastrado
+        largo = (n_tramas - 1) * self.hop + self.n_fft
+        salida = np.zeros(largo)
+        salida[:len(self._salida)] += self._salida
+        # Las tramas r, r+k, r+2k... (k = n_fft / hop) no se solapan entre sí
+        pasos = self.n_fft // self.hop
+        for r in range(min(pasos, n_tramas)):
+            contiguas = tramas_salida[r::pasos].reshape(-1)
+            salida[r * self.hop:r * self.hop + len(contiguas)] += contiguas
+        salida /= self.normalizacion
+
+        listas = n_tramas * self.hop
+        self._salida = salida[listas:]
+        self._entrada = self._entrada[listas:]
+        resultado = salida[:listas]
+
+        # Descartar el relleno inicial para mantener la alineación temporal
+        if self._pendiente_inicio:
+            descartar = min(self._pendiente_inicio, len(resultado))
+            resultado = resultado[descartar:]
+            self._pendiente_inicio -= descartar
+        return resultado
+
+    def _limitar(self, resultado: np.ndarray) -> np.ndarray:
+        restante = self._muestras_entrada - self._muestras_salida
+        resultado = resultado[:max(0, restante)]
+        self._muestras_salida += len(resultado)
+        return resultado
+
+    def procesar(self, bloque):
+        self._muestras_entrada += len(bloque)
+        self._entrada = np.concatenate((self._entrada, bloque))
+        return self._limitar(self._procesar_tramas())
+
+    def finalizar(self):
+        self._entrada = np.concatenate((self._entrada, np.zeros(self.n_fft)))
+        resultado = self._procesar_tramas()
+        return self._limitar(np.concatenate((resultado, self._salida)))
+
+
+class Ganancia(Etapa):
+    nombre = 'gain'
+
+    def __init__(self, factor: float):
+        self.factor = factor
+
+    def procesar(self, bloque):
+        return bloque * self.factor
+
+
+class FiltroBiquad(Etapa):
+    """Butterworth de 2 polos (como ``highpass``/``lowpass`` de SoX) con estado entre bloques"""
+
+    def __init__(self, tipo: str, frecuencia: float, sample_rate: int):
+        self.nombre = f'{tipo}_{int(frecuencia)}hz'
+        nyquist = sample_rate / 2
+        self.sos = butter(2, min(frecuencia, nyquist * 0.99) / nyquist, btype=tipo, output='sos')
+        self._zi = None
+
+    def procesar(self, bloque):
+        if len(bloque) == 0:
+            return bloque
+        if self._zi is None:
+            self._zi = sosfilt_zi(self.sos) * 0.0
+        salida, self._zi = sosfilt(self.sos, bloque, zi=self._zi)
+        return salida
+
+
+class Compansor(Etapa):
+    """
+    Equivalente en proceso de ``compand 0.3,1 6:-70,-60,-20 -5 -90 0.2`` de SoX.
+
+    La envolvente se calcula por pico en saltos de 10 ms con ataque/caída
+    exponenciales, la curva de transferencia es lineal por tramos en dB y el
+    audio se retrasa ``retardo`` segundos respecto a la envolvente, de modo
+    que la ganancia "ve" los transitorios antes de que lleguen (look-ahead).
+    """
+
+    nombre = 'compand'
+
+    def __init__(self, sample_rate: int, ataque: float = 0.3, caida: float = 1.0,
+                 puntos=((-70.0, -60.0), (-20.0, -20.0), (0.0, 0.0)),
+                 ganancia_db: float = -5.0, volumen_inicial_db: float = -90.0, retardo: float = 0.2):
+        self.salto = max(1, int(sample_rate * 0.01))
+        segundos_salto = self.salto / sample_rate
+        self.coef_ataque = 1 - np.exp(-segundos_salto / ataque)
+        self.coef_caida = 1 - np.exp(-segundos_salto / caida)
+        self.puntos_x = np.array([p[0] for p in puntos])
+        self.puntos_y = np.array([p[1] for p in puntos])
+        self.ganancia_db = ganancia_db
+        self.retardo = int(sample_rate * retardo)
+
+        self._volumen = 10 ** (volumen_inicial_db / 20)
+        self._resto = np.zeros(0)  # muestras que aún no completan un salto
+        self._ganancias = np.zeros(0)  # ganancia por muestra ya calculada y no aplicada
+        self._audio = np.zeros(self.retardo)  # audio retrasado pendiente de salida
+        self._descartar = self.retardo  # silencio inicial introducido por el retardo
+
+    def _transferencia_db(self, entrada_db: np.ndarray) -> np.ndarray:
+        # Pendiente 1 por debajo del primer punto y por encima del último
+        salida = np.interp(entrada_db, self.puntos_x, self.puntos_y)
+        debajo = entrada_db < self.puntos_x[0]
+        salida[debajo] = entrada_db[debajo] + (self.puntos_y[0] - self.puntos_x[0])
+        encima = entrada_db > self.puntos_x[-1]
+        salida[encima] = entrada_db[encima] + (self.puntos_y[-1] - self.puntos_x[-1])
+        return salida + self.ganancia_db
+
+    def _avanzar_envolvente(self, muestras: np.ndarray) -> np.ndarray:
+        n_saltos = len(muestras) // self.salto
+        picos = np.abs(muestras[:n_saltos * self.salto]).reshape(n_saltos, self.salto).max(axis=1)
+        volumenes = np.empty(n_saltos)
+        volumen = self._volumen
+        for i, pico in enumerate(picos):
+            volumen += (pico - volumen) * (self.coef_ataque if pico > volumen else self.coef_caida)
+            volumenes[i] = volumen
+        self._volumen = volumen
+
+        entrada_db = 20 * np.log10(np.maximum(volumenes, 1e-10))
+        ganancia = 10 ** ((self._transferencia_db(entrada_db) - entrada_db) / 20)
+        return np.repeat(ganancia, self.salto)
+
+    def _emitir(self, bloque: np.ndarray, ganancias_nuevas: np.ndarray) -> np.ndarray:
+        self._audio = np.concatenate((self._audio, bloque))
+        self._ganancias = np.concatenate((self._ganancias, ganancias_nuevas))
+        listas = min(len(self._audio), len(self._ganancias))
+        salida = self._audio[:listas] * self._ganancias[:listas]
+        self._audio = self._audio[listas:]
+        self._ganancias = self._ganancias[listas:]
+        if self._descartar:
+            descartar = min(self._descartar, len(salida))
+            salida = salida[descartar:]
+            self._descartar -= descartar
+        return salida
+
+    def procesar(self, bloque):
+        datos = np.concatenate((self._resto, bloque))
+        usadas = len(datos) // self.salto * self.salto
+        self._resto = datos[usadas:]
+        return self._emitir(bloque, self._avanzar_envolvente(datos[:usadas]))
+
+    def finalizar(self):
+        # Como SoX, el retardo se vacía alimentando silencio
+        relleno = np.concatenate((self._resto, np.zeros(self.retardo + self.salto)))
+        usadas = len(relleno) // self.salto * self.salto
+        self._resto = np.zeros(0)
+        return self._emitir(np.zeros(0), self._avanzar_envolvente(relleno[:usadas]))
+
+
+class MedidorPico(Etapa):
+    nombre = 'peak_meter'
+
+    def __init__(self):
+        self.pico = 0.0
+        self.muestras = 0
+
+    def procesar(self, bloque):
+        if len(bloque):
+            self.pico = max(self.pico, float(np.max(np.abs(bloque))))
+        self.muestras += len(bloque)
+        return bloque
+
+
+def ejecutar_etapas(etapas: List[Etapa], bloques: Iterator[np.ndarray]) -> Iterator[np.ndarray]:
+    """Pasa cada bloque por la cadena de etapas y al final vacía las retenidas en orden"""
+    for bloque in bloques:
+        for etapa in etapas:
+            bloque = etapa.procesar(bloque)
+        if len(bloque):
+            yield bloque
+
+    for i, etapa in enumerate(etapas):
+        bloque = etapa.finalizar()
+        for siguiente in etapas[i + 1:]:
+            bloque = siguiente.procesar(bloque)
+        if len(bloque):
+            yield bloque
+
+
+def _etapas_base(sample_rate: int, apply_noise_reduction: bool) -> List[Etapa]:
+    etapas = [RecortadorSilencios(sample_rate), PreEnfasis()]
+    if apply_noise_reduction:
+        etapas.append(ReductorRuido(sample_rate))
+    return etapas
+
+
+def improve_audio_streaming(input_path: str, output_path: str,
+                            apply_noise_reduction: bool = True,
+                            use_sox_effects: bool = True,
+                            target_sample_rate: int = DEFAULT_SAMPLE_RATE,
+                            original_info: Optional[Dict] = None) -> Dict:
+    """
+    ✅ PIPELINE DE MEJORA DE AUDIO EN STREAMING
+    Mismos pasos que ``improve_audio_optimized`` sin archivos intermedios:
+
+    1. FFmpeg → PCM mono por tubería
+    2. Eliminación de silencios (VAD)
+    3. Pre-énfasis
+    4. Reducción de ruido con perfil arrastrado (opcional)
+    5. Normalización por pico a -3 dB (pico medido en una pasada de análisis)
+    6. Equivalente en proceso de los efectos SoX (opcional)
+
+    Returns:
+        Dict con metadatos del procesamiento
+    """
+    logger.info(f"🌊 Iniciando mejora de audio en streaming: {input_path} -> {output_path}")
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+    if original_info is None:
+        original_info = get_audio_info(input_path)
+
+    sr = target_sample_rate
+    muestras_bloque = int(get_config_streaming()['DURACION_BLOQUE'] * sr)
+
+    try:
+        # Pasada 1: análisis del pico tras las etapas previas a la normalización
+        medidor = MedidorPico()
+        medidor_filtrado = MedidorPico()
+        etapas = _etapas_base(sr, apply_noise_reduction) + [medidor]
+        if use_sox_effects:
+            etapas += [FiltroBiquad('highpass', 300, sr), FiltroBiquad('lowpass', 3400, sr), medidor_filtrado]
+        for _ in ejecutar_etapas(etapas, leer_pcm_ffmpeg(input_path, sr, muestras_bloque)):
+            pass
+        recortador = etapas[0]
+
+        if medidor.muestras == 0:
+            raise AudioPipelineError("El audio no contiene voz tras eliminar silencios")
+
+        ganancia_pico = 10 ** (-3.0 / 20) / medidor.pico if medidor.pico > 0 else 1.0
+        logger.info(f"🔎 Análisis: {medidor.muestras} muestras, pico {medidor.pico:.4f}, "
+                    f"{recortador.muestras_eliminadas / sr:.1f}s de silencio")
+
+        # Pasada 2: procesamiento y escritura única del resultado
+        etapas = _etapas_base(sr, apply_noise_reduction) + [Ganancia(ganancia_pico)]
+        if use_sox_effects:
+            # gain -n: llevar a 0 dBFS el pico esperado tras filtros y compand
+            pico_filtrado_db = 20 * np.log10(max(medidor_filtrado.pico * ganancia_pico, 1e-10))
+            compansor = Compansor(sr)
+            ganancia_final = 10 ** ((-pico_filtrado_db - compansor.ganancia_db - 1.0) / 20)
+            etapas += [
+                FiltroBiquad('highpass', 300, sr),
+                FiltroBiquad('lowpass', 3400, sr),
+                compansor,
+                Ganancia(ganancia_final),
+            ]
+
+        muestras_escritas = 0
+        recortes = 0
+        with sf.SoundFile(output_path, 'w', samplerate=sr, channels=1, subtype='PCM_16') as salida:
+            for bloque in ejecutar_etapas(etapas, leer_pcm_ffmpeg(input_path, sr, muestras_bloque)):
+                recortes += int(np.count_nonzero(np.abs(bloque) > 1.0))
+                salida.write(np.clip(bloque, -1.0, 1.0).astype(np.float32))
+                muestras_escritas += len(bloque)
+
+        if recortes:
+            logger.warning(f"⚠️ {recortes} muestras saturadas tras el compresor")
+
+        processed_size = os.path.getsize(output_path)
+        duration_processed = muestras_escritas / sr
+
+        metadata = {
+            'pipeline_version': PIPELINE_VERSION_STREAMING,
+            'optimization_applied': True,
+            'streaming': True,
+            'resemblyzer_used': False,
+            'original_duration': original_info['duration'],
+            'processed_duration': duration_processed,
+            'duration_reduction': original_info['duration'] - duration_processed,
+            'original_sample_rate': original_info['sample_rate'],
+            'processed_sample_rate': sr,
+            'original_size': original_info['size'],
+            'processed_size': processed_size,
+            'compression_ratio': original_info['size'] / processed_size if processed_size > 0 else 1.0,
+            'noise_reduction_applied': apply_noise_reduction,
+            'sox_effects_applied': use_sox_effects,
+            'quality_improvements': [
+                'wav_mono_conversion',
+                'vad_silence_trimming',
+                'preemphasis_filter',
+                'noise_reduction' if apply_noise_reduction else 'noise_reduction_skipped',
+                'peak_normalization',
+                'sox_equivalent_effects' if use_sox_effects else 'sox_effects_skipped'
+            ]
+        }
+
+        logger.info("✅ Mejora de audio en streaming completada")
+        logger.info(f"Duración: {original_info['duration']:.2f}s -> {duration_processed:.2f}s")
+        logger.info(f"Tamaño: {original_info['size']} -> {processed_size} bytes")
+        return metadata
+
+    except AudioPipelineError:
+        raise
+    except Exception as e:
+        logger.error(f"Error en pipeline de audio en streaming: {e}")
+        raise AudioPipelineError(f"Error procesando audio: {e}") from e
@@ -8,11 +8,15 @@ from django.conf import settings
 from django.db import transaction
 from pathlib import Path
 import os
+import shutil
 import logging
 import tempfile
 
 from .models import ProcesamientoAudio, LogProcesamiento
-from .services.audio_pipeline import AudioProcessor, AudioPipelineError
+from .services.audio_pipeline import AudioProcessor, AudioPipelineError, PIPELINE_VERSION
+from .services.audio_streaming import PIPELINE_VERSION_STREAMING
+from helpers.cache_artefactos import get_cache_artefactos, ETAPA_AUDIO_MEJORADO
+from helpers.progreso_eventos import ReportadorProgreso, publicar_progreso
 
 logger = logging.getLogger(__name__)
 
@@ -36,11 +40,8 @@ def procesar_audio_task(self, procesamiento_id: int):
         return
     
     # Marcar como en proceso
-    procesamiento.estado = 'procesando'
-    procesamiento.progreso = 10
-    procesamiento.fecha_procesamiento = timezone.now()
-    procesamiento.mensaje_estado = 'Iniciando procesamiento...'
-    procesamiento.save(update_fields=['estado', 'progreso', 'fecha_procesamiento', 'mensaje_estado'])
+    reportador = ReportadorProgreso('audio', procesamiento)
+    reportador.avanzar(10, 'Iniciando procesamiento...', estado='procesando', fecha_procesamiento=timezone.now())
     
     # Log inicial
     LogProcesamiento.objects.create(
@@ -65,9 +66,7 @@ def procesar_audio_task(self, procesamiento_id: int):
         archivo_salida = output_dir / f"proceso_{procesamiento.id}.wav"
         
         # Actualizar progreso
-        procesamiento.progreso = 30
-        procesamiento.mensaje_estado = 'Procesando audio...'
-        procesamiento.save(update_fields=['progreso', 'mensaje_estado'])
+        reportador.avanzar(30, 'Procesando audio...')
         
         # Crear instancia del procesador
         processor = AudioProcessor()
@@ -85,20 +84,41 @@ def procesar_audio_task(self, procesamiento_id: int):
         options = {
             'noise_reduction': config.get('aplicar_reduccion_ruido', True),
             'sox_effects': config.get('aplicar_efectos_sox', True),
-            'sample_rate': config.get('sample_rate', 16000)
+            'sample_rate': config.get('sample_rate', 16000),
+            'streaming': config.get('procesamiento_streaming')
         }
         
-        # Procesar audio
-        archivo_procesado, metadata = processor.process_audio(
-            archivo_original, 
-            str(archivo_salida),
-            options=options
-        )
+        # Reutilizar el audio mejorado si la misma grabación ya se procesó con estas opciones
+        cache = get_cache_artefactos()
+        clave_cache = None
+        if config.get('usar_cache', True):
+            clave_cache = cache.clave(archivo_original, {
+                'pipeline': [PIPELINE_VERSION, PIPELINE_VERSION_STREAMING],
+                'options': options,
+                'streaming': getattr(settings, 'AUDIO_PIPELINE_STREAMING', {}),
+            })
+        entrada_cache = cache.obtener(ETAPA_AUDIO_MEJORADO, clave_cache)
+        
+        if entrada_cache and entrada_cache.archivo:
+            shutil.copyfile(entrada_cache.archivo, archivo_salida)
+            archivo_procesado, metadata = str(archivo_salida), dict(entrada_cache.datos)
+            LogProcesamiento.objects.create(
+                procesamiento=procesamiento,
+                nivel='info',
+                mensaje='Audio mejorado recuperado de la caché de artefactos',
+                detalles_json={'clave_cache': clave_cache}
+            )
+        else:
+            # Procesar audio
+            archivo_procesado, metadata = processor.process_audio(
+                archivo_original, 
+                str(archivo_salida),
+                options=options
+            )
+            cache.guardar(ETAPA_AUDIO_MEJORADO, clave_cache, datos=metadata, archivo=archivo_procesado)
         
         # Actualizar progreso
-        procesamiento.progreso = 80
-        procesamiento.mensaje_estado = 'Guardando resultados...'
-        procesamiento.save(update_fields=['progreso', 'mensaje_estado'])
+        reportador.avanzar(80, 'Guardando resultados...')
         
         # Guardar resultados usando transacción atómica
         with transaction.atomic():
@@ -128,7 +148,12 @@ def procesar_audio_task(self, procesamiento_id: int):
             procesamiento.fecha_completado = timezone.now()
             procesamiento.mensaje_estado = 'Procesamiento completado exitosamente'
             
-            procesamiento.save()
+            # Solo lo que cambió: sin reescribir metadatos_originales, resultado, etc.
+            procesamiento.save(update_fields=[
+                'archivo_mejorado', 'duracion_seg', 'sample_rate', 'metadatos_procesamiento',
+                'version_pipeline', 'estado', 'progreso', 'fecha_completado', 'mensaje_estado', 'updated_at',
+            ])
+        publicar_progreso('audio', procesamiento.id, procesamiento.estado, 100, procesamiento.mensaje_estado)
         
         # Log de éxito
         LogProcesamiento.objects.create(
@@ -155,10 +180,7 @@ def procesar_audio_task(self, procesamiento_id: int):
         
     except Exception as e:
         # Marcar como error
-        procesamiento.estado = 'error'
-        procesamiento.progreso = 0
-        procesamiento.mensaje_estado = f'Error: {str(e)}'
-        procesamiento.save(update_fields=['estado', 'progreso', 'mensaje_estado'])
+        reportador.avanzar(0, f'Error: {str(e)}', estado='error')
         
         # Log de error
         LogProcesamiento.objects.create(
@@ -22,6 +22,10 @@ urlpatterns = [
     path('confirmar-eliminar/<int:id>/', views.confirmar_eliminar_procesamiento, name='confirmar_eliminar_procesamiento'),
     path('eliminar/<int:id>/', views.eliminar_procesamiento, name='eliminar_procesamiento'),
     
+    # Descarga de audio (streaming con Range)
+    path('descargar/<int:id>/original/', views.descargar_audio_original, name='descargar_audio_original'),
+    path('descargar/<int:id>/procesado/', views.descargar_audio_procesado, name='descargar_audio_procesado'),
+    
     # Acciones de control de procesamientos
     path('reiniciar/<int:id>/', views.reiniciar_procesamiento, name='reiniciar_procesamiento'),
     path('detener/<int:id>/', views.detener_procesamiento, name='detener_procesamiento'),
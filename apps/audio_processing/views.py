@@ -9,11 +9,12 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 import json
 import os
-import mimetypes
 import os
 import logging
 import traceback
 
+from helpers.descargas import respuesta_archivo
+
 from .models import ProcesamientoAudio, TipoReunion, LogProcesamiento
 from .forms import SubirAudioForm, TipoReunionForm, FiltroProcesamientoForm, ConfiguracionProcesamientoForm, EditarProcesamientoForm
 from .logging_helper import (
@@ -703,17 +704,15 @@ def descargar_audio_original(request, id):
     """Descargar archivo de audio original"""
     procesamiento = get_object_or_404(ProcesamientoAudio, id=id, usuario=request.user)
     
-    if not procesamiento.archivo_audio_original:
+    if not procesamiento.archivo_audio:
         raise Http404("Archivo no encontrado")
     
-    file_path = procesamiento.archivo_audio_original.path
+    file_path = procesamiento.archivo_audio.path
     if not os.path.exists(file_path):
         raise Http404("Archivo no encontrado en el sistema")
     
-    with open(file_path, 'rb') as fh:
-        response = HttpResponse(fh.read(), content_type=mimetypes.guess_type(file_path)[0])
-        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
-        return response
+    # Streaming con soporte de Range para poder saltar en grabaciones largas
+    return respuesta_archivo(request, file_path, nombre=os.path.basename(file_path))
 
 
 @login_required
@@ -728,10 +727,9 @@ def descargar_audio_procesado(request, id):
     if not os.path.exists(file_path):
         raise Http404("Archivo no encontrado en el sistema")
     
-    with open(file_path, 'rb') as fh:
-        response = HttpResponse(fh.read(), content_type='audio/wav')
-        response['Content-Disposition'] = f'attachment; filename="procesado_{os.path.basename(file_path)}"'
-        return response
+    return respuesta_archivo(
+        request, file_path, content_type='audio/wav', nombre=f"procesado_{os.path.basename(file_path)}"
+    )
 
 
 @login_required
@@ -49,13 +49,13 @@ def estadisticas_resumen_context(request):
         
         try:
             with connection.cursor() as cursor:
-                # Contar eventos de hoy por tipo
+                # Contar eventos de hoy por tipo (rango sobre timestamp: usa índices y particiones)
                 cursor.execute("""
                     SELECT 
-                        (SELECT COUNT(*) FROM logs.celery_logs WHERE DATE(timestamp) = CURRENT_DATE AND estado = 'SUCCESS') as tareas_exitosas,
-                        (SELECT COUNT(*) FROM logs.celery_logs WHERE DATE(timestamp) = CURRENT_DATE AND estado = 'FAILURE') as tareas_fallidas,
-                        (SELECT COUNT(*) FROM logs.archivo_logs WHERE DATE(timestamp) = CURRENT_DATE AND operacion = 'UPLOAD') as archivos_subidos,
-                        (SELECT COUNT(*) FROM logs.errores_sistema WHERE DATE(timestamp) = CURRENT_DATE AND resuelto = false) as errores_pendientes
+                        (SELECT COUNT(*) FROM logs.celery_logs WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1 AND estado = 'SUCCESS') as tareas_exitosas,
+                        (SELECT COUNT(*) FROM logs.celery_logs WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1 AND estado = 'FAILURE') as tareas_fallidas,
+                        (SELECT COUNT(*) FROM logs.archivo_logs WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1 AND operacion = 'UPLOAD') as archivos_subidos,
+                        (SELECT COUNT(*) FROM logs.errores_sistema WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1 AND resuelto = false) as errores_pendientes
                 """)
                 result = cursor.fetchone()
                 
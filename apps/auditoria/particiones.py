@@ -0,0 +1,267 @@
+"""
+Particionado mensual de las tablas de logs y auditoría
+
+``setup_auditoria --particionar`` convierte cada tabla de ``TABLAS_PARTICIONADAS``
+en una tabla particionada por rango de ``timestamp`` (una partición por mes,
+``<tabla>_pAAAAMM``). La tarea diaria ``mantener_particiones_auditoria``:
+
+- crea las particiones de los próximos ``PARTICIONES_FUTURAS`` meses, y
+- elimina con ``DROP TABLE`` las particiones que ya quedaron fuera de
+  ``AUDITORIA_CONFIG['RETENTION_DAYS_*']``, en lugar de borrar fila a fila.
+
+Cada tabla tiene además una partición ``DEFAULT`` (``<tabla>_pdefault``) para
+que una fila fuera de los meses creados (reloj desajustado, fecha importada)
+no haga fallar el ``INSERT`` de la petición. Al crear el mes que le
+corresponde, sus filas se mueven a la partición mensual; la tarea avisa en el
+log si la partición por defecto acumula filas.
+
+Los índices se declaran en la tabla padre y PostgreSQL crea uno local en cada
+partición.
+"""
+import logging
+import re
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger('auditoria')
+
+# Tabla -> clave de AUDITORIA_CONFIG con los días que se conservan
+TABLAS_PARTICIONADAS = {
+    'logs.sistema_logs': 'RETENTION_DAYS_SYSTEM_LOGS',
+    'logs.navegacion_usuarios': 'RETENTION_DAYS_NAVIGATION',
+    'logs.celery_logs': 'RETENTION_DAYS_SYSTEM_LOGS',
+    'logs.errores_sistema': 'RETENTION_DAYS_ERROR_LOGS',
+    'auditoria.cambios_bd': 'RETENTION_DAYS_AUDIT_CHANGES',
+}
+
+# Índices de la tabla padre (sufijo, columnas); el resto los crea setup_auditoria.
+# Los sufijos no repiten los nombres de los índices originales, que siguen en
+# <tabla>_sin_particion y harían que CREATE INDEX IF NOT EXISTS se saltara el nuevo
+INDICES = {
+    'logs.sistema_logs': [
+        ('ts', '("timestamp" DESC)'),
+        ('categoria_sub', '(categoria, subcategoria)'),
+        ('usuario_ts', '(usuario_id, "timestamp" DESC)'),
+    ],
+    'logs.navegacion_usuarios': [('ts', '("timestamp" DESC)'), ('usuario_ts', '(usuario_id, "timestamp" DESC)')],
+    'logs.celery_logs': [('ts', '("timestamp" DESC)'), ('task_id', '(task_id)')],
+    'logs.errores_sistema': [('ts', '("timestamp" DESC)')],
+    'auditoria.cambios_bd': [('ts', '("timestamp" DESC)'), ('tabla_registro', '(tabla, registro_id)')],
+}
+
+RETENCION_POR_DEFECTO = 90
+
+PARTICION_RE = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def get_config_particiones():
+    config = {
+        'PARTICIONES_FUTURAS': 3,  # meses creados por adelantado
+    }
+    config.update(getattr(settings, 'AUDITORIA_PARTICIONES', {}) or {})
+    return config
+
+
+def dias_retencion(tabla):
+    auditoria = getattr(settings, 'AUDITORIA_CONFIG', {}) or {}
+    return int(auditoria.get(TABLAS_PARTICIONADAS[tabla], RETENCION_POR_DEFECTO))
+
+
+def inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def sumar_meses(mes, cantidad):
+    indice = mes.year * 12 + mes.month - 1 + cantidad
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def nombre_particion(tabla, mes):
+    return f'{tabla}_p{mes:%Y%m}'
+
+
+def nombre_particion_default(tabla):
+    return f'{tabla}_pdefault'
+
+
+def es_particionada(cursor, tabla):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [tabla])
+    fila = cursor.fetchone()
+    return bool(fila) and fila[0] == 'p'
+
+
+def particiones_existentes(cursor, tabla):
+    """{mes: nombre calificado} de las particiones ``_pAAAAMM`` de ``tabla``"""
+    cursor.execute("""
+        SELECT n.nspname, c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE i.inhparent = to_regclass(%s)
+    """, [tabla])
+    particiones = {}
+    for esquema, nombre in cursor.fetchall():
+        coincidencia = PARTICION_RE.search(nombre)
+        if coincidencia:
+            mes = date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1)
+            particiones[mes] = f'{esquema}.{nombre}'
+    return particiones
+
+
+def crear_particion_default(cursor, tabla):
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {nombre_particion_default(tabla)} PARTITION OF {tabla} DEFAULT")
+
+
+def crear_particion_mes(cursor, tabla, mes):
+    """
+    Crea la partición de ``mes``
+
+    PostgreSQL no admite la partición si la ``DEFAULT`` ya tiene filas de ese
+    rango: se sacan a una tabla temporal y se reinsertan cuando existe.
+    """
+    siguiente = sumar_meses(mes, 1)
+    rango = [mes, siguiente]
+    default = nombre_particion_default(tabla)
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM {default} WHERE "timestamp" >= %s AND "timestamp" < %s)', rango
+    )
+    pendientes = cursor.fetchone()[0]
+    if pendientes:
+        cursor.execute(f'CREATE TEMP TABLE particion_pendiente (LIKE {tabla}) ON COMMIT DROP')
+        cursor.execute(
+            f'WITH movidas AS (DELETE FROM {default} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+            f'INSERT INTO particion_pendiente SELECT * FROM movidas', rango
+        )
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {nombre_particion(tabla, mes)} PARTITION OF {tabla} "
+        f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{siguiente.isoformat()}')"
+    )
+    if pendientes:
+        cursor.execute(f'INSERT INTO {tabla} SELECT * FROM particion_pendiente')
+        logger.info(f"🗂️ {tabla}: {cursor.rowcount} filas movidas de la partición por defecto a {mes:%Y-%m}")
+        cursor.execute('DROP TABLE particion_pendiente')
+
+
+def crear_particiones(cursor, tabla, desde, hasta):
+    """Crea las particiones mensuales de ``desde`` a ``hasta`` (incluidos); devuelve las nuevas"""
+    existentes = particiones_existentes(cursor, tabla)
+    creadas = []
+    mes = inicio_mes(desde)
+    while mes <= hasta:
+        if mes not in existentes:
+            crear_particion_mes(cursor, tabla, mes)
+            creadas.append(nombre_particion(tabla, mes))
+        mes = sumar_meses(mes, 1)
+    return creadas
+
+
+def eliminar_particiones_vencidas(cursor, tabla, hoy=None):
+    """
+    DROP de las particiones cuyo mes completo es anterior al límite de
+    retención; en la partición por defecto se borran las filas vencidas
+    """
+    limite = (hoy or date.today()) - timedelta(days=dias_retencion(tabla))
+    eliminadas = []
+    for mes, nombre in sorted(particiones_existentes(cursor, tabla).items()):
+        if sumar_meses(mes, 1) <= limite:
+            cursor.execute(f"DROP TABLE IF EXISTS {nombre}")
+            eliminadas.append(nombre)
+    cursor.execute(f'DELETE FROM {nombre_particion_default(tabla)} WHERE "timestamp" < %s', [limite])
+    return eliminadas
+
+
+def crear_indices(cursor, tabla):
+    nombre = tabla.split('.')[1]
+    for sufijo, columnas in INDICES.get(tabla, []):
+        # En una tabla particionada no se admite CONCURRENTLY; cada partición recibe su índice local
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{nombre}_{sufijo} ON {tabla} {columnas}")
+
+
+def particionar_tabla(cursor, tabla, eliminar_antigua=False):
+    """
+    Convierte ``tabla`` en particionada por mes y copia las filas dentro del
+    periodo de retención
+
+    La tabla original queda como ``<tabla>_sin_particion`` salvo que se pida
+    eliminarla. Ejecutar dentro de una transacción.
+
+    Returns:
+        Número de filas copiadas, o None si ya estaba particionada
+    """
+    if es_particionada(cursor, tabla):
+        return None
+
+    esquema, nombre = tabla.split('.')
+    antigua = f'{nombre}_sin_particion'
+    hoy = date.today()
+    limite = hoy - timedelta(days=dias_retencion(tabla))
+    hasta = sumar_meses(inicio_mes(hoy), get_config_particiones()['PARTICIONES_FUTURAS'])
+
+    cursor.execute(f'ALTER TABLE {tabla} RENAME TO {antigua}')
+    cursor.execute(
+        f'CREATE TABLE {tabla} (LIKE {esquema}.{antigua} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+        f'INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY RANGE ("timestamp")'
+    )
+    # La clave de partición debe formar parte de la clave primaria y no admite NULL
+    cursor.execute(f'ALTER TABLE {tabla} ALTER COLUMN "timestamp" SET NOT NULL')
+    cursor.execute(f'ALTER TABLE {tabla} ADD PRIMARY KEY (id, "timestamp")')
+
+    # La secuencia del id pasa a la tabla nueva (si no, se borraría con la antigua)
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [f'{esquema}.{antigua}'])
+    secuencia = cursor.fetchone()[0]
+    if secuencia:
+        cursor.execute(f'ALTER SEQUENCE {secuencia} OWNED BY {tabla}.id')
+
+    cursor.execute(f'SELECT MIN("timestamp") FROM {esquema}.{antigua} WHERE "timestamp" >= %s', [limite])
+    primera = cursor.fetchone()[0]
+    desde = inicio_mes(primera.date() if primera else hoy)
+    crear_particion_default(cursor, tabla)
+    crear_particiones(cursor, tabla, desde, hasta)
+
+    # Las filas con fecha posterior a ``hasta`` quedan en la partición por defecto
+    cursor.execute(
+        f'INSERT INTO {tabla} SELECT * FROM {esquema}.{antigua} WHERE "timestamp" >= %s', [limite]
+    )
+    copiadas = cursor.rowcount
+
+    crear_indices(cursor, tabla)
+    if eliminar_antigua:
+        cursor.execute(f'DROP TABLE {esquema}.{antigua}')
+    return copiadas
+
+
+def mantener_particiones(hoy=None):
+    """
+    Crea las particiones futuras y elimina las vencidas de todas las tablas
+
+    Returns:
+        {tabla: {'creadas': [...], 'eliminadas': [...], 'en_default': n}}
+        (solo tablas particionadas)
+    """
+    hoy = hoy or date.today()
+    hasta = sumar_meses(inicio_mes(hoy), get_config_particiones()['PARTICIONES_FUTURAS'])
+    resumen = {}
+    with connection.cursor() as cursor:
+        for tabla in TABLAS_PARTICIONADAS:
+            if not es_particionada(cursor, tabla):
+                continue
+            with transaction.atomic():
+                # Tablas particionadas antes de existir la partición por defecto
+                crear_particion_default(cursor, tabla)
+                creadas = crear_particiones(cursor, tabla, hoy, hasta)
+                eliminadas = eliminar_particiones_vencidas(cursor, tabla, hoy)
+                cursor.execute(f'SELECT COUNT(*) FROM {nombre_particion_default(tabla)}')
+                en_default = cursor.fetchone()[0]
+            resumen[tabla] = {'creadas': creadas, 'eliminadas': eliminadas, 'en_default': en_default}
+            if creadas or eliminadas:
+                logger.info(
+                    f"🗂️ {tabla}: {len(creadas)} particiones creadas, {len(eliminadas)} eliminadas por retención"
+                )
+            if en_default:
+                logger.warning(
+                    f"⚠️ {tabla}: {en_default} filas en {nombre_particion_default(tabla)} "
+                    f"(fechas fuera de las particiones mensuales)"
+                )
+    return resumen
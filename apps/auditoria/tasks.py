@@ -0,0 +1,12 @@
+"""
+Tareas Celery de auditoría
+"""
+from celery import shared_task
+
+
+@shared_task
+def mantener_particiones_auditoria():
+    """Crea las particiones futuras y elimina las vencidas de logs.* y auditoria.cambios_bd"""
+    from .particiones import mantener_particiones
+
+    return mantener_particiones()
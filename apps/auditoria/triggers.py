@@ -0,0 +1,156 @@
+"""
+Triggers de auditoría de cambios (auditoria.cambios_bd)
+
+El trigger anterior (``auditoria.registrar_cambio_automatico``) era FOR EACH
+ROW y guardaba la fila completa antes y después de cada UPDATE: cada avance
+de progreso de una Transcripcion o ActaGenerada copiaba varios MB de JSON.
+
+``setup_auditoria`` instala ahora tres triggers por tabla, FOR EACH STATEMENT
+con tablas de transición (``filas_anteriores`` / ``filas_nuevas``):
+
+- UPDATE: solo las columnas que cambiaron, como JSONB (``valores_anteriores``
+  y ``valores_nuevos`` con esas claves). Si solo cambiaron columnas excluidas
+  no se escribe nada.
+- INSERT / DELETE: la fila sin las columnas excluidas.
+
+Un UPDATE masivo se audita con un solo INSERT ... SELECT en lugar de una
+llamada al trigger por fila. Las columnas excluidas (progreso, fechas
+``auto_now``...) se pasan como argumentos del trigger y se configuran en
+``AUDITORIA_TRIGGERS``.
+"""
+from django.conf import settings
+
+PREFIJO_TRIGGER = 'audit_'
+OPERACIONES = ('insert', 'update', 'delete')
+
+SQL_FUNCIONES = [
+    """
+    CREATE OR REPLACE FUNCTION auditoria.diferencia_jsonb(anterior JSONB, nuevo JSONB, excluir TEXT[])
+    RETURNS TABLE(campos TEXT[], antes JSONB, despues JSONB) AS $$
+        SELECT array_agg(n.key ORDER BY n.key),
+               jsonb_object_agg(n.key, anterior -> n.key),
+               jsonb_object_agg(n.key, n.value)
+        FROM jsonb_each(nuevo) n
+        WHERE NOT (n.key = ANY(excluir))
+          AND (anterior -> n.key) IS DISTINCT FROM n.value
+    $$ LANGUAGE sql IMMUTABLE;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION auditoria.registrar_cambios_sentencia()
+    RETURNS TRIGGER AS $$
+    DECLARE
+        excluir TEXT[] := COALESCE(TG_ARGV, ARRAY[]::TEXT[]);
+        usuario_actual INTEGER;
+        session_actual VARCHAR(255);
+        ip_actual INET;
+    BEGIN
+        BEGIN
+            usuario_actual := NULLIF(current_setting('audit.user_id', true), '')::INTEGER;
+            session_actual := NULLIF(current_setting('audit.session_id', true), '');
+            ip_actual := NULLIF(current_setting('audit.ip_address', true), '')::INET;
+        EXCEPTION
+            WHEN OTHERS THEN
+                usuario_actual := NULL;
+                session_actual := NULL;
+                ip_actual := NULL;
+        END;
+
+        IF TG_OP = 'UPDATE' THEN
+            INSERT INTO auditoria.cambios_bd (
+                esquema, tabla, operacion, registro_id, usuario_id, session_id, ip_address,
+                campos_modificados, valores_anteriores, valores_nuevos, transaccion_id
+            )
+            SELECT TG_TABLE_SCHEMA, TG_TABLE_NAME, TG_OP, (n.fila ->> 'id')::INTEGER,
+                   usuario_actual, session_actual, ip_actual,
+                   d.campos, d.antes, d.despues, txid_current()
+            FROM (SELECT to_jsonb(f) AS fila FROM filas_nuevas f) n
+            JOIN (SELECT to_jsonb(f) AS fila FROM filas_anteriores f) o
+              ON (o.fila -> 'id') = (n.fila -> 'id')
+            CROSS JOIN LATERAL auditoria.diferencia_jsonb(o.fila, n.fila, excluir) d
+            WHERE d.campos IS NOT NULL;
+
+        ELSIF TG_OP = 'INSERT' THEN
+            INSERT INTO auditoria.cambios_bd (
+                esquema, tabla, operacion, registro_id, usuario_id, session_id, ip_address,
+                valores_nuevos, transaccion_id
+            )
+            SELECT TG_TABLE_SCHEMA, TG_TABLE_NAME, TG_OP, (to_jsonb(f) ->> 'id')::INTEGER,
+                   usuario_actual, session_actual, ip_actual,
+                   to_jsonb(f) - excluir, txid_current()
+            FROM filas_nuevas f;
+
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO auditoria.cambios_bd (
+                esquema, tabla, operacion, registro_id, usuario_id, session_id, ip_address,
+                valores_anteriores, transaccion_id
+            )
+            SELECT TG_TABLE_SCHEMA, TG_TABLE_NAME, TG_OP, (to_jsonb(f) ->> 'id')::INTEGER,
+                   usuario_actual, session_actual, ip_actual,
+                   to_jsonb(f) - excluir, txid_current()
+            FROM filas_anteriores f;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+]
+
+TRANSICIONES = {
+    'insert': 'REFERENCING NEW TABLE AS filas_nuevas',
+    'update': 'REFERENCING OLD TABLE AS filas_anteriores NEW TABLE AS filas_nuevas',
+    'delete': 'REFERENCING OLD TABLE AS filas_anteriores',
+}
+
+
+def get_config_triggers():
+    config = {
+        # Columnas que cambian en cada save() sin aportar a la auditoría
+        'COLUMNAS_EXCLUIDAS': ['fecha_actualizacion', 'fecha_modificacion', 'updated_at'],
+        'COLUMNAS_EXCLUIDAS_POR_TABLA': {},
+    }
+    config.update(getattr(settings, 'AUDITORIA_TRIGGERS', {}) or {})
+    return config
+
+
+def columnas_excluidas(tabla):
+    config = get_config_triggers()
+    return list(dict.fromkeys(
+        list(config['COLUMNAS_EXCLUIDAS']) + list(config['COLUMNAS_EXCLUIDAS_POR_TABLA'].get(tabla, []))
+    ))
+
+
+def nombre_trigger(tabla, operacion):
+    # PostgreSQL trunca los identificadores a 63 bytes
+    return f'{PREFIJO_TRIGGER}{operacion}_{tabla}'[:63]
+
+
+def instalar_funciones(cursor):
+    for sql in SQL_FUNCIONES:
+        cursor.execute(sql)
+
+
+def _literal(valor):
+    return "'" + valor.replace("'", "''") + "'"
+
+
+def eliminar_triggers(cursor, tabla):
+    """Quita los triggers de auditoría de ``tabla`` (también el antiguo FOR EACH ROW)"""
+    cursor.execute(f'DROP TRIGGER IF EXISTS audit_trigger_{tabla} ON {tabla}')
+    for operacion in OPERACIONES:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {nombre_trigger(tabla, operacion)} ON {tabla}')
+
+
+def instalar_triggers(cursor, tabla, excluir=None):
+    """Sustituye los triggers de ``tabla`` por los de sentencia con diferencias"""
+    excluir = columnas_excluidas(tabla) if excluir is None else excluir
+    argumentos = ', '.join(_literal(columna) for columna in excluir)
+    eliminar_triggers(cursor, tabla)
+    for operacion in OPERACIONES:
+        cursor.execute(f"""
+            CREATE TRIGGER {nombre_trigger(tabla, operacion)}
+                AFTER {operacion.upper()} ON {tabla}
+                {TRANSICIONES[operacion]}
+                FOR EACH STATEMENT
+                EXECUTE FUNCTION auditoria.registrar_cambios_sentencia({argumentos})
+        """)
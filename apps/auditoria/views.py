@@ -21,16 +21,18 @@ def dashboard_auditoria(request):
     """Dashboard principal de auditoría"""
     
     # Obtener estadísticas generales
+    # Predicados de rango sobre timestamp (no DATE(timestamp)): usan los índices
+    # y descartan las particiones fuera del periodo
     with connection.cursor() as cursor:
         # Estadísticas de hoy
         cursor.execute("""
             SELECT 
-                (SELECT COUNT(*) FROM logs.sistema_logs WHERE DATE(timestamp) = CURRENT_DATE) as logs_sistema,
-                (SELECT COUNT(*) FROM logs.navegacion_usuarios WHERE DATE(timestamp) = CURRENT_DATE) as navegacion,
-                (SELECT COUNT(*) FROM logs.api_logs WHERE DATE(timestamp) = CURRENT_DATE) as api_calls,
-                (SELECT COUNT(*) FROM logs.errores_sistema WHERE DATE(timestamp) = CURRENT_DATE) as errores,
-                (SELECT COUNT(*) FROM logs.acceso_usuarios WHERE DATE(timestamp) = CURRENT_DATE) as accesos,
-                (SELECT COUNT(*) FROM auditoria.cambios_bd WHERE DATE(timestamp) = CURRENT_DATE) as cambios_bd
+                (SELECT COUNT(*) FROM logs.sistema_logs WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1) as logs_sistema,
+                (SELECT COUNT(*) FROM logs.navegacion_usuarios WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1) as navegacion,
+                (SELECT COUNT(*) FROM logs.api_logs WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1) as api_calls,
+                (SELECT COUNT(*) FROM logs.errores_sistema WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1) as errores,
+                (SELECT COUNT(*) FROM logs.acceso_usuarios WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1) as accesos,
+                (SELECT COUNT(*) FROM auditoria.cambios_bd WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1) as cambios_bd
         """)
         estadisticas_hoy = cursor.fetchone()
         
@@ -110,11 +112,11 @@ def logs_sistema(request):
         params.append(f'%{categoria}%')
     
     if fecha_desde:
-        query += " AND DATE(timestamp) >= %s"
+        query += " AND timestamp >= %s::date"
         params.append(fecha_desde)
     
     if fecha_hasta:
-        query += " AND DATE(timestamp) <= %s"
+        query += " AND timestamp < %s::date + 1"
         params.append(fecha_hasta)
     
     query += " ORDER BY timestamp DESC"
@@ -178,11 +180,11 @@ def logs_navegacion(request):
         params.append(f'%{url_filtro}%')
     
     if fecha_desde:
-        query += " AND DATE(timestamp) >= %s"
+        query += " AND timestamp >= %s::date"
         params.append(fecha_desde)
     
     if fecha_hasta:
-        query += " AND DATE(timestamp) <= %s"
+        query += " AND timestamp < %s::date + 1"
         params.append(fecha_hasta)
     
     query += " ORDER BY timestamp DESC"
@@ -244,11 +246,11 @@ def auditoria_cambios(request):
         params.append(usuario_id)
     
     if fecha_desde:
-        query += " AND DATE(timestamp) >= %s"
+        query += " AND timestamp >= %s::date"
         params.append(fecha_desde)
     
     if fecha_hasta:
-        query += " AND DATE(timestamp) <= %s"
+        query += " AND timestamp < %s::date + 1"
         params.append(fecha_hasta)
     
     query += " ORDER BY timestamp DESC"
@@ -0,0 +1,399 @@
+"""
+Motor de envío SMTP por lotes
+
+``SMTPService`` abría una conexión (TCP + STARTTLS + login) por destinatario.
+El motor mantiene por proceso:
+
+- Un pool de sesiones SMTP abiertas por proveedor. Una sesión se reutiliza
+  mientras responda a ``NOOP`` y no supere ``MENSAJES_POR_SESION`` envíos.
+- Un cubo de tokens por proveedor que limita el ritmo de envío a
+  ``ENVIOS_POR_MINUTO`` (ráfaga máxima ``RAFAGA``). El cupo diario lo marca
+  el contador ``emails_enviados_hoy`` de la base de datos, compartido entre
+  procesos. Un proveedor sin tokens está saturado, no sin cupo diario.
+
+``enviar`` manda un lote de mensajes con failover entre proveedores y
+registra ``LogEnvioEmail`` con ``bulk_create``/``bulk_update``. Lo que no
+cabe en el cubo de ningún proveedor se devuelve como diferido: la tarea
+``enviar_lote_emails`` (cola ``emails``) lo vuelve a encolar con espera.
+"""
+import logging
+import smtplib
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ConfiguracionSMTP, LogEnvioEmail
+
+logger = logging.getLogger(__name__)
+
+# La sesión sigue viva pero el proveedor rechazó el mensaje: no se reintenta en otro
+ERRORES_DESTINATARIO = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)
+# La sesión se perdió: el resto del lote pasa a otra sesión o proveedor
+ERRORES_SESION = (smtplib.SMTPServerDisconnected, smtplib.SMTPException, OSError)
+
+# Resultado de un envío individual sin tokens en el cubo: reintentar, no es el límite diario
+MENSAJE_SATURADO = "Proveedor SMTP saturado"
+
+CAMPOS_LOG = ['estado', 'enviado_en', 'mensaje_error', 'intentos_realizados',
+              'tiempo_procesamiento', 'configuracion_smtp']
+
+
+def get_config_motor_smtp():
+    config = {
+        'CONEXIONES_POR_PROVEEDOR': 2,  # sesiones ociosas que se conservan por proveedor
+        'INACTIVIDAD_MAXIMA': 60,       # segundos; pasado ese tiempo se comprueba con NOOP
+        'MENSAJES_POR_SESION': 100,     # luego se cierra y se abre otra (límite habitual de los proveedores)
+        'RAFAGA': 50,                   # capacidad del cubo de tokens
+        'ENVIOS_POR_MINUTO': 60,        # recarga del cubo: ritmo sostenido que acepta el proveedor
+        'TAMANO_LOTE': 50,              # mensajes por tarea Celery
+        'COLA': 'emails',
+        'TIMEOUT': 30,
+    }
+    config.update(getattr(settings, 'MOTOR_SMTP', {}) or {})
+    return config
+
+
+class CuboTokens:
+    """Cubo de tokens: ``capacidad`` de ráfaga y recarga de ``tasa`` tokens por segundo"""
+
+    def __init__(self, tasa, capacidad):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = float(capacidad)
+        self.ultima_recarga = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultima_recarga) * self.tasa)
+        self.ultima_recarga = ahora
+
+    def tomar(self, cantidad):
+        """Reserva hasta ``cantidad`` tokens y devuelve cuántos consiguió"""
+        with self.lock:
+            self._recargar()
+            tomados = min(cantidad, int(self.tokens))
+            self.tokens -= tomados
+            return tomados
+
+    def devolver(self, cantidad):
+        with self.lock:
+            self.tokens = min(self.capacidad, self.tokens + cantidad)
+
+    def espera(self):
+        """Segundos hasta que haya un token disponible"""
+        with self.lock:
+            self._recargar()
+            if self.tokens >= 1 or self.tasa <= 0:
+                return 0
+            return (1 - self.tokens) / self.tasa
+
+
+class PoolSMTP:
+    """Sesiones SMTP abiertas por proveedor, reutilizadas entre envíos del mismo proceso"""
+
+    def __init__(self):
+        self.libres = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def clave(config):
+        # Si cambian el servidor o las credenciales, las sesiones anteriores dejan de usarse
+        return (config.pk, config.servidor_smtp, config.puerto, config.usuario_smtp,
+                config.password_smtp, config.usa_ssl, config.usa_tls)
+
+    @staticmethod
+    def abrir(config):
+        """Abre y autentica una sesión SMTP con el proveedor"""
+        timeout = get_config_motor_smtp()['TIMEOUT']
+        if config.usa_ssl:
+            server = smtplib.SMTP_SSL(config.servidor_smtp, config.puerto, timeout=timeout)
+        else:
+            server = smtplib.SMTP(config.servidor_smtp, config.puerto, timeout=timeout)
+
+        if config.usa_tls and not config.usa_ssl:
+            server.starttls()
+
+        server.login(config.usuario_smtp, config.password_smtp)
+        return server
+
+    @staticmethod
+    def cerrar(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def obtener(self, config):
+        """Devuelve (sesión, mensajes ya enviados en ella): una libre que responda o una nueva"""
+        inactividad = get_config_motor_smtp()['INACTIVIDAD_MAXIMA']
+        clave = self.clave(config)
+        while True:
+            with self.lock:
+                cola = self.libres.get(clave)
+                if not cola:
+                    break
+                server, enviados, devuelta = cola.pop()
+            if time.monotonic() - devuelta < inactividad:
+                return server, enviados
+            try:
+                if server.noop()[0] == 250:
+                    return server, enviados
+            except ERRORES_SESION:
+                pass
+            self.cerrar(server)
+        return self.abrir(config), 0
+
+    def devolver(self, config, server, enviados):
+        config_motor = get_config_motor_smtp()
+        if enviados < config_motor['MENSAJES_POR_SESION']:
+            with self.lock:
+                cola = self.libres.setdefault(self.clave(config), deque())
+                if len(cola) < config_motor['CONEXIONES_POR_PROVEEDOR']:
+                    cola.append((server, enviados, time.monotonic()))
+                    return
+        self.cerrar(server)
+
+    def descartar(self, server):
+        self.cerrar(server)
+
+    def cerrar_todo(self):
+        with self.lock:
+            sesiones = [server for cola in self.libres.values() for server, _, _ in cola]
+            self.libres.clear()
+        for server in sesiones:
+            self.cerrar(server)
+
+
+class MotorSMTP:
+    """Envío de lotes con pool de sesiones, cubo de tokens y failover por proveedor"""
+
+    def __init__(self):
+        self.pool = PoolSMTP()
+        self.cubos = {}
+        self.lock = threading.Lock()
+
+    def cubo(self, config):
+        """Cubo del proveedor; se recrea si cambió el ritmo configurado o su límite diario"""
+        config_motor = get_config_motor_smtp()
+        tasa = config_motor['ENVIOS_POR_MINUTO'] / 60.0
+        capacidad = max(1, min(config.limite_diario, config_motor['RAFAGA']))
+        with self.lock:
+            cubo = self.cubos.get(config.pk)
+            if cubo is None or cubo.tasa != tasa or cubo.capacidad != capacidad:
+                cubo = self.cubos[config.pk] = CuboTokens(tasa, capacidad)
+            return cubo
+
+    def _reservar(self, config, cantidad):
+        """Tokens concedidos al proveedor, sin pasar del restante de su límite diario"""
+        config.reset_contador_diario()
+        restante = max(0, config.limite_diario - config.emails_enviados_hoy)
+        return self.cubo(config).tomar(min(cantidad, restante))
+
+    def _espera_cupo(self, config):
+        """Segundos hasta que el proveedor vuelva a tener cupo"""
+        if config.emails_enviados_hoy >= config.limite_diario:
+            ahora = timezone.localtime()
+            manana = (ahora + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            return (manana - ahora).total_seconds()
+        return self.cubo(config).espera()
+
+    def _sumar_enviados(self, config, cantidad):
+        if cantidad:
+            # Un UPDATE por sesión en lugar de un save() por email
+            ConfiguracionSMTP.objects.filter(pk=config.pk).update(
+                emails_enviados_hoy=F('emails_enviados_hoy') + cantidad
+            )
+            config.emails_enviados_hoy += cantidad
+
+    def _enviar_sesion(self, config, lote, logs, resultados):
+        """
+        Envía ``lote`` por una sesión del pool (reconecta una vez si se cae)
+
+        Returns:
+            (mensajes no enviados por fallo de sesión, último error)
+        """
+        from .smtp_service import smtp_service
+
+        indice = 0
+        ultimo_error = ''
+        for _ in range(2):
+            try:
+                server, en_sesion = self.pool.obtener(config)
+            except Exception as e:
+                ultimo_error = str(e)
+                logger.error(f"Error conectando con {config.nombre}: {ultimo_error}")
+                break
+
+            enviados = 0
+            try:
+                while indice < len(lote):
+                    mensaje = lote[indice]
+                    log_envio = logs[mensaje['log_id']]
+                    log_envio.intentos_realizados += 1
+                    inicio = time.time()
+                    try:
+                        msg = smtp_service._crear_mensaje(
+                            config, log_envio.destinatario, log_envio.asunto,
+                            log_envio.contenido_texto, log_envio.contenido_html,
+                        )
+                        error_mensaje = None if msg is not None else "No hay contenido para enviar"
+                    except Exception as e:
+                        error_mensaje = f"Error creando el mensaje: {e}"
+                    if error_mensaje:
+                        # No llegó al proveedor: el token vuelve al cubo
+                        self.cubo(config).devolver(1)
+                        log_envio.estado = 'error'
+                        log_envio.mensaje_error = error_mensaje
+                        resultados[mensaje['log_id']] = (False, error_mensaje)
+                        indice += 1
+                        continue
+                    try:
+                        server.sendmail(config.email_remitente, log_envio.destinatario, msg.as_string())
+                    except ERRORES_DESTINATARIO as e:
+                        # Rechazo del destinatario: otro proveedor no lo arreglará
+                        log_envio.estado = 'error'
+                        log_envio.mensaje_error = str(e)
+                        resultados[mensaje['log_id']] = (False, str(e))
+                        indice += 1
+                        continue
+
+                    enviados += 1
+                    en_sesion += 1
+                    log_envio.estado = 'enviado'
+                    log_envio.enviado_en = timezone.now()
+                    log_envio.tiempo_procesamiento = time.time() - inicio
+                    log_envio.configuracion_smtp = config
+                    log_envio.mensaje_error = None
+                    resultados[mensaje['log_id']] = (True, "Email enviado exitosamente")
+                    indice += 1
+            except ERRORES_SESION as e:
+                ultimo_error = str(e)
+                logger.warning(f"Sesión SMTP con {config.nombre} interrumpida: {ultimo_error}")
+                logs[lote[indice]['log_id']].mensaje_error = ultimo_error
+                self.pool.descartar(server)
+                self._sumar_enviados(config, enviados)
+                continue
+            except Exception:
+                # Error inesperado: no dejar la sesión abierta ni perder la cuenta de lo enviado
+                self.pool.descartar(server)
+                self._sumar_enviados(config, enviados)
+                raise
+
+            self.pool.devolver(config, server, en_sesion)
+            self._sumar_enviados(config, enviados)
+            return [], ultimo_error
+
+        return lote[indice:], ultimo_error
+
+    def enviar(self, mensajes, usuario_solicitante_id=None):
+        """
+        Envía un lote de mensajes
+
+        Args:
+            mensajes: Lista de dicts con ``destinatario``, ``asunto``,
+                ``contenido_html`` y/o ``contenido_texto``, o solo ``log_id``
+                para reenviar un LogEnvioEmail ya creado (reintentos diferidos).
+            usuario_solicitante_id: Usuario que solicita el envío
+
+        Returns:
+            dict con ``resultados`` ({log_id: (éxito, mensaje)}), ``diferidos``
+            (mensajes sin cupo en ningún proveedor) y ``espera`` (segundos
+            hasta que vuelva a haber cupo)
+        """
+        respuesta = {'resultados': {}, 'diferidos': [], 'espera': 0}
+        if not mensajes:
+            return respuesta
+
+        nuevos = [m for m in mensajes if not m.get('log_id')]
+        creados = LogEnvioEmail.objects.bulk_create([
+            LogEnvioEmail(
+                destinatario=m['destinatario'],
+                asunto=m['asunto'][:255],
+                contenido_texto=m.get('contenido_texto') or '',
+                contenido_html=m.get('contenido_html') or '',
+                usuario_solicitante_id=usuario_solicitante_id,
+            )
+            for m in nuevos
+        ], batch_size=200)
+        for mensaje, log_envio in zip(nuevos, creados):
+            mensaje['log_id'] = log_envio.pk
+
+        logs = LogEnvioEmail.objects.in_bulk([m['log_id'] for m in mensajes])
+        pendientes = [m for m in mensajes if m['log_id'] in logs]
+        resultados = respuesta['resultados']
+        ultimo_error = "No hay proveedores SMTP activos"
+        sin_cupo = []
+
+        for config in ConfiguracionSMTP.objects.filter(activo=True).order_by('prioridad', 'por_defecto'):
+            if not pendientes:
+                break
+            concedidos = self._reservar(config, len(pendientes))
+            if concedidos < len(pendientes):
+                sin_cupo.append(config)
+            if not concedidos:
+                continue
+
+            lote, resto = pendientes[:concedidos], pendientes[concedidos:]
+            logger.info(f"📧 Enviando lote de {len(lote)} emails con {config.nombre}")
+            fallidos, error = self._enviar_sesion(config, lote, logs, resultados)
+            if fallidos:
+                ultimo_error = error
+                self.cubo(config).devolver(len(fallidos))
+            pendientes = fallidos + resto
+
+        if pendientes and sin_cupo:
+            # Sin cupo ahora: se reintentan cuando el cubo de algún proveedor se recargue
+            respuesta['diferidos'] = [{'log_id': m['log_id']} for m in pendientes]
+            respuesta['espera'] = max(1, min(self._espera_cupo(config) for config in sin_cupo))
+            for mensaje in pendientes:
+                logs[mensaje['log_id']].estado = 'reintentando'
+        else:
+            for mensaje in pendientes:
+                log_envio = logs[mensaje['log_id']]
+                log_envio.estado = 'error'
+                log_envio.mensaje_error = f"Todos los proveedores fallaron. Último error: {ultimo_error}"
+                resultados[mensaje['log_id']] = (False, ultimo_error)
+
+        LogEnvioEmail.objects.bulk_update(list(logs.values()), CAMPOS_LOG, batch_size=200)
+
+        enviados = sum(1 for exito, _ in resultados.values() if exito)
+        logger.info(
+            f"📧 Lote de {len(mensajes)} emails: {enviados} enviados, "
+            f"{len(respuesta['diferidos'])} diferidos"
+        )
+        return respuesta
+
+
+motor_smtp = MotorSMTP()
+
+
+def encolar_emails(mensajes, usuario_solicitante=None):
+    """
+    Reparte los mensajes en tareas de ``TAMANO_LOTE`` en la cola ``emails``
+
+    Sin broker disponible el lote se envía en el propio proceso.
+    """
+    from .tasks import enviar_lote_emails
+
+    config = get_config_motor_smtp()
+    usuario_id = getattr(usuario_solicitante, 'pk', usuario_solicitante)
+    tamano = config['TAMANO_LOTE']
+    lotes = [mensajes[i:i + tamano] for i in range(0, len(mensajes), tamano)]
+    for indice, lote in enumerate(lotes):
+        try:
+            enviar_lote_emails.apply_async((lote, usuario_id), queue=config['COLA'])
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo encolar el lote de emails, se envía en el proceso: {e}")
+            for restante in lotes[indice:]:
+                motor_smtp.enviar(restante, usuario_id)
+            break
+    return len(lotes)
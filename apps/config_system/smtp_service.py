@@ -16,6 +16,7 @@ from typing import List, Optional, Dict, Any
 import logging
 
 from .models import ConfiguracionSMTP, ConfiguracionEmail, LogEnvioEmail
+from .motor_smtp import MENSAJE_SATURADO, encolar_emails, get_config_motor_smtp, motor_smtp
 
 logger = logging.getLogger(__name__)
 
@@ -132,6 +133,59 @@ class SMTPService:
             
             return False, error_msg
     
+    def _abrir_conexion(self, config: ConfiguracionSMTP) -> smtplib.SMTP:
+        """Abre y autentica una sesión SMTP con el proveedor"""
+        return motor_smtp.pool.abrir(config)
+    
+    def _crear_mensaje(self, config: ConfiguracionSMTP, destinatario: str, asunto: str,
+                       contenido_texto: str = None, contenido_html: str = None,
+                       adjuntos: List = None):
+        """Construye el mensaje MIME (None si no hay contenido)"""
+        if contenido_texto and contenido_html:
+            # Email con versiones texto y HTML
+            msg = MIMEMultipart('alternative')
+            msg.attach(MIMEText(contenido_texto, 'plain', 'utf-8'))
+            msg.attach(MIMEText(contenido_html, 'html', 'utf-8'))
+        elif contenido_html:
+            # Solo HTML
+            msg = MIMEText(contenido_html, 'html', 'utf-8')
+        elif contenido_texto:
+            # Solo texto
+            msg = MIMEText(contenido_texto, 'plain', 'utf-8')
+        else:
+            return None
+        
+        msg['From'] = f"{config.nombre_remitente} <{config.email_remitente}>"
+        msg['To'] = destinatario
+        msg['Subject'] = asunto
+        
+        # Agregar adjuntos si los hay
+        if adjuntos:
+            # Si hay adjuntos, necesitamos convertir a MIMEMultipart
+            if not isinstance(msg, MIMEMultipart):
+                # Crear nuevo mensaje multipart y mover el contenido
+                original_msg = msg
+                msg = MIMEMultipart()
+                msg['From'] = original_msg['From']
+                msg['To'] = original_msg['To']
+                msg['Subject'] = original_msg['Subject']
+                msg.attach(original_msg)
+            
+            for adjunto in adjuntos:
+                if hasattr(adjunto, 'read'):  # Es un archivo
+                    if hasattr(adjunto, 'seek'):
+                        adjunto.seek(0)
+                    part = MIMEBase('application', 'octet-stream')
+                    part.set_payload(adjunto.read())
+                    encoders.encode_base64(part)
+                    part.add_header(
+                        'Content-Disposition',
+                        f'attachment; filename= {adjunto.name}'
+                    )
+                    msg.attach(part)
+        
+        return msg
+    
     def _enviar_con_proveedor(self, config: ConfiguracionSMTP, destinatario: str,
                              asunto: str, contenido_texto: str = None, 
                              contenido_html: str = None, adjuntos: List = None,
@@ -140,82 +194,35 @@ class SMTPService:
         try:
             start_time = time.time()
             
-            # Verificar límites
+            # Verificar límites: cupo diario y ritmo de envío (cubo de tokens del motor)
             if not config.puede_enviar_email():
                 return False, f"Límite diario alcanzado ({config.limite_diario})"
+            if not motor_smtp._reservar(config, 1):
+                espera = motor_smtp.cubo(config).espera()
+                return False, f"{MENSAJE_SATURADO} ({config.nombre}), reintentar en {espera:.0f} s"
             
             # Crear mensaje
-            if contenido_texto and contenido_html:
-                # Email con versiones texto y HTML
-                msg = MIMEMultipart('alternative')
-                msg['From'] = f"{config.nombre_remitente} <{config.email_remitente}>"
-                msg['To'] = destinatario
-                msg['Subject'] = asunto
-                
-                # Agregar contenido texto
-                part_texto = MIMEText(contenido_texto, 'plain', 'utf-8')
-                msg.attach(part_texto)
-                
-                # Agregar contenido HTML
-                part_html = MIMEText(contenido_html, 'html', 'utf-8')
-                msg.attach(part_html)
-                
-            elif contenido_html:
-                # Solo HTML
-                msg = MIMEText(contenido_html, 'html', 'utf-8')
-                msg['From'] = f"{config.nombre_remitente} <{config.email_remitente}>"
-                msg['To'] = destinatario
-                msg['Subject'] = asunto
-                
-            elif contenido_texto:
-                # Solo texto
-                msg = MIMEText(contenido_texto, 'plain', 'utf-8')
-                msg['From'] = f"{config.nombre_remitente} <{config.email_remitente}>"
-                msg['To'] = destinatario
-                msg['Subject'] = asunto
-                
-            else:
+            try:
+                msg = self._crear_mensaje(config, destinatario, asunto, contenido_texto, contenido_html, adjuntos)
+            except Exception:
+                motor_smtp.cubo(config).devolver(1)
+                raise
+            if msg is None:
+                motor_smtp.cubo(config).devolver(1)
                 return False, "No hay contenido para enviar"
             
-            # Agregar adjuntos si los hay
-            if adjuntos:
-                # Si hay adjuntos, necesitamos convertir a MIMEMultipart
-                if not isinstance(msg, MIMEMultipart):
-                    # Crear nuevo mensaje multipart y mover el contenido
-                    original_msg = msg
-                    msg = MIMEMultipart()
-                    msg['From'] = original_msg['From']
-                    msg['To'] = original_msg['To']
-                    msg['Subject'] = original_msg['Subject']
-                    msg.attach(original_msg)
-                
-                for adjunto in adjuntos:
-                    if hasattr(adjunto, 'read'):  # Es un archivo
-                        part = MIMEBase('application', 'octet-stream')
-                        part.set_payload(adjunto.read())
-                        encoders.encode_base64(part)
-                        part.add_header(
-                            'Content-Disposition',
-                            f'attachment; filename= {adjunto.name}'
-                        )
-                        msg.attach(part)
-            
-            # Enviar email
-            if config.usa_ssl:
-                server = smtplib.SMTP_SSL(config.servidor_smtp, config.puerto)
-            else:
-                server = smtplib.SMTP(config.servidor_smtp, config.puerto)
-            
-            if config.usa_tls and not config.usa_ssl:
-                server.starttls()
-            
-            server.login(config.usuario_smtp, config.password_smtp)
-            text = msg.as_string()
-            server.sendmail(config.email_remitente, destinatario, text)
-            server.quit()
+            # Enviar email por una sesión del pool
+            server, en_sesion = motor_smtp.pool.obtener(config)
+            try:
+                server.sendmail(config.email_remitente, destinatario, msg.as_string())
+            except Exception:
+                motor_smtp.pool.descartar(server)
+                motor_smtp.cubo(config).devolver(1)
+                raise
+            motor_smtp.pool.devolver(config, server, en_sesion + 1)
             
             # Actualizar contadores y logs
-            config.incrementar_contador()
+            motor_smtp._sumar_enviados(config, 1)
             end_time = time.time()
             
             if log_envio:
@@ -238,6 +245,79 @@ class SMTPService:
             
             return False, error_msg
     
+    def enviar_lote(self, destinatarios: List[str], asunto: str, contenido_html: str = None,
+                    contenido_texto: str = None, usuario_solicitante=None) -> Dict[str, tuple[bool, str]]:
+        """
+        Envía el mismo email a varios destinatarios con el motor SMTP
+        (sesiones del pool, cupo por proveedor y failover)
+        
+        Los destinatarios que no caben en el cupo de ningún proveedor quedan
+        encolados en la cola ``emails`` hasta que haya cupo. El contenido se
+        envía tal cual, sin plantilla.
+        
+        Returns:
+            dict: {destinatario: (éxito, mensaje)}
+        """
+        destinatarios = list(dict.fromkeys(d for d in destinatarios if d))
+        if not destinatarios:
+            return {}
+        
+        config_email = self._get_configuracion_email()
+        if config_email and hasattr(config_email, 'sistema_activo') and not config_email.sistema_activo:
+            return {d: (False, "Sistema de emails desactivado") for d in destinatarios}
+        
+        mensajes = [
+            {'destinatario': d, 'asunto': asunto, 'contenido_html': contenido_html, 'contenido_texto': contenido_texto}
+            for d in destinatarios
+        ]
+        usuario_id = getattr(usuario_solicitante, 'pk', None)
+        respuesta = motor_smtp.enviar(mensajes, usuario_id)
+        
+        if respuesta['diferidos']:
+            from .tasks import enviar_lote_emails
+            try:
+                enviar_lote_emails.apply_async(
+                    (respuesta['diferidos'], usuario_id),
+                    countdown=respuesta['espera'],
+                    queue=get_config_motor_smtp()['COLA'],
+                )
+            except Exception as e:
+                logger.error(f"No se pudieron encolar los emails diferidos: {e}")
+        
+        diferidos = {m['log_id'] for m in respuesta['diferidos']}
+        resultados = {}
+        for mensaje in mensajes:
+            if mensaje['log_id'] in diferidos:
+                resultados[mensaje['destinatario']] = (False, "Límite de envío alcanzado, encolado para más tarde")
+            else:
+                resultados[mensaje['destinatario']] = respuesta['resultados'].get(
+                    mensaje['log_id'], (False, "No enviado")
+                )
+        return resultados
+    
+    def encolar_lote(self, destinatarios: List[str], asunto: str, contenido: str,
+                     variables_template: Dict[str, Any] = None, usuario_solicitante=None) -> int:
+        """
+        Encola el mismo email (con la plantilla HTML) para varios destinatarios
+        en la cola ``emails``; la vista no espera al servidor SMTP
+        
+        Returns:
+            int: Número de destinatarios encolados
+        """
+        destinatarios = list(dict.fromkeys(d for d in destinatarios if d))
+        config_email = self._get_configuracion_email()
+        if not destinatarios or (
+            config_email and hasattr(config_email, 'sistema_activo') and not config_email.sistema_activo
+        ):
+            return 0
+        
+        contenido_html = self._generar_html_desde_template(contenido, asunto, variables_template)
+        encolar_emails(
+            [{'destinatario': d, 'asunto': asunto, 'contenido_html': contenido_html} for d in destinatarios],
+            usuario_solicitante=usuario_solicitante,
+        )
+        return len(destinatarios)
+    
     def enviar_email(self, destinatario: str, asunto: str, contenido: str,
                     es_html: bool = True, adjuntos: List = None, 
                     variables_template: Dict[str, Any] = None,
@@ -316,10 +396,6 @@ class SMTPService:
                     return True, mensaje
                 
                 ultimo_error = mensaje
-                
-                # Esperar antes del siguiente intento
-                if log_envio.intentos_realizados < len(proveedores):
-                    time.sleep(2)
             
             # Si llegamos aquí, todos los proveedores fallaron
             log_envio.estado = 'error'
@@ -438,9 +514,9 @@ def enviar_email_notificacion(destinatario: str, asunto: str, contenido: str,
     )
 
 
-def enviar_email_evento(destinatario: str, evento, tipo_notificacion: str = 'invitacion',
-                       usuario_solicitante=None) -> tuple[bool, str]:
-    """Función específica para enviar emails de eventos"""
+def _contenido_email_evento(evento, tipo_notificacion: str) -> tuple[str, str]:
+    """Asunto y contenido HTML de las notificaciones de eventos"""
+    asunto, contenido = f"Evento: {evento.titulo}", ""
     
     if tipo_notificacion == 'invitacion':
         asunto = f"Invitación: {evento.titulo}"
@@ -489,6 +565,13 @@ def enviar_email_evento(destinatario: str, evento, tipo_notificacion: str = 'inv
         <p>Te esperamos puntualmente.</p>
         """
     
+    return asunto, contenido
+
+
+def enviar_email_evento(destinatario: str, evento, tipo_notificacion: str = 'invitacion',
+                       usuario_solicitante=None) -> tuple[bool, str]:
+    """Función específica para enviar emails de eventos"""
+    asunto, contenido = _contenido_email_evento(evento, tipo_notificacion)
     return smtp_service.enviar_email(
         destinatario=destinatario,
         asunto=asunto,
@@ -496,3 +579,12 @@ def enviar_email_evento(destinatario: str, evento, tipo_notificacion: str = 'inv
         es_html=True,
         usuario_solicitante=usuario_solicitante
     )
+
+
+def encolar_emails_evento(destinatarios: List[str], evento, tipo_notificacion: str = 'invitacion',
+                          usuario_solicitante=None) -> int:
+    """Encola la notificación del evento para todos los destinatarios (cola ``emails``)"""
+    asunto, contenido = _contenido_email_evento(evento, tipo_notificacion)
+    return smtp_service.encolar_lote(
+        destinatarios, asunto, contenido, usuario_solicitante=usuario_solicitante
+    )
@@ -0,0 +1,32 @@
+"""
+Tareas Celery del sistema de email (cola ``emails``)
+"""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, acks_late=True)
+def enviar_lote_emails(self, mensajes, usuario_solicitante_id=None):
+    """Envía un lote con el motor SMTP y reprograma lo que quedó sin cupo"""
+    from .motor_smtp import get_config_motor_smtp, motor_smtp
+
+    respuesta = motor_smtp.enviar(mensajes, usuario_solicitante_id)
+    if respuesta['diferidos']:
+        logger.info(
+            f"⏳ {len(respuesta['diferidos'])} emails sin cupo (ritmo o límite diario), reintento en {respuesta['espera']:.0f}s"
+        )
+        enviar_lote_emails.apply_async(
+            (respuesta['diferidos'], usuario_solicitante_id),
+            countdown=respuesta['espera'],
+            queue=get_config_motor_smtp()['COLA'],
+        )
+
+    enviados = sum(1 for exito, _ in respuesta['resultados'].values() if exito)
+    return {
+        'enviados': enviados,
+        'fallidos': len(respuesta['resultados']) - enviados,
+        'diferidos': len(respuesta['diferidos']),
+    }
@@ -0,0 +1,113 @@
+import smtplib
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from .models import ConfiguracionSMTP, LogEnvioEmail
+from .motor_smtp import MENSAJE_SATURADO, CuboTokens, MotorSMTP
+from .smtp_service import smtp_service
+
+
+def mensajes(cantidad):
+    return [
+        {'destinatario': f'concejal{i}@municipio.gob.ec', 'asunto': f'Convocatoria {i}', 'contenido_texto': 'Sesión'}
+        for i in range(cantidad)
+    ]
+
+
+class CuboTokensTests(TestCase):
+    def test_rafaga_y_recarga(self):
+        cubo = CuboTokens(tasa=1.0, capacidad=5)
+
+        self.assertEqual(cubo.tomar(8), 5)
+        self.assertEqual(cubo.tomar(1), 0)
+        self.assertGreater(cubo.espera(), 0)
+
+        # Tres segundos después hay tres tokens, nunca más que la capacidad
+        cubo.ultima_recarga -= 3
+        self.assertEqual(cubo.tomar(8), 3)
+        cubo.ultima_recarga -= 3600
+        self.assertEqual(cubo.tomar(8), 5)
+
+        cubo.devolver(50)
+        self.assertEqual(cubo.tokens, 5)
+
+
+# Sin recarga durante la prueba: los tokens solo cambian por lo que toma y devuelve el motor
+@override_settings(MOTOR_SMTP={'ENVIOS_POR_MINUTO': 0, 'RAFAGA': 10})
+class MotorSMTPTests(TestCase):
+    def setUp(self):
+        self.config = ConfiguracionSMTP.objects.create(
+            nombre='Pruebas', servidor_smtp='smtp.municipio.gob.ec', puerto=587,
+            usuario_smtp='actas', password_smtp='clave', email_remitente='actas@municipio.gob.ec',
+            nombre_remitente='Actas', limite_diario=500,
+        )
+        self.motor = MotorSMTP()
+        parche = mock.patch('apps.config_system.motor_smtp.smtplib.SMTP')
+        self.smtp = parche.start()
+        self.addCleanup(parche.stop)
+        self.sesion = self.smtp.return_value
+        self.sesion.noop.return_value = (250, b'OK')
+
+    def test_una_sesion_para_todo_el_lote(self):
+        respuesta = self.motor.enviar(mensajes(5))
+        self.motor.enviar(mensajes(3))
+
+        self.assertTrue(all(exito for exito, _ in respuesta['resultados'].values()))
+        self.assertEqual(self.smtp.call_count, 1)
+        self.assertEqual(self.sesion.login.call_count, 1)
+        self.assertEqual(self.sesion.sendmail.call_count, 8)
+        self.config.refresh_from_db()
+        self.assertEqual(self.config.emails_enviados_hoy, 8)
+
+    def test_fallo_de_un_destinatario_no_afecta_al_resto(self):
+        def sendmail(remitente, destinatario, mensaje):
+            if destinatario == 'concejal2@municipio.gob.ec':
+                raise smtplib.SMTPRecipientsRefused({destinatario: (550, b'No existe')})
+            return {}
+
+        self.sesion.sendmail.side_effect = sendmail
+        respuesta = self.motor.enviar(mensajes(5))
+
+        exitos = sorted(exito for exito, _ in respuesta['resultados'].values())
+        self.assertEqual(exitos, [False, True, True, True, True])
+        self.assertEqual(self.smtp.call_count, 1)
+        self.sesion.quit.assert_not_called()
+        self.assertEqual(
+            LogEnvioEmail.objects.get(destinatario='concejal2@municipio.gob.ec').estado, 'error'
+        )
+
+    def test_mensajes_no_creados_devuelven_el_token(self):
+        crear = smtp_service._crear_mensaje
+        sin_contenido = {'concejal0@municipio.gob.ec'}
+        con_error = {'concejal1@municipio.gob.ec'}
+
+        def crear_mensaje(config, destinatario, *args, **kwargs):
+            if destinatario in sin_contenido:
+                return None
+            if destinatario in con_error:
+                raise ValueError('Plantilla inválida')
+            return crear(config, destinatario, *args, **kwargs)
+
+        with mock.patch.object(smtp_service, '_crear_mensaje', side_effect=crear_mensaje):
+            respuesta = self.motor.enviar(mensajes(4))
+
+        self.assertEqual(sum(1 for exito, _ in respuesta['resultados'].values() if exito), 2)
+        # Diez de ráfaga menos los dos mensajes que sí llegaron al proveedor
+        self.assertEqual(self.motor.cubo(self.config).tokens, 8)
+        # La sesión sigue en el pool
+        self.motor.enviar(mensajes(1))
+        self.assertEqual(self.smtp.call_count, 1)
+
+    def test_envio_individual_saturado_no_es_limite_diario(self):
+        self.motor.cubo(self.config).tomar(10)
+
+        with mock.patch('apps.config_system.smtp_service.motor_smtp', self.motor):
+            exito, mensaje = smtp_service._enviar_con_proveedor(
+                self.config, 'alcaldia@municipio.gob.ec', 'Aviso', 'Texto'
+            )
+
+        self.assertFalse(exito)
+        self.assertTrue(mensaje.startswith(MENSAJE_SATURADO))
+        self.assertNotIn('Límite diario', mensaje)
+        self.sesion.sendmail.assert_not_called()
@@ -2,10 +2,11 @@ import os
 import csv
 import uuid
 from django.shortcuts import render, redirect
-from django.http import HttpResponse, Http404
+from django.http import Http404
 from django.conf import settings
 from .models import *
 from django.contrib.auth.decorators import login_required
+from helpers.descargas import respuesta_archivo
 
 # Create your views here.
 
@@ -127,10 +128,11 @@ def download_file(request, file_path):
     path = file_path.replace('%slash%', '/')
     absolute_file_path = os.path.join(settings.MEDIA_ROOT, path)
     if os.path.exists(absolute_file_path):
-        with open(absolute_file_path, 'rb') as fh:
-            response = HttpResponse(fh.read(), content_type="application/vnd.ms-excel")
-            response['Content-Disposition'] = 'inline; filename=' + os.path.basename(absolute_file_path)
-            return response
+        return respuesta_archivo(
+            request, absolute_file_path,
+            content_type="application/vnd.ms-excel",
+            nombre=os.path.basename(absolute_file_path), adjunto=False,
+        )
     raise Http404
 
 @login_required(login_url='/accounts/login-v1/')
@@ -1,15 +1,18 @@
 """
 API views para operaciones AJAX y monitoreo en tiempo real
 """
+import hashlib
 import json
 import logging
 from datetime import datetime, timedelta
 
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
+from django.db.models import BooleanField, Case, Value, When
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
@@ -18,6 +21,9 @@ from .services import GeneradorActasService, EstadisticasService
 
 logger = logging.getLogger(__name__)
 
+# Tope de ids por petición de api_estados_multiple
+MAX_ESTADOS_POR_CONSULTA = 500
+
 
 @login_required
 @require_http_methods(["POST"])
@@ -90,6 +96,10 @@ def api_estado_acta(request, acta_id):
 def api_estados_multiple(request):
     """
     API endpoint para consultar estados de múltiples actas
+
+    Una sola consulta sobre las columnas de estado (sin los JSON ni el
+    contenido). En GET responde con ETag y devuelve 304 si ningún estado
+    cambió desde la última consulta del cliente.
     """
     try:
         # Obtener IDs de actas desde query params o POST data
@@ -99,35 +109,60 @@ def api_estados_multiple(request):
             data = json.loads(request.body)
             acta_ids = data.get('acta_ids', [])
         
-        # Filtrar IDs válidos
-        acta_ids = [int(id_) for id_ in acta_ids if id_.strip().isdigit()]
+        # Filtrar IDs válidos (sin repetidos, en el orden pedido)
+        acta_ids = list(dict.fromkeys(int(id_) for id_ in map(str, acta_ids) if id_.strip().isdigit()))
         
         if not acta_ids:
             return JsonResponse({
                 'success': False,
                 'message': 'No se proporcionaron IDs válidos de actas'
             })
-        
-        # Obtener estados
+
+        if len(acta_ids) > MAX_ESTADOS_POR_CONSULTA:
+            return JsonResponse({
+                'success': False,
+                'message': f'Se pueden consultar como máximo {MAX_ESTADOS_POR_CONSULTA} actas por petición'
+            }, status=400)
+        
+        filas = ActaGenerada.objects.filter(id__in=acta_ids).annotate(
+            tiene_contenido=Case(
+                When(contenido_final='', contenido_borrador='', then=Value(False)),
+                default=Value(True),
+                output_field=BooleanField(),
+            )
+        ).values('id', 'estado', 'progreso', 'mensajes_error', 'fecha_actualizacion', 'tiene_contenido')
+        encontradas = {fila['id']: fila for fila in filas}
+
         estados = {}
         for acta_id in acta_ids:
-            try:
-                acta = ActaGenerada.objects.get(id=acta_id)
-                estados[acta_id] = {
-                    'estado': acta.estado,
-                    'progreso': acta.progreso,
-                    'puede_procesar': acta.puede_procesar,
-                    'tiene_contenido': bool(acta.contenido_final or acta.contenido_borrador),
-                    'mensajes_error': acta.mensajes_error
-                }
-            except ActaGenerada.DoesNotExist:
+            fila = encontradas.get(acta_id)
+            if fila is None:
                 estados[acta_id] = {'error': 'Acta no encontrada'}
+                continue
+            estados[acta_id] = {
+                'estado': fila['estado'],
+                'progreso': fila['progreso'],
+                'puede_procesar': fila['estado'] in ActaGenerada.ESTADOS_PROCESABLES,
+                'tiene_contenido': fila['tiene_contenido'],
+                'mensajes_error': fila['mensajes_error'],
+                'fecha_actualizacion': fila['fecha_actualizacion'].isoformat() if fila['fecha_actualizacion'] else None,
+            }
+
+        etag = '"%s"' % hashlib.md5(
+            json.dumps(estados, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        if request.method == 'GET':
+            no_modificado = get_conditional_response(request, etag=etag)
+            if no_modificado is not None:
+                return no_modificado
         
-        return JsonResponse({
+        respuesta = JsonResponse({
             'success': True,
             'data': estados,
             'timestamp': timezone.now().isoformat()
         })
+        respuesta['ETag'] = etag
+        return respuesta
         
     except Exception as e:
         logger.error(f"Error obteniendo estados múltiples: {str(e)}")
@@ -3,13 +3,20 @@ Proveedores de IA para el módulo Generador de Actas
 Implementaciones completas para todos los proveedores soportados
 """
 import json
+import hashlib
 import requests
 import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from django.conf import settings
 import time
 
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -126,6 +133,31 @@ class BaseIAProvider(ABC):
             logger.error(f"Error en generar_respuesta {self.config.nombre}: {str(e)}")
             raise Exception(f"Error generando respuesta: {str(e)}")
     
+    def formatear_contexto(self, contexto: Dict[str, Any] = None) -> str:
+        """
+        Serializa el contexto de forma compacta: la transcripción como texto
+        (un turno por línea) y el resto en JSON sin sangría
+        """
+        if not contexto:
+            return ""
+
+        contexto = dict(contexto)
+        conversacion = contexto.pop('transcripcion_completa', None)
+        partes = []
+        if contexto:
+            partes.append(json.dumps(contexto, ensure_ascii=False, separators=(',', ':'), default=str))
+        if conversacion:
+            partes.append(
+                renderizar_transcripcion(conversacion) if isinstance(conversacion, list) else str(conversacion)
+            )
+        return "\n".join(partes)
+
+    def contar_tokens(self, texto: str) -> int:
+        return contar_tokens(texto, self.configuracion.get('modelo') or '')
+
+    def ventana_contexto(self) -> int:
+        return ventana_contexto(self.configuracion.get('modelo') or '')
+    
     def construir_mensaje_sistema(self) -> str:
         """Construye el mensaje del sistema para el chat"""
         mensaje_base = (
@@ -175,7 +207,7 @@ class OpenAIProvider(BaseIAProvider):
             
             # Agregar contexto si existe
             if contexto:
-                context_msg = f"Contexto adicional:\n{json.dumps(contexto, ensure_ascii=False, indent=2)}"
+                context_msg = f"Contexto adicional:\n{self.formatear_contexto(contexto)}"
                 messages.insert(-1, {"role": "user", "content": context_msg})
             
             response = self.client.chat.completions.create(
@@ -218,7 +250,7 @@ class AnthropicProvider(BaseIAProvider):
             # Construir mensaje completo
             mensaje_completo = prompt
             if contexto:
-                context_str = f"\n\nContexto adicional:\n{json.dumps(contexto, ensure_ascii=False, indent=2)}"
+                context_str = f"\n\nContexto adicional:\n{self.formatear_contexto(contexto)}"
                 mensaje_completo += context_str
             
             response = self.client.messages.create(
@@ -257,7 +289,7 @@ class DeepSeekProvider(BaseIAProvider):
             ]
             
             if contexto:
-                context_msg = f"Contexto adicional:\n{json.dumps(contexto, ensure_ascii=False, indent=2)}"
+                context_msg = f"Contexto adicional:\n{self.formatear_contexto(contexto)}"
                 messages.insert(-1, {"role": "user", "content": context_msg})
             
             headers = {
@@ -304,7 +336,7 @@ class GoogleGeminiProvider(BaseIAProvider):
             # Construir mensaje completo
             mensaje_completo = f"{self.construir_mensaje_sistema()}\n\n{prompt}"
             if contexto:
-                context_str = f"\n\nContexto adicional:\n{json.dumps(contexto, ensure_ascii=False, indent=2)}"
+                context_str = f"\n\nContexto adicional:\n{self.formatear_contexto(contexto)}"
                 mensaje_completo += context_str
             
             headers = {
@@ -360,7 +392,7 @@ class OllamaProvider(BaseIAProvider):
             # Construir mensaje completo
             mensaje_completo = f"{self.construir_mensaje_sistema()}\n\n{prompt}"
             if contexto:
-                context_str = f"\n\nContexto adicional:\n{json.dumps(contexto, ensure_ascii=False, indent=2)}"
+                context_str = f"\n\nContexto adicional:\n{self.formatear_contexto(contexto)}"
                 mensaje_completo += context_str
             
             data = {
@@ -407,7 +439,7 @@ class LMStudioProvider(BaseIAProvider):
             ]
             
             if contexto:
-                context_msg = f"Contexto adicional:\n{json.dumps(contexto, ensure_ascii=False, indent=2)}"
+                context_msg = f"Contexto adicional:\n{self.formatear_contexto(contexto)}"
                 messages.insert(-1, {"role": "user", "content": context_msg})
             
             data = {
@@ -451,7 +483,7 @@ class GroqProvider(BaseIAProvider):
             ]
             
             if contexto:
-                context_msg = f"Contexto adicional:\n{json.dumps(contexto, ensure_ascii=False, indent=2)}"
+                context_msg = f"Contexto adicional:\n{self.formatear_contexto(contexto)}"
                 messages.insert(-1, {"role": "user", "content": context_msg})
             
             headers = {
@@ -501,7 +533,7 @@ class GenericProvider(BaseIAProvider):
             ]
             
             if contexto:
-                context_msg = f"Contexto adicional:\n{json.dumps(contexto, ensure_ascii=False, indent=2)}"
+                context_msg = f"Contexto adicional:\n{self.formatear_contexto(contexto)}"
                 messages.insert(-1, {"role": "user", "content": context_msg})
             
             headers = {
@@ -564,27 +596,6 @@ class DeepSeekProvider(BaseIAProvider):
         
         return True, ""
     
-    def formatear_contexto(self, contexto: Dict[str, Any] = None) -> str:
-        """Formatea el contexto para incluirlo en el prompt"""
-        if not contexto:
-            return ""
-        
-        if 'transcripcion_completa' in contexto:
-            # Formatear transcripción para ser más legible
-            transcripcion = contexto['transcripcion_completa']
-            texto_formateado = []
-            
-            for i, segmento in enumerate(transcripcion):
-                tiempo = segmento.get('inicio', 0)
-                hablante = segmento.get('hablante', f'Participante_{i+1}')
-                texto = segmento.get('texto', '')
-                texto_formateado.append(f"[{hablante}] ({tiempo:.1f}s): {texto}")
-            
-            return "\n".join(texto_formateado)
-        
-        # Para otros tipos de contexto, convertir a JSON legible
-        return json.dumps(contexto, ensure_ascii=False, indent=2)
-    
     def procesar_prompt(self, prompt: str, contexto: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Procesa el prompt usando DeepSeek
@@ -839,6 +850,273 @@ Contexto de la reunión:
             raise Exception(f"Error procesando con Google Gemini: {str(e)}")
 
 
+# ==================== EMPAQUETADO DE CONTEXTO ====================
+
+# Ventana de contexto (tokens) por prefijo de modelo; gana el prefijo más largo
+VENTANAS_CONTEXTO = {
+    'gpt-4o': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4-1106': 128000,
+    'gpt-4-0125': 128000,
+    'gpt-4-32k': 32768,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 16385,
+    'o1': 128000,
+    'claude': 200000,
+    'deepseek': 64000,
+    'gemini-1.5': 1000000,
+    'gemini': 32760,
+    'llama-3.1': 128000,
+    'llama3.1': 128000,
+    'llama-3': 8192,
+    'llama3': 8192,
+    'llama2': 4096,
+    'mixtral': 32768,
+    'mistral': 32768,
+    'qwen2': 32768,
+    'gemma': 8192,
+}
+
+PLANTILLA_MAPEO = """{instrucciones}
+
+FRAGMENTO {indice}/{total} DE LA TRANSCRIPCIÓN:
+{fragmento}
+
+INSTRUCCIONES:
+- Extrae SOLO la información de este fragmento relevante para la sección "{seccion}"
+- Conserva nombres, cargos, cifras, mociones y votaciones tal como aparecen
+- Responde con notas breves; si no hay nada relevante responde "Sin información relevante"
+"""
+
+
+def get_config_contexto() -> Dict[str, Any]:
+    config = {
+        'VENTANAS': {},  # {prefijo_modelo: tokens} para ampliar/sobrescribir VENTANAS_CONTEXTO
+        'VENTANA_DEFECTO': 8192,
+        'MARGEN_TOKENS': 512,
+        'CARACTERES_POR_TOKEN': 3.5,  # estimación para español sin tiktoken
+        'CACHE_TIMEOUT': 24 * 3600,
+        'MAX_NIVELES_REDUCCION': 3,
+    }
+    config.update(getattr(settings, 'IA_CONTEXTO', {}) or {})
+    return config
+
+
+def ventana_contexto(modelo: str) -> int:
+    config = get_config_contexto()
+    nombre = (modelo or '').lower().split('/')[-1]
+    ventanas = {**VENTANAS_CONTEXTO, **config['VENTANAS']}
+    coincidencias = [prefijo for prefijo in ventanas if nombre.startswith(prefijo)]
+    if not coincidencias:
+        return config['VENTANA_DEFECTO']
+    return ventanas[max(coincidencias, key=len)]
+
+
+_codificadores: Dict[str, Any] = {}
+
+
+def _codificador(modelo: str):
+    """Codificador tiktoken del modelo (cl100k_base como aproximación para el resto)"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    if modelo not in _codificadores:
+        try:
+            try:
+                codificador = tiktoken.encoding_for_model(modelo)
+            except KeyError:
+                codificador = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            # Sin red para descargar el vocabulario: se usa la estimación por caracteres
+            logger.warning(f"⚠️ tiktoken no disponible para {modelo}: {e}")
+            codificador = None
+        _codificadores[modelo] = codificador
+    return _codificadores[modelo]
+
+
+def contar_tokens(texto: str, modelo: str = '') -> int:
+    if not texto:
+        return 0
+    codificador = _codificador(modelo)
+    if codificador is not None:
+        return len(codificador.encode(texto, disallowed_special=()))
+    return int(len(texto) / get_config_contexto()['CARACTERES_POR_TOKEN']) + 1
+
+
+def _marca_tiempo(segundos) -> str:
+    segundos = int(segundos or 0)
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    return f"{horas}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos:02d}:{segundos:02d}"
+
+
+def renderizar_transcripcion(conversacion: List[Dict[str, Any]]) -> str:
+    """
+    Transcripción compacta: una línea por turno de palabra con marca de tiempo
+    y hablante; los segmentos consecutivos del mismo hablante se fusionan
+    """
+    lineas = []
+    hablante_actual = None
+    for segmento in conversacion or []:
+        texto = (segmento.get('texto') or '').strip()
+        if not texto:
+            continue
+        hablante = segmento.get('hablante') or 'Desconocido'
+        if lineas and hablante == hablante_actual:
+            lineas[-1] += ' ' + texto
+        else:
+            lineas.append(f"[{_marca_tiempo(segmento.get('inicio'))} {hablante}] {texto}")
+            hablante_actual = hablante
+    return "\n".join(lineas)
+
+
+def transcripcion_compacta(transcripcion) -> str:
+    """
+    Transcripción compacta de una ``Transcripcion``, cacheada por id y versión
+    para que todos los segmentos (y todas las actas) de la misma sesión la
+    rendericen una sola vez
+    """
+    from django.core.cache import cache
+
+    actualizacion = getattr(transcripcion, 'fecha_actualizacion', None)
+    version = f"{transcripcion.pk}:{getattr(transcripcion, 'version_actual', 1)}:" \
+              f"{actualizacion.timestamp() if actualizacion else ''}"
+    clave = f"ia_transcripcion_compacta_{hashlib.sha1(version.encode('utf-8')).hexdigest()}"
+
+    texto = cache.get(clave)
+    if texto is None:
+        conversacion = (transcripcion.sincronizar_conversacion() or {}).get('conversacion', [])
+        texto = renderizar_transcripcion(conversacion)
+        cache.set(clave, texto, timeout=get_config_contexto()['CACHE_TIMEOUT'])
+    return texto
+
+
+def fragmentar_texto(texto: str, presupuesto: int, modelo: str = '') -> List[str]:
+    """Parte ``texto`` por líneas (y por palabras si una línea no cabe) en fragmentos de ``presupuesto`` tokens"""
+    fragmentos = []
+    actual: List[str] = []
+    tokens_actual = 0
+
+    def piezas_de(linea: str):
+        tokens = contar_tokens(linea, modelo) + 1
+        if tokens <= presupuesto:
+            yield linea, tokens
+            return
+        palabras = linea.split(' ')
+        por_pieza = max(1, int(len(palabras) * presupuesto / tokens * 0.9))
+        for inicio in range(0, len(palabras), por_pieza):
+            pieza = ' '.join(palabras[inicio:inicio + por_pieza])
+            yield pieza, contar_tokens(pieza, modelo) + 1
+
+    for linea in texto.split('\n'):
+        for pieza, tokens in piezas_de(linea):
+            if actual and tokens_actual + tokens > presupuesto:
+                fragmentos.append("\n".join(actual))
+                actual, tokens_actual = [], 0
+            actual.append(pieza)
+            tokens_actual += tokens
+    if actual:
+        fragmentos.append("\n".join(actual))
+    return fragmentos
+
+
+class EmpaquetadorContexto:
+    """Presupuesto de tokens de entrada según la ventana del modelo del proveedor"""
+
+    PRESUPUESTO_MINIMO = 256
+
+    def __init__(self, ia_provider: BaseIAProvider):
+        config = get_config_contexto()
+        self.modelo = ia_provider.configuracion.get('modelo') or ''
+        self.ventana = ia_provider.ventana_contexto()
+        self.tokens_salida = int(ia_provider.configuracion.get('max_tokens') or 0)
+        self.tokens_sistema = ia_provider.contar_tokens(ia_provider.construir_mensaje_sistema())
+        self.margen = config['MARGEN_TOKENS']
+
+    def contar(self, texto: str) -> int:
+        return contar_tokens(texto, self.modelo)
+
+    def presupuesto(self, *textos_fijos: str) -> int:
+        """Tokens libres para la transcripción una vez descontado todo lo demás"""
+        libres = self.ventana - self.tokens_salida - self.tokens_sistema - self.margen
+        libres -= sum(self.contar(texto) for texto in textos_fijos if texto)
+        return max(self.PRESUPUESTO_MINIMO, libres)
+
+
+def generar_con_transcripcion(ia_provider: BaseIAProvider,
+                              armar_prompt: Callable[[str], str],
+                              transcripcion: str,
+                              seccion: str = '',
+                              instrucciones: str = '',
+                              contexto: Dict[str, Any] = None,
+                              llamar: Optional[Callable[[str, Optional[Dict[str, Any]]], Dict[str, Any]]] = None
+                              ) -> Dict[str, Any]:
+    """
+    Genera una respuesta cuyo prompt incluye la transcripción una sola vez
+
+    Si la transcripción no cabe en la ventana del modelo se hace map-reduce:
+    cada fragmento se resume en notas para la sección y el prompt final recibe
+    las notas en lugar de la transcripción (repitiendo si aún no caben).
+
+    Args:
+        ia_provider: Proveedor ya inicializado
+        armar_prompt: Construye el prompt final a partir del texto de transcripción
+        transcripcion: Transcripción compacta (ver ``transcripcion_compacta``)
+        seccion: Nombre de la sección, para las instrucciones de extracción
+        instrucciones: Prompt base del segmento, se repite en cada fragmento
+        contexto: Metadatos pequeños (número de acta, fecha...) SIN la transcripción
+        llamar: ``llamar(prompt, contexto)``; por defecto ``generar_respuesta``
+
+    Returns:
+        Respuesta del prompt final con ``tokens_usados`` acumulados,
+        ``fragmentos_transcripcion`` (0 si no hizo falta fragmentar),
+        ``tokens_contexto`` (tokens de transcripción o notas del prompt final)
+        y ``prompt_sha256`` (hash del prompt final enviado)
+    """
+    if llamar is None:
+        def llamar(prompt, ctx):
+            return ia_provider.generar_respuesta(prompt=prompt, contexto=ctx)
+
+    config = get_config_contexto()
+    empaquetador = EmpaquetadorContexto(ia_provider)
+    texto_contexto = ia_provider.formatear_contexto(contexto)
+    texto = transcripcion
+    tokens_mapeo = 0
+    fragmentos_totales = 0
+
+    for nivel in range(config['MAX_NIVELES_REDUCCION']):
+        presupuesto = empaquetador.presupuesto(armar_prompt(''), texto_contexto)
+        if empaquetador.contar(texto) <= presupuesto:
+            break
+
+        presupuesto_mapeo = empaquetador.presupuesto(
+            PLANTILLA_MAPEO.format(instrucciones=instrucciones, indice=0, total=0, fragmento='', seccion=seccion)
+        )
+        fragmentos = fragmentar_texto(texto, presupuesto_mapeo, empaquetador.modelo)
+        fragmentos_totales += len(fragmentos)
+        logger.info(
+            f"✂️ Transcripción de {empaquetador.contar(texto)} tokens excede {presupuesto} "
+            f"({empaquetador.modelo}); map-reduce nivel {nivel + 1} en {len(fragmentos)} fragmentos"
+        )
+
+        notas = []
+        for indice, fragmento in enumerate(fragmentos, 1):
+            respuesta = llamar(PLANTILLA_MAPEO.format(
+                instrucciones=instrucciones, indice=indice, total=len(fragmentos),
+                fragmento=fragmento, seccion=seccion,
+            ), None)
+            tokens_mapeo += respuesta.get('tokens_usados') or 0
+            notas.append(f"(Fragmento {indice}/{len(fragmentos)})\n{(respuesta.get('contenido') or '').strip()}")
+        texto = "NOTAS EXTRAÍDAS DE LA TRANSCRIPCIÓN POR FRAGMENTOS:\n" + "\n\n".join(notas)
+
+    prompt_final = armar_prompt(texto)
+    resultado = dict(llamar(prompt_final, contexto))
+    resultado['tokens_usados'] = (resultado.get('tokens_usados') or 0) + tokens_mapeo
+    resultado['fragmentos_transcripcion'] = fragmentos_totales
+    resultado['tokens_contexto'] = empaquetador.contar(texto)
+    resultado['prompt_sha256'] = hashlib.sha256(prompt_final.encode('utf-8')).hexdigest()
+    return resultado
+
+
 # Factory para crear proveedores
 def get_ia_provider(proveedor_config) -> BaseIAProvider:
     """
@@ -0,0 +1,186 @@
+"""
+Llamadas concurrentes a proveedores de IA para los segmentos de un acta
+
+Los segmentos dinámicos de una plantilla son independientes entre sí: cada
+uno recibe la transcripción y su propio prompt. Este módulo los despacha en
+un pool de hilos (las llamadas son E/S de red, el GIL no es el cuello de
+botella) respetando un límite de concurrencia por proveedor y reaccionando a
+los errores de límite de tasa (HTTP 429 / sobrecarga) con espera exponencial
+o el ``Retry-After`` que indique la API.
+
+Los semáforos y las pausas por límite de tasa son por proceso: todas las actas
+que procese un mismo worker comparten el cupo de cada proveedor.
+"""
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CODIGOS_LIMITE = (429, 503, 529)
+TEXTOS_LIMITE = ('rate limit', 'rate_limit', 'too many requests', 'overloaded', '429')
+
+
+def get_config_paralelo() -> Dict[str, Any]:
+    config = {
+        'HABILITADO': True,
+        'MAX_HILOS': 4,
+        # Proveedores locales atienden una petición a la vez
+        'CONCURRENCIA_POR_TIPO': {'ollama': 1, 'lmstudio': 1},
+        'REINTENTOS_LIMITE': 4,
+        'ESPERA_BASE': 2.0,
+        'ESPERA_MAXIMA': 60.0,
+    }
+    config.update(getattr(settings, 'GENERADOR_ACTAS_PARALELO', {}) or {})
+    return config
+
+
+def _retry_after(respuesta) -> Optional[float]:
+    cabeceras = getattr(respuesta, 'headers', None)
+    if not cabeceras:
+        return None
+    valor = cabeceras.get('retry-after') or cabeceras.get('Retry-After')
+    try:
+        return float(valor) if valor is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def info_limite_tasa(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Indica si la excepción (o alguna de su cadena) es un límite de tasa
+
+    ``generar_respuesta`` re-lanza los errores como ``Exception`` genérica, así
+    que se recorre ``__cause__``/``__context__`` hasta el error original del
+    SDK (``RateLimitError`` de openai/anthropic) o de ``requests``.
+
+    Returns:
+        (es_limite, segundos_retry_after)
+    """
+    vistos = set()
+    actual = exc
+    while actual is not None and id(actual) not in vistos:
+        vistos.add(id(actual))
+        respuesta = getattr(actual, 'response', None)
+        codigo = getattr(actual, 'status_code', None)
+        if codigo is None and respuesta is not None:
+            codigo = getattr(respuesta, 'status_code', None)
+
+        texto = str(actual).lower()
+        if (codigo in CODIGOS_LIMITE
+                or type(actual).__name__ == 'RateLimitError'
+                or any(marca in texto for marca in TEXTOS_LIMITE)):
+            return True, _retry_after(respuesta)
+        actual = actual.__cause__ or actual.__context__
+    return False, None
+
+
+class ControlProveedor:
+    """Cupo de llamadas simultáneas y pausa compartida de un proveedor"""
+
+    def __init__(self, limite: int):
+        self.limite = max(1, int(limite))
+        self.semaforo = threading.BoundedSemaphore(self.limite)
+        self._lock = threading.Lock()
+        self.pausado_hasta = 0.0
+
+    def pausar(self, segundos: float):
+        """Tras un 429 todas las llamadas del proveedor esperan, no solo la que falló"""
+        with self._lock:
+            self.pausado_hasta = max(self.pausado_hasta, time.monotonic() + segundos)
+
+    def esperar_pausa(self):
+        while True:
+            with self._lock:
+                restante = self.pausado_hasta - time.monotonic()
+            if restante <= 0:
+                return
+            time.sleep(restante)
+
+
+_controles: Dict[Any, ControlProveedor] = {}
+_controles_lock = threading.Lock()
+
+
+def control_proveedor(proveedor, config: Optional[Dict[str, Any]] = None) -> ControlProveedor:
+    """Control único por proveedor (instancia de ``ProveedorIA``) dentro del proceso"""
+    config = config or get_config_paralelo()
+    limite = config['CONCURRENCIA_POR_TIPO'].get(proveedor.tipo, config['MAX_HILOS'])
+    clave = (proveedor.tipo, proveedor.pk)
+    with _controles_lock:
+        control = _controles.get(clave)
+        if control is None or control.limite != max(1, int(limite)):
+            control = _controles[clave] = ControlProveedor(limite)
+        return control
+
+
+def llamar_con_limite(ia_provider, proveedor, prompt: str, contexto: Optional[Dict[str, Any]] = None,
+                      config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    ``ia_provider.generar_respuesta`` dentro del cupo del proveedor, con
+    reintentos ante límites de tasa. Cualquier otro error se propaga tal cual.
+    """
+    config = config or get_config_paralelo()
+    control = control_proveedor(proveedor, config)
+    intento = 0
+
+    while True:
+        control.esperar_pausa()
+        with control.semaforo:
+            try:
+                return ia_provider.generar_respuesta(prompt=prompt, contexto=contexto)
+            except Exception as exc:
+                es_limite, retry_after = info_limite_tasa(exc)
+                if not es_limite or intento >= config['REINTENTOS_LIMITE']:
+                    raise
+
+        espera = retry_after if retry_after is not None else min(
+            config['ESPERA_MAXIMA'], config['ESPERA_BASE'] * (2 ** intento)
+        )
+        espera += random.uniform(0, config['ESPERA_BASE'])
+        intento += 1
+        logger.warning(
+            f"⏳ Límite de tasa en {proveedor.nombre}; reintento {intento}/{config['REINTENTOS_LIMITE']} "
+            f"en {espera:.1f}s"
+        )
+        control.pausar(espera)
+
+
+def ejecutar_concurrente(trabajos: List[Tuple[Any, Callable[[], Any]]],
+                         max_hilos: Optional[int] = None) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Ejecuta ``trabajos`` [(clave, funcion)] en un pool de hilos
+
+    Genera (clave, resultado, error) en orden de finalización para que el
+    llamador actualice progreso y base de datos desde su propio hilo; el orden
+    final lo reconstruye el llamador a partir de la clave.
+    """
+    if not trabajos:
+        return
+    config = get_config_paralelo()
+    hilos = max_hilos or config['MAX_HILOS']
+    if not config['HABILITADO']:
+        hilos = 1
+    hilos = max(1, min(int(hilos), len(trabajos)))
+
+    if hilos == 1:
+        for clave, funcion in trabajos:
+            try:
+                yield clave, funcion(), None
+            except Exception as exc:
+                yield clave, None, exc
+        return
+
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='segmentos_ia') as pool:
+        futuros = {pool.submit(funcion): clave for clave, funcion in trabajos}
+        for futuro in as_completed(futuros):
+            clave = futuros[futuro]
+            try:
+                yield clave, futuro.result(), None
+            except Exception as exc:
+                yield clave, None, exc
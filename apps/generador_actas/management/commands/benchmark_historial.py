@@ -0,0 +1,136 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.audio_processing.models import ProcesamientoAudio, TipoReunion
+from apps.generador_actas.models import ActaGenerada, OperacionSistema, PlantillaActa, ProveedorIA
+from apps.transcripcion.models import Transcripcion
+
+
+def entrada_historial(i):
+    return {
+        'evento': f'segmento_{i}_completado',
+        'descripcion': f'Segmento {i} procesado exitosamente',
+        'progreso': i % 100,
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide agregar una entrada al historial de un acta y al log de una operación a medida que crecen: '
+        'array JSON reescrito completo frente a las tablas de solo inserción (todo se revierte al terminar)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='0,1000,5000,10000,20000',
+                            help='Entradas previas con las que se mide cada escenario')
+        parser.add_argument('--muestras', type=int, default=50, help='Inserciones medidas por tamaño')
+
+    def handle(self, *args, **options):
+        tamanos = sorted(int(t) for t in options['tamanos'].split(',') if t.strip())
+        muestras = options['muestras']
+
+        with transaction.atomic():
+            acta, operacion = self.crear_objetos()
+            resultados = {'json': [], 'historial': [], 'logs': []}
+            previas = 0
+            array = []
+            for tamano in tamanos:
+                # Llenar hasta el tamaño por el camino masivo (un INSERT por lote)
+                nuevas = [entrada_historial(i) for i in range(previas, tamano)]
+                for inicio in range(0, len(nuevas), 1000):
+                    acta.registrar_eventos(*nuevas[inicio:inicio + 1000])
+                    operacion.agregar_logs(
+                        ('info', entrada['descripcion'], {'progreso': entrada['progreso']})
+                        for entrada in nuevas[inicio:inicio + 1000]
+                    )
+                array.extend(nuevas)
+                previas = tamano
+
+                # Camino anterior: el array completo en una columna JSON de la fila del acta
+                acta.metadatos = {'historial': list(array)}
+                acta.save(update_fields=['metadatos'])
+
+                resultados['json'].append(self.medir(tamano, muestras, lambda i: self.agregar_json(acta, i)))
+                resultados['historial'].append(self.medir(
+                    tamano, muestras, lambda i: acta.registrar_eventos(entrada_historial(i))
+                ))
+                resultados['logs'].append(self.medir(
+                    tamano, muestras, lambda i: operacion.agregar_log('info', f'Paso {i}')
+                ))
+
+            # Nada del benchmark queda en la base de datos
+            transaction.set_rollback(True)
+
+        self.mostrar(resultados, muestras)
+
+    def crear_objetos(self):
+        usuario = User.objects.create_user(f'benchmark_historial_{time.time_ns()}')
+        audio = ProcesamientoAudio.objects.create(
+            titulo='Benchmark de historial',
+            tipo_reunion=TipoReunion.objects.get_or_create(nombre='Benchmark')[0],
+            usuario=usuario,
+            archivo_audio='audio/benchmark.wav',
+        )
+        transcripcion = Transcripcion.objects.create(procesamiento_audio=audio, usuario_creacion=usuario)
+        proveedor = ProveedorIA.objects.create(
+            nombre=f'Benchmark {time.time_ns()}', tipo='openai', modelo='gpt-4o-mini', usuario_creacion=usuario
+        )
+        plantilla = PlantillaActa.objects.create(
+            codigo=f'benchmark_{time.time_ns()}', nombre='Benchmark', descripcion='Plantilla de benchmark',
+            tipo_acta='ordinaria', prompt_global='', usuario_creacion=usuario,
+        )
+        # bulk_create: sin la señal que crea la GestionActa
+        acta = ActaGenerada.objects.bulk_create([ActaGenerada(
+            numero_acta=f'ACTA-BENCH-{time.time_ns()}',
+            titulo='Benchmark de historial',
+            transcripcion=transcripcion,
+            plantilla=plantilla,
+            proveedor_ia=proveedor,
+            usuario_creacion=usuario,
+            fecha_sesion=timezone.now(),
+        )])[0]
+        operacion = OperacionSistema.objects.create(tipo='backup', titulo='Benchmark de logs', usuario=usuario)
+        return acta, operacion
+
+    def agregar_json(self, acta, i):
+        """Camino anterior: leer el array, agregar y reescribir la columna completa"""
+        acta = ActaGenerada.objects.only('id', 'metadatos').get(pk=acta.pk)
+        acta.metadatos['historial'].append(entrada_historial(i))
+        acta.save(update_fields=['metadatos'])
+
+    def medir(self, tamano, muestras, agregar):
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            for i in range(muestras):
+                agregar(tamano + i)
+            duracion = time.perf_counter() - inicio
+        return {
+            'tamano': tamano,
+            'ms': duracion * 1000 / muestras,
+            'bytes': sum(len(c['sql']) for c in consultas.captured_queries) / muestras,
+        }
+
+    def mostrar(self, resultados, muestras):
+        self.stdout.write(self.style.SUCCESS(f'📊 Coste de agregar una entrada (media de {muestras} inserciones)'))
+        for escenario, filas in resultados.items():
+            for fila in filas:
+                self.stdout.write(
+                    f"  {escenario:10s} {fila['tamano']:7d} previas  {fila['ms']:8.2f} ms  "
+                    f"{fila['bytes'] / 1024:9.1f} KB enviados"
+                )
+
+        for escenario in ('historial', 'logs'):
+            filas = resultados[escenario]
+            primera, ultima = filas[0], filas[-1]
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {escenario}: {primera['ms']:.2f} ms con {primera['tamano']} entradas → "
+                f"{ultima['ms']:.2f} ms con {ultima['tamano']} "
+                f"({ultima['ms'] / max(primera['ms'], 1e-6):.1f}×; JSON: "
+                f"{resultados['json'][-1]['ms'] / max(resultados['json'][0]['ms'], 1e-6):.1f}×)"
+            ))
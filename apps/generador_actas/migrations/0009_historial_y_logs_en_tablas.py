@@ -0,0 +1,142 @@
+# Generated by Django 4.2.9 on 2026-10-17 16:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def fecha_entrada(entrada):
+    """
+    Fecha de una entrada de los antiguos arrays JSON
+
+    Copia congelada del helper de ``generador_actas.models``: la migración no
+    debe depender del código vivo de los modelos.
+    """
+    fecha = None
+    valor = entrada.get('timestamp') or entrada.get('fecha')
+    if isinstance(valor, str):
+        try:
+            fecha = parse_datetime(valor)
+        except ValueError:
+            fecha = None
+    if fecha is None:
+        return timezone.now()
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def separar_arrays(apps, schema_editor):
+    """Una fila por entrada de ActaGenerada.historial_cambios y OperacionSistema.logs"""
+    ActaGenerada = apps.get_model('generador_actas', 'ActaGenerada')
+    EventoHistorialActa = apps.get_model('generador_actas', 'EventoHistorialActa')
+    OperacionSistema = apps.get_model('generador_actas', 'OperacionSistema')
+    LogOperacionSistema = apps.get_model('generador_actas', 'LogOperacionSistema')
+
+    filas = []
+    for acta in ActaGenerada.objects.exclude(historial_cambios=[]).only('id', 'historial_cambios').iterator(chunk_size=100):
+        filas.extend(
+            EventoHistorialActa(acta_id=acta.id, datos=entrada, fecha_creacion=fecha_entrada(entrada))
+            for entrada in acta.historial_cambios or []
+            if isinstance(entrada, dict)
+        )
+        if len(filas) >= 5000:
+            EventoHistorialActa.objects.bulk_create(filas, batch_size=1000)
+            filas = []
+    EventoHistorialActa.objects.bulk_create(filas, batch_size=1000)
+
+    filas = []
+    for operacion in OperacionSistema.objects.exclude(logs=[]).only('id', 'logs').iterator(chunk_size=100):
+        filas.extend(
+            LogOperacionSistema(
+                operacion_id=operacion.id,
+                fecha_creacion=fecha_entrada(entrada),
+                nivel=str(entrada.get('nivel') or 'info')[:20],
+                mensaje=str(entrada.get('mensaje') or ''),
+                detalles=entrada.get('detalles') or {},
+            )
+            for entrada in operacion.logs or []
+            if isinstance(entrada, dict)
+        )
+        if len(filas) >= 5000:
+            LogOperacionSistema.objects.bulk_create(filas, batch_size=1000)
+            filas = []
+    LogOperacionSistema.objects.bulk_create(filas, batch_size=1000)
+
+
+def unir_arrays(apps, schema_editor):
+    """Vuelve a llenar los arrays JSON desde las tablas (reversión)"""
+    ActaGenerada = apps.get_model('generador_actas', 'ActaGenerada')
+    EventoHistorialActa = apps.get_model('generador_actas', 'EventoHistorialActa')
+    OperacionSistema = apps.get_model('generador_actas', 'OperacionSistema')
+    LogOperacionSistema = apps.get_model('generador_actas', 'LogOperacionSistema')
+
+    historiales = {}
+    for acta_id, datos in EventoHistorialActa.objects.order_by('fecha_creacion', 'id').values_list('acta_id', 'datos').iterator():
+        historiales.setdefault(acta_id, []).append(datos)
+    for acta_id, historial in historiales.items():
+        ActaGenerada.objects.filter(id=acta_id).update(historial_cambios=historial)
+
+    logs = {}
+    for entrada in LogOperacionSistema.objects.order_by('fecha_creacion', 'id').iterator():
+        logs.setdefault(entrada.operacion_id, []).append({
+            'timestamp': entrada.fecha_creacion.isoformat(),
+            'nivel': entrada.nivel,
+            'mensaje': entrada.mensaje,
+            'detalles': entrada.detalles,
+        })
+    for operacion_id, entradas in logs.items():
+        OperacionSistema.objects.filter(id=operacion_id).update(logs=entradas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador_actas', '0008_delete_promptlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoHistorialActa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('datos', models.JSONField(default=dict, help_text='Entrada tal como se guardaba en historial_cambios')),
+                ('acta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_historial', to='generador_actas.actagenerada')),
+            ],
+            options={
+                'verbose_name': 'Evento de Historial de Acta',
+                'verbose_name_plural': 'Eventos de Historial de Actas',
+                'ordering': ['fecha_creacion', 'id'],
+                'indexes': [models.Index(fields=['acta', 'fecha_creacion'], name='generador_a_acta_id_eb50a3_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LogOperacionSistema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('nivel', models.CharField(choices=[('debug', 'Debug'), ('info', 'Info'), ('warning', 'Advertencia'), ('error', 'Error')], default='info', max_length=20)),
+                ('mensaje', models.TextField(blank=True)),
+                ('detalles', models.JSONField(blank=True, default=dict)),
+                ('operacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entradas_log', to='generador_actas.operacionsistema')),
+            ],
+            options={
+                'verbose_name': 'Log de Operación del Sistema',
+                'verbose_name_plural': 'Logs de Operaciones del Sistema',
+                'ordering': ['fecha_creacion', 'id'],
+                'indexes': [models.Index(fields=['operacion', 'fecha_creacion'], name='generador_a_operaci_33ffbc_idx')],
+            },
+        ),
+        migrations.RunPython(separar_arrays, unir_arrays),
+        migrations.RemoveField(
+            model_name='actagenerada',
+            name='historial_cambios',
+        ),
+        migrations.RemoveField(
+            model_name='operacionsistema',
+            name='logs',
+        ),
+    ]
@@ -7,9 +7,33 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 import json
 
 
+def fecha_entrada(entrada):
+    """Fecha de una entrada de historial/log con el formato de los antiguos arrays JSON"""
+    fecha = None
+    if isinstance(entrada, dict):
+        valor = entrada.get('timestamp') or entrada.get('fecha')
+        if isinstance(valor, str):
+            try:
+                fecha = parse_datetime(valor)
+            except ValueError:
+                fecha = None
+    if fecha is None:
+        return timezone.now()
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def ultimas_entradas(queryset, cantidad):
+    """Últimas ``cantidad`` filas de una tabla de solo inserción, en orden cronológico"""
+    return list(reversed(queryset.order_by('-fecha_creacion', '-id')[:cantidad]))
+
+
 class ProveedorIA(models.Model):
     """Configuración de proveedores de IA disponibles"""
     TIPO_PROVEEDOR = [
@@ -766,7 +790,6 @@ class ActaGenerada(models.Model):
     # Metadatos y métricas
     metadatos = models.JSONField(default=dict, blank=True, help_text="Metadatos adicionales")
     metricas_procesamiento = models.JSONField(default=dict, blank=True, help_text="Métricas de tiempo, tokens, costo")
-    historial_cambios = models.JSONField(default=list, blank=True, help_text="Historial de modificaciones")
     
     # Estado y tracking
     estado = models.CharField(max_length=30, choices=ESTADO_CHOICES, default='borrador', help_text="Estado actual del acta")
@@ -846,10 +869,13 @@ class ActaGenerada(models.Model):
         }
         return classes.get(self.estado, 'badge-secondary')
     
+    # Estados desde los que se puede (re)lanzar el procesamiento
+    ESTADOS_PROCESABLES = ('borrador', 'error')
+
     @property
     def puede_procesar(self):
         """Verifica si el acta puede ser procesada"""
-        return self.estado in ['borrador', 'error']
+        return self.estado in self.ESTADOS_PROCESABLES
     
     @property
     def puede_revisar(self):
@@ -861,16 +887,51 @@ class ActaGenerada(models.Model):
         """Verifica si el acta puede ser aprobada"""
         return self.estado == 'revision'
     
+    # Entradas que devuelve historial_cambios; el historial completo está en eventos_historial
+    HISTORIAL_RECIENTE = 50
+
+    @cached_property
+    def historial_cambios(self):
+        """Últimas entradas del historial, de la más antigua a la más reciente (solo lectura)"""
+        if self.pk is None:
+            return []
+        return [evento.datos for evento in ultimas_entradas(self.eventos_historial.all(), self.HISTORIAL_RECIENTE)]
+
+    def registrar_eventos(self, *entradas):
+        """Agrega entradas al historial con un único INSERT, sin tocar la fila del acta"""
+        eventos = EventoHistorialActa.objects.bulk_create([
+            EventoHistorialActa(acta=self, datos=entrada, fecha_creacion=fecha_entrada(entrada))
+            for entrada in entradas
+        ])
+        self.__dict__.pop('historial_cambios', None)
+        return eventos
+
     def agregar_historial(self, accion, usuario, detalles=None):
         """Agrega una entrada al historial de cambios"""
-        entrada = {
+        self.registrar_eventos({
             'fecha': timezone.now().isoformat(),
             'usuario': usuario.username,
             'accion': accion,
             'detalles': detalles or {}
-        }
-        self.historial_cambios.append(entrada)
-        self.save(update_fields=['historial_cambios'])
+        })
+
+
+class EventoHistorialActa(models.Model):
+    """Entrada del historial de un acta; la tabla solo recibe inserciones"""
+    acta = models.ForeignKey(ActaGenerada, on_delete=models.CASCADE, related_name='eventos_historial')
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    datos = models.JSONField(default=dict, help_text="Entrada tal como se guardaba en historial_cambios")
+
+    class Meta:
+        verbose_name = "Evento de Historial de Acta"
+        verbose_name_plural = "Eventos de Historial de Actas"
+        ordering = ['fecha_creacion', 'id']
+        indexes = [
+            models.Index(fields=['acta', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"{self.acta_id} - {self.datos.get('evento') or self.datos.get('accion', '')}"
 
 
 # =========================
@@ -913,7 +974,6 @@ class OperacionSistema(models.Model):
     # Datos de la operación
     parametros_entrada = models.JSONField(default=dict, help_text="Parámetros de entrada de la operación")
     resultado = models.JSONField(default=dict, blank=True, help_text="Resultado de la operación")
-    logs = models.JSONField(default=list, help_text="Logs detallados de la operación")
     
     # Archivos generados
     archivo_resultado = models.FileField(upload_to='operaciones_sistema/', blank=True, null=True)
@@ -941,16 +1001,26 @@ class OperacionSistema(models.Model):
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.titulo} ({self.get_estado_display()})"
     
+    # Entradas que devuelve logs; el registro completo está en entradas_log
+    LOGS_RECIENTES = 50
+
+    @cached_property
+    def logs(self):
+        """Últimas entradas de log, de la más antigua a la más reciente (solo lectura)"""
+        return [entrada.a_dict() for entrada in ultimas_entradas(self.entradas_log.all(), self.LOGS_RECIENTES)]
+
+    def agregar_logs(self, entradas):
+        """Agrega varias entradas (nivel, mensaje, detalles) con un único INSERT"""
+        filas = LogOperacionSistema.objects.bulk_create([
+            LogOperacionSistema(operacion=self, nivel=nivel, mensaje=mensaje, detalles=detalles or {})
+            for nivel, mensaje, detalles in entradas
+        ])
+        self.__dict__.pop('logs', None)
+        return filas
+
     def agregar_log(self, nivel, mensaje, detalles=None):
         """Agrega una entrada de log a la operación"""
-        entrada = {
-            'timestamp': timezone.now().isoformat(),
-            'nivel': nivel,
-            'mensaje': mensaje,
-            'detalles': detalles or {}
-        }
-        self.logs.append(entrada)
-        self.save(update_fields=['logs'])
+        self.agregar_logs([(nivel, mensaje, detalles)])
     
     def actualizar_progreso(self, progreso, mensaje=""):
         """Actualiza el progreso de la operación"""
@@ -978,6 +1048,42 @@ class OperacionSistema(models.Model):
         self.save()
 
 
+class LogOperacionSistema(models.Model):
+    """Entrada de log de una operación del sistema; la tabla solo recibe inserciones"""
+    NIVELES = [
+        ('debug', 'Debug'),
+        ('info', 'Info'),
+        ('warning', 'Advertencia'),
+        ('error', 'Error'),
+    ]
+
+    operacion = models.ForeignKey(OperacionSistema, on_delete=models.CASCADE, related_name='entradas_log')
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    nivel = models.CharField(max_length=20, choices=NIVELES, default='info')
+    mensaje = models.TextField(blank=True)
+    detalles = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        verbose_name = "Log de Operación del Sistema"
+        verbose_name_plural = "Logs de Operaciones del Sistema"
+        ordering = ['fecha_creacion', 'id']
+        indexes = [
+            models.Index(fields=['operacion', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"[{self.nivel}] {self.mensaje[:80]}"
+
+    def a_dict(self):
+        """Entrada con el formato del antiguo array OperacionSistema.logs"""
+        return {
+            'timestamp': self.fecha_creacion.isoformat(),
+            'nivel': self.nivel,
+            'mensaje': self.mensaje,
+            'detalles': self.detalles,
+        }
+
+
 class ConfiguracionSistema(models.Model):
     """Modelo para almacenar configuraciones del sistema con versionado"""
     
@@ -50,6 +50,7 @@ class GeneradorActasService:
         """
         try:
             # Validar transcripción
+            transcripcion.sincronizar_conversacion()
             if not transcripcion.conversacion_json:
                 raise ValidationError("La transcripción no tiene datos de conversación")
             
@@ -338,6 +339,7 @@ class GeneradorActasService:
         
         try:
             # Validar que existe conversación
+            transcripcion.sincronizar_conversacion()
             if not transcripcion.conversacion_json:
                 errores.append("La transcripción no tiene datos de conversación")
             else:
@@ -1937,7 +1937,7 @@ def procesar_acta_simple_task(self, acta_id):
                 'descripcion': f'Segmento {i} procesado exitosamente',
                 'progreso': progreso
             }
-            acta.historial_cambios.append(historial_entry)
+            acta.registrar_eventos(historial_entry)
             acta.save()
         
         # Unificar contenido final
@@ -2002,7 +2002,7 @@ Se da por terminada la sesión a las [hora] del día [fecha].
             'progreso': 100,
             'task_id': str(self.request.id)
         }
-        acta.historial_cambios.append(historial_final)
+        acta.registrar_eventos(historial_final)
         acta.save()
         
         # SINCRONIZACIÓN EXPLÍCITA CON GESTION_ACTAS
@@ -2093,10 +2093,20 @@ def procesar_acta_completa_real(self, acta_id):
     Procesamiento REAL de un acta usando la transcripción y segmentos configurados
     """
     from .models import ActaGenerada, ConfiguracionSegmento
-    from .ia_providers import get_ia_provider
+    from .ia_providers import generar_con_transcripcion, get_ia_provider, transcripcion_compacta
+    from .llamadas_paralelas import ejecutar_concurrente, get_config_paralelo, llamar_con_limite
+    from helpers.progreso_eventos import ReportadorProgreso, publicar_progreso
     import logging
     
     logger = logging.getLogger(__name__)
+    config_paralelo = get_config_paralelo()
+    # Eventos del historial pendientes de insertar (un solo INSERT al terminar o al fallar)
+    eventos = []
+
+    def avisar(acta):
+        # Delta para los editores suscritos; la descripción es la del último evento del historial
+        ultimo = eventos[-1] if eventos else {}
+        publicar_progreso('acta', acta.id, acta.estado, acta.progreso, ultimo.get('descripcion', ''))
     
     try:
         # Obtener acta con relaciones necesarias
@@ -2114,17 +2124,24 @@ def procesar_acta_completa_real(self, acta_id):
         acta.mensajes_error = ""
         
         # Registrar inicio en historial
-        if not acta.historial_cambios:
-            acta.historial_cambios = []
-        acta.historial_cambios.append({
+        eventos.append({
             'evento': 'procesamiento_iniciado',
             'descripcion': 'Procesamiento real iniciado',
             'progreso': 0,
             'timestamp': timezone.now().isoformat(),
         })
         acta.save()
+        acta.registrar_eventos(*eventos)
+        avisar(acta)
+        eventos.clear()
+
+        # Avances intermedios: UPDATE de progreso/estado; los eventos del historial
+        # se acumulan y se insertan juntos con el acta terminada (o con el error)
+        reportador = ReportadorProgreso('acta', acta)
         
-        # Verificar que tiene transcripción
+        # Verificar que tiene transcripción (con las ediciones de segmentos aplicadas)
+        if acta.transcripcion:
+            acta.transcripcion.sincronizar_conversacion()
         if not acta.transcripcion or not acta.transcripcion.conversacion_json:
             raise ValueError("El acta no tiene una transcripción válida")
         
@@ -2146,137 +2163,158 @@ def procesar_acta_completa_real(self, acta_id):
         total_segmentos = configuraciones.count()
         logger.info(f"📋 Plantilla con {total_segmentos} segmentos configurados")
         
-        # Procesar cada segmento
-        contenido_completo = []
-        
+        # Metadatos comunes; la transcripción va una sola vez, compacta, dentro del prompt
+        contexto_segmento = {
+            'numero_acta': acta.numero_acta,
+            'fecha_sesion': acta.fecha_sesion.isoformat() if acta.fecha_sesion else None,
+            'titulo_acta': acta.titulo,
+        }
+        texto_conversacion = transcripcion_compacta(acta.transcripcion)
+
+        proveedor = acta.proveedor_ia
+        ia_provider = None
+        error_proveedor = None
+        try:
+            ia_provider = get_ia_provider(proveedor)
+        except Exception as e:
+            error_proveedor = e
+            logger.error(f"❌ No se pudo inicializar el proveedor IA {proveedor.nombre}: {str(e)}")
+
+        def llamar_ia(prompt, contexto):
+            return llamar_con_limite(ia_provider, proveedor, prompt, contexto, config_paralelo)
+
+        # Segmentos estáticos se resuelven al momento; los dinámicos se despachan
+        # en paralelo y se reensamblan por orden antes de la unificación
+        segmentos_resueltos = {}
+        trabajos = []
+
         for i, config in enumerate(configuraciones):
             segmento = config.segmento
-            progreso_actual = int((i / total_segmentos) * 90)  # 90% para segmentos, 10% para unificación
-            
-            logger.info(f"📝 Procesando segmento {i+1}/{total_segmentos}: {segmento.nombre}")
-            
-            # Actualizar progreso
-            acta.progreso = progreso_actual
-            acta.historial_cambios.append({
-                'evento': f'segmento_{i+1}_iniciado',
-                'descripcion': f'Iniciando procesamiento de {segmento.nombre}',
-                'progreso': progreso_actual,
-                'timestamp': timezone.now().isoformat(),
-            })
-            acta.save()
-            
-            # Preparar contexto para el segmento
-            contexto_segmento = {
-                'transcripcion_completa': conversacion,
-                'numero_acta': acta.numero_acta,
-                'fecha_sesion': acta.fecha_sesion.isoformat() if acta.fecha_sesion else None,
-                'titulo_acta': acta.titulo,
-            }
-            
+
             if segmento.tipo == 'dinamico':
-                # Segmento dinámico: usar IA
-                try:
-                    # Obtener proveedor IA
-                    proveedor = acta.proveedor_ia
-                    ia_provider = get_ia_provider(proveedor)
-                    
-                    # Preparar prompt
-                    prompt_base = config.prompt_personalizado or segmento.prompt_ia
-                    
-                    # Convertir conversación a texto para el prompt
-                    texto_conversacion = "\n".join([
-                        f"[{seg['hablante']}] ({seg['inicio']:.1f}s): {seg['texto']}"
-                        for seg in conversacion
-                    ])
-                    
-                    prompt_final = f"""
+                prompt_base = config.prompt_personalizado or segmento.prompt_ia
+
+                def armar_prompt(texto, prompt_base=prompt_base, nombre=segmento.nombre):
+                    return f"""
 {prompt_base}
 
 TRANSCRIPCIÓN DE LA REUNIÓN:
-{texto_conversacion}
+{texto}
 
 INSTRUCCIONES:
-- Genera el contenido para la sección "{segmento.nombre}"
+- Genera el contenido para la sección "{nombre}"
 - Usa ÚNICAMENTE la información de la transcripción
 - Mantén un formato profesional y claro
-- Si no hay información relevante, indica "No se discutieron temas relacionados con {segmento.nombre}"
+- Si no hay información relevante, indica "No se discutieron temas relacionados con {nombre}"
 """
-                    
-                    logger.info(f"🤖 Enviando prompt a IA para {segmento.nombre}")
-                    
-                    # Llamar a IA
-                    resultado_ia = ia_provider.generar_respuesta(
-                        prompt=prompt_final,
-                        contexto=contexto_segmento
-                    )
-                    
-                    contenido_segmento = resultado_ia.get('contenido', f'Error procesando {segmento.nombre}')
-                    
-                    # Guardar información detallada del procesamiento
-                    info_segmento = {
-                        'orden': i + 1,
-                        'segmento_id': segmento.id,
-                        'nombre': segmento.nombre,
-                        'tipo': segmento.tipo,
-                        'contenido': contenido_segmento,
-                        'prompt_usado': prompt_final,
-                        'proveedor': proveedor.nombre,
-                        'timestamp': timezone.now().isoformat(),
-                        'tokens_usados': resultado_ia.get('tokens_usados', 0),
-                        'costo_estimado': resultado_ia.get('costo_estimado', 0),
-                    }
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error procesando segmento dinámico {segmento.nombre}: {str(e)}")
-                    contenido_segmento = f"[ERROR] No se pudo procesar {segmento.nombre}: {str(e)}"
-                    info_segmento = {
-                        'orden': i + 1,
-                        'segmento_id': segmento.id,
-                        'nombre': segmento.nombre,
-                        'tipo': segmento.tipo,
-                        'contenido': contenido_segmento,
-                        'error': str(e),
-                        'timestamp': timezone.now().isoformat(),
-                    }
+                if ia_provider is None:
+                    def llamada(error=error_proveedor):
+                        raise error
+                else:
+                    def llamada(armar_prompt=armar_prompt, prompt_base=prompt_base, nombre=segmento.nombre):
+                        return generar_con_transcripcion(
+                            ia_provider, armar_prompt, texto_conversacion,
+                            seccion=nombre, instrucciones=prompt_base,
+                            contexto=contexto_segmento, llamar=llamar_ia,
+                        )
+                trabajos.append((i, llamada))
+                segmentos_resueltos[i] = (segmento, armar_prompt)
             else:
                 # Segmento estático: usar contenido predefinido
                 contenido_segmento = segmento.contenido_estatico or f"[{segmento.nombre}]\n(Contenido estático no definido)"
+                segmentos_resueltos[i] = (segmento, {
+                    'orden': i + 1,
+                    'segmento_id': segmento.id,
+                    'nombre': segmento.nombre,
+                    'tipo': segmento.tipo,
+                    'contenido': contenido_segmento,
+                    'timestamp': timezone.now().isoformat(),
+                })
+
+        logger.info(
+            f"🤖 Despachando {len(trabajos)} segmentos dinámicos a {proveedor.nombre} "
+            f"(hasta {config_paralelo['MAX_HILOS']} en paralelo)"
+        )
+        descripcion = f'{len(trabajos)} segmentos dinámicos enviados a IA en paralelo'
+        eventos.append({
+            'evento': 'segmentos_despachados',
+            'descripcion': descripcion,
+            'progreso': acta.progreso,
+            'timestamp': timezone.now().isoformat(),
+        })
+        reportador.avanzar(acta.progreso, descripcion)
+
+        completados = total_segmentos - len(trabajos)
+        for i, resultado_ia, error in ejecutar_concurrente(trabajos):
+            segmento, armar_prompt = segmentos_resueltos[i]
+
+            if error is None:
+                contenido_segmento = resultado_ia.get('contenido', f'Error procesando {segmento.nombre}')
+                # La transcripción no se copia en cada segmento: el prompt guardado la
+                # sustituye por su tamaño y el hash del prompt realmente enviado
+                prompt_usado = armar_prompt(
+                    f"[{resultado_ia.get('tokens_contexto', 0)} tokens de "
+                    f"{'notas por fragmentos' if resultado_ia.get('fragmentos_transcripcion') else 'transcripción compacta'}; "
+                    f"SHA-256 del prompt enviado: {resultado_ia.get('prompt_sha256', '')}]"
+                )
                 info_segmento = {
                     'orden': i + 1,
                     'segmento_id': segmento.id,
                     'nombre': segmento.nombre,
                     'tipo': segmento.tipo,
                     'contenido': contenido_segmento,
+                    'prompt_usado': prompt_usado,
+                    'prompt_sha256': resultado_ia.get('prompt_sha256', ''),
+                    'tokens_contexto': resultado_ia.get('tokens_contexto', 0),
+                    'proveedor': proveedor.nombre,
                     'timestamp': timezone.now().isoformat(),
+                    'tokens_usados': resultado_ia.get('tokens_usados', 0),
+                    'costo_estimado': resultado_ia.get('costo_estimado', 0),
+                    'fragmentos_transcripcion': resultado_ia.get('fragmentos_transcripcion', 0),
                 }
-            
-            # Guardar segmento procesado
-            acta.segmentos_procesados[f'segmento_{i+1}'] = info_segmento
-            contenido_completo.append(f"\n=== {segmento.nombre.upper()} ===\n{contenido_segmento}\n")
-            
-            # Actualizar progreso completado del segmento
-            progreso_segmento = int(((i + 1) / total_segmentos) * 90)
-            acta.progreso = progreso_segmento
-            acta.historial_cambios.append({
+            else:
+                logger.error(f"❌ Error procesando segmento dinámico {segmento.nombre}: {str(error)}")
+                info_segmento = {
+                    'orden': i + 1,
+                    'segmento_id': segmento.id,
+                    'nombre': segmento.nombre,
+                    'tipo': segmento.tipo,
+                    'contenido': f"[ERROR] No se pudo procesar {segmento.nombre}: {str(error)}",
+                    'error': str(error),
+                    'timestamp': timezone.now().isoformat(),
+                }
+            segmentos_resueltos[i] = (segmento, info_segmento)
+
+            # Actualizar progreso a medida que terminan (90% para segmentos, 10% para unificación)
+            completados += 1
+            progreso_segmento = int((completados / total_segmentos) * 90)
+            descripcion = f'Segmento {segmento.nombre} procesado' + (' con errores' if error else ' exitosamente')
+            eventos.append({
                 'evento': f'segmento_{i+1}_completado',
-                'descripcion': f'Segmento {segmento.nombre} procesado exitosamente',
+                'descripcion': descripcion,
                 'progreso': progreso_segmento,
                 'timestamp': timezone.now().isoformat(),
             })
-            acta.save()
-            
-            logger.info(f"✅ Segmento {segmento.nombre} completado")
+            reportador.avanzar(progreso_segmento, descripcion)
+
+            logger.info(f"✅ Segmento {segmento.nombre} completado ({completados}/{total_segmentos})")
+
+        # Reensamblar en el orden de la plantilla
+        contenido_completo = []
+        for i in sorted(segmentos_resueltos):
+            segmento, info_segmento = segmentos_resueltos[i]
+            acta.segmentos_procesados[f'segmento_{i+1}'] = info_segmento
+            contenido_completo.append(f"\n=== {segmento.nombre.upper()} ===\n{info_segmento['contenido']}\n")
         
         # Unificar contenido final
         logger.info(f"🔗 Unificando contenido final")
-        acta.progreso = 95
-        acta.historial_cambios.append({
+        eventos.append({
             'evento': 'unificacion_iniciada',
             'descripcion': 'Unificando todos los segmentos',
             'progreso': 95,
             'timestamp': timezone.now().isoformat(),
         })
-        acta.save()
+        reportador.avanzar(95, 'Unificando todos los segmentos')
         
         # Crear contenido unificado básico
         contenido_borrador = "\n\n".join(contenido_completo)
@@ -2301,7 +2339,11 @@ Contenido a unificar:
 Genera una versión unificada manteniendo toda la información importante pero mejorando la redacción y estructura.
 """
 
-                respuesta_ia_unificacion = ia_provider.generar_respuesta(prompt_unificacion)
+                if ia_provider is None:
+                    raise error_proveedor
+                respuesta_ia_unificacion = llamar_con_limite(
+                    ia_provider, proveedor, prompt_unificacion, config=config_paralelo
+                )
                 
                 # Extraer contenido de la respuesta de manera robusta
                 if isinstance(respuesta_ia_unificacion, dict):
@@ -2315,7 +2357,7 @@ Genera una versión unificada manteniendo toda la información importante pero m
                     contenido_unificado = respuesta_texto
                     logger.info(f"✅ Contenido mejorado con IA: {len(contenido_unificado)} caracteres")
 
-                    acta.historial_cambios.append({
+                    eventos.append({
                         'evento': 'unificacion_ia_aplicada',
                         'descripcion': f'Contenido mejorado con IA: {len(contenido_unificado)} caracteres',
                         'progreso': 97,
@@ -2370,13 +2412,7 @@ Genera una versión unificada manteniendo toda la información importante pero m
 
             participantes_texto = ", ".join(participantes_normalizados)
 
-            if hasattr(acta.transcripcion, 'conversacion_json') and isinstance(acta.transcripcion.conversacion_json, dict):
-                transcripcion_texto = "\n".join([
-                    f"[{seg.get('hablante')}] {seg.get('texto')}"
-                    for seg in acta.transcripcion.conversacion_json.get('conversacion', [])
-                ])
-            else:
-                transcripcion_texto = getattr(acta.transcripcion, 'texto_completo', '') if acta.transcripcion else ''
+            transcripcion_texto = texto_conversacion
 
             prompt_contexto = {
                 'segmentos': contenido_unificado,
@@ -2414,7 +2450,9 @@ Genera una versión unificada manteniendo toda la información importante pero m
                             }
                             for seg in acta.segmentos_procesados.values()
                         ] if acta.segmentos_procesados else [],
-                        'borrador_unificado': contenido_unificado
+                        # Solo si el prompt global no lo incluye ya vía {segmentos}/{borrador}
+                        **({} if contenido_unificado in prompt_final_renderizado
+                           else {'borrador_unificado': contenido_unificado}),
                     }
                 )
 
@@ -2448,7 +2486,7 @@ Genera una versión unificada manteniendo toda la información importante pero m
             metadatos_acta = acta.metadatos or {}
             metadatos_acta['procesamiento_final'] = procesamiento_final_metadata
             acta.metadatos = metadatos_acta
-            acta.historial_cambios.append({
+            eventos.append({
                 'evento': 'prompt_global_ejecutado',
                 'descripcion': 'Se aplicó el prompt global de la plantilla para generar la versión final del acta',
                 'progreso': 99,
@@ -2459,13 +2497,16 @@ Genera una versión unificada manteniendo toda la información importante pero m
         acta.estado = 'revision'
         acta.progreso = 100
         acta.fecha_completado = timezone.now()
-        acta.historial_cambios.append({
+        eventos.append({
             'evento': 'procesamiento_completado',
             'descripcion': f'Acta procesada exitosamente con {total_segmentos} segmentos. Contenido final: {len(contenido_unificado)} caracteres.',
             'progreso': 100,
             'timestamp': timezone.now().isoformat(),
         })
         acta.save()
+        acta.registrar_eventos(*eventos)
+        avisar(acta)
+        eventos.clear()
         
         # SINCRONIZACIÓN EXPLÍCITA CON GESTION_ACTAS PARA TAREA COMPLEJA
         # Igual que en procesar_acta_simple_task - Celery necesita sincronización explícita
@@ -2536,13 +2577,16 @@ Genera una versión unificada manteniendo toda la información importante pero m
             acta = ActaGenerada.objects.get(id=acta_id)
             acta.estado = 'error'
             acta.mensajes_error = str(exc)
-            acta.historial_cambios.append({
+            # Junto con los eventos acumulados que aún no se guardaron
+            eventos.append({
                 'evento': 'error_procesamiento',
                 'descripcion': f'Error: {str(exc)}',
                 'progreso': acta.progreso,
                 'timestamp': timezone.now().isoformat(),
             })
             acta.save()
+            acta.registrar_eventos(*eventos)
+            avisar(acta)
         except:
             pass
             
@@ -0,0 +1,148 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.audio_processing.models import ProcesamientoAudio, TipoReunion
+from apps.transcripcion.models import Transcripcion
+
+from .api_views import MAX_ESTADOS_POR_CONSULTA
+from .models import ActaGenerada, EventoHistorialActa, OperacionSistema, PlantillaActa, ProveedorIA
+
+
+def dependencias_acta(nombre_usuario, nombre, prompt_global=''):
+    """
+    Usuario, transcripción, proveedor y plantilla de un ActaGenerada
+
+    Devuelve los campos listos para ``ActaGenerada(**dependencias, ...)``;
+    ``nombre`` distingue el proveedor y la plantilla, que son únicos.
+    """
+    usuario = User.objects.create_user(nombre_usuario, password='clave')
+    audio = ProcesamientoAudio.objects.create(
+        titulo=f'Sesión {nombre.lower()}',
+        tipo_reunion=TipoReunion.objects.create(nombre=nombre),
+        usuario=usuario,
+        archivo_audio=f'audio/{nombre.lower()}.wav',
+    )
+    return {
+        'usuario_creacion': usuario,
+        'transcripcion': Transcripcion.objects.create(procesamiento_audio=audio, usuario_creacion=usuario),
+        'proveedor_ia': ProveedorIA.objects.create(
+            nombre=f'OpenAI {nombre.lower()}', tipo='openai', modelo='gpt-4o-mini', usuario_creacion=usuario
+        ),
+        'plantilla': PlantillaActa.objects.create(
+            codigo=nombre.lower(), nombre=nombre, descripcion='Plantilla de pruebas',
+            tipo_acta='ordinaria', prompt_global=prompt_global, usuario_creacion=usuario,
+        ),
+    }
+
+
+class EstadosMultiplesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dependencias = dependencias_acta('secretaria', 'Ordinaria', prompt_global='Unifica el acta')
+        cls.usuario = dependencias['usuario_creacion']
+        ahora = timezone.now()
+        # bulk_create: sin la señal que crea la GestionActa de cada acta
+        cls.actas = ActaGenerada.objects.bulk_create([
+            ActaGenerada(
+                **dependencias,
+                numero_acta=f'ACTA-PRUEBA-{i:04d}',
+                titulo=f'Acta {i}',
+                fecha_sesion=ahora,
+                estado='procesando',
+                progreso=i % 100,
+                segmentos_procesados={'segmento_1': {'contenido': 'x' * 2000}},
+                contenido_borrador='Borrador' if i % 2 else '',
+            )
+            for i in range(MAX_ESTADOS_POR_CONSULTA)
+        ])
+        cls.url = reverse('generador_actas:api_estados_multiple')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def consultar(self, ids, **cabeceras):
+        return self.client.get(self.url, {'ids': ','.join(str(i) for i in ids)}, **cabeceras)
+
+    def consultas_de_actas(self, cantidad):
+        ids = [acta.id for acta in self.actas[:cantidad]]
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.consultar(ids)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()['data']), cantidad)
+        return [c['sql'] for c in consultas.captured_queries if 'generador_actas_actagenerada' in c['sql']]
+
+    def test_consultas_constantes_para_1_50_y_500_ids(self):
+        for cantidad in (1, 50, 500):
+            with self.subTest(cantidad=cantidad):
+                consultas = self.consultas_de_actas(cantidad)
+                self.assertEqual(len(consultas), 1)
+                for columna in ('segmentos_procesados', 'metadatos', 'contenido_html'):
+                    self.assertNotIn(columna, consultas[0])
+
+    def test_datos_de_estado(self):
+        acta = self.actas[3]
+        datos = self.consultar([acta.id, 999999]).json()['data']
+        self.assertEqual(datos[str(acta.id)]['progreso'], 3)
+        self.assertTrue(datos[str(acta.id)]['tiene_contenido'])
+        self.assertFalse(datos[str(acta.id)]['puede_procesar'])
+        self.assertEqual(datos['999999'], {'error': 'Acta no encontrada'})
+
+    def test_etag_devuelve_304_si_no_hay_cambios(self):
+        ids = [acta.id for acta in self.actas[:10]]
+        primera = self.consultar(ids)
+        etag = primera['ETag']
+
+        self.assertEqual(self.consultar(ids, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        ActaGenerada.objects.filter(id=ids[0]).update(progreso=99)
+        cambiada = self.consultar(ids, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cambiada.status_code, 200)
+        self.assertNotEqual(cambiada['ETag'], etag)
+
+    def test_limite_de_ids(self):
+        respuesta = self.consultar(range(1, MAX_ESTADOS_POR_CONSULTA + 2))
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class HistorialSoloInsercionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dependencias = dependencias_acta('archivo', 'Archivo')
+        cls.usuario = dependencias['usuario_creacion']
+        cls.acta = ActaGenerada.objects.bulk_create([ActaGenerada(
+            **dependencias, numero_acta='ACTA-HISTORIAL-0001', titulo='Acta con historial', fecha_sesion=timezone.now(),
+        )])[0]
+        cls.operacion = OperacionSistema.objects.create(tipo='backup', titulo='Backup', usuario=cls.usuario)
+
+    def test_agregar_es_un_insert_sin_tocar_el_acta(self):
+        self.acta.registrar_eventos(*({'evento': f'evento_{i}', 'progreso': i} for i in range(200)))
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.acta.agregar_historial('aprobar', self.usuario, {'motivo': 'prueba'})
+
+        sentencias = [c['sql'] for c in consultas.captured_queries]
+        self.assertEqual(len(sentencias), 1)
+        self.assertTrue(sentencias[0].startswith('INSERT INTO "generador_actas_eventohistorialacta"'))
+        self.assertEqual(EventoHistorialActa.objects.filter(acta=self.acta).count(), 201)
+
+        # Compatibilidad: las últimas N entradas, en orden cronológico
+        historial = ActaGenerada.objects.get(pk=self.acta.pk).historial_cambios
+        self.assertEqual(len(historial), ActaGenerada.HISTORIAL_RECIENTE)
+        self.assertEqual(historial[-2]['evento'], 'evento_199')
+        self.assertEqual(historial[-1]['accion'], 'aprobar')
+
+    def test_logs_de_operacion(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.operacion.agregar_logs([('info', f'Paso {i}', None) for i in range(100)])
+        self.assertEqual(len(consultas.captured_queries), 1)
+
+        self.operacion.agregar_log('error', 'Falló', {'codigo': 3})
+        logs = OperacionSistema.objects.get(pk=self.operacion.pk).logs
+        self.assertEqual(len(logs), OperacionSistema.LOGS_RECIENTES)
+        self.assertEqual(logs[-1]['nivel'], 'error')
+        self.assertEqual(logs[-1]['detalles'], {'codigo': 3})
+        self.assertEqual(logs[-2]['mensaje'], 'Paso 99')
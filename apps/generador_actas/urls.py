@@ -3,6 +3,7 @@ Configuración de URLs para el módulo generador de actas
 """
 from django.urls import path, include
 from . import views, api_views
+from helpers.progreso_eventos import estado_progreso, stream_progreso
 
 app_name = 'generador_actas'
 
@@ -91,6 +92,8 @@ urlpatterns = [
         path('actas/<int:acta_id>/cancelar/', api_views.api_cancelar_procesamiento, name='api_cancelar_procesamiento'),
         path('actas/<int:acta_id>/preview/', api_views.api_previsualizar_contenido, name='api_previsualizar_contenido'),
         path('actas/estados/', api_views.api_estados_multiple, name='api_estados_multiple'),
+        path('actas/<int:objeto_id>/progreso/', estado_progreso, {'tipo': 'acta'}, name='api_progreso_acta'),
+        path('actas/<int:objeto_id>/progreso/stream/', stream_progreso, {'tipo': 'acta'}, name='stream_progreso_acta'),
         
         # APIs de transcripciones
         path('transcripciones/<int:transcripcion_id>/validar/', api_views.api_validar_transcripcion, name='api_validar_transcripcion'),
@@ -401,12 +401,6 @@ def revertir_acta(request, acta_id):
         acta.estado = 'borrador'
         acta.progreso = 0
         acta.segmentos_procesados = {}
-        acta.historial_cambios = [{
-            'evento': 'acta_revertida',
-            'descripcion': f'Acta revertida desde estado {estado_anterior} a borrador por {request.user.username}',
-            'progreso': 0,
-            'timestamp': timezone.now().isoformat(),
-        }]
         acta.contenido_borrador = ''
         acta.contenido_final = ''
         acta.contenido_html = ''
@@ -417,6 +411,13 @@ def revertir_acta(request, acta_id):
         acta.fecha_procesamiento = None
         
         acta.save()
+        # El historial es de solo inserción: la reversión queda como un evento más
+        acta.registrar_eventos({
+            'evento': 'acta_revertida',
+            'descripcion': f'Acta revertida desde estado {estado_anterior} a borrador por {request.user.username}',
+            'progreso': 0,
+            'timestamp': timezone.now().isoformat(),
+        })
         
         logger.info(f"Acta {acta.numero_acta} revertida a borrador por {request.user.username}")
         
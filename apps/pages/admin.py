@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     TipoSesion, EstadoActa, ActaMunicipal, 
-    VisualizacionActa, DescargaActa, Product,
+    VisualizacionActa, DescargaActa, ResumenDiarioActa, Product,
     IndicadorTransparencia, MetricaTransparencia,
     EstadisticaMunicipal, ProyectoMunicipal,
     EventoMunicipal, DocumentoEvento, AsistenciaEvento, InvitacionExterna
@@ -123,6 +123,21 @@ class DescargaActaAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         return False
 
+@admin.register(ResumenDiarioActa)
+class ResumenDiarioActaAdmin(admin.ModelAdmin):
+    list_display = [
+        'acta', 'fecha', 'visualizaciones', 'descargas_pdf', 'descargas_txt', 'descargas_word'
+    ]
+    list_filter = ['fecha']
+    search_fields = ['acta__numero_acta', 'acta__titulo']
+    date_hierarchy = 'fecha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # ========================================================================
 # ADMIN DE TRANSPARENCIA MUNICIPAL
 # ========================================================================
@@ -0,0 +1,225 @@
+"""
+Documentos pre-generados de las actas del portal ciudadano
+
+Cada acta publicada tiene un juego de documentos (PDF, TXT, Word y HTML) que
+se genera una sola vez, en la tarea Celery ``construir_artefactos_acta``, y
+se guarda en::
+
+    MEDIA_ROOT/actas_artefactos/<id_acta>/<hash>/acta.{pdf,txt,docx,html}
+
+El ``hash`` se calcula sobre los campos que aparecen en los documentos, así
+que el juego solo se invalida cuando cambia el contenido del acta. Los
+directorios no se modifican nunca: se construyen en un directorio temporal y
+se renombran de forma atómica, por lo que las descargas se sirven como
+archivos estáticos con ETag/Last-Modified (ver ``helpers.descargas``).
+"""
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+
+from helpers.descargas import respuesta_archivo
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = {
+    'pdf': ('acta.pdf', 'application/pdf'),
+    'txt': ('acta.txt', 'text/plain; charset=utf-8'),
+    'word': ('acta.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    'html': ('acta.html', 'text/html; charset=utf-8'),
+}
+
+EXTENSIONES_DESCARGA = {'pdf': 'pdf', 'txt': 'txt', 'word': 'docx', 'html': 'html'}
+
+# Formatos que también quedan enlazados en los FileField del modelo
+CAMPOS_MODELO = {'pdf': 'archivo_pdf', 'word': 'archivo_word', 'txt': 'archivo_txt'}
+
+# Campos del acta que se imprimen en los documentos (la fecha de publicación no)
+CAMPOS_HASH = (
+    'numero_acta', 'titulo', 'contenido', 'resumen', 'orden_del_dia', 'acuerdos',
+    'asistentes', 'presidente', 'observaciones', 'palabras_clave', 'fecha_sesion',
+    'tipo_sesion_id', 'secretario_id',
+)
+
+
+def get_config_artefactos():
+    config = {
+        'DIRECTORIO': 'actas_artefactos',
+        'ESPERA_CONSTRUCCION': 30,  # segundos que una petición espera a otra que ya está generando
+        'BLOQUEO_TIMEOUT': 600,
+    }
+    config.update(getattr(settings, 'ARTEFACTOS_ACTAS', {}) or {})
+    return config
+
+
+def hash_contenido(acta):
+    sha = hashlib.sha256()
+    for campo in CAMPOS_HASH:
+        valor = getattr(acta, campo, None)
+        valor = valor.isoformat() if hasattr(valor, 'isoformat') else str(valor or '')
+        sha.update(valor.encode('utf-8'))
+        sha.update(b'\x00')
+    return sha.hexdigest()[:20]
+
+
+def directorio_acta(acta_id):
+    return os.path.join(settings.MEDIA_ROOT, get_config_artefactos()['DIRECTORIO'], str(acta_id))
+
+
+def directorio_artefactos(acta, hash_actual=None):
+    return os.path.join(directorio_acta(acta.pk), hash_actual or hash_contenido(acta))
+
+
+def artefactos_vigentes(acta, hash_actual=None):
+    """True si ya existe el juego de documentos del contenido actual"""
+    return os.path.isdir(directorio_artefactos(acta, hash_actual))
+
+
+def _generar_en(acta, directorio):
+    from gestion_actas.generador_documentos import generar_documentos_acta_mejorados
+    from .views import convertir_word_a_pdf
+
+    documentos = generar_documentos_acta_mejorados(acta, directorio=directorio, nombre_base='acta')
+
+    # Igual que la descarga original: el PDF se obtiene del Word cuando es posible
+    if 'word' in documentos:
+        convertir_word_a_pdf(documentos['word']['ruta'], acta.numero_acta)
+
+    generados = [f for f, (nombre, _) in FORMATOS.items() if os.path.exists(os.path.join(directorio, nombre))]
+    if not generados:
+        raise RuntimeError(f"No se generó ningún documento para el acta {acta.numero_acta}")
+    if len(generados) < len(FORMATOS):
+        logger.warning(f"⚠️ Acta {acta.numero_acta}: solo se generaron {', '.join(generados)}")
+
+
+def _enlazar_modelo(acta, directorio):
+    """Apunta los FileField del acta a los documentos vigentes sin copiarlos"""
+    from .models import ActaMunicipal
+
+    relativo = os.path.relpath(directorio, settings.MEDIA_ROOT).replace(os.sep, '/')
+    campos = {
+        campo: f'{relativo}/{FORMATOS[formato][0]}'
+        for formato, campo in CAMPOS_MODELO.items()
+        if os.path.exists(os.path.join(directorio, FORMATOS[formato][0]))
+    }
+    # update() no dispara post_save ni toca fecha_actualizacion
+    ActaMunicipal.objects.filter(pk=acta.pk).update(**campos)
+    for campo, nombre in campos.items():
+        getattr(acta, campo).name = nombre
+
+
+def _eliminar_obsoletos(acta, hash_actual):
+    base = directorio_acta(acta.pk)
+    for nombre in os.listdir(base):
+        if nombre != hash_actual and not nombre.startswith('.tmp-'):
+            shutil.rmtree(os.path.join(base, nombre), ignore_errors=True)
+
+
+def construir_artefactos(acta, esperar=True):
+    """
+    Genera el juego de documentos del contenido actual si no existe
+
+    Un bloqueo en la caché compartida evita que varios procesos generen el
+    mismo juego a la vez; con ``esperar`` se aguarda a que termine quien lo
+    tenga.
+
+    Returns:
+        Directorio de los documentos, o None si no están disponibles
+    """
+    config = get_config_artefactos()
+    hash_actual = hash_contenido(acta)
+    destino = directorio_artefactos(acta, hash_actual)
+    if os.path.isdir(destino):
+        return destino
+
+    clave_bloqueo = f'artefactos_acta_{acta.pk}_{hash_actual}'
+    if not cache.add(clave_bloqueo, 1, config['BLOQUEO_TIMEOUT']):
+        if not esperar:
+            return None
+        limite = time.monotonic() + config['ESPERA_CONSTRUCCION']
+        while time.monotonic() < limite:
+            time.sleep(0.5)
+            if os.path.isdir(destino):
+                return destino
+        return None
+
+    temporal = os.path.join(directorio_acta(acta.pk), f'.tmp-{uuid.uuid4().hex}')
+    try:
+        inicio = time.monotonic()
+        os.makedirs(temporal)
+        _generar_en(acta, temporal)
+        try:
+            os.rename(temporal, destino)
+        except OSError:
+            # Otro proceso lo publicó primero (bloqueo expirado): el suyo es idéntico
+            if not os.path.isdir(destino):
+                raise
+        _enlazar_modelo(acta, destino)
+        _eliminar_obsoletos(acta, hash_actual)
+        logger.info(
+            f"📄 Documentos del acta {acta.numero_acta} generados en {time.monotonic() - inicio:.1f}s ({hash_actual})"
+        )
+        return destino
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+        cache.delete(clave_bloqueo)
+
+
+def programar_artefactos(acta):
+    """Encola la generación al confirmar la transacción si el contenido cambió"""
+    hash_actual = hash_contenido(acta)
+    if artefactos_vigentes(acta, hash_actual) or getattr(acta, '_artefactos_programados', None) == hash_actual:
+        return False
+    acta._artefactos_programados = hash_actual
+    acta_id = acta.pk
+
+    def encolar():
+        from .tasks import construir_artefactos_acta
+        try:
+            construir_artefactos_acta.delay(acta_id)
+        except Exception as e:
+            # Sin broker la primera descarga genera los documentos
+            logger.warning(f"⚠️ No se pudo encolar la generación de documentos del acta {acta_id}: {e}")
+
+    transaction.on_commit(encolar)
+    return True
+
+
+def servir_artefacto(request, acta, formato, adjunto=True):
+    """
+    Respuesta de descarga del documento vigente
+
+    El ETag identifica el contenido del acta, así que las peticiones
+    condicionales reciben 304 hasta que el acta cambie. El envío (rangos,
+    X-Accel-Redirect) lo resuelve ``helpers.descargas.respuesta_archivo``.
+    """
+    hash_actual = hash_contenido(acta)
+    directorio = construir_artefactos(acta)
+    if directorio is None:
+        respuesta = HttpResponse("El documento se está generando, inténtelo en unos segundos", status=503)
+        respuesta['Retry-After'] = '10'
+        return respuesta
+
+    nombre, content_type = FORMATOS[formato]
+    ruta = os.path.join(directorio, nombre)
+    if not os.path.exists(ruta):
+        raise Http404(f"El formato {formato} no está disponible para esta acta")
+
+    respuesta = respuesta_archivo(
+        request, ruta,
+        content_type=content_type,
+        nombre=f'{acta.numero_acta}.{EXTENSIONES_DESCARGA[formato]}',
+        adjunto=adjunto,
+        etag=f'"{hash_actual}-{formato}"',
+    )
+    # Las actas restringidas dependen de la sesión: no deben quedar en cachés compartidas
+    patch_cache_control(respuesta, no_cache=True, **({'public': True} if acta.es_publico else {'private': True}))
+    return respuesta
@@ -0,0 +1,84 @@
+"""
+Búsqueda de texto completo de actas del portal ciudadano
+
+En PostgreSQL la columna ``search_vector`` de ``pages_actamunicipal`` la
+mantiene un trigger (migración 0010) con la configuración ``es_unaccent``
+(español + unaccent) y pesos por campo: título A, palabras clave y
+presidente B, resumen C, contenido D. Está indexada con GIN, y el número de
+acta tiene además un índice de trigramas para coincidencias parciales
+("2025-0", "ord-12"...). Los resultados se ordenan por ``ts_rank``.
+
+En otros backends (SQLite de desarrollo) se mantiene la búsqueda por
+``icontains`` de ``crear_filtros_busqueda_multiple``.
+"""
+import re
+
+from django.db import connection
+
+from helpers.util import crear_filtros_busqueda_multiple
+
+CONFIGURACION_TS = 'es_unaccent'
+
+CAMPOS_FALLBACK = ['titulo', 'numero_acta', 'resumen', 'contenido', 'palabras_clave', 'presidente']
+
+
+def consulta_ts(busqueda):
+    """
+    Convierte el texto del usuario en una tsquery con prefijos ("presupuest:*")
+    para que las palabras a medio escribir sigan encontrando resultados. Solo
+    se conservan caracteres de palabra, así que el texto no puede romper la
+    sintaxis de ``to_tsquery``.
+    """
+    terminos = re.findall(r'\w+', busqueda or '')
+    return ' & '.join(f'{termino}:*' for termino in terminos)
+
+
+def _patron_like(busqueda):
+    escapado = busqueda.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escapado}%'
+
+
+def usa_texto_completo():
+    return connection.vendor == 'postgresql'
+
+
+def buscar_actas(actas, busqueda, campos_fallback=None):
+    """
+    Filtra ``actas`` por ``busqueda`` y anota ``rank`` cuando hay índice
+
+    Returns:
+        (queryset, con_ranking)
+    """
+    busqueda = (busqueda or '').strip()
+    if not busqueda:
+        return actas, False
+
+    if not usa_texto_completo():
+        filtros = crear_filtros_busqueda_multiple(campos_fallback or CAMPOS_FALLBACK, busqueda)
+        return actas.filter(filtros), False
+
+    tsquery = consulta_ts(busqueda)
+    patron = _patron_like(busqueda)
+    if not tsquery:
+        # Solo símbolos: únicamente puede coincidir con el número de acta
+        return actas.extra(
+            where=["f_unaccent(lower(pages_actamunicipal.numero_acta)) LIKE f_unaccent(lower(%s))"],
+            params=[patron],
+        ), False
+
+    condicion = (
+        f"(pages_actamunicipal.search_vector @@ to_tsquery('{CONFIGURACION_TS}', %s) "
+        f"OR f_unaccent(lower(pages_actamunicipal.numero_acta)) LIKE f_unaccent(lower(%s)))"
+    )
+    ranking = (
+        f"ts_rank(pages_actamunicipal.search_vector, to_tsquery('{CONFIGURACION_TS}', %s)) "
+        f"+ CASE WHEN f_unaccent(lower(pages_actamunicipal.numero_acta)) LIKE f_unaccent(lower(%s)) "
+        f"THEN 1.0 ELSE 0.0 END"
+    )
+    actas = actas.extra(
+        select={'rank': ranking},
+        select_params=[tsquery, patron],
+        where=[condicion],
+        params=[tsquery, patron],
+    )
+    return actas, True
@@ -0,0 +1,286 @@
+"""
+Contadores de visualizaciones y descargas del portal ciudadano
+
+Las vistas ya no insertan una fila por visita dentro de la petición: encolan
+el evento en un buffer y la tarea ``volcar_contadores_portal`` (Celery beat)
+lo vacía con ``bulk_create`` y acumula los totales en ``ResumenDiarioActa``,
+que es lo que leen el portal y las páginas de transparencia.
+
+El buffer es una lista de Redis compartida por todos los procesos web. Sin
+Redis se usa una cola en memoria del proceso que se vuelca sola al llenarse o
+al pasar el intervalo configurado. Si Redis falla, el evento se escribe en el
+momento para no perderlo. Un lote cuyo volcado falla vuelve al inicio del
+buffer para el siguiente intento; si la base de datos rechaza una fila, el
+lote se parte en mitades para que solo ese evento quede fuera y, tras
+``MAX_INTENTOS``, pasa a la lista de descartados en lugar de bloquear la cola.
+"""
+import ipaddress
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .estadisticas import CAMPOS_DESCARGA, acumular_resumen
+from .models import ActaMunicipal, DescargaActa, VisualizacionActa
+
+logger = logging.getLogger(__name__)
+
+TIPO_VISUALIZACION = 'visualizacion'
+TIPO_DESCARGA = 'descarga'
+
+
+def get_config_contadores():
+    config = {
+        'BUFFER': True,
+        'REDIS_URL': getattr(settings, 'CACHE_REDIS_URL', '') or '',
+        'CLAVE': 'actas:eventos_portal',
+        'LOTE': 1000,
+        'INTERVALO_MEMORIA': 30,  # segundos entre volcados del buffer en memoria
+        'MAX_INTENTOS': 3,        # volcados rechazados antes de descartar un evento
+    }
+    config.update(getattr(settings, 'PORTAL_CONTADORES', {}) or {})
+    return config
+
+
+class BufferRedis:
+    """Lista de Redis: RPUSH en la petición, LPOP por lotes en el volcado"""
+
+    def __init__(self, url, clave):
+        import redis
+        self.cliente = redis.Redis.from_url(url, socket_timeout=1)
+        self.clave = clave
+
+    def agregar(self, evento):
+        self.cliente.rpush(self.clave, json.dumps(evento))
+
+    def extraer(self, cantidad):
+        datos = self.cliente.lpop(self.clave, cantidad) or []
+        return [json.loads(dato) for dato in datos]
+
+    def devolver(self, eventos):
+        """Vuelve a poner un lote al inicio de la lista, en su orden original"""
+        if eventos:
+            self.cliente.lpush(self.clave, *[json.dumps(evento) for evento in reversed(eventos)])
+
+    def descartar(self, evento):
+        """Lista aparte (``<clave>:descartados``) para revisar los eventos que la base de datos rechaza"""
+        self.cliente.rpush(f'{self.clave}:descartados', json.dumps(evento))
+
+    def pendientes(self):
+        return self.cliente.llen(self.clave)
+
+
+class BufferMemoria:
+    """Cola del proceso; se vuelca desde la propia petición cada ``intervalo`` segundos o ``lote`` eventos"""
+
+    def __init__(self, lote, intervalo):
+        self.cola = deque()
+        self.lock = threading.Lock()
+        self.lote = lote
+        self.intervalo = intervalo
+        self.ultimo_volcado = time.monotonic()
+
+    def agregar(self, evento):
+        with self.lock:
+            self.cola.append(evento)
+            vencido = time.monotonic() - self.ultimo_volcado >= self.intervalo
+            if len(self.cola) < self.lote and not vencido:
+                return
+            self.ultimo_volcado = time.monotonic()
+        try:
+            volcar_lote(self, self.extraer(self.lote))
+        except Exception as e:
+            # El evento ya está en la cola devuelta: no se reintenta la escritura directa
+            logger.error(f"❌ Error volcando contadores en memoria; se reintentará: {e}")
+
+    def extraer(self, cantidad):
+        with self.lock:
+            return [self.cola.popleft() for _ in range(min(cantidad, len(self.cola)))]
+
+    def devolver(self, eventos):
+        with self.lock:
+            self.cola.extendleft(reversed(eventos))
+
+    def descartar(self, evento):
+        # Sin Redis no hay dónde conservarlo: queda en el log de error
+        pass
+
+    def pendientes(self):
+        return len(self.cola)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Buffer único del proceso (None si el buffer está desactivado)"""
+    global _buffer
+    config = get_config_contadores()
+    if not config['BUFFER']:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            if config['REDIS_URL']:
+                try:
+                    _buffer = BufferRedis(config['REDIS_URL'], config['CLAVE'])
+                except ImportError:
+                    logger.warning("⚠️ Librería redis no disponible; contadores en memoria")
+            if _buffer is None:
+                _buffer = BufferMemoria(config['LOTE'], config['INTERVALO_MEMORIA'])
+        return _buffer
+
+
+def ip_normalizada(valor):
+    """La IP en forma canónica, o None si no es una dirección válida (las columnas son inet)"""
+    try:
+        return str(ipaddress.ip_address((valor or '').strip()))
+    except ValueError:
+        return None
+
+
+def _evento(tipo, request, acta, **extra):
+    from .views import get_client_ip
+
+    return {
+        'tipo': tipo,
+        'acta_id': acta.pk,
+        'usuario_id': request.user.pk if request.user.is_authenticated else None,
+        # X-Forwarded-For lo escribe el cliente: si no es una IP se usa la del socket
+        'ip_address': ip_normalizada(get_client_ip(request)) or ip_normalizada(request.META.get('REMOTE_ADDR')),
+        'fecha': timezone.now().isoformat(),
+        **extra,
+    }
+
+
+def _encolar(evento):
+    buffer = get_buffer()
+    if buffer is None:
+        volcar_eventos([evento])
+        return
+    try:
+        buffer.agregar(evento)
+    except Exception as e:
+        logger.warning(f"⚠️ Buffer de contadores no disponible, escritura directa: {e}")
+        volcar_eventos([evento])
+
+
+def registrar_visualizacion(request, acta):
+    _encolar(_evento(
+        TIPO_VISUALIZACION, request, acta,
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:1000],
+    ))
+
+
+def registrar_descarga(request, acta, formato):
+    _encolar(_evento(TIPO_DESCARGA, request, acta, formato=formato))
+
+
+def volcar_eventos(eventos):
+    """Inserta los eventos con ``bulk_create`` y acumula el resumen diario por acta"""
+    if not eventos:
+        return 0
+
+    visualizaciones = []
+    descargas = []
+    incrementos = Counter()
+
+    # Actas y usuarios eliminados mientras el evento esperaba en el buffer
+    actas_existentes = set(ActaMunicipal.objects.filter(
+        pk__in={evento['acta_id'] for evento in eventos}
+    ).values_list('pk', flat=True))
+    usuarios_existentes = set(User.objects.filter(
+        pk__in={evento.get('usuario_id') for evento in eventos} - {None}
+    ).values_list('pk', flat=True))
+
+    for evento in eventos:
+        if evento['acta_id'] not in actas_existentes:
+            continue
+        fecha = parse_datetime(evento['fecha']) or timezone.now()
+        dia = timezone.localdate(fecha)
+        comunes = {
+            'acta_id': evento['acta_id'],
+            # El FK es SET_NULL: el evento de un usuario eliminado queda anónimo
+            'usuario_id': evento.get('usuario_id') if evento.get('usuario_id') in usuarios_existentes else None,
+            'ip_address': ip_normalizada(evento.get('ip_address')) or '0.0.0.0',
+        }
+        if evento['tipo'] == TIPO_VISUALIZACION:
+            visualizaciones.append(VisualizacionActa(
+                fecha_visualizacion=fecha, user_agent=evento.get('user_agent', ''), **comunes
+            ))
+            incrementos[(evento['acta_id'], dia, 'visualizaciones')] += 1
+        elif evento['tipo'] == TIPO_DESCARGA:
+            formato = evento.get('formato', 'pdf')
+            descargas.append(DescargaActa(fecha_descarga=fecha, formato=formato, **comunes))
+            if formato in CAMPOS_DESCARGA:
+                incrementos[(evento['acta_id'], dia, CAMPOS_DESCARGA[formato])] += 1
+
+    # bulk_create no emite post_save, así que el resumen se acumula aquí una vez por (acta, día, campo).
+    # Filas y resumen en la misma transacción: o entra el lote completo o no entra nada
+    with transaction.atomic():
+        VisualizacionActa.objects.bulk_create(visualizaciones, batch_size=500)
+        DescargaActa.objects.bulk_create(descargas, batch_size=500)
+        for (acta_id, dia, campo), cantidad in incrementos.items():
+            acumular_resumen(acta_id, dia, **{campo: cantidad})
+
+    return len(eventos)
+
+
+def volcar_lote(buffer, eventos):
+    """
+    Vuelca un lote extraído del buffer
+
+    Si la base de datos rechaza alguna fila (``DataError``/``IntegrityError``)
+    el lote se vuelca por mitades hasta aislar el evento; este vuelve al
+    buffer con un intento más y tras ``MAX_INTENTOS`` se descarta. Con
+    cualquier otro error (base de datos caída...) el lote completo vuelve al
+    buffer y el error se relanza.
+    """
+    try:
+        return volcar_eventos(eventos)
+    except (DataError, IntegrityError) as e:
+        if len(eventos) > 1:
+            mitad = len(eventos) // 2
+            return volcar_lote(buffer, eventos[:mitad]) + volcar_lote(buffer, eventos[mitad:])
+        evento = dict(eventos[0], intentos=eventos[0].get('intentos', 0) + 1)
+        if evento['intentos'] >= get_config_contadores()['MAX_INTENTOS']:
+            logger.error(f"❌ Evento de contadores descartado tras {evento['intentos']} intentos: {evento} ({e})")
+            buffer.descartar(evento)
+        else:
+            logger.warning(f"⚠️ Evento de contadores rechazado, se reintentará: {e}")
+            buffer.devolver([evento])
+        return 0
+    except Exception:
+        try:
+            buffer.devolver(eventos)
+        except Exception as e:
+            logger.error(f"❌ No se pudieron devolver {len(eventos)} eventos de contadores al buffer: {e}")
+        raise
+
+
+def volcar_buffer(max_lotes=100):
+    """Vacía el buffer por lotes; devuelve el número de eventos volcados"""
+    buffer = get_buffer()
+    if buffer is None:
+        return 0
+    lote = get_config_contadores()['LOTE']
+    total = 0
+    for _ in range(max_lotes):
+        eventos = buffer.extraer(lote)
+        if not eventos:
+            break
+        try:
+            total += volcar_lote(buffer, eventos)
+        except Exception as e:
+            logger.error(f"❌ Error volcando {len(eventos)} eventos de contadores; quedan en el buffer: {e}")
+            break
+        if len(eventos) < lote:
+            break
+    return total
@@ -0,0 +1,147 @@
+"""
+Estadísticas del portal ciudadano
+
+Las cifras de las actas se calculan con una sola consulta de agregación
+condicional y, para el listado sin filtros, se guardan en la caché compartida
+por alcance de usuario (público, autenticado, staff). Las visualizaciones y
+descargas se leen de ``ResumenDiarioActa`` en lugar de contar las tablas de
+eventos (ver ``contadores``). Las señales de ``ActaMunicipal`` invalidan la caché.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from .models import ActaMunicipal, ResumenDiarioActa
+
+logger = logging.getLogger(__name__)
+
+ALCANCES = ('publico', 'autenticado', 'staff')
+CLAVE_ACTAS = 'portal_ciudadano_estadisticas_{alcance}'
+CLAVE_GLOBALES = 'portal_ciudadano_metricas_globales'
+
+CAMPOS_DESCARGA = {
+    'pdf': 'descargas_pdf',
+    'txt': 'descargas_txt',
+    'word': 'descargas_word',
+}
+
+
+def get_config_estadisticas():
+    config = {
+        'CACHE_TIMEOUT': 300,
+    }
+    config.update(getattr(settings, 'PORTAL_ESTADISTICAS', {}) or {})
+    return config
+
+
+def alcance_usuario(user):
+    if not user.is_authenticated:
+        return 'publico'
+    if user.is_superuser or user.is_staff:
+        return 'staff'
+    return 'autenticado'
+
+
+def inicio_mes():
+    ahora = timezone.localtime()
+    return ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def calcular_estadisticas_actas(actas):
+    """Totales, públicas, del mes, con IA y precisión media en una sola consulta"""
+    datos = actas.order_by().aggregate(
+        total_actas=Count('id'),
+        actas_publicas=Count('id', filter=Q(acceso='publico')),
+        actas_este_mes=Count('id', filter=Q(fecha_sesion__gte=inicio_mes())),
+        actas_con_ia=Count('id', filter=Q(transcripcion_ia=True)),
+        precision_promedio=Avg('precision_ia'),
+    )
+    total = datos['total_actas']
+    datos['porcentaje_ia'] = round((datos['actas_con_ia'] / total * 100) if total else 0, 1)
+    datos['precision_promedio'] = round(float(datos['precision_promedio'] or 0), 1)
+    return datos
+
+
+def calcular_metricas_globales():
+    """Última actualización del archivo y visualizaciones/descargas del mes desde el rollup"""
+    ultima_creacion = ActaMunicipal.objects.filter(activo=True).aggregate(
+        ultima=Max('fecha_creacion')
+    )['ultima']
+    dias_ultima_actualizacion = 0
+    if ultima_creacion:
+        dias_ultima_actualizacion = (timezone.localdate() - timezone.localtime(ultima_creacion).date()).days
+
+    mes = totales_contadores(desde=inicio_mes())
+    return {
+        'dias_ultima_actualizacion': dias_ultima_actualizacion,
+        'visualizaciones_mes': mes['visualizaciones'],
+        'descargas_mes': mes['descargas'],
+    }
+
+
+def totales_contadores(desde=None):
+    """Visualizaciones y descargas acumuladas en el rollup diario (desde una fecha opcional)"""
+    resumenes = ResumenDiarioActa.objects.all()
+    if desde is not None:
+        if hasattr(desde, 'date'):
+            desde = timezone.localtime(desde).date() if timezone.is_aware(desde) else desde.date()
+        resumenes = resumenes.filter(fecha__gte=desde)
+    datos = resumenes.aggregate(
+        visualizaciones=Sum('visualizaciones'),
+        descargas_pdf=Sum('descargas_pdf'),
+        descargas_txt=Sum('descargas_txt'),
+        descargas_word=Sum('descargas_word'),
+    )
+    return {
+        'visualizaciones': datos['visualizaciones'] or 0,
+        'descargas': sum(datos[campo] or 0 for campo in CAMPOS_DESCARGA.values()),
+    }
+
+
+def estadisticas_portal(actas, alcance=None):
+    """
+    Estadísticas del listado del portal
+
+    Args:
+        actas: Queryset ya filtrado por permisos (y por búsqueda/filtros)
+        alcance: Alcance del usuario cuando el listado NO tiene filtros; solo
+            entonces se cachean las cifras de las actas
+
+    Returns:
+        Dict con las claves que espera la plantilla del portal
+    """
+    timeout = get_config_estadisticas()['CACHE_TIMEOUT']
+
+    if alcance:
+        datos = cache.get_or_set(
+            CLAVE_ACTAS.format(alcance=alcance), lambda: calcular_estadisticas_actas(actas), timeout
+        )
+    else:
+        datos = calcular_estadisticas_actas(actas)
+
+    return {**datos, **cache.get_or_set(CLAVE_GLOBALES, calcular_metricas_globales, timeout)}
+
+
+def invalidar_estadisticas():
+    cache.delete_many([CLAVE_ACTAS.format(alcance=alcance) for alcance in ALCANCES] + [CLAVE_GLOBALES])
+
+
+def acumular_resumen(acta_id, fecha, **incrementos):
+    """Suma ``incrementos`` (visualizaciones=1, descargas_pdf=1...) al resumen diario del acta"""
+    incrementos = {campo: n for campo, n in incrementos.items() if n}
+    if not incrementos:
+        return
+    actualizacion = {campo: F(campo) + n for campo, n in incrementos.items()}
+    filtro = ResumenDiarioActa.objects.filter(acta_id=acta_id, fecha=fecha)
+    if filtro.update(**actualizacion):
+        return
+    try:
+        with transaction.atomic():
+            ResumenDiarioActa.objects.create(acta_id=acta_id, fecha=fecha, **incrementos)
+    except IntegrityError:
+        # Otro proceso creó la fila entre el UPDATE y el INSERT
+        filtro.update(**actualizacion)
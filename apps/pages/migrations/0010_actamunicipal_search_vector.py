@@ -0,0 +1,87 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:00
+
+from django.db import migrations
+
+
+SQL_CREAR = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() es STABLE; el envoltorio IMMUTABLE permite usarlo en índices
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS $$
+        SELECT unaccent('unaccent', $1)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION es_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END
+    $$
+    """,
+    "ALTER TABLE pages_actamunicipal ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION pages_actamunicipal_search_vector_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('es_unaccent', coalesce(NEW.titulo, '')), 'A') ||
+            setweight(to_tsvector('es_unaccent', coalesce(NEW.palabras_clave, '') || ' ' ||
+                                                 coalesce(NEW.presidente, '')), 'B') ||
+            setweight(to_tsvector('es_unaccent', coalesce(NEW.resumen, '')), 'C') ||
+            setweight(to_tsvector('es_unaccent', coalesce(NEW.contenido, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS pages_actamunicipal_search_vector_update ON pages_actamunicipal",
+    """
+    CREATE TRIGGER pages_actamunicipal_search_vector_update
+        BEFORE INSERT OR UPDATE OF titulo, palabras_clave, presidente, resumen, contenido
+        ON pages_actamunicipal
+        FOR EACH ROW EXECUTE FUNCTION pages_actamunicipal_search_vector_trigger()
+    """,
+    # Rellenar las actas existentes disparando el trigger
+    "UPDATE pages_actamunicipal SET titulo = titulo",
+    "CREATE INDEX IF NOT EXISTS pages_acta_search_vector_gin ON pages_actamunicipal USING gin (search_vector)",
+    """
+    CREATE INDEX IF NOT EXISTS pages_acta_numero_trgm
+        ON pages_actamunicipal USING gin (f_unaccent(lower(numero_acta)) gin_trgm_ops)
+    """,
+]
+
+SQL_ELIMINAR = [
+    "DROP INDEX IF EXISTS pages_acta_numero_trgm",
+    "DROP INDEX IF EXISTS pages_acta_search_vector_gin",
+    "DROP TRIGGER IF EXISTS pages_actamunicipal_search_vector_update ON pages_actamunicipal",
+    "DROP FUNCTION IF EXISTS pages_actamunicipal_search_vector_trigger()",
+    "ALTER TABLE pages_actamunicipal DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def crear_busqueda_texto_completo(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_CREAR:
+        schema_editor.execute(sql)
+
+
+def eliminar_busqueda_texto_completo(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_ELIMINAR:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0009_add_word_txt_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_busqueda_texto_completo, eliminar_busqueda_texto_completo),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.9 on 2026-10-17 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Consolida los registros existentes de visualizaciones y descargas por acta y día"""
+    from django.db.models import Count
+    from django.db.models.functions import TruncDate
+
+    VisualizacionActa = apps.get_model('pages', 'VisualizacionActa')
+    DescargaActa = apps.get_model('pages', 'DescargaActa')
+    ResumenDiarioActa = apps.get_model('pages', 'ResumenDiarioActa')
+
+    resumenes = {}
+
+    def resumen(acta_id, fecha):
+        clave = (acta_id, fecha)
+        if clave not in resumenes:
+            resumenes[clave] = ResumenDiarioActa(acta_id=acta_id, fecha=fecha)
+        return resumenes[clave]
+
+    visualizaciones = (
+        VisualizacionActa.objects
+        .annotate(dia=TruncDate('fecha_visualizacion'))
+        .values('acta_id', 'dia')
+        .annotate(total=Count('id'))
+    )
+    for fila in visualizaciones:
+        resumen(fila['acta_id'], fila['dia']).visualizaciones = fila['total']
+
+    descargas = (
+        DescargaActa.objects
+        .annotate(dia=TruncDate('fecha_descarga'))
+        .values('acta_id', 'dia', 'formato')
+        .annotate(total=Count('id'))
+    )
+    for fila in descargas:
+        campo = f"descargas_{fila['formato']}"
+        if campo in ('descargas_pdf', 'descargas_txt', 'descargas_word'):
+            setattr(resumen(fila['acta_id'], fila['dia']), campo, fila['total'])
+
+    ResumenDiarioActa.objects.bulk_create(resumenes.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0010_actamunicipal_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioActa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('visualizaciones', models.PositiveIntegerField(default=0)),
+                ('descargas_pdf', models.PositiveIntegerField(default=0)),
+                ('descargas_txt', models.PositiveIntegerField(default=0)),
+                ('descargas_word', models.PositiveIntegerField(default=0)),
+                ('acta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='pages.actamunicipal')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Acta',
+                'verbose_name_plural': 'Resúmenes Diarios de Actas',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha'], name='pages_resum_fecha_624cba_idx')],
+                'unique_together': {('acta', 'fecha')},
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.9 on 2026-10-17 12:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0011_resumendiarioacta'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='visualizacionacta',
+            name='fecha_visualizacion',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='descargaacta',
+            name='fecha_descarga',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 import uuid
 import os
 
@@ -235,7 +236,8 @@ class VisualizacionActa(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True)
-    fecha_visualizacion = models.DateTimeField(auto_now_add=True)
+    # Sin auto_now_add: el volcado por lotes conserva la hora real del evento
+    fecha_visualizacion = models.DateTimeField(default=timezone.now, db_index=True)
     tiempo_lectura = models.DurationField(null=True, blank=True)
     
     class Meta:
@@ -255,7 +257,7 @@ class DescargaActa(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     ip_address = models.GenericIPAddressField()
     formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, default='pdf')
-    fecha_descarga = models.DateTimeField(auto_now_add=True)
+    fecha_descarga = models.DateTimeField(default=timezone.now, db_index=True)
     
     class Meta:
         verbose_name = "Descarga de Acta"
@@ -265,6 +267,31 @@ class DescargaActa(models.Model):
     def __str__(self):
         return f"{self.acta} - {self.get_formato_display()} - {self.fecha_descarga}"
 
+class ResumenDiarioActa(models.Model):
+    """Totales diarios de visualizaciones y descargas por acta (rollup de VisualizacionActa/DescargaActa)"""
+    acta = models.ForeignKey(ActaMunicipal, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    fecha = models.DateField()
+    visualizaciones = models.PositiveIntegerField(default=0)
+    descargas_pdf = models.PositiveIntegerField(default=0)
+    descargas_txt = models.PositiveIntegerField(default=0)
+    descargas_word = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Resumen Diario de Acta"
+        verbose_name_plural = "Resúmenes Diarios de Actas"
+        ordering = ['-fecha']
+        unique_together = ['acta', 'fecha']
+        indexes = [
+            models.Index(fields=['fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.acta_id} - {self.fecha}: {self.visualizaciones} vistas, {self.descargas} descargas"
+    
+    @property
+    def descargas(self):
+        return self.descargas_pdf + self.descargas_txt + self.descargas_word
+
 # ========================================================================
 # MODELOS DE TRANSPARENCIA
 # ========================================================================
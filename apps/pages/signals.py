@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.conf import settings
-from .models import ActaMunicipal
+from django.utils import timezone
+from .models import ActaMunicipal, DescargaActa, VisualizacionActa
+from .estadisticas import CAMPOS_DESCARGA, acumular_resumen, invalidar_estadisticas
+from .artefactos import programar_artefactos
 import os
 
 @receiver(pre_save, sender=ActaMunicipal)
@@ -62,6 +65,29 @@ def acta_publicada_signal(sender, instance, created, **kwargs):
         except Exception as e:
             print(f"❌ Error en signal de publicación: {e}")
 
+@receiver(post_save, sender=ActaMunicipal)
+@receiver(post_delete, sender=ActaMunicipal)
+def invalidar_estadisticas_portal(sender, instance, **kwargs):
+    """Las cifras cacheadas del portal ciudadano dependen de las actas"""
+    invalidar_estadisticas()
+
+@receiver(post_save, sender=ActaMunicipal)
+def programar_documentos_acta(sender, instance, **kwargs):
+    """Los documentos de descarga se regeneran solo si cambió el contenido del acta publicada"""
+    if instance.activo and instance.estado_id and instance.estado.nombre == 'publicada':
+        programar_artefactos(instance)
+
+@receiver(post_save, sender=VisualizacionActa)
+def acumular_visualizacion(sender, instance, created, **kwargs):
+    if created:
+        acumular_resumen(instance.acta_id, timezone.localdate(instance.fecha_visualizacion), visualizaciones=1)
+
+@receiver(post_save, sender=DescargaActa)
+def acumular_descarga(sender, instance, created, **kwargs):
+    campo = CAMPOS_DESCARGA.get(instance.formato)
+    if created and campo:
+        acumular_resumen(instance.acta_id, timezone.localdate(instance.fecha_descarga), **{campo: 1})
+
 def generar_pdf_para_acta(acta):
     """
     Genera PDF específico para una sola acta
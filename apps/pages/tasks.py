@@ -0,0 +1,39 @@
+"""
+Tareas Celery del portal ciudadano
+"""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def volcar_contadores_portal():
+    """Vuelca el buffer de visualizaciones/descargas a la base de datos (programada con beat)"""
+    from .contadores import volcar_buffer
+
+    total = volcar_buffer()
+    if total:
+        logger.info(f"📊 Contadores del portal: {total} eventos volcados")
+    return total
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=60)
+def construir_artefactos_acta(self, acta_id):
+    """Genera una vez los documentos PDF/TXT/Word/HTML del contenido actual del acta"""
+    from .artefactos import construir_artefactos
+    from .models import ActaMunicipal
+
+    try:
+        acta = ActaMunicipal.objects.select_related('tipo_sesion', 'estado', 'secretario').get(pk=acta_id)
+    except ActaMunicipal.DoesNotExist:
+        logger.warning(f"⚠️ Acta {acta_id} no existe; no se generan documentos")
+        return None
+
+    try:
+        directorio = construir_artefactos(acta, esperar=False)
+    except Exception as e:
+        logger.error(f"❌ Error generando documentos del acta {acta_id}: {e}")
+        raise self.retry(exc=e)
+    return directorio
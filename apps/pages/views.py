@@ -2,22 +2,26 @@ from django.shortcuts import render, redirect, get_object_or_404
 from apps.pages.forms import LoginForm, RegistrationForm, UserPasswordResetForm, UserSetPasswordForm, UserPasswordChangeForm
 from django.contrib.auth import logout
 from django.contrib.auth import views as auth_views
-from django.db.models import Q, Count, Avg
+from django.db.models import Q
 from django.core.paginator import Paginator
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, Http404
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.contrib import messages
 from django.views.generic import ListView, DetailView
 from django.utils import timezone
-from .models import ActaMunicipal, TipoSesion, EstadoActa, VisualizacionActa, DescargaActa
-from helpers.util import normalizar_busqueda, crear_filtros_busqueda_multiple
+from .models import ActaMunicipal, TipoSesion, EstadoActa
+from helpers.util import normalizar_busqueda
+from .busqueda import buscar_actas
+from .estadisticas import alcance_usuario, estadisticas_portal, totales_contadores
+from .contadores import registrar_descarga, registrar_visualizacion
+from .artefactos import servir_artefacto
 import json
 import os
 import tempfile
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
@@ -122,7 +126,7 @@ def get_dashboard_data_real(request):
   from django.db.models import Count, Avg, Sum, Q
   from django.utils import timezone
   from datetime import datetime, timedelta
-  from .models import ActaMunicipal, VisualizacionActa, DescargaActa
+  from .models import ActaMunicipal
   
   # Importar modelos de otras apps
   try:
@@ -292,10 +296,12 @@ def get_dashboard_data_real(request):
   # ===== MÉTRICAS DE RENDIMIENTO =====
   
   # Visualizaciones y descargas
-  total_visualizaciones = VisualizacionActa.objects.count()
-  total_descargas = DescargaActa.objects.count()
-  visualizaciones_mes = VisualizacionActa.objects.filter(fecha_visualizacion__gte=inicio_mes).count()
-  descargas_mes = DescargaActa.objects.filter(fecha_descarga__gte=inicio_mes).count()
+  totales = totales_contadores()
+  totales_mes = totales_contadores(desde=inicio_mes)
+  total_visualizaciones = totales['visualizaciones']
+  total_descargas = totales['descargas']
+  visualizaciones_mes = totales_mes['visualizaciones']
+  descargas_mes = totales_mes['descargas']
   
   # Estado del sistema
   estado_sistema = {
@@ -1414,35 +1420,8 @@ def portal_ciudadano(request):
       Q(acceso='restringido')  # Los usuarios autenticados pueden ver restringidas
     )
 
-  # Aplicar filtros de búsqueda
-  if search_query:
-    from django.db import connection
-    
-    # Para PostgreSQL, usar SQL con unaccent
-    if connection.vendor == 'postgresql':
-      with connection.cursor() as cursor:
-        # Preparar la consulta con unaccent
-        placeholders = ', '.join(['%s'] * 6)  # 6 campos de búsqueda
-        sql_condition = f"""
-          id IN (
-            SELECT id FROM pages_actamunicipal 
-            WHERE activo = true AND (
-              unaccent(titulo) ILIKE unaccent(%s) OR
-              unaccent(numero_acta) ILIKE unaccent(%s) OR  
-              unaccent(resumen) ILIKE unaccent(%s) OR
-              unaccent(contenido) ILIKE unaccent(%s) OR
-              unaccent(palabras_clave) ILIKE unaccent(%s) OR
-              unaccent(presidente) ILIKE unaccent(%s)
-            )
-          )
-        """
-        search_pattern = f'%{search_query}%'
-        actas = actas.extra(where=[sql_condition], params=[search_pattern] * 6)
-    else:
-      # Fallback para otros backends
-      campos_busqueda = ['titulo', 'numero_acta', 'resumen', 'contenido', 'palabras_clave', 'presidente']
-      filtros_busqueda = crear_filtros_busqueda_multiple(campos_busqueda, search_query)
-      actas = actas.filter(filtros_busqueda)
+  # Aplicar filtros de búsqueda (texto completo con ranking en PostgreSQL)
+  actas, con_ranking = buscar_actas(actas, search_query)
 
   if tipo_sesion:
     actas = actas.filter(tipo_sesion__nombre=tipo_sesion)
@@ -1480,63 +1459,35 @@ def portal_ciudadano(request):
   ]
   if orden not in valid_orders:
     orden = '-fecha_sesion'
-  actas = actas.order_by(orden)
+  if con_ranking and 'orden' not in request.GET:
+    # Búsqueda sin orden explícito: más relevantes primero
+    actas = actas.order_by('-rank', orden)
+  else:
+    actas = actas.order_by(orden)
+
+  # Estadísticas en una sola consulta; sin filtros se sirven desde caché
+  filtrado = any([search_query, tipo_sesion, estado, acceso, fecha_desde, fecha_hasta])
+  estadisticas = estadisticas_portal(actas, None if filtrado else alcance_usuario(request.user))
 
-  # Paginación
+  # Paginación (reutiliza el total ya calculado en lugar de otro COUNT)
   paginator = Paginator(actas, 10)  # 10 actas por página
+  paginator.count = estadisticas['total_actas']
   actas_page = paginator.get_page(page)
 
   # Obtener datos para filtros
   tipos_sesion = TipoSesion.objects.filter(activo=True)
   estados = EstadoActa.objects.filter(activo=True)
 
-  # Estadísticas para mostrar
-  total_actas = actas.count()
-  actas_publicas = actas.filter(acceso='publico').count()
-  actas_este_mes = actas.filter(
-    fecha_sesion__gte=datetime.now().replace(day=1)
-  ).count()
-
-  # Calcular estadísticas adicionales para la cuarta métrica
-  from django.db.models import Avg, Count  # noqa: F401 (Count posible uso futuro)
-  from datetime import timedelta  # noqa: F401 (posible uso futuro)
-
-  # Días desde la última actualización
-  ultima_acta = ActaMunicipal.objects.filter(activo=True).order_by('-fecha_creacion').first()
-  dias_ultima_actualizacion = 0
-  if ultima_acta:
-    dias_ultima_actualizacion = (datetime.now().date() - ultima_acta.fecha_creacion.date()).days
-
-  # Total de visualizaciones este mes
-  visualizaciones_mes = VisualizacionActa.objects.filter(
-    fecha_visualizacion__gte=datetime.now().replace(day=1)
-  ).count()
-
-  # Total de descargas este mes
-  descargas_mes = DescargaActa.objects.filter(
-    fecha_descarga__gte=datetime.now().replace(day=1)
-  ).count()
-
-  # Porcentaje de actas con IA procesada
-  actas_con_ia = actas.filter(transcripcion_ia__isnull=False).count()
-  porcentaje_ia = round((actas_con_ia / total_actas * 100) if total_actas > 0 else 0, 1)
-
-  # Promedio de precisión IA
-  precision_promedio = actas.filter(
-    precision_ia__isnull=False
-  ).aggregate(Avg('precision_ia'))['precision_ia__avg']
-  precision_promedio = round(precision_promedio if precision_promedio else 0, 1)
-
   context = {
     'actas': actas_page,
-    'total_actas': total_actas,
-    'actas_publicas': actas_publicas,
-    'actas_este_mes': actas_este_mes,
-    'visualizaciones_mes': visualizaciones_mes,
-    'descargas_mes': descargas_mes,
-    'porcentaje_ia': porcentaje_ia,
-    'precision_promedio': precision_promedio,
-    'dias_ultima_actualizacion': dias_ultima_actualizacion,
+    'total_actas': estadisticas['total_actas'],
+    'actas_publicas': estadisticas['actas_publicas'],
+    'actas_este_mes': estadisticas['actas_este_mes'],
+    'visualizaciones_mes': estadisticas['visualizaciones_mes'],
+    'descargas_mes': estadisticas['descargas_mes'],
+    'porcentaje_ia': estadisticas['porcentaje_ia'],
+    'precision_promedio': estadisticas['precision_promedio'],
+    'dias_ultima_actualizacion': estadisticas['dias_ultima_actualizacion'],
     'tipos_sesion': tipos_sesion,
     'estados': estados,
     'search_query': search_query,
@@ -1596,20 +1547,8 @@ def acta_detail(request, pk):
     if not acta.puede_ver_usuario(request.user):
         raise Http404("No tienes permisos para ver esta acta")
     
-    # Registrar visualización
-    if request.user.is_authenticated:
-        VisualizacionActa.objects.create(
-            acta=acta,
-            usuario=request.user,
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
-        )
-    else:
-        VisualizacionActa.objects.create(
-            acta=acta,
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
-        )
+    # Registrar visualización (buffer, se vuelca por lotes)
+    registrar_visualizacion(request, acta)
     
     # Obtener actas relacionadas (mismo tipo de sesión, fechas cercanas)
     actas_relacionadas = ActaMunicipal.objects.filter(
@@ -1833,7 +1772,7 @@ def convertir_word_a_pdf(ruta_word, nombre_acta):
 
 
 def acta_pdf_view(request, pk):
-    """Vista para mostrar el PDF en el navegador (usando exactamente el mismo proceso que Word)"""
+    """Vista para mostrar el PDF en el navegador (documento pre-generado del acta)"""
     acta = get_object_or_404(ActaMunicipal, pk=pk, activo=True)
     
     # Verificar permisos
@@ -1841,48 +1780,15 @@ def acta_pdf_view(request, pk):
         raise Http404("No tienes permisos para ver esta acta")
     
     try:
-        # PASO 1: Usar archivo PDF ya generado si existe
-        if acta.archivo_pdf and os.path.exists(acta.archivo_pdf.path):
-            with open(acta.archivo_pdf.path, 'rb') as pdf_file:
-                response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                response['Content-Disposition'] = f'inline; filename="{acta.numero_acta}.pdf"'
-                return response
-        
-        # PASO 2: Usar EXACTAMENTE el mismo proceso que acta_word_download → PDF
-        logger.info(f"PDF no encontrado para acta {pk}, generando usando proceso idéntico a Word")
-        
-        from gestion_actas.generador_documentos import generar_documentos_acta_mejorados
-        
-        documentos = generar_documentos_acta_mejorados(acta)
-        
-        # Si se generó Word, convertir a PDF (manteniendo formato idéntico)
-        if 'word' in documentos:
-            word_path = documentos['word']['ruta']
-            pdf_path = convertir_word_a_pdf(word_path, acta.numero_acta)
-            
-            if pdf_path and os.path.exists(pdf_path):
-                # Guardar PDF en modelo para uso futuro
-                with open(pdf_path, 'rb') as pdf_file:
-                    from django.core.files.base import ContentFile
-                    acta.archivo_pdf.save(
-                        os.path.basename(pdf_path),
-                        ContentFile(pdf_file.read()),
-                        save=True
-                    )
-                
-                with open(pdf_path, 'rb') as pdf_file:
-                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                    response['Content-Disposition'] = f'inline; filename="{acta.numero_acta}.pdf"'
-                    return response
-        
-        raise Http404("No se pudo generar PDF usando proceso de Word")
-        
+        return servir_artefacto(request, acta, 'pdf', adjunto=False)
+    except Http404:
+        raise
     except Exception as e:
         logger.error(f"Error mostrando PDF del acta {pk}: {str(e)}")
         raise Http404("Error al generar el archivo PDF")
 
 def acta_pdf_download(request, pk):
-    """Vista para descargar el PDF (generado desde Word)"""
+    """Vista para descargar el PDF (generado desde Word una sola vez por contenido)"""
     acta = get_object_or_404(ActaMunicipal, pk=pk, activo=True)
     
     # Verificar permisos
@@ -1891,48 +1797,19 @@ def acta_pdf_download(request, pk):
     
     # Registrar descarga
     if request.user.is_authenticated:
-        DescargaActa.objects.create(
-            acta=acta,
-            usuario=request.user,
-            ip_address=get_client_ip(request),
-            formato='pdf'
-        )
+        registrar_descarga(request, acta, 'pdf')
     
     try:
-        # Generar documentos (Word primero, luego PDF desde Word)
-        from gestion_actas.generador_documentos import generar_documentos_acta_mejorados
-        
-        documentos = generar_documentos_acta_mejorados(acta)
-        
-        # Si se generó Word, convertir a PDF
-        if 'word' in documentos:
-            word_path = documentos['word']['ruta']
-            pdf_path = convertir_word_a_pdf(word_path, acta.numero_acta)
-            
-            if pdf_path and os.path.exists(pdf_path):
-                with open(pdf_path, 'rb') as pdf_file:
-                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                    response['Content-Disposition'] = f'attachment; filename="{acta.numero_acta}.pdf"'
-                    return response
-        
-        # Fallback: usar PDF generado por el sistema original
-        if 'pdf' in documentos:
-            pdf_path = documentos['pdf']['ruta']
-            if os.path.exists(pdf_path):
-                with open(pdf_path, 'rb') as pdf_file:
-                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                    response['Content-Disposition'] = f'attachment; filename="{acta.numero_acta}.pdf"'
-                    return response
-        
-        raise Http404("No se pudo generar el archivo PDF")
-        
+        return servir_artefacto(request, acta, 'pdf')
+    except Http404:
+        raise
     except Exception as e:
         logger.error(f"Error descargando PDF del acta {pk}: {str(e)}")
         raise Http404("Error al generar el archivo PDF")
 
 
 def acta_txt_download(request, pk):
-    """Vista para descargar el TXT (usa archivo ya generado durante la publicación)"""
+    """Vista para descargar el TXT (documento pre-generado del acta)"""
     acta = get_object_or_404(ActaMunicipal, pk=pk, activo=True)
     
     # Verificar permisos
@@ -1940,49 +1817,18 @@ def acta_txt_download(request, pk):
         raise Http404("No tienes permisos para descargar esta acta")
     
     # Registrar descarga
-    if request.user.is_authenticated:
-        DescargaActa.objects.create(
-            acta=acta,
-            usuario=request.user,
-            ip_address=get_client_ip(request),
-            formato='txt'
-        )
-    else:
-        DescargaActa.objects.create(
-            acta=acta,
-            ip_address=get_client_ip(request),
-            formato='txt'
-        )
+    registrar_descarga(request, acta, 'txt')
     
     try:
-        # Usar archivo TXT ya generado si existe
-        if acta.archivo_txt and os.path.exists(acta.archivo_txt.path):
-            with open(acta.archivo_txt.path, 'r', encoding='utf-8') as txt_file:
-                response = HttpResponse(txt_file.read(), content_type='text/plain; charset=utf-8')
-                response['Content-Disposition'] = f'attachment; filename="{acta.numero_acta}.txt"'
-                return response
-        
-        # Fallback: generar TXT al vuelo si no existe el archivo guardado
-        logger.warning(f"Archivo TXT no encontrado para acta {pk}, generando al vuelo")
-        from gestion_actas.generador_documentos import generar_documentos_acta_mejorados
-        
-        documentos = generar_documentos_acta_mejorados(acta)
-        
-        if 'txt' in documentos:
-            txt_path = documentos['txt']['ruta']
-            with open(txt_path, 'r', encoding='utf-8') as txt_file:
-                response = HttpResponse(txt_file.read(), content_type='text/plain; charset=utf-8')
-                response['Content-Disposition'] = f'attachment; filename="{acta.numero_acta}.txt"'
-                return response
-        
-        raise Http404("No se pudo generar el archivo TXT")
-        
+        return servir_artefacto(request, acta, 'txt')
+    except Http404:
+        raise
     except Exception as e:
         logger.error(f"Error descargando TXT del acta {pk}: {str(e)}")
         raise Http404("Error al generar el archivo TXT")
 
 def acta_word_download(request, pk):
-    """Vista para descargar el Word (usa archivo ya generado durante la publicación)"""
+    """Vista para descargar el Word (documento pre-generado del acta)"""
     acta = get_object_or_404(ActaMunicipal, pk=pk, activo=True)
     
     # Verificar permisos
@@ -1990,49 +1836,12 @@ def acta_word_download(request, pk):
         raise Http404("No tienes permisos para descargar esta acta")
     
     # Registrar descarga
-    if request.user.is_authenticated:
-        DescargaActa.objects.create(
-            acta=acta,
-            usuario=request.user,
-            ip_address=get_client_ip(request),
-            formato='word'
-        )
-    else:
-        DescargaActa.objects.create(
-            acta=acta,
-            ip_address=get_client_ip(request),
-            formato='word'
-        )
+    registrar_descarga(request, acta, 'word')
     
     try:
-        # Usar archivo Word ya generado si existe
-        if acta.archivo_word and os.path.exists(acta.archivo_word.path):
-            with open(acta.archivo_word.path, 'rb') as word_file:
-                response = HttpResponse(
-                    word_file.read(), 
-                    content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                )
-                response['Content-Disposition'] = f'attachment; filename="{acta.numero_acta}.docx"'
-                return response
-        
-        # Fallback: generar Word al vuelo si no existe el archivo guardado
-        logger.warning(f"Archivo Word no encontrado para acta {pk}, generando al vuelo")
-        from gestion_actas.generador_documentos import generar_documentos_acta_mejorados
-        
-        documentos = generar_documentos_acta_mejorados(acta)
-        
-        if 'word' in documentos:
-            word_path = documentos['word']['ruta']
-            with open(word_path, 'rb') as word_file:
-                response = HttpResponse(
-                    word_file.read(), 
-                    content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                )
-                response['Content-Disposition'] = f'attachment; filename="{acta.numero_acta}.docx"'
-                return response
-        
-        raise Http404("No se pudo generar el archivo Word")
-        
+        return servir_artefacto(request, acta, 'word')
+    except Http404:
+        raise
     except Exception as e:
         logger.error(f"Error descargando Word del acta {pk}: {str(e)}")
         raise Http404("Error al generar el archivo Word")
@@ -2063,32 +1872,11 @@ def portal_ciudadano_api(request):
             )
         
         # Aplicar búsqueda
-        if search_query:
-            from django.db import connection
-            
-            # Para PostgreSQL, usar SQL con unaccent
-            if connection.vendor == 'postgresql':
-                with connection.cursor() as cursor:
-                    # Preparar la consulta con unaccent
-                    sql_condition = f"""
-                      id IN (
-                        SELECT id FROM pages_actamunicipal 
-                        WHERE activo = true AND (
-                          unaccent(titulo) ILIKE unaccent(%s) OR
-                          unaccent(numero_acta) ILIKE unaccent(%s) OR  
-                          unaccent(resumen) ILIKE unaccent(%s) OR
-                          unaccent(palabras_clave) ILIKE unaccent(%s)
-                        )
-                      )
-                    """
-                    search_pattern = f'%{search_query}%'
-                    actas = actas.extra(where=[sql_condition], params=[search_pattern] * 4)
-            else:
-                # Fallback para otros backends
-                campos_busqueda = ['titulo', 'numero_acta', 'resumen', 'palabras_clave']
-                filtros_busqueda = crear_filtros_busqueda_multiple(campos_busqueda, search_query)
-                actas = actas.filter(filtros_busqueda)
-        
+        actas, con_ranking = buscar_actas(
+            actas, search_query,
+            campos_fallback=['titulo', 'numero_acta', 'resumen', 'palabras_clave'],
+        )
+
         # Aplicar filtros
         if filters.get('tipo_sesion'):
             actas = actas.filter(tipo_sesion__nombre=filters['tipo_sesion'])
@@ -2100,7 +1888,7 @@ def portal_ciudadano_api(request):
             actas = actas.filter(acceso=filters['acceso'])
         
         # Ordenar y paginar
-        actas = actas.order_by('-fecha_sesion')
+        actas = actas.order_by('-rank', '-fecha_sesion') if con_ranking else actas.order_by('-fecha_sesion')
         paginator = Paginator(actas, 10)
         actas_page = paginator.get_page(page)
         
@@ -2179,8 +1967,9 @@ def transparencia_index(request):
         estado__nombre='publicada'
     ).count()
     
-    total_descargas = DescargaActa.objects.count()
-    total_visualizaciones = VisualizacionActa.objects.count()
+    totales = totales_contadores()
+    total_descargas = totales['descargas']
+    total_visualizaciones = totales['visualizaciones']
     
     # Presupuesto total proyectos
     presupuesto_total = ProyectoMunicipal.objects.aggregate(
@@ -2456,7 +2245,7 @@ def eventos_nuevo(request):
     from .models import DocumentoEvento, InvitacionExterna
     from django.contrib import messages
     from django.core.mail import send_mail
-    from apps.config_system.smtp_service import enviar_email_evento
+    from apps.config_system.smtp_service import encolar_emails_evento
     from django.conf import settings
     import uuid
     import os
@@ -2506,21 +2295,19 @@ def eventos_nuevo(request):
                         enviado_por=request.user
                     )
                     invitacion.save()
-                    
-                    # Enviar email de invitación usando el servicio SMTP personalizado
-                    try:
-                        exito, mensaje = enviar_email_evento(
-                            destinatario=email,
-                            evento=evento,
-                            tipo_notificacion='invitacion',
-                            usuario_solicitante=request.user
-                        )
-                        
-                        if not exito:
-                            messages.warning(request, f'Error enviando invitación a {email}: {mensaje}')
-                        # El estado se mantiene como 'enviada' que es el default
-                    except Exception as e:
-                        messages.warning(request, f'Error enviando invitación a {email}: {str(e)}')
+            
+            # Las invitaciones salen en lote por la cola de emails (una sesión SMTP por proveedor)
+            if emails_externos:
+                try:
+                    encolar_emails_evento(
+                        [email for email in emails_externos if email],
+                        evento=evento,
+                        tipo_notificacion='invitacion',
+                        usuario_solicitante=request.user
+                    )
+                    # El estado se mantiene como 'enviada' que es el default
+                except Exception as e:
+                    messages.warning(request, f'Error encolando las invitaciones: {str(e)}')
             
             messages.success(request, f'Evento "{evento.titulo}" creado exitosamente.')
             if emails_externos:
@@ -0,0 +1,172 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.auditoria.triggers import instalar_funciones, instalar_triggers
+
+TABLA = 'benchmark_auditoria'
+
+# Copia del trigger FOR EACH ROW anterior (fila completa antes y después)
+SQL_FILA_COMPLETA = """
+    CREATE OR REPLACE FUNCTION auditoria.benchmark_fila_completa()
+    RETURNS TRIGGER AS $$
+    DECLARE
+        campos_modificados TEXT[] := ARRAY[]::TEXT[];
+        campo_nombre TEXT;
+    BEGIN
+        IF TG_OP = 'UPDATE' THEN
+            FOR campo_nombre IN
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = TG_TABLE_NAME AND table_schema = TG_TABLE_SCHEMA
+            LOOP
+                IF (to_jsonb(OLD) ->> campo_nombre) IS DISTINCT FROM (to_jsonb(NEW) ->> campo_nombre) THEN
+                    campos_modificados := array_append(campos_modificados, campo_nombre);
+                END IF;
+            END LOOP;
+        END IF;
+
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO auditoria.cambios_bd (esquema, tabla, operacion, registro_id, valores_anteriores, transaccion_id)
+            VALUES (TG_TABLE_SCHEMA, TG_TABLE_NAME, TG_OP, (row_to_json(OLD) ->> 'id')::INTEGER,
+                    row_to_json(OLD), txid_current());
+            RETURN OLD;
+        ELSIF TG_OP = 'UPDATE' THEN
+            INSERT INTO auditoria.cambios_bd (esquema, tabla, operacion, registro_id, campos_modificados,
+                                              valores_anteriores, valores_nuevos, transaccion_id)
+            VALUES (TG_TABLE_SCHEMA, TG_TABLE_NAME, TG_OP, (row_to_json(NEW) ->> 'id')::INTEGER,
+                    campos_modificados, row_to_json(OLD), row_to_json(NEW), txid_current());
+            RETURN NEW;
+        ELSE
+            INSERT INTO auditoria.cambios_bd (esquema, tabla, operacion, registro_id, valores_nuevos, transaccion_id)
+            VALUES (TG_TABLE_SCHEMA, TG_TABLE_NAME, TG_OP, (row_to_json(NEW) ->> 'id')::INTEGER,
+                    row_to_json(NEW), txid_current());
+            RETURN NEW;
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def conversacion_sintetica(kb):
+    """JSON parecido a conversacion_json de unos ``kb`` KB"""
+    segmento = {'hablante': 'SPEAKER_00', 'inicio': 0.0, 'fin': 0.0, 'texto': 'x' * 60}
+    return [dict(segmento, inicio=i * 2.0, fin=i * 2.0 + 1.5) for i in range(max(1, kb * 1024 // 120))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la escritura en auditoria.cambios_bd del trigger por fila completa frente al '
+        'trigger por sentencia con diferencias (todo se revierte al terminar)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=20, help='Registros simulados (transcripciones)')
+        parser.add_argument('--json-kb', type=int, default=1024, help='Tamaño del JSON de cada registro')
+        parser.add_argument('--avances', type=int, default=20, help='Actualizaciones de progreso por registro')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.ERROR('❌ El benchmark necesita PostgreSQL'))
+            return
+
+        resultados = {}
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                instalar_funciones(cursor)
+                cursor.execute(SQL_FILA_COMPLETA)
+                cursor.execute(f"""
+                    CREATE TABLE {TABLA} (
+                        id SERIAL PRIMARY KEY,
+                        estado VARCHAR(30) NOT NULL,
+                        progreso_porcentaje INTEGER NOT NULL DEFAULT 0,
+                        conversacion_json JSONB NOT NULL,
+                        fecha_actualizacion TIMESTAMP NOT NULL DEFAULT now()
+                    )
+                """)
+
+                for escenario in ('fila_completa', 'diferencias'):
+                    if escenario == 'fila_completa':
+                        cursor.execute(f"""
+                            CREATE TRIGGER audit_trigger_{TABLA}
+                                AFTER INSERT OR UPDATE OR DELETE ON {TABLA}
+                                FOR EACH ROW EXECUTE FUNCTION auditoria.benchmark_fila_completa()
+                        """)
+                    else:
+                        instalar_triggers(cursor, TABLA, excluir=['progreso_porcentaje', 'fecha_actualizacion'])
+
+                    resultados[escenario] = self.ejecutar_carga(cursor, options)
+                    cursor.execute(f'DROP TRIGGER IF EXISTS audit_trigger_{TABLA} ON {TABLA}')
+                    cursor.execute(f'TRUNCATE {TABLA} RESTART IDENTITY')
+                    cursor.execute('DELETE FROM auditoria.cambios_bd WHERE tabla = %s', [TABLA])
+
+            # Nada del benchmark queda en la base de datos
+            transaction.set_rollback(True)
+
+        self.mostrar(resultados, options)
+
+    def ejecutar_carga(self, cursor, options):
+        """Inserta, avanza el progreso, cambia el estado fila a fila y en bloque"""
+        conversacion = json.dumps(conversacion_sintetica(options['json_kb']))
+        sentencias = 0
+        inicio = time.perf_counter()
+
+        ids = []
+        for _ in range(options['filas']):
+            cursor.execute(
+                f"INSERT INTO {TABLA} (estado, conversacion_json) VALUES ('procesando', %s) RETURNING id",
+                [conversacion]
+            )
+            ids.append(cursor.fetchone()[0])
+            sentencias += 1
+
+        for registro_id in ids:
+            for avance in range(1, options['avances'] + 1):
+                cursor.execute(
+                    f"UPDATE {TABLA} SET progreso_porcentaje = %s, fecha_actualizacion = now() WHERE id = %s",
+                    [avance * 100 // options['avances'], registro_id]
+                )
+                sentencias += 1
+            cursor.execute(f"UPDATE {TABLA} SET estado = 'completado' WHERE id = %s", [registro_id])
+            sentencias += 1
+
+        cursor.execute(f"UPDATE {TABLA} SET estado = 'revisado'")
+        sentencias += 1
+        duracion = time.perf_counter() - inicio
+
+        cursor.execute(
+            'SELECT COUNT(*), COALESCE(SUM(pg_column_size(c.*)), 0) FROM auditoria.cambios_bd c WHERE tabla = %s',
+            [TABLA]
+        )
+        registros, bytes_auditoria = cursor.fetchone()
+        cursor.execute(f'SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {TABLA} t')
+        bytes_tabla = cursor.fetchone()[0]
+        return {
+            'sentencias': sentencias,
+            'registros': registros,
+            'bytes': bytes_auditoria,
+            'bytes_tabla': bytes_tabla,
+            'segundos': duracion,
+        }
+
+    def mostrar(self, resultados, options):
+        self.stdout.write(self.style.SUCCESS(
+            f"📊 {options['filas']} registros de ~{options['json_kb']} KB, "
+            f"{options['avances']} avances de progreso cada uno"
+        ))
+        for escenario, datos in resultados.items():
+            amplificacion = datos['bytes'] / max(1, datos['bytes_tabla'])
+            self.stdout.write(
+                f"  {escenario:14s} {datos['registros']:6d} registros de auditoría "
+                f"{datos['bytes'] / 1024 / 1024:9.2f} MB  "
+                f"({amplificacion:6.1f}× el tamaño de la tabla)  "
+                f"{datos['segundos']:7.2f}s para {datos['sentencias']} sentencias"
+            )
+
+        antes, despues = resultados['fila_completa'], resultados['diferencias']
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Escritura en cambios_bd reducida {antes['bytes'] / max(1, despues['bytes']):.1f}× "
+            f"({antes['registros']} → {despues['registros']} registros), "
+            f"tiempo {antes['segundos']:.2f}s → {despues['segundos']:.2f}s"
+        ))
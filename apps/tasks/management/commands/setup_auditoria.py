@@ -27,6 +27,16 @@ class Command(BaseCommand):
             action='store_true',
             help='Solo mostrar qué tablas se auditarían, sin crear triggers'
         )
+        parser.add_argument(
+            '--particionar',
+            action='store_true',
+            help='Convertir logs.* y auditoria.cambios_bd en tablas particionadas por mes'
+        )
+        parser.add_argument(
+            '--eliminar-tablas-antiguas',
+            action='store_true',
+            help='Con --particionar, eliminar las tablas sin particionar en lugar de conservarlas como <tabla>_sin_particion'
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(
@@ -46,8 +56,12 @@ class Command(BaseCommand):
         # Crear triggers de auditoría
         with transaction.atomic():
             self.crear_triggers_auditoria(tablas_para_auditar)
+            if options['particionar']:
+                self.particionar_tablas(options['eliminar_tablas_antiguas'])
             self.configurar_logging()
             self.crear_indices_adicionales()
+        
+        self.mantener_particiones()
 
         self.stdout.write(
             self.style.SUCCESS('✅ Sistema de auditoría configurado correctamente')
@@ -125,42 +139,41 @@ class Command(BaseCommand):
         self.stdout.write(f'\n📊 Total: {len(tablas)} tablas')
 
     def crear_triggers_auditoria(self, tablas):
-        """Crea triggers de auditoría para las tablas especificadas"""
+        """
+        Crea los triggers de auditoría (por sentencia, solo columnas modificadas)
+        para las tablas especificadas; ver apps.auditoria.triggers
+        """
+        from apps.auditoria.triggers import columnas_excluidas, instalar_funciones, instalar_triggers
         
         triggers_creados = 0
         triggers_fallidos = 0
 
         with connection.cursor() as cursor:
+            instalar_funciones(cursor)
+            
+            # Las diferencias de UPDATE se emparejan por la columna id
+            cursor.execute("""
+                SELECT table_name FROM information_schema.columns
+                WHERE table_schema = 'public' AND column_name = 'id'
+            """)
+            tablas_con_id = {row[0] for row in cursor.fetchall()}
+            
             for tabla in tablas:
+                if tabla not in tablas_con_id:
+                    self.stdout.write(
+                        self.style.WARNING(f'⚠️  Tabla sin columna id, no se audita: {tabla}')
+                    )
+                    continue
                 try:
-                    # Verificar si ya existe el trigger
-                    cursor.execute("""
-                        SELECT COUNT(*) 
-                        FROM information_schema.triggers 
-                        WHERE trigger_name = %s AND event_object_table = %s
-                    """, [f'audit_trigger_{tabla}', tabla])
-                    
-                    existe_trigger = cursor.fetchone()[0] > 0
-                    
-                    if existe_trigger:
-                        self.stdout.write(
-                            self.style.WARNING(f'⚠️  Trigger ya existe para tabla: {tabla}')
-                        )
-                        continue
-
-                    # Crear trigger
-                    sql_trigger = f"""
-                        CREATE TRIGGER audit_trigger_{tabla}
-                            AFTER INSERT OR UPDATE OR DELETE ON {tabla}
-                            FOR EACH ROW 
-                            EXECUTE FUNCTION auditoria.registrar_cambio_automatico();
-                    """
-                    
-                    cursor.execute(sql_trigger)
+                    # Savepoint: un fallo no debe abortar la transacción del comando
+                    with transaction.atomic():
+                        excluir = columnas_excluidas(tabla)
+                        instalar_triggers(cursor, tabla, excluir)
                     triggers_creados += 1
                     
+                    detalle = f' (excluye: {", ".join(excluir)})' if excluir else ''
                     self.stdout.write(
-                        self.style.SUCCESS(f'✅ Trigger creado para tabla: {tabla}')
+                        self.style.SUCCESS(f'✅ Triggers creados para tabla: {tabla}{detalle}')
                     )
                     
                 except Exception as e:
@@ -171,10 +184,62 @@ class Command(BaseCommand):
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'\n🎯 Triggers creados: {triggers_creados} | Fallidos: {triggers_fallidos}'
+                f'\n🎯 Tablas con triggers: {triggers_creados} | Fallidas: {triggers_fallidos}'
             )
         )
 
+    def particionar_tablas(self, eliminar_antiguas=False):
+        """Convierte las tablas de logs en particionadas por mes (ver apps.auditoria.particiones)"""
+        from apps.auditoria.particiones import TABLAS_PARTICIONADAS, dias_retencion, particionar_tabla
+        
+        with connection.cursor() as cursor:
+            for tabla in TABLAS_PARTICIONADAS:
+                copiadas = particionar_tabla(cursor, tabla, eliminar_antigua=eliminar_antiguas)
+                if copiadas is None:
+                    self.stdout.write(
+                        self.style.WARNING(f'⚠️  {tabla} ya está particionada')
+                    )
+                    continue
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'✅ {tabla} particionada por mes: {copiadas} filas de los últimos '
+                        f'{dias_retencion(tabla)} días copiadas'
+                    )
+                )
+        
+        if not eliminar_antiguas:
+            self.stdout.write(
+                self.style.WARNING(
+                    '⚠️  Las tablas originales se conservan como <tabla>_sin_particion; '
+                    'elimínalas cuando hayas verificado los datos'
+                )
+            )
+    
+    def mantener_particiones(self):
+        """Crea las particiones futuras y elimina las que superan la retención"""
+        from apps.auditoria.particiones import mantener_particiones
+        
+        resumen = mantener_particiones()
+        if not resumen:
+            self.stdout.write(
+                self.style.WARNING('⚠️  No hay tablas particionadas (usa --particionar)')
+            )
+            return
+        for tabla, cambios in resumen.items():
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'🗂️  {tabla}: {len(cambios["creadas"])} particiones creadas, '
+                    f'{len(cambios["eliminadas"])} eliminadas por retención'
+                )
+            )
+            if cambios['en_default']:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'⚠️  {tabla}: {cambios["en_default"]} filas en la partición por defecto '
+                        f'(fechas fuera de los meses creados)'
+                    )
+                )
+
     def configurar_logging(self):
         """Configura ajustes adicionales de logging"""
         
@@ -249,21 +314,26 @@ class Command(BaseCommand):
             )
 
     def crear_indices_adicionales(self):
-        """Crea índices adicionales para optimización"""
+        """Crea índices adicionales para optimización
+        
+        Sin CONCURRENTLY: el comando corre dentro de una transacción y las
+        tablas particionadas no lo admiten; en ellas el índice se crea en cada
+        partición.
+        """
         
         indices_adicionales = [
             # Índices compuestos para consultas frecuentes
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sistema_logs_usuario_fecha ON logs.sistema_logs(usuario_id, timestamp DESC) WHERE usuario_id IS NOT NULL",
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cambios_bd_usuario_tabla ON auditoria.cambios_bd(usuario_id, tabla, timestamp DESC)",
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_navegacion_session_tiempo ON logs.navegacion_usuarios(session_id, timestamp DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_sistema_logs_usuario_fecha ON logs.sistema_logs(usuario_id, timestamp DESC) WHERE usuario_id IS NOT NULL",
+            "CREATE INDEX IF NOT EXISTS idx_cambios_bd_usuario_tabla ON auditoria.cambios_bd(usuario_id, tabla, timestamp DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_navegacion_session_tiempo ON logs.navegacion_usuarios(session_id, timestamp DESC)",
             
             # Índices para reportes
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_acceso_usuarios_fecha_tipo ON logs.acceso_usuarios(DATE(timestamp), tipo_evento)",
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_errores_no_resueltos ON logs.errores_sistema(resuelto, timestamp DESC) WHERE resuelto = false",
+            "CREATE INDEX IF NOT EXISTS idx_acceso_usuarios_fecha_tipo ON logs.acceso_usuarios(timestamp, tipo_evento)",
+            "CREATE INDEX IF NOT EXISTS idx_errores_no_resueltos ON logs.errores_sistema(resuelto, timestamp DESC) WHERE resuelto = false",
             
             # Índices para análisis de rendimiento
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sistema_logs_tiempo_respuesta ON logs.sistema_logs(tiempo_respuesta_ms) WHERE tiempo_respuesta_ms > 1000",
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_celery_logs_duracion ON logs.celery_logs(duracion_segundos) WHERE duracion_segundos > 60"
+            "CREATE INDEX IF NOT EXISTS idx_sistema_logs_tiempo_respuesta ON logs.sistema_logs(tiempo_respuesta_ms) WHERE tiempo_respuesta_ms > 1000",
+            "CREATE INDEX IF NOT EXISTS idx_celery_logs_duracion ON logs.celery_logs(duracion_segundos) WHERE duracion_segundos > 60"
         ]
 
         indices_creados = 0
@@ -271,7 +341,9 @@ class Command(BaseCommand):
         with connection.cursor() as cursor:
             for sql_indice in indices_adicionales:
                 try:
-                    cursor.execute(sql_indice)
+                    # Savepoint: un índice fallido no debe abortar la transacción del comando
+                    with transaction.atomic():
+                        cursor.execute(sql_indice)
                     indices_creados += 1
                     
                     # Extraer nombre del índice del SQL
@@ -325,20 +397,20 @@ class Command(BaseCommand):
             cursor.execute("""
                 SELECT routine_name FROM information_schema.routines 
                 WHERE routine_schema = 'auditoria' 
-                AND routine_name = 'registrar_cambio_automatico'
+                AND routine_name = 'registrar_cambios_sentencia'
             """)
             funcion_auditoria = cursor.fetchone() is not None
             
             verificaciones.append({
                 'item': 'Función de auditoría',
                 'status': funcion_auditoria,
-                'detalle': 'Función registrar_cambio_automatico'
+                'detalle': 'Función registrar_cambios_sentencia'
             })
             
             # Verificar triggers activos
             cursor.execute("""
-                SELECT COUNT(*) FROM information_schema.triggers 
-                WHERE trigger_name LIKE 'audit_trigger_%'
+                SELECT COUNT(DISTINCT trigger_name) FROM information_schema.triggers 
+                WHERE trigger_name LIKE 'audit\\_%'
             """)
             triggers_activos = cursor.fetchone()[0]
             
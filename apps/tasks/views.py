@@ -14,6 +14,7 @@ from django.http import HttpResponse, Http404
 from os import listdir
 from os.path import isfile, join
 from django.conf import settings
+from helpers.descargas import respuesta_archivo
 
 from django.template  import loader
 
@@ -150,8 +151,9 @@ def task_log(request):
 def download_log_file(request, file_path):
     path = file_path.replace('%slash%', '/')
     if os.path.exists(path):
-        with open(path, 'rb') as fh:
-            response = HttpResponse(fh.read(), content_type="application/vnd.ms-excel")
-            response['Content-Disposition'] = 'inline; filename=' + os.path.basename(path)
-            return response
+        return respuesta_archivo(
+            request, path,
+            content_type="application/vnd.ms-excel",
+            nombre=os.path.basename(path), adjunto=False,
+        )
     raise Http404
\ No newline at end of file
@@ -25,7 +25,7 @@ class ConfiguracionTranscripcionAdmin(admin.ModelAdmin):
             'fields': ('nombre', 'descripcion', 'activa', 'usuario_creacion')
         }),
         ('Configuración Whisper', {
-            'fields': ('modelo_whisper', 'idioma_principal', 'temperatura'),
+            'fields': ('modelo_whisper', 'motor_asr', 'idioma_principal', 'temperatura'),
             'description': 'Configuración para el motor de transcripción Whisper'
         }),
         ('Configuración Diarización', {
@@ -0,0 +1,213 @@
+"""
+Alineación Whisper ↔ diarización con un árbol de intervalos
+
+Módulo compartido para asignar a cada segmento (o palabra) de Whisper el
+hablante con mayor solapamiento temporal. Los segmentos de diarización se
+indexan una sola vez en un árbol de intervalos centrado: cada consulta cuesta
+O(log M + k), con k los intervalos que la cruzan, también cuando hay turnos
+solapados o largos (habla simultánea, ruido de fondo de toda la sesión).
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def tiempos_segmento(segmento: Dict[str, Any]) -> Tuple[float, float]:
+    """Inicio y fin aceptando las claves en español o en inglés"""
+    inicio = segmento.get('inicio', segmento.get('start', 0.0)) or 0.0
+    fin = segmento.get('fin', segmento.get('end', 0.0)) or 0.0
+    return float(inicio), float(fin)
+
+
+def hablante_segmento(segmento: Dict[str, Any], defecto: Any = None) -> Any:
+    return segmento.get('speaker', segmento.get('hablante', defecto))
+
+
+class IndiceDiarizacion:
+    """
+    Árbol de intervalos centrado sobre los segmentos de diarización.
+
+    Cada nodo guarda un ``centro`` (el inicio del intervalo mediano de su
+    rango), los intervalos que lo contienen ordenados por inicio y por fin, y
+    dos subárboles con los que terminan antes y empiezan después del centro.
+    Todo nodo tiene al menos un intervalo y la profundidad es O(log M), así
+    que una consulta recorre dos caminos y los nodos cuyo centro cae dentro
+    del rango, que son parte del resultado.
+
+    Las posiciones internas son las del orden por inicio; ``orden`` las
+    traduce al índice original en ``segmentos``.
+    """
+
+    def __init__(self, diarizacion: Sequence[Dict[str, Any]]):
+        self.segmentos = list(diarizacion)
+        orden = sorted(range(len(self.segmentos)), key=lambda i: tiempos_segmento(self.segmentos[i])[0])
+        self.orden = orden
+        self.inicios: List[float] = []
+        self.finales: List[float] = []
+        for i in orden:
+            inicio, fin = tiempos_segmento(self.segmentos[i])
+            self.inicios.append(inicio)
+            self.finales.append(fin)
+        self.raiz = self._construir(list(range(len(orden))))
+
+    def _construir(self, posiciones: List[int]):
+        """Nodo (centro, por_inicio, por_fin, izquierda, derecha) para posiciones ordenadas por inicio"""
+        if not posiciones:
+            return None
+        inicios = self.inicios
+        # Un fin anterior al inicio cuenta como intervalo vacío en su inicio
+        finales = [max(self.finales[p], inicios[p]) for p in posiciones]
+        centro = inicios[posiciones[len(posiciones) // 2]]
+
+        izquierda, aqui, derecha = [], [], []
+        for posicion, fin in zip(posiciones, finales):
+            if fin < centro:
+                izquierda.append(posicion)
+            elif inicios[posicion] > centro:
+                derecha.append(posicion)
+            else:
+                aqui.append(posicion)
+        por_fin = sorted(aqui, key=lambda p: max(self.finales[p], inicios[p]), reverse=True)
+        return centro, aqui, por_fin, self._construir(izquierda), self._construir(derecha)
+
+    @classmethod
+    def desde(cls, diarizacion) -> 'IndiceDiarizacion':
+        """Acepta una lista de segmentos o un índice ya construido"""
+        return diarizacion if isinstance(diarizacion, cls) else cls(diarizacion)
+
+    def __len__(self):
+        return len(self.segmentos)
+
+    def _cruzan(self, inicio: float, fin: float) -> List[int]:
+        """Posiciones (orden por inicio) de los intervalos con inicio <= fin y fin >= inicio"""
+        inicios, finales = self.inicios, self.finales
+        encontradas = []
+        pendientes = [self.raiz]
+        while pendientes:
+            nodo = pendientes.pop()
+            if nodo is None:
+                continue
+            centro, por_inicio, por_fin, izquierda, derecha = nodo
+            if centro < inicio:
+                # Todos contienen el centro: cruzan si terminan después del inicio de la consulta
+                for posicion in por_fin:
+                    if max(finales[posicion], inicios[posicion]) < inicio:
+                        break
+                    encontradas.append(posicion)
+                pendientes.append(derecha)
+            elif centro > fin:
+                for posicion in por_inicio:
+                    if inicios[posicion] > fin:
+                        break
+                    encontradas.append(posicion)
+                pendientes.append(izquierda)
+            else:
+                encontradas.extend(por_inicio)
+                pendientes.append(izquierda)
+                pendientes.append(derecha)
+        encontradas.sort()
+        return encontradas
+
+    def solapamientos(self, inicio: float, fin: float) -> Iterable[Tuple[int, float]]:
+        """Genera (indice_original, segundos_solapados) para los intervalos que cruzan [inicio, fin]"""
+        for posicion in self._cruzan(inicio, fin):
+            solape = min(fin, self.finales[posicion]) - max(inicio, self.inicios[posicion])
+            if solape > 0:
+                yield self.orden[posicion], solape
+
+    def contiene(self, instante: float) -> Optional[int]:
+        """Índice original del primer intervalo (por inicio) que contiene ``instante``"""
+        for posicion in self._cruzan(instante, instante):
+            if self.inicios[posicion] <= instante <= self.finales[posicion]:
+                return self.orden[posicion]
+        return None
+
+    def votos(self, inicio: float, fin: float) -> Dict[Any, Tuple[float, int, float]]:
+        """
+        Solapamiento total por hablante en [inicio, fin]
+
+        Returns:
+            {hablante: (segundos_totales, indice_mejor_segmento, segundos_mejor_segmento)}
+        """
+        votos: Dict[Any, Tuple[float, int, float]] = {}
+        for indice, solape in self.solapamientos(inicio, fin):
+            hablante = hablante_segmento(self.segmentos[indice])
+            total, mejor_indice, mejor_solape = votos.get(hablante, (0.0, indice, 0.0))
+            if solape > mejor_solape:
+                mejor_indice, mejor_solape = indice, solape
+            votos[hablante] = (total + solape, mejor_indice, mejor_solape)
+        return votos
+
+
+def _sumar_votos(acumulado: Dict[Any, Tuple[float, int, float]], nuevos: Dict[Any, Tuple[float, int, float]]):
+    for hablante, (total, indice, mejor) in nuevos.items():
+        total_prev, indice_prev, mejor_prev = acumulado.get(hablante, (0.0, indice, 0.0))
+        if mejor > mejor_prev:
+            indice_prev, mejor_prev = indice, mejor
+        acumulado[hablante] = (total_prev + total, indice_prev, mejor_prev)
+
+
+def asignar_hablantes(segmentos: Sequence[Dict[str, Any]],
+                      diarizacion,
+                      por_palabras: bool = False,
+                      umbral_ratio: float = 0.0) -> List[Dict[str, Any]]:
+    """
+    Asigna a cada segmento de Whisper el hablante con mayor solapamiento total
+
+    Args:
+        segmentos: Segmentos de Whisper (``inicio``/``fin`` o ``start``/``end``)
+        diarizacion: Segmentos de diarización o un ``IndiceDiarizacion``
+        por_palabras: Si el segmento trae ``palabras``/``words`` con tiempos,
+            se vota palabra a palabra (ponderado por duración)
+        umbral_ratio: Ratio mínimo solapamiento/duración para aceptar el hablante
+
+    Returns:
+        Lista paralela a ``segmentos`` con ``hablante``, ``segmento`` (el de
+        diarización con mayor solape de ese hablante, o None), ``solapamiento``
+        en segundos y ``ratio`` respecto a la duración del segmento.
+    """
+    indice = IndiceDiarizacion.desde(diarizacion)
+    asignaciones = []
+
+    for segmento in segmentos:
+        inicio, fin = tiempos_segmento(segmento)
+        votos: Dict[Any, Tuple[float, int, float]] = {}
+
+        palabras = (segmento.get('palabras') or segmento.get('words')) if por_palabras else None
+        if palabras:
+            for palabra in palabras:
+                p_inicio, p_fin = tiempos_segmento(palabra)
+                _sumar_votos(votos, indice.votos(p_inicio, p_fin))
+        if not votos:
+            votos = indice.votos(inicio, fin)
+
+        duracion = max(1e-6, fin - inicio)
+        asignacion = {'hablante': None, 'segmento': None, 'solapamiento': 0.0, 'ratio': 0.0}
+        if votos:
+            hablante, (total, mejor_indice, _) = max(votos.items(), key=lambda item: item[1][0])
+            ratio = min(1.0, total / duracion)
+            if ratio >= umbral_ratio:
+                asignacion = {
+                    'hablante': hablante,
+                    'segmento': indice.segmentos[mejor_indice],
+                    'solapamiento': total,
+                    'ratio': ratio,
+                }
+        asignaciones.append(asignacion)
+
+    return asignaciones
+
+
+def asignar_hablantes_ingenuo(segmentos: Sequence[Dict[str, Any]],
+                              diarizacion: Sequence[Dict[str, Any]]) -> List[Any]:
+    """Implementación O(N×M) de referencia, usada solo en el benchmark"""
+    resultado = []
+    for segmento in segmentos:
+        inicio, fin = tiempos_segmento(segmento)
+        votos: Dict[Any, float] = {}
+        for seg_diar in diarizacion:
+            d_inicio, d_fin = tiempos_segmento(seg_diar)
+            solape = min(fin, d_fin) - max(inicio, d_inicio)
+            if solape > 0:
+                hablante = hablante_segmento(seg_diar)
+                votos[hablante] = votos.get(hablante, 0.0) + solape
+        resultado.append(max(votos.items(), key=lambda item: item[1])[0] if votos else None)
+    return resultado
@@ -12,11 +12,17 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
 from django.utils import timezone
 import json
 import logging
 
 from .models import Transcripcion, HistorialEdicion, ConfiguracionHablante
+from .segmentos import (
+    ErrorEdicion, aplicar_parche, contar_segmentos, contar_segmentos_hablante, editar_segmento,
+    eliminar_segmento, insertar_segmento, modificar_cabecera, obtener_segmento, reasignar_hablantes,
+    reconstruir_segmentos, segmento_a_dict
+)
 from .logging_helper import log_transcripcion_edicion, log_transcripcion_error
 
 logger = logging.getLogger(__name__)
@@ -31,8 +37,8 @@ def api_obtener_estructura_completa(request, transcripcion_id):
     try:
         transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
         
-        # Obtener estructura completa
-        estructura = transcripcion.conversacion_json or {}
+        # Obtener estructura completa (con las ediciones de segmentos aplicadas)
+        estructura = transcripcion.sincronizar_conversacion() or {}
         
         # Asegurar que tiene la estructura esperada
         if not isinstance(estructura, dict):
@@ -53,6 +59,7 @@ def api_obtener_estructura_completa(request, transcripcion_id):
             'estructura': estructura,
             'puede_editar': transcripcion.esta_completado,
             'estado': transcripcion.estado,
+            'version_actual': transcripcion.version_actual,
             'total_segmentos': len(estructura.get('conversacion', [])),
             'hablantes_disponibles': list(estructura.get('cabecera', {}).get('mapeo_hablantes', {}).values())
         })
@@ -65,6 +72,17 @@ def api_obtener_estructura_completa(request, transcripcion_id):
         }, status=500)
 
 
+def _metadata_edicion(usuario, total_segmentos=None):
+    """Resumen de la edición para las respuestas (la metadata del JSON se regenera al leerlo)"""
+    metadata = {
+        'fecha_ultima_edicion': timezone.now().isoformat(),
+        'usuario_ultima_edicion': usuario.username,
+    }
+    if total_segmentos is not None:
+        metadata['total_segmentos'] = total_segmentos
+    return metadata
+
+
 @login_required
 @require_http_methods(["POST"])
 @csrf_exempt
@@ -73,7 +91,7 @@ def api_editar_segmento_avanzado(request, transcripcion_id):
     Edita un segmento específico con validación completa
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id', 'estado'), id=transcripcion_id)
         
         if not transcripcion.esta_completado:
             return JsonResponse({
@@ -87,6 +105,8 @@ def api_editar_segmento_avanzado(request, transcripcion_id):
         nuevo_hablante = data.get('hablante', '').strip()
         nuevo_inicio = float(data.get('inicio', 0))
         nuevo_fin = float(data.get('fin', 0))
+        version = data.get('version')
+        version_actual = data.get('version_actual')
         
         # Validaciones
         if indice_segmento is None:
@@ -101,56 +121,43 @@ def api_editar_segmento_avanzado(request, transcripcion_id):
         if not nuevo_hablante:
             return JsonResponse({'exito': False, 'error': 'El hablante no puede estar vacío'}, status=400)
         
-        # Obtener estructura actual
-        estructura = transcripcion.conversacion_json or {}
-        if 'conversacion' not in estructura:
-            estructura['conversacion'] = []
-            
-        conversacion = estructura['conversacion']
-        
-        # Validar índice
-        if indice_segmento < 0 or indice_segmento >= len(conversacion):
-            return JsonResponse({'exito': False, 'error': 'Índice de segmento inválido'}, status=400)
-        
-        # Guardar estado anterior para historial
-        segmento_anterior = conversacion[indice_segmento].copy()
-        
-        # Actualizar segmento
-        conversacion[indice_segmento].update({
-            'texto': nuevo_texto,
-            'hablante': nuevo_hablante,
-            'inicio': nuevo_inicio,
-            'fin': nuevo_fin,
-            'duracion': round(nuevo_fin - nuevo_inicio, 2),
-            'editado': True,
-            'fecha_edicion': timezone.now().isoformat()
-        })
-        
-        # Regenerar texto estructurado
-        estructura['texto_estructurado'] = _generar_texto_estructurado(conversacion)
-        
-        # Actualizar metadata
-        if 'metadata' not in estructura:
-            estructura['metadata'] = {}
-        estructura['metadata'].update({
-            'fecha_ultima_edicion': timezone.now().isoformat(),
-            'usuario_ultima_edicion': request.user.username,
-            'total_segmentos': len(conversacion),
-            'segmentos_editados': len([s for s in conversacion if s.get('editado', False)])
-        })
-        
-        # Guardar cambios
-        transcripcion.conversacion_json = estructura
-        transcripcion.save()
+        try:
+            # Estado anterior para historial; su versión protege el UPDATE si el cliente no envió una
+            segmento_anterior = segmento_a_dict(obtener_segmento(transcripcion.id, int(indice_segmento)))
+            if version is None:
+                version = segmento_anterior['version']
+            version_segmento, version_actual = editar_segmento(
+                transcripcion.id,
+                int(indice_segmento),
+                {'texto': nuevo_texto, 'hablante': nuevo_hablante, 'inicio': nuevo_inicio, 'fin': nuevo_fin},
+                version=version,
+                usuario=request.user,
+                version_actual=version_actual
+            )
+        except ErrorEdicion as e:
+            return JsonResponse({'exito': False, 'error': str(e)}, status=e.status)
+        
+        segmento_actualizado = dict(
+            segmento_anterior,
+            texto=nuevo_texto,
+            hablante=nuevo_hablante,
+            inicio=nuevo_inicio,
+            fin=nuevo_fin,
+            duracion=round(nuevo_fin - nuevo_inicio, 2),
+            editado=True,
+            version=version_segmento
+        )
         
         # Registrar en historial
         HistorialEdicion.objects.create(
             transcripcion=transcripcion,
             usuario=request.user,
-            tipo_edicion='edicion_segmento',
-            descripcion=f'Editó segmento {indice_segmento}: "{segmento_anterior.get("texto", "")[:50]}..." → "{nuevo_texto[:50]}..."',
-            datos_anteriores={'segmento': segmento_anterior, 'indice': indice_segmento},
-            datos_nuevos={'segmento': conversacion[indice_segmento], 'indice': indice_segmento}
+            version=version_actual,
+            tipo_edicion='segmento',
+            segmento_id=str(indice_segmento),
+            valor_anterior=segmento_anterior,
+            valor_nuevo=segmento_actualizado,
+            comentario=f'Editó segmento {indice_segmento}: "{segmento_anterior.get("texto", "")[:50]}..." → "{nuevo_texto[:50]}..."'
         )
         
         log_transcripcion_edicion(
@@ -162,9 +169,9 @@ def api_editar_segmento_avanzado(request, transcripcion_id):
         
         return JsonResponse({
             'exito': True,
-            'segmento_actualizado': conversacion[indice_segmento],
-            'texto_estructurado': estructura['texto_estructurado'],
-            'metadata': estructura['metadata']
+            'segmento_actualizado': segmento_actualizado,
+            'version_actual': version_actual,
+            'metadata': _metadata_edicion(request.user)
         })
         
     except json.JSONDecodeError:
@@ -183,7 +190,7 @@ def api_agregar_segmento_avanzado(request, transcripcion_id):
     Agrega un nuevo segmento a la conversación
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id', 'estado'), id=transcripcion_id)
         
         if not transcripcion.esta_completado:
             return JsonResponse({
@@ -208,13 +215,6 @@ def api_agregar_segmento_avanzado(request, transcripcion_id):
         if not hablante:
             return JsonResponse({'exito': False, 'error': 'El hablante no puede estar vacío'}, status=400)
         
-        # Obtener estructura actual
-        estructura = transcripcion.conversacion_json or {}
-        if 'conversacion' not in estructura:
-            estructura['conversacion'] = []
-            
-        conversacion = estructura['conversacion']
-        
         # Crear nuevo segmento
         nuevo_segmento = {
             'inicio': inicio,
@@ -227,39 +227,28 @@ def api_agregar_segmento_avanzado(request, transcripcion_id):
             'fecha_creacion': timezone.now().isoformat()
         }
         
-        # Insertar en la posición correcta
-        if posicion is None or posicion >= len(conversacion):
-            conversacion.append(nuevo_segmento)
-            posicion_final = len(conversacion) - 1
-        else:
-            conversacion.insert(posicion, nuevo_segmento)
-            posicion_final = posicion
-        
-        # Regenerar texto estructurado
-        estructura['texto_estructurado'] = _generar_texto_estructurado(conversacion)
-        
-        # Actualizar metadata
-        if 'metadata' not in estructura:
-            estructura['metadata'] = {}
-        estructura['metadata'].update({
-            'fecha_ultima_edicion': timezone.now().isoformat(),
-            'usuario_ultima_edicion': request.user.username,
-            'total_segmentos': len(conversacion),
-            'segmentos_editados': len([s for s in conversacion if s.get('editado', False)])
-        })
-        
-        # Guardar cambios
-        transcripcion.conversacion_json = estructura
-        transcripcion.save()
+        try:
+            # Una posición más allá del final equivale a añadir al final
+            if posicion is not None and int(posicion) >= 0:
+                posicion = min(int(posicion), contar_segmentos(transcripcion.id))
+            posicion_final, total_segmentos, version_actual = insertar_segmento(
+                transcripcion.id, posicion, nuevo_segmento, usuario=request.user,
+                version_actual=data.get('version_actual')
+            )
+        except ErrorEdicion as e:
+            return JsonResponse({'exito': False, 'error': str(e)}, status=e.status)
+        nuevo_segmento['version'] = 1
         
         # Registrar en historial
         HistorialEdicion.objects.create(
             transcripcion=transcripcion,
             usuario=request.user,
-            tipo_edicion='agregar_segmento',
-            descripcion=f'Agregó nuevo segmento en posición {posicion_final}: "{texto[:50]}..."',
-            datos_anteriores={'total_segmentos': len(conversacion) - 1},
-            datos_nuevos={'segmento': nuevo_segmento, 'posicion': posicion_final, 'total_segmentos': len(conversacion)}
+            version=version_actual,
+            tipo_edicion='adicion',
+            segmento_id=str(posicion_final),
+            valor_anterior={'total_segmentos': total_segmentos - 1},
+            valor_nuevo={'segmento': nuevo_segmento, 'posicion': posicion_final, 'total_segmentos': total_segmentos},
+            comentario=f'Agregó nuevo segmento en posición {posicion_final}: "{texto[:50]}..."'
         )
         
         log_transcripcion_edicion(
@@ -273,9 +262,9 @@ def api_agregar_segmento_avanzado(request, transcripcion_id):
             'exito': True,
             'segmento_creado': nuevo_segmento,
             'posicion': posicion_final,
-            'total_segmentos': len(conversacion),
-            'texto_estructurado': estructura['texto_estructurado'],
-            'metadata': estructura['metadata']
+            'total_segmentos': total_segmentos,
+            'version_actual': version_actual,
+            'metadata': _metadata_edicion(request.user, total_segmentos)
         })
         
     except json.JSONDecodeError:
@@ -294,7 +283,7 @@ def api_eliminar_segmento_avanzado(request, transcripcion_id):
     Elimina un segmento específico de la conversación
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id', 'estado'), id=transcripcion_id)
         
         if not transcripcion.esta_completado:
             return JsonResponse({
@@ -309,48 +298,24 @@ def api_eliminar_segmento_avanzado(request, transcripcion_id):
         if indice_segmento is None:
             return JsonResponse({'exito': False, 'error': 'Índice de segmento requerido'}, status=400)
         
-        # Obtener estructura actual
-        estructura = transcripcion.conversacion_json or {}
-        if 'conversacion' not in estructura:
-            estructura['conversacion'] = []
-            
-        conversacion = estructura['conversacion']
-        
-        # Validar índice
-        if indice_segmento < 0 or indice_segmento >= len(conversacion):
-            return JsonResponse({'exito': False, 'error': 'Índice de segmento inválido'}, status=400)
-        
-        # Guardar segmento para historial antes de eliminar
-        segmento_eliminado = conversacion[indice_segmento].copy()
-        
-        # Eliminar segmento
-        del conversacion[indice_segmento]
-        
-        # Regenerar texto estructurado
-        estructura['texto_estructurado'] = _generar_texto_estructurado(conversacion)
-        
-        # Actualizar metadata
-        if 'metadata' not in estructura:
-            estructura['metadata'] = {}
-        estructura['metadata'].update({
-            'fecha_ultima_edicion': timezone.now().isoformat(),
-            'usuario_ultima_edicion': request.user.username,
-            'total_segmentos': len(conversacion),
-            'segmentos_editados': len([s for s in conversacion if s.get('editado', False)])
-        })
-        
-        # Guardar cambios
-        transcripcion.conversacion_json = estructura
-        transcripcion.save()
+        try:
+            segmento_eliminado, total_segmentos, version_actual = eliminar_segmento(
+                transcripcion.id, int(indice_segmento), version=data.get('version'), usuario=request.user,
+                version_actual=data.get('version_actual')
+            )
+        except ErrorEdicion as e:
+            return JsonResponse({'exito': False, 'error': str(e)}, status=e.status)
         
         # Registrar en historial
         HistorialEdicion.objects.create(
             transcripcion=transcripcion,
             usuario=request.user,
-            tipo_edicion='eliminar_segmento',
-            descripcion=f'Eliminó segmento {indice_segmento}: "{segmento_eliminado.get("texto", "")[:50]}..."',
-            datos_anteriores={'segmento': segmento_eliminado, 'indice': indice_segmento, 'total_segmentos': len(conversacion) + 1},
-            datos_nuevos={'total_segmentos': len(conversacion)}
+            version=version_actual,
+            tipo_edicion='eliminacion',
+            segmento_id=str(indice_segmento),
+            valor_anterior={'segmento': segmento_eliminado, 'indice': indice_segmento, 'total_segmentos': total_segmentos + 1},
+            valor_nuevo={'total_segmentos': total_segmentos},
+            comentario=f'Eliminó segmento {indice_segmento}: "{segmento_eliminado.get("texto", "")[:50]}..."'
         )
         
         log_transcripcion_edicion(
@@ -363,9 +328,9 @@ def api_eliminar_segmento_avanzado(request, transcripcion_id):
         return JsonResponse({
             'exito': True,
             'segmento_eliminado': segmento_eliminado,
-            'total_segmentos': len(conversacion),
-            'texto_estructurado': estructura['texto_estructurado'],
-            'metadata': estructura['metadata']
+            'total_segmentos': total_segmentos,
+            'version_actual': version_actual,
+            'metadata': _metadata_edicion(request.user, total_segmentos)
         })
         
     except json.JSONDecodeError:
@@ -384,7 +349,7 @@ def api_gestionar_hablantes_avanzado(request, transcripcion_id):
     Gestiona los hablantes: agregar, editar, eliminar, renombrar
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id', 'estado'), id=transcripcion_id)
         
         if not transcripcion.esta_completado:
             return JsonResponse({
@@ -394,101 +359,89 @@ def api_gestionar_hablantes_avanzado(request, transcripcion_id):
         
         data = json.loads(request.body)
         accion = data.get('accion')  # 'agregar', 'editar', 'eliminar', 'renombrar'
+        if accion not in ('agregar', 'editar', 'eliminar'):
+            return JsonResponse({'exito': False, 'error': 'Acción no válida'}, status=400)
         
-        # Obtener estructura actual
-        estructura = transcripcion.conversacion_json or {}
-        if 'cabecera' not in estructura:
-            estructura['cabecera'] = {}
-        if 'mapeo_hablantes' not in estructura['cabecera']:
-            estructura['cabecera']['mapeo_hablantes'] = {}
-        if 'conversacion' not in estructura:
-            estructura['conversacion'] = []
-            
-        mapeo_hablantes = estructura['cabecera']['mapeo_hablantes']
-        conversacion = estructura['conversacion']
+        renombrado = {}
         
-        if accion == 'agregar':
-            nuevo_nombre = data.get('nombre', '').strip()
-            nuevo_id = data.get('id', f"SPEAKER_{len(mapeo_hablantes):02d}")
-            
-            if not nuevo_nombre:
-                return JsonResponse({'exito': False, 'error': 'El nombre del hablante no puede estar vacío'}, status=400)
-            
-            if nuevo_nombre in mapeo_hablantes.values():
-                return JsonResponse({'exito': False, 'error': 'Ya existe un hablante con ese nombre'}, status=400)
-            
-            mapeo_hablantes[nuevo_id] = nuevo_nombre
-            
-            descripcion = f'Agregó hablante: {nuevo_nombre} ({nuevo_id})'
-            
-        elif accion == 'editar':
-            hablante_id = data.get('id')
-            nuevo_nombre = data.get('nuevo_nombre', '').strip()
-            
-            if not hablante_id or hablante_id not in mapeo_hablantes:
-                return JsonResponse({'exito': False, 'error': 'Hablante no encontrado'}, status=400)
-            
-            if not nuevo_nombre:
-                return JsonResponse({'exito': False, 'error': 'El nuevo nombre no puede estar vacío'}, status=400)
-            
-            nombre_anterior = mapeo_hablantes[hablante_id]
-            mapeo_hablantes[hablante_id] = nuevo_nombre
-            
-            # Actualizar conversación
-            for segmento in conversacion:
-                if segmento.get('hablante') == nombre_anterior:
-                    segmento['hablante'] = nuevo_nombre
-                    segmento['editado'] = True
-            
-            descripcion = f'Renombró hablante: {nombre_anterior} → {nuevo_nombre}'
-            
-        elif accion == 'eliminar':
-            hablante_id = data.get('id')
+        def gestionar(estructura):
+            mapeo_hablantes = estructura['cabecera'].setdefault('mapeo_hablantes', {})
+            mapeo_anterior = dict(mapeo_hablantes)
             
-            if not hablante_id or hablante_id not in mapeo_hablantes:
-                return JsonResponse({'exito': False, 'error': 'Hablante no encontrado'}, status=400)
+            if accion == 'agregar':
+                nuevo_nombre = data.get('nombre', '').strip()
+                nuevo_id = data.get('id', f"SPEAKER_{len(mapeo_hablantes):02d}")
+                
+                if not nuevo_nombre:
+                    raise ErrorEdicion('El nombre del hablante no puede estar vacío')
+                
+                if nuevo_nombre in mapeo_hablantes.values():
+                    raise ErrorEdicion('Ya existe un hablante con ese nombre')
+                
+                mapeo_hablantes[nuevo_id] = nuevo_nombre
+                descripcion = f'Agregó hablante: {nuevo_nombre} ({nuevo_id})'
+                
+            elif accion == 'editar':
+                hablante_id = data.get('id')
+                nuevo_nombre = data.get('nuevo_nombre', '').strip()
+                
+                if not hablante_id or hablante_id not in mapeo_hablantes:
+                    raise ErrorEdicion('Hablante no encontrado')
+                
+                if not nuevo_nombre:
+                    raise ErrorEdicion('El nuevo nombre no puede estar vacío')
+                
+                nombre_anterior = mapeo_hablantes[hablante_id]
+                mapeo_hablantes[hablante_id] = nuevo_nombre
+                if isinstance(nombre_anterior, str):
+                    renombrado[nombre_anterior] = nuevo_nombre
+                descripcion = f'Renombró hablante: {nombre_anterior} → {nuevo_nombre}'
+                
+            else:
+                hablante_id = data.get('id')
+                
+                if not hablante_id or hablante_id not in mapeo_hablantes:
+                    raise ErrorEdicion('Hablante no encontrado')
+                
+                # Verificar si el hablante está en uso
+                nombre_hablante = mapeo_hablantes[hablante_id]
+                en_uso = contar_segmentos_hablante(transcripcion.id, nombre_hablante)
+                if en_uso:
+                    raise ErrorEdicion(
+                        f'No se puede eliminar el hablante {nombre_hablante} porque está siendo usado en {en_uso} segmento(s)'
+                    )
+                
+                del mapeo_hablantes[hablante_id]
+                descripcion = f'Eliminó hablante: {nombre_hablante} ({hablante_id})'
             
-            # Verificar si el hablante está en uso
-            nombre_hablante = mapeo_hablantes[hablante_id]
-            segmentos_con_hablante = [s for s in conversacion if s.get('hablante') == nombre_hablante]
-            
-            if segmentos_con_hablante:
-                return JsonResponse({
-                    'exito': False, 
-                    'error': f'No se puede eliminar el hablante {nombre_hablante} porque está siendo usado en {len(segmentos_con_hablante)} segmento(s)'
-                }, status=400)
-            
-            del mapeo_hablantes[hablante_id]
-            descripcion = f'Eliminó hablante: {nombre_hablante} ({hablante_id})'
-            
-        else:
-            return JsonResponse({'exito': False, 'error': 'Acción no válida'}, status=400)
-        
-        # Regenerar texto estructurado si cambió la conversación
-        estructura['texto_estructurado'] = _generar_texto_estructurado(conversacion)
-        
-        # Actualizar metadata
-        if 'metadata' not in estructura:
-            estructura['metadata'] = {}
-        estructura['metadata'].update({
-            'fecha_ultima_edicion': timezone.now().isoformat(),
-            'usuario_ultima_edicion': request.user.username,
+            return mapeo_anterior, dict(mapeo_hablantes), descripcion
+        
+        try:
+            with transaction.atomic():
+                (mapeo_anterior, mapeo_hablantes, descripcion), version_actual = modificar_cabecera(
+                    transcripcion.id, gestionar, usuario=request.user
+                )
+                # Los segmentos del hablante renombrado se actualizan con un UPDATE
+                if renombrado:
+                    reasignar_hablantes(transcripcion.id, renombrado, usuario=request.user)
+        except ErrorEdicion as e:
+            return JsonResponse({'exito': False, 'error': str(e)}, status=e.status)
+        
+        metadata = _metadata_edicion(request.user)
+        metadata.update({
             'total_hablantes': len(mapeo_hablantes),
             'hablantes_disponibles': list(mapeo_hablantes.values())
         })
         
-        # Guardar cambios
-        transcripcion.conversacion_json = estructura
-        transcripcion.save()
-        
         # Registrar en historial
         HistorialEdicion.objects.create(
             transcripcion=transcripcion,
             usuario=request.user,
-            tipo_edicion=f'hablantes_{accion}',
-            descripcion=descripcion,
-            datos_anteriores={'mapeo_anterior': dict(mapeo_hablantes) if accion != 'agregar' else {}},
-            datos_nuevos={'mapeo_nuevo': dict(mapeo_hablantes)}
+            version=version_actual,
+            tipo_edicion='hablante',
+            valor_anterior={'mapeo_anterior': mapeo_anterior if accion != 'agregar' else {}},
+            valor_nuevo={'mapeo_nuevo': mapeo_hablantes},
+            comentario=descripcion
         )
         
         log_transcripcion_edicion(
@@ -503,8 +456,7 @@ def api_gestionar_hablantes_avanzado(request, transcripcion_id):
             'mapeo_hablantes': mapeo_hablantes,
             'hablantes_disponibles': list(mapeo_hablantes.values()),
             'total_hablantes': len(mapeo_hablantes),
-            'texto_estructurado': estructura['texto_estructurado'],
-            'metadata': estructura['metadata'],
+            'metadata': metadata,
             'descripcion': descripcion
         })
         
@@ -516,6 +468,67 @@ def api_gestionar_hablantes_avanzado(request, transcripcion_id):
         return JsonResponse({'exito': False, 'error': str(e)}, status=500)
 
 
+@login_required
+@require_http_methods(["PATCH", "POST"])
+@csrf_exempt
+def api_aplicar_parche(request, transcripcion_id):
+    """
+    Aplica un JSON Patch (RFC 6902) sobre /conversacion
+
+    Las posiciones son las de la ``version_actual`` que leyó el cliente, y el
+    parche debe comprobarla. Ejemplo, dividir el segmento 12::
+
+        [
+            {"op": "test", "path": "/version_actual", "value": 7},
+            {"op": "test", "path": "/conversacion/12/version", "value": 3},
+            {"op": "replace", "path": "/conversacion/12/texto", "value": "Primera parte"},
+            {"op": "replace", "path": "/conversacion/12/fin", "value": 61.2},
+            {"op": "add", "path": "/conversacion/13", "value": {"inicio": 61.2, "fin": 64.0,
+                                                             "hablante": "Alcalde", "texto": "Segunda parte"}}
+        ]
+    """
+    try:
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id', 'estado'), id=transcripcion_id)
+        
+        if not transcripcion.esta_completado:
+            return JsonResponse({
+                'exito': False,
+                'error': 'Solo se pueden editar transcripciones completadas'
+            }, status=400)
+        
+        operaciones = json.loads(request.body)
+        try:
+            resultado = aplicar_parche(transcripcion.id, operaciones, usuario=request.user)
+        except ErrorEdicion as e:
+            return JsonResponse({'exito': False, 'error': str(e)}, status=e.status)
+        
+        HistorialEdicion.objects.create(
+            transcripcion=transcripcion,
+            usuario=request.user,
+            version=resultado['version_actual'],
+            tipo_edicion='segmento',
+            segmento_id=','.join(str(indice) for indice in resultado['versiones'])[:50],
+            valor_nuevo={'operaciones': operaciones},
+            comentario=f'Aplicó un parche de {len(operaciones)} operación(es)'
+        )
+        
+        log_transcripcion_edicion(
+            transcripcion,
+            request.user,
+            'parche_segmentos',
+            {'operaciones': len(operaciones)}
+        )
+        
+        return JsonResponse({'exito': True, **resultado})
+        
+    except json.JSONDecodeError:
+        return JsonResponse({'exito': False, 'error': 'JSON inválido'}, status=400)
+    except Exception as e:
+        logger.error(f"Error en api_aplicar_parche: {str(e)}")
+        log_transcripcion_error(transcripcion, 'api_error', str(e), {'api': 'aplicar_parche'})
+        return JsonResponse({'exito': False, 'error': str(e)}, status=500)
+
+
 @login_required
 @require_http_methods(["POST"])
 @csrf_exempt
@@ -560,7 +573,7 @@ def api_guardar_estructura_completa(request, transcripcion_id):
                 return JsonResponse({'exito': False, 'error': f'Segmento {i}: tiempo inicio debe ser menor que tiempo fin'}, status=400)
         
         # Guardar estado anterior para historial
-        estructura_anterior = transcripcion.conversacion_json or {}
+        estructura_anterior = transcripcion.sincronizar_conversacion() or {}
         
         # Actualizar metadata
         nueva_estructura['metadata'].update({
@@ -572,16 +585,19 @@ def api_guardar_estructura_completa(request, transcripcion_id):
         
         # Guardar cambios
         transcripcion.conversacion_json = nueva_estructura
+        transcripcion.version_actual = (transcripcion.version_actual or 1) + 1
         transcripcion.save()
+        reconstruir_segmentos(transcripcion)
         
         # Registrar en historial
         HistorialEdicion.objects.create(
             transcripcion=transcripcion,
             usuario=request.user,
-            tipo_edicion='edicion_completa',
-            descripcion='Editó la estructura JSON completa manualmente',
-            datos_anteriores={'estructura': estructura_anterior},
-            datos_nuevos={'estructura': nueva_estructura}
+            version=transcripcion.version_actual,
+            tipo_edicion='segmento',
+            valor_anterior={'estructura': estructura_anterior},
+            valor_nuevo={'estructura': nueva_estructura},
+            comentario='Editó la estructura JSON completa manualmente'
         )
         
         log_transcripcion_edicion(
@@ -604,22 +620,3 @@ def api_guardar_estructura_completa(request, transcripcion_id):
         logger.error(f"Error en api_guardar_estructura_completa: {str(e)}")
         log_transcripcion_error(transcripcion, 'api_error', str(e), {'api': 'guardar_estructura_completa'})
         return JsonResponse({'exito': False, 'error': str(e)}, status=500)
-
-
-def _generar_texto_estructurado(conversacion):
-    """
-    Genera el texto estructurado en formato MM:SS,Hablante,Texto
-    """
-    lineas = []
-    for segmento in conversacion:
-        inicio = segmento.get('inicio', 0)
-        minutos = int(inicio // 60)
-        segundos = int(inicio % 60)
-        tiempo_formateado = f"{minutos:02d}:{segundos:02d}"
-        
-        hablante = segmento.get('hablante', 'Desconocido')
-        texto = segmento.get('texto', '').replace('\n', ' ').replace('\r', ' ')
-        
-        lineas.append(f"{tiempo_formateado},{hablante},{texto}")
-    
-    return '\n'.join(lineas)
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Motores ASR intercambiables para WhisperProcessor
+
+Cada motor carga su modelo a través del registro de modelos del proceso y
+devuelve el resultado con el formato de ``whisper.transcribe()``
+(``text``, ``segments``, ``language``) para que ``_procesar_resultado_whisper``
+produzca exactamente los mismos ``segmentos``/``palabras``/``idioma_detectado``.
+"""
+import logging
+from typing import Any, Dict, Union
+
+from django.conf import settings
+
+from .model_registry import get_registro, TAMANOS_WHISPER_MB, TAMANO_DESCONOCIDO_MB
+
+try:
+    import whisper
+    OPENAI_WHISPER_AVAILABLE = True
+except ImportError:
+    OPENAI_WHISPER_AVAILABLE = False
+
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MOTOR_OPENAI_WHISPER = 'openai_whisper'
+MOTOR_FASTER_WHISPER = 'faster_whisper'
+
+
+def get_config_asr() -> Dict[str, Any]:
+    config = {
+        'TIPO_COMPUTO_CPU': 'int8',
+        'TIPO_COMPUTO_GPU': 'float16',
+        'HILOS_CPU': 0,
+    }
+    config.update(getattr(settings, 'TRANSCRIPCION_ASR', {}) or {})
+    return config
+
+
+class MotorASR:
+    """Interfaz común de los motores de transcripción"""
+
+    nombre = ''
+
+    def __init__(self, modelo_nombre: str, device: str = 'cpu'):
+        self.modelo_nombre = modelo_nombre
+        self.device = device
+        self.modelo = None
+
+    @classmethod
+    def disponible(cls) -> bool:
+        return False
+
+    @property
+    def clave(self) -> str:
+        return f"{self.nombre}:{self.modelo_nombre}:{self.device}"
+
+    def cargar(self):
+        """Obtiene el modelo del registro del proceso"""
+        if self.modelo is None:
+            tamano = TAMANOS_WHISPER_MB.get(self.modelo_nombre, TAMANO_DESCONOCIDO_MB)
+            self.modelo = get_registro().adquirir(self.clave, self._crear_modelo, tamano)
+        return self.modelo
+
+    def liberar(self):
+        if self.modelo is not None:
+            get_registro().liberar(self.clave)
+            self.modelo = None
+
+    def _crear_modelo(self):
+        raise NotImplementedError
+
+    def transcribir(self, audio: Union[str, Any], opciones: Dict[str, Any]) -> Dict[str, Any]:
+        """Transcribe una ruta o un array de 16 kHz con opciones estilo whisper"""
+        raise NotImplementedError
+
+    def info(self) -> Dict[str, Any]:
+        return {'motor': self.nombre, 'modelo': self.modelo_nombre, 'device': self.device}
+
+
+class MotorOpenAIWhisper(MotorASR):
+    """Motor original: openai-whisper en PyTorch (fp32 en CPU)"""
+
+    nombre = MOTOR_OPENAI_WHISPER
+
+    @classmethod
+    def disponible(cls) -> bool:
+        return OPENAI_WHISPER_AVAILABLE
+
+    @property
+    def clave(self) -> str:
+        # Misma clave que model_registry.clave_whisper para compartir el modelo
+        return f"whisper:{self.modelo_nombre}:{self.device}"
+
+    def _crear_modelo(self):
+        return whisper.load_model(self.modelo_nombre, device=self.device)
+
+    def transcribir(self, audio, opciones):
+        return self.cargar().transcribe(audio, **opciones)
+
+
+class MotorFasterWhisper(MotorASR):
+    """Motor CTranslate2 (faster-whisper) con cuantización int8 en CPU"""
+
+    nombre = MOTOR_FASTER_WHISPER
+
+    def __init__(self, modelo_nombre: str, device: str = 'cpu', tipo_computo: str = None):
+        super().__init__(modelo_nombre, device)
+        config = get_config_asr()
+        self.tipo_computo = tipo_computo or (
+            config['TIPO_COMPUTO_GPU'] if device == 'cuda' else config['TIPO_COMPUTO_CPU']
+        )
+        self.hilos_cpu = config['HILOS_CPU']
+
+    @classmethod
+    def disponible(cls) -> bool:
+        return FASTER_WHISPER_AVAILABLE
+
+    @property
+    def clave(self) -> str:
+        return f"{self.nombre}:{self.modelo_nombre}:{self.device}:{self.tipo_computo}"
+
+    def _crear_modelo(self):
+        return WhisperModel(
+            self.modelo_nombre,
+            device=self.device,
+            compute_type=self.tipo_computo,
+            cpu_threads=self.hilos_cpu,
+        )
+
+    def transcribir(self, audio, opciones):
+        """Traduce las opciones de whisper y convierte la salida al formato de whisper"""
+        temperatura = opciones.get('temperature', 0.0)
+        kwargs = {
+            'language': opciones.get('language'),
+            'task': opciones.get('task', 'transcribe'),
+            'temperature': temperatura,
+            'word_timestamps': opciones.get('word_timestamps', False),
+            'condition_on_previous_text': opciones.get('condition_on_previous_text', True),
+        }
+        if 'compression_ratio_threshold' in opciones:
+            kwargs['compression_ratio_threshold'] = opciones['compression_ratio_threshold']
+        if 'logprob_threshold' in opciones:
+            kwargs['log_prob_threshold'] = opciones['logprob_threshold']
+
+        segmentos_iter, info = self.cargar().transcribe(audio, **kwargs)
+
+        segments = []
+        for segmento in segmentos_iter:
+            convertido = {
+                'id': segmento.id,
+                'seek': segmento.seek,
+                'start': segmento.start,
+                'end': segmento.end,
+                'text': segmento.text,
+                'tokens': list(segmento.tokens),
+                'temperature': segmento.temperature if segmento.temperature is not None else temperatura,
+                'avg_logprob': segmento.avg_logprob,
+                'compression_ratio': segmento.compression_ratio,
+                'no_speech_prob': segmento.no_speech_prob,
+            }
+            if kwargs['word_timestamps'] and segmento.words:
+                convertido['words'] = [
+                    {
+                        'word': palabra.word,
+                        'start': palabra.start,
+                        'end': palabra.end,
+                        'probability': palabra.probability,
+                    }
+                    for palabra in segmento.words
+                ]
+            segments.append(convertido)
+
+        return {
+            'text': ''.join(s['text'] for s in segments),
+            'segments': segments,
+            'language': info.language,
+        }
+
+    def info(self):
+        return {**super().info(), 'tipo_computo': self.tipo_computo}
+
+
+MOTORES = {
+    MOTOR_OPENAI_WHISPER: MotorOpenAIWhisper,
+    MOTOR_FASTER_WHISPER: MotorFasterWhisper,
+}
+
+
+def crear_motor(motor: str, modelo_nombre: str, device: str = 'cpu') -> MotorASR:
+    """
+    Crea el motor solicitado; si no está instalado se usa openai-whisper.
+
+    ``modelo_whisper`` también acepta el prefijo ``faster-`` (ej. ``faster-medium``)
+    como atajo para seleccionar faster-whisper.
+    """
+    if modelo_nombre and modelo_nombre.startswith('faster-'):
+        motor = MOTOR_FASTER_WHISPER
+        modelo_nombre = modelo_nombre[len('faster-'):]
+
+    clase = MOTORES.get(motor or MOTOR_OPENAI_WHISPER, MotorOpenAIWhisper)
+    if not clase.disponible():
+        logger.warning(f"⚠️ Motor ASR {motor} no disponible, usando {MOTOR_OPENAI_WHISPER}")
+        clase = MotorOpenAIWhisper
+    return clase(modelo_nombre, device)
@@ -8,6 +8,8 @@ import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
+from .alineacion_hablantes import IndiceDiarizacion, asignar_hablantes
+
 logger = logging.getLogger(__name__)
 
 
@@ -326,35 +328,19 @@ def combinar_segmentos_whisper_pyannote(
         Lista de segmentos combinados
     """
     segmentos_combinados = []
+    asignaciones = asignar_hablantes(segmentos_whisper, diarizacion)
     
-    for seg_whisper in segmentos_whisper:
+    for seg_whisper, asignacion in zip(segmentos_whisper, asignaciones):
         inicio = seg_whisper.get('inicio', seg_whisper.get('start', 0.0))
         fin = seg_whisper.get('fin', seg_whisper.get('end', 0.0))
         texto = seg_whisper.get('texto', seg_whisper.get('text', ''))
         
-        # Buscar segmento de diarización que mejor coincida
+        # Hablante con mayor solapamiento (ya viene con mapeo cronológico)
         speaker_idx = 0  # Default
         speaker_confidence = 0.5
-        
-        mejor_overlap = 0.0
-        for seg_diar in diarizacion:
-            inicio_diar = seg_diar.get('inicio', seg_diar.get('start', 0.0))
-            fin_diar = seg_diar.get('fin', seg_diar.get('end', 0.0))
-            
-            # Calcular overlap temporal
-            overlap_inicio = max(inicio, inicio_diar)
-            overlap_fin = min(fin, fin_diar)
-            
-            if overlap_fin > overlap_inicio:
-                overlap_duracion = overlap_fin - overlap_inicio
-                whisper_duracion = fin - inicio
-                overlap_ratio = overlap_duracion / whisper_duracion if whisper_duracion > 0 else 0
-                
-                if overlap_ratio > mejor_overlap:
-                    mejor_overlap = overlap_ratio
-                    # USAR EL SPEAKER MAPEADO CRONOLÓGICAMENTE
-                    speaker_idx = seg_diar.get('speaker', 0)  # Ya viene con mapeo cronológico
-                    speaker_confidence = overlap_ratio
+        if asignacion['segmento'] is not None:
+            speaker_idx = asignacion['segmento'].get('speaker', 0)
+            speaker_confidence = asignacion['ratio']
         
         # Crear segmento combinado con mapeo cronológico aplicado
         segmento = {
@@ -382,19 +368,17 @@ def encontrar_hablante_en_tiempo(
     Args:
         inicio: Tiempo de inicio del segmento
         fin: Tiempo de fin del segmento
-        diarizacion: Lista de segmentos de diarización
+        diarizacion: Lista de segmentos de diarización (o IndiceDiarizacion ya construido)
         
     Returns:
         ID del hablante
     """
-    tiempo_medio = (inicio + fin) / 2
+    indice = IndiceDiarizacion.desde(diarizacion)
+    posicion = indice.contiene((inicio + fin) / 2)
     
-    for seg_diaz in diarizacion:
-        seg_inicio = seg_diaz.get('inicio', seg_diaz.get('start', 0.0))
-        seg_fin = seg_diaz.get('fin', seg_diaz.get('end', 0.0))
-        
-        if seg_inicio <= tiempo_medio <= seg_fin:
-            return seg_diaz.get('hablante', seg_diaz.get('speaker', 'SPEAKER_00'))
+    if posicion is not None:
+        seg_diaz = indice.segmentos[posicion]
+        return seg_diaz.get('hablante', seg_diaz.get('speaker', 'SPEAKER_00'))
     
     return 'SPEAKER_00'  # Fallback
 
@@ -410,19 +394,17 @@ def obtener_confianza_speaker(
     Args:
         inicio: Tiempo de inicio
         fin: Tiempo de fin
-        diarizacion: Lista de segmentos de diarización
+        diarizacion: Lista de segmentos de diarización (o IndiceDiarizacion ya construido)
         
     Returns:
         Confianza del speaker (0.0 a 1.0)
     """
-    tiempo_medio = (inicio + fin) / 2
+    indice = IndiceDiarizacion.desde(diarizacion)
+    posicion = indice.contiene((inicio + fin) / 2)
     
-    for seg_diaz in diarizacion:
-        seg_inicio = seg_diaz.get('inicio', seg_diaz.get('start', 0.0))
-        seg_fin = seg_diaz.get('fin', seg_diaz.get('end', 0.0))
-        
-        if seg_inicio <= tiempo_medio <= seg_fin:
-            return seg_diaz.get('confianza', seg_diaz.get('confidence', 1.0))
+    if posicion is not None:
+        seg_diaz = indice.segmentos[posicion]
+        return seg_diaz.get('confianza', seg_diaz.get('confidence', 1.0))
     
     return 1.0  # Confianza alta por defecto
 
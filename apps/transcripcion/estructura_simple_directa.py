@@ -7,6 +7,8 @@ import logging
 from typing import Dict, Any, List
 from datetime import datetime
 
+from .alineacion_hablantes import asignar_hablantes
+
 logger = logging.getLogger(__name__)
 
 def generar_estructura_simple(resultado_whisper: Dict[str, Any], 
@@ -113,6 +115,10 @@ def generar_estructura_simple(resultado_whisper: Dict[str, Any],
         
         logger.info(f"🔧 Generando conversación estructurada...")
         
+        # Alineación Whisper ↔ pyannote por barrido de intervalos (máximo solapamiento)
+        palabra_por_palabra = resultado_whisper.get('parametros_aplicados', {}).get('palabra_por_palabra', False)
+        asignaciones = asignar_hablantes(segmentos_whisper, segmentos_pyannote, por_palabras=palabra_por_palabra)
+        
         for i, segmento in enumerate(segmentos_whisper):
             # 1. OBTENER TIEMPO DE INICIO
             inicio = segmento.get('start', 0)
@@ -127,18 +133,10 @@ def generar_estructura_simple(resultado_whisper: Dict[str, Any],
             speaker_id = 0  # Default
             speaker_name = "Hablante 0"  # Default para mapeo
             
-            if segmentos_pyannote:
-                # Buscar segmento de pyannote que coincida temporalmente
-                for seg_pya in segmentos_pyannote:
-                    inicio_pya = seg_pya.get('inicio', 0)
-                    fin_pya = seg_pya.get('fin', 0)
-                    
-                    # Si hay overlap temporal entre whisper y pyannote
-                    if not (fin <= inicio_pya or inicio >= fin_pya):  # Hay overlap
-                        speaker_id = seg_pya.get('speaker', 0)
-                        speaker_name_pyannote = seg_pya.get('speaker_name', f'Hablante {speaker_id}')
-                        speaker_name = f'Hablante {speaker_id}'  # Para buscar en mapeo
-                        break
+            seg_pya = asignaciones[i]['segmento']
+            if seg_pya is not None:
+                speaker_id = seg_pya.get('speaker', 0)
+                speaker_name = f'Hablante {speaker_id}'  # Para buscar en mapeo
             
             # 3. APLICAR MAPEO DE NOMBRES REALES
             nombre_final = speaker_name  # Default
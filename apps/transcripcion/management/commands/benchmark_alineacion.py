@@ -0,0 +1,135 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.transcripcion.alineacion_hablantes import (
+    IndiceDiarizacion,
+    asignar_hablantes,
+    asignar_hablantes_ingenuo,
+    hablante_segmento,
+    tiempos_segmento,
+)
+
+
+def generar_segmentos(cantidad, duracion_total, hablantes=0, semilla=0, palabras=False):
+    """Segmentos contiguos con duraciones aleatorias que cubren ``duracion_total``"""
+    aleatorio = random.Random(semilla)
+    pesos = [aleatorio.uniform(0.5, 1.5) for _ in range(cantidad)]
+    escala = duracion_total / sum(pesos)
+
+    segmentos = []
+    inicio = 0.0
+    for peso in pesos:
+        fin = inicio + peso * escala
+        segmento = {'inicio': inicio, 'fin': fin}
+        if hablantes:
+            segmento['speaker'] = aleatorio.randrange(hablantes)
+        if palabras:
+            paso = (fin - inicio) / 4
+            segmento['palabras'] = [
+                {'inicio': inicio + paso * j, 'fin': inicio + paso * (j + 1)} for j in range(4)
+            ]
+        segmentos.append(segmento)
+        inicio = fin
+    return segmentos
+
+
+def solape_hablante(segmento, diarizacion, hablante):
+    """Segundos de ``segmento`` cubiertos por los turnos de ``hablante`` (fuerza bruta)"""
+    inicio, fin = tiempos_segmento(segmento)
+    return sum(
+        max(0.0, min(fin, tiempos_segmento(turno)[1]) - max(inicio, tiempos_segmento(turno)[0]))
+        for turno in diarizacion if hablante_segmento(turno) == hablante
+    )
+
+
+def generar_turnos_solapados(cantidad, duracion_total, hablantes, semilla=0):
+    """
+    Turnos con habla simultánea: cada hablante tiene su propia secuencia de
+    turnos que se cruza con las de los demás, más un turno de ruido de fondo
+    que dura toda la sesión (el caso que vuelve lineal un índice por prefijos)
+    """
+    aleatorio = random.Random(semilla)
+    turnos = [{'inicio': 0.0, 'fin': duracion_total, 'speaker': 'FONDO'}]
+    por_hablante = max(1, (cantidad - 1) // max(1, hablantes))
+    for hablante in range(hablantes):
+        for turno in generar_segmentos(por_hablante, duracion_total, semilla=semilla * 100 + hablante):
+            # Cada turno se alarga hasta un 50 % para invadir el siguiente
+            turno['fin'] = min(duracion_total, turno['fin'] + (turno['fin'] - turno['inicio']) * aleatorio.uniform(0, 0.5))
+            turno['speaker'] = hablante
+            turnos.append(turno)
+    aleatorio.shuffle(turnos)
+    return turnos
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark de la alineación Whisper ↔ diarización con segmentos sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--whisper', type=int, default=10000, help='Segmentos de Whisper')
+        parser.add_argument('--diarizacion', type=int, default=10000, help='Segmentos de diarización')
+        parser.add_argument('--duracion', type=float, default=3 * 3600, help='Duración simulada en segundos')
+        parser.add_argument('--hablantes', type=int, default=8)
+        parser.add_argument(
+            '--muestra-ingenua',
+            type=int,
+            default=500,
+            help='Segmentos de Whisper evaluados con la versión O(N×M); el tiempo se extrapola'
+        )
+        parser.add_argument('--completo', action='store_true', help='Ejecutar la versión O(N×M) completa')
+
+    def handle(self, *args, **options):
+        whisper = generar_segmentos(options['whisper'], options['duracion'], semilla=1, palabras=True)
+        escenarios = {
+            'turnos contiguos': generar_segmentos(
+                options['diarizacion'], options['duracion'], hablantes=options['hablantes'], semilla=2
+            ),
+            'turnos solapados': generar_turnos_solapados(
+                options['diarizacion'], options['duracion'], options['hablantes'], semilla=3
+            ),
+        }
+        for nombre, diarizacion in escenarios.items():
+            self.medir(nombre, whisper, diarizacion, options)
+
+    def medir(self, nombre, whisper, diarizacion, options):
+        self.stdout.write(self.style.SUCCESS(
+            f"📊 {nombre}: {len(whisper)} segmentos Whisper × {len(diarizacion)} segmentos de diarización "
+            f"({options['duracion'] / 3600:.1f} h)"
+        ))
+
+        inicio = time.perf_counter()
+        indice = IndiceDiarizacion(diarizacion)
+        tiempo_indice = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        asignaciones = asignar_hablantes(whisper, indice)
+        tiempo_barrido = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        asignar_hablantes(whisper, indice, por_palabras=True)
+        tiempo_palabras = time.perf_counter() - inicio
+
+        muestra = whisper if options['completo'] else whisper[:options['muestra_ingenua']]
+        inicio = time.perf_counter()
+        esperados = asignar_hablantes_ingenuo(muestra, diarizacion)
+        tiempo_ingenuo = (time.perf_counter() - inicio) * len(whisper) / max(1, len(muestra))
+
+        # Con turnos solapados hay empates entre hablantes; solo cuenta si el solapamiento elegido es peor
+        diferencias = sum(
+            1 for segmento, asignacion, esperado in zip(muestra, asignaciones, esperados)
+            if asignacion['hablante'] != esperado
+            and abs(solape_hablante(segmento, diarizacion, esperado) - asignacion['solapamiento']) > 1e-6
+        )
+
+        self.stdout.write(f'  - Construcción del índice: {tiempo_indice * 1000:.1f} ms')
+        self.stdout.write(f'  - Consulta por segmento:   {tiempo_barrido * 1000:.1f} ms')
+        self.stdout.write(f'  - Consulta por palabra:    {tiempo_palabras * 1000:.1f} ms')
+        etiqueta = 'medido' if options['completo'] else f'extrapolado de {len(muestra)} segmentos'
+        self.stdout.write(f'  - O(N×M) ingenuo:          {tiempo_ingenuo * 1000:.1f} ms ({etiqueta})')
+        self.stdout.write(f'  - Aceleración:             x{tiempo_ingenuo / max(1e-9, tiempo_indice + tiempo_barrido):.0f}')
+
+        if diferencias:
+            self.stdout.write(self.style.ERROR(f'❌ {diferencias} asignaciones difieren de la referencia'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ Asignaciones equivalentes a la referencia en {len(esperados)} segmentos comparados'))
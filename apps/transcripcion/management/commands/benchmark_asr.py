@@ -0,0 +1,165 @@
+import os
+import re
+import time
+import unicodedata
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.transcripcion.asr_backends import MOTORES, crear_motor
+
+ARCHIVOS_MUESTRA = [
+    'Sesión de concejo 1.m4a',
+    'Sesión de concejo 2.m4a',
+    'Sesión del 29.m4a',
+    'Cotopaxi 2.m4a',
+]
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes ni puntuación, para comparar palabras"""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'[^\w\s]', ' ', texto).split()
+
+
+def calcular_wer(referencia, hipotesis):
+    """Word Error Rate por distancia de edición a nivel de palabra"""
+    ref = normalizar_texto(referencia)
+    hip = normalizar_texto(hipotesis)
+    if not ref:
+        return 0.0 if not hip else 1.0
+
+    anterior = list(range(len(hip) + 1))
+    for i, palabra_ref in enumerate(ref, 1):
+        actual = [i] + [0] * len(hip)
+        for j, palabra_hip in enumerate(hip, 1):
+            actual[j] = min(
+                anterior[j] + 1,
+                actual[j - 1] + 1,
+                anterior[j - 1] + (palabra_ref != palabra_hip),
+            )
+        anterior = actual
+    return anterior[-1] / len(ref)
+
+
+class Command(BaseCommand):
+    help = 'Compara factor de tiempo real (RTF) y WER de los motores ASR sobre las sesiones de muestra'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--archivos',
+            nargs='+',
+            default=ARCHIVOS_MUESTRA,
+            help='Audios a evaluar (rutas relativas a la raíz del proyecto)'
+        )
+        parser.add_argument(
+            '--motores',
+            nargs='+',
+            default=list(MOTORES.keys()),
+            choices=list(MOTORES.keys()),
+            help='Motores ASR a comparar'
+        )
+        parser.add_argument('--modelo', default='base', help='Modelo Whisper (tiny, base, small, medium...)')
+        parser.add_argument('--idioma', default='es', help='Idioma de las sesiones')
+        parser.add_argument('--device', default='cpu', help='cpu o cuda')
+        parser.add_argument(
+            '--referencias',
+            help='Directorio con transcripciones de referencia <nombre_audio>.txt; '
+                 'sin referencias el WER se calcula contra el primer motor'
+        )
+
+    def handle(self, *args, **options):
+        motores = options['motores']
+        archivos = []
+        for nombre in options['archivos']:
+            ruta = nombre if os.path.isabs(nombre) else os.path.join(settings.BASE_DIR, nombre)
+            if os.path.exists(ruta):
+                archivos.append(ruta)
+            else:
+                self.stdout.write(self.style.WARNING(f'⚠️ No encontrado: {ruta}'))
+
+        if not archivos:
+            raise CommandError('No hay audios para evaluar')
+
+        import whisper
+
+        opciones = {
+            'language': options['idioma'],
+            'temperature': 0.0,
+            'task': 'transcribe',
+            'verbose': False,
+            'word_timestamps': False,
+        }
+
+        resultados = []
+        for ruta in archivos:
+            nombre = os.path.basename(ruta)
+            duracion = len(whisper.load_audio(ruta)) / 16000
+            self.stdout.write(self.style.SUCCESS(f'🎧 {nombre} ({duracion:.0f}s)'))
+
+            referencia = self._cargar_referencia(options.get('referencias'), nombre)
+            textos = {}
+            for nombre_motor in motores:
+                motor = crear_motor(nombre_motor, options['modelo'], options['device'])
+                if motor.nombre != nombre_motor:
+                    self.stdout.write(self.style.WARNING(f'  ⚠️ {nombre_motor} no instalado, se omite'))
+                    continue
+
+                inicio_carga = time.time()
+                motor.cargar()
+                tiempo_carga = time.time() - inicio_carga
+
+                inicio = time.time()
+                resultado = motor.transcribir(ruta, opciones)
+                tiempo = time.time() - inicio
+                motor.liberar()
+
+                textos[nombre_motor] = resultado.get('text', '')
+                resultados.append({
+                    'archivo': nombre,
+                    'motor': nombre_motor,
+                    'duracion': duracion,
+                    'tiempo': tiempo,
+                    'carga': tiempo_carga,
+                    'rtf': tiempo / duracion if duracion else 0.0,
+                    'segmentos': len(resultado.get('segments', [])),
+                })
+                self.stdout.write(f'  - {nombre_motor}: {tiempo:.1f}s (RTF {tiempo / duracion:.3f}, carga {tiempo_carga:.1f}s)')
+
+            base = referencia if referencia is not None else textos.get(motores[0], '')
+            for fila in resultados:
+                if fila['archivo'] == nombre and fila['motor'] in textos:
+                    fila['wer'] = calcular_wer(base, textos[fila['motor']])
+                    fila['wer_tipo'] = 'referencia' if referencia is not None else f'vs {motores[0]}'
+
+        self._imprimir_resumen(resultados)
+
+    def _cargar_referencia(self, directorio, nombre_audio):
+        if not directorio:
+            return None
+        ruta = os.path.join(directorio, os.path.splitext(nombre_audio)[0] + '.txt')
+        if not os.path.exists(ruta):
+            return None
+        with open(ruta, encoding='utf-8') as fh:
+            return fh.read()
+
+    def _imprimir_resumen(self, resultados):
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('📊 RESUMEN'))
+        self.stdout.write(f"{'Archivo':32} {'Motor':16} {'RTF':>7} {'WER':>7} {'Segs':>6}  Base WER")
+        for fila in resultados:
+            wer = f"{fila['wer'] * 100:6.1f}%" if 'wer' in fila else '    N/A'
+            self.stdout.write(
+                f"{fila['archivo'][:32]:32} {fila['motor']:16} {fila['rtf']:7.3f} {wer:>7} "
+                f"{fila['segmentos']:6d}  {fila.get('wer_tipo', '')}"
+            )
+
+        for nombre_motor in sorted({f['motor'] for f in resultados}):
+            filas = [f for f in resultados if f['motor'] == nombre_motor]
+            duracion = sum(f['duracion'] for f in filas)
+            tiempo = sum(f['tiempo'] for f in filas)
+            if duracion:
+                self.stdout.write(f'  {nombre_motor}: RTF global {tiempo / duracion:.3f}')
+
+        self.stdout.write('RTF < 1 significa más rápido que tiempo real')
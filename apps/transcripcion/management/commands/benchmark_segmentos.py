@@ -0,0 +1,157 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.audio_processing.models import ProcesamientoAudio, TipoReunion
+from apps.transcripcion.models import EstadoTranscripcion, Transcripcion
+from apps.transcripcion.segmentos import editar_segmento, reconstruir_segmentos
+
+
+def conversacion_sintetica(cantidad, duracion_total, hablantes, semilla=0):
+    """Estructura como la de finalizar_transcripcion con ``cantidad`` segmentos"""
+    aleatorio = random.Random(semilla)
+    paso = duracion_total / cantidad
+    conversacion = []
+    for i in range(cantidad):
+        hablante = aleatorio.randrange(hablantes)
+        conversacion.append({
+            'inicio': round(i * paso, 2),
+            'fin': round((i + 1) * paso - 0.1, 2),
+            'duracion': round(paso - 0.1, 2),
+            'hablante': f'Concejal {hablante + 1}',
+            'hablante_id': str(hablante + 1),
+            'texto': ' '.join(aleatorio.choice(['moción', 'sesión', 'votación', 'ordenanza', 'informe', 'presupuesto'])
+                              for _ in range(25)),
+            'confianza': round(aleatorio.uniform(0.7, 1.0), 3),
+        })
+    return {
+        'cabecera': {'mapeo_hablantes': {str(h + 1): {'nombre': f'Concejal {h + 1}'} for h in range(hablantes)}},
+        'conversacion': conversacion,
+        'texto_estructurado': '',
+        'metadata': {'total_segmentos': cantidad},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide editar un segmento reescribiendo conversacion_json completo frente al UPDATE de una fila '
+        'de SegmentoTranscripcion (todo se revierte al terminar)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segmentos', type=int, default=4000)
+        parser.add_argument('--duracion', type=float, default=3 * 3600, help='Duración simulada en segundos')
+        parser.add_argument('--hablantes', type=int, default=8)
+        parser.add_argument('--ediciones', type=int, default=20, help='Ediciones de un segmento por escenario')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.ERROR('❌ El benchmark necesita PostgreSQL'))
+            return
+
+        with transaction.atomic():
+            transcripcion = self.crear_transcripcion(options)
+            resultados = {
+                'blob': self.medir(options, lambda i: self.editar_blob(transcripcion.pk, i, options)),
+                'segmentos': self.medir(options, lambda i: self.editar_fila(transcripcion.pk, i, options)),
+            }
+
+            # Coste diferido: la primera lectura regenera el JSON una sola vez
+            inicio = time.perf_counter()
+            Transcripcion.objects.get(pk=transcripcion.pk).sincronizar_conversacion()
+            regeneracion = time.perf_counter() - inicio
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_column_size(conversacion_json) FROM transcripcion_transcripcion WHERE id = %s',
+                    [transcripcion.pk]
+                )
+                bytes_json = cursor.fetchone()[0]
+
+            # Nada del benchmark queda en la base de datos
+            transaction.set_rollback(True)
+
+        self.mostrar(resultados, regeneracion, bytes_json, options)
+
+    def crear_transcripcion(self, options):
+        usuario = User.objects.create_user(f'benchmark_segmentos_{time.time_ns()}')
+        audio = ProcesamientoAudio.objects.create(
+            titulo='Benchmark de edición de segmentos',
+            tipo_reunion=TipoReunion.objects.get_or_create(nombre='Benchmark')[0],
+            usuario=usuario,
+            archivo_audio='audio/benchmark.wav',
+        )
+        transcripcion = Transcripcion.objects.create(
+            procesamiento_audio=audio,
+            usuario_creacion=usuario,
+            estado=EstadoTranscripcion.COMPLETADO,
+            conversacion_json=conversacion_sintetica(options['segmentos'], options['duracion'], options['hablantes']),
+            numero_segmentos=options['segmentos'],
+        )
+        reconstruir_segmentos(transcripcion)
+        return transcripcion
+
+    def editar_blob(self, transcripcion_id, i, options):
+        """Camino anterior: leer la fila completa, modificar la lista y guardar el blob"""
+        transcripcion = Transcripcion.objects.get(pk=transcripcion_id)
+        conversacion = transcripcion.conversacion_json['conversacion']
+        conversacion[i * 197 % options['segmentos']]['texto'] = f'Texto corregido {i}'
+        transcripcion.save()
+
+    def editar_fila(self, transcripcion_id, i, options):
+        """Camino nuevo: UPDATE de la fila del segmento y de las columnas de estado de la transcripción"""
+        if i == 0:
+            # Como un cliente: la versión leída al cargar y luego la que devuelve cada edición
+            self.version_actual = Transcripcion.objects.values_list('version_actual', flat=True).get(pk=transcripcion_id)
+        _, self.version_actual = editar_segmento(
+            transcripcion_id, i * 197 % options['segmentos'], {'texto': f'Texto corregido {i}'},
+            version_actual=self.version_actual,
+        )
+
+    def wal_actual(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_current_wal_insert_lsn()')
+            return cursor.fetchone()[0]
+
+    def medir(self, options, editar):
+        wal_inicio = self.wal_actual()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            for i in range(options['ediciones']):
+                editar(i)
+            duracion = time.perf_counter() - inicio
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)', [wal_inicio])
+            bytes_wal = int(cursor.fetchone()[0])
+        return {
+            'segundos': duracion,
+            'consultas': len(consultas.captured_queries),
+            'bytes_enviados': sum(len(c['sql']) for c in consultas.captured_queries),
+            'bytes_wal': bytes_wal,
+        }
+
+    def mostrar(self, resultados, regeneracion, bytes_json, options):
+        ediciones = options['ediciones']
+        self.stdout.write(self.style.SUCCESS(
+            f"📊 {options['segmentos']} segmentos ({options['duracion'] / 3600:.1f} h), "
+            f"conversacion_json de {bytes_json / 1024:.0f} KB en disco, {ediciones} ediciones"
+        ))
+        for escenario, datos in resultados.items():
+            self.stdout.write(
+                f"  {escenario:10s} {datos['segundos'] * 1000 / ediciones:8.2f} ms/edición  "
+                f"{datos['consultas'] / ediciones:4.1f} consultas  "
+                f"{datos['bytes_enviados'] / ediciones / 1024:9.1f} KB enviados  "
+                f"{datos['bytes_wal'] / ediciones / 1024:9.1f} KB de WAL por edición"
+            )
+
+        antes, despues = resultados['blob'], resultados['segmentos']
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Edición de un segmento: {antes['segundos'] * 1000 / ediciones:.2f} ms → "
+            f"{despues['segundos'] * 1000 / ediciones:.2f} ms, "
+            f"WAL {antes['bytes_wal'] / max(1, despues['bytes_wal']):.1f}× menor; "
+            f"la siguiente lectura regenera el JSON una vez en {regeneracion * 1000:.0f} ms"
+        ))
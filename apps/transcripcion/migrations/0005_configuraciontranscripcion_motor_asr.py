@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripcion', '0004_alter_configuraciontranscripcion_vad_filtro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuraciontranscripcion',
+            name='motor_asr',
+            field=models.CharField(choices=[('openai_whisper', 'OpenAI Whisper (PyTorch)'), ('faster_whisper', 'Faster Whisper (CTranslate2 int8) - Recomendado en CPU')], default='openai_whisper', help_text='Motor de inferencia usado para ejecutar el modelo Whisper', max_length=30),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.9 on 2026-10-17 12:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Copias congeladas de los helpers de ``transcripcion.segmentos``: la migración
+# no debe depender del código vivo de la app.
+CAMPOS = ('inicio', 'fin', 'hablante', 'hablante_id', 'texto')
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def segmentos_desde_json(estructura):
+    """Columnas de SegmentoTranscripcion para cada segmento de ``conversacion_json``"""
+    if isinstance(estructura, dict):
+        estructura = estructura.get('conversacion', [])
+    if not isinstance(estructura, list):
+        return []
+    segmentos = [segmento for segmento in estructura if isinstance(segmento, dict)]
+    return [
+        {
+            'orden': orden,
+            'inicio': _numero(segmento.get('inicio')),
+            'fin': _numero(segmento.get('fin')),
+            'hablante': str(segmento.get('hablante') or '')[:200],
+            'hablante_id': str(segmento.get('hablante_id') or '')[:100],
+            'texto': str(segmento.get('texto') or ''),
+            'datos': {clave: valor for clave, valor in segmento.items() if clave not in CAMPOS and clave != 'version'},
+        }
+        for orden, segmento in enumerate(segmentos)
+    ]
+
+
+def poblar_segmentos(apps, schema_editor):
+    """Crea una fila por segmento de la conversacion_json de cada transcripción"""
+    Transcripcion = apps.get_model('transcripcion', 'Transcripcion')
+    SegmentoTranscripcion = apps.get_model('transcripcion', 'SegmentoTranscripcion')
+
+    filas = []
+    for transcripcion in Transcripcion.objects.only('id', 'conversacion_json').iterator(chunk_size=50):
+        filas.extend(
+            SegmentoTranscripcion(transcripcion_id=transcripcion.id, **fila)
+            for fila in segmentos_desde_json(transcripcion.conversacion_json)
+        )
+        if len(filas) >= 5000:
+            SegmentoTranscripcion.objects.bulk_create(filas, batch_size=1000)
+            filas = []
+    SegmentoTranscripcion.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripcion', '0005_configuraciontranscripcion_motor_asr'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcripcion',
+            name='conversacion_desactualizada',
+            field=models.BooleanField(default=False, help_text='Hay ediciones en los segmentos que aún no se copiaron a conversacion_json'),
+        ),
+        migrations.CreateModel(
+            name='SegmentoTranscripcion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orden', models.IntegerField()),
+                ('inicio', models.FloatField(default=0)),
+                ('fin', models.FloatField(default=0)),
+                ('hablante', models.CharField(blank=True, max_length=200)),
+                ('hablante_id', models.CharField(blank=True, max_length=100)),
+                ('texto', models.TextField(blank=True)),
+                ('datos', models.JSONField(default=dict, help_text='Resto de claves del segmento original (confianza, color, marcas de edición...)')),
+                ('version', models.IntegerField(default=1)),
+                ('transcripcion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segmentos', to='transcripcion.transcripcion')),
+            ],
+            options={
+                'verbose_name': 'Segmento de Transcripción',
+                'verbose_name_plural': 'Segmentos de Transcripción',
+                'ordering': ['orden', 'id'],
+                'indexes': [models.Index(fields=['transcripcion', 'orden'], name='transcripci_transcr_45ffbb_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_segmentos, migrations.RunPython.noop),
+    ]
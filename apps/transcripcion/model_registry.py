@@ -0,0 +1,316 @@
+"""
+Registro de modelos a nivel de proceso para los workers de transcripción
+
+Mantiene "calientes" los modelos de Whisper y el pipeline de pyannote entre
+tareas de Celery en lugar de cargarlos y liberarlos en cada transcripción.
+Incluye precarga en ``worker_process_init``, conteo de referencias por modelo
+y expulsión LRU según un presupuesto de RAM configurable.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Tamaños aproximados en memoria (MB) para estimar el presupuesto de RAM
+TAMANOS_WHISPER_MB = {
+    'tiny': 39,
+    'base': 74,
+    'small': 244,
+    'medium': 769,
+    'large': 1550,
+    'large-v2': 1550,
+    'large-v3': 1550,
+}
+TAMANO_PYANNOTE_MB = 120
+TAMANO_DESCONOCIDO_MB = 500
+
+CONFIG_DEFECTO = {
+    'PRESUPUESTO_RAM_MB': 4096,
+    'PRECARGAR_WHISPER': [],
+    'PRECARGAR_PYANNOTE': False,
+    'DEVICE': 'auto',  # auto = cuda si hay GPU, si no cpu
+}
+
+
+def get_config_modelos() -> Dict[str, Any]:
+    """Obtiene la configuración del registro combinando defaults y settings"""
+    config = dict(CONFIG_DEFECTO)
+    config.update(getattr(settings, 'TRANSCRIPCION_MODELOS', {}) or {})
+    return config
+
+
+class EntradaModelo:
+    """Modelo cargado en el registro con sus metadatos de uso"""
+
+    def __init__(self, clave: str, objeto: Any, tamano_mb: float):
+        self.clave = clave
+        self.objeto = objeto
+        self.tamano_mb = tamano_mb
+        self.referencias = 0
+        self.cargado_en = time.time()
+        self.ultimo_uso = self.cargado_en
+        self.usos = 0
+
+
+class RegistroModelos:
+    """
+    Registro LRU de modelos con conteo de referencias.
+
+    Un modelo con referencias activas nunca se expulsa; los modelos sin uso se
+    descargan del más antiguo al más reciente hasta respetar el presupuesto.
+    """
+
+    def __init__(self, presupuesto_mb: float):
+        self.presupuesto_mb = presupuesto_mb
+        self._modelos: 'OrderedDict[str, EntradaModelo]' = OrderedDict()
+        self._lock = threading.RLock()
+        self.cargas = 0
+        self.aciertos = 0
+        self.expulsiones = 0
+
+    @property
+    def memoria_usada_mb(self) -> float:
+        return sum(entrada.tamano_mb for entrada in self._modelos.values())
+
+    def adquirir(self, clave: str, cargador: Callable[[], Any], tamano_mb: float = TAMANO_DESCONOCIDO_MB) -> Any:
+        """
+        Devuelve el modelo ``clave`` cargándolo con ``cargador`` si no está en
+        memoria, e incrementa su contador de referencias.
+        """
+        with self._lock:
+            entrada = self._modelos.get(clave)
+            if entrada is not None:
+                self.aciertos += 1
+                logger.info(f"♻️ Modelo {clave} reutilizado desde el registro")
+            else:
+                self._expulsar(tamano_mb)
+                logger.info(f"🔧 Cargando modelo {clave} en el registro ({tamano_mb} MB)")
+                inicio = time.time()
+                objeto = cargador()
+                entrada = EntradaModelo(clave, objeto, tamano_mb)
+                self._modelos[clave] = entrada
+                self.cargas += 1
+                logger.info(f"✅ Modelo {clave} cargado en {time.time() - inicio:.1f}s")
+
+            entrada.referencias += 1
+            entrada.usos += 1
+            entrada.ultimo_uso = time.time()
+            self._modelos.move_to_end(clave)
+            return entrada.objeto
+
+    def liberar(self, clave: str):
+        """Decrementa el contador de referencias; el modelo queda en caché"""
+        with self._lock:
+            entrada = self._modelos.get(clave)
+            if entrada is None:
+                return
+            entrada.referencias = max(0, entrada.referencias - 1)
+            entrada.ultimo_uso = time.time()
+            # Si el presupuesto se redujo o se excedió con modelos en uso
+            self._expulsar(0)
+
+    @contextmanager
+    def usar(self, clave: str, cargador: Callable[[], Any], tamano_mb: float = TAMANO_DESCONOCIDO_MB):
+        """Context manager que adquiere y libera el modelo automáticamente"""
+        objeto = self.adquirir(clave, cargador, tamano_mb)
+        try:
+            yield objeto
+        finally:
+            self.liberar(clave)
+
+    def descargar(self, clave: str, forzar: bool = False) -> bool:
+        """Descarga un modelo concreto si no tiene referencias activas"""
+        with self._lock:
+            entrada = self._modelos.get(clave)
+            if entrada is None:
+                return False
+            if entrada.referencias > 0 and not forzar:
+                logger.warning(f"⚠️ Modelo {clave} en uso ({entrada.referencias} refs), no se descarga")
+                return False
+            self._descargar_entrada(entrada)
+            return True
+
+    def descargar_todo(self):
+        """Descarga todos los modelos sin referencias activas"""
+        with self._lock:
+            for clave in list(self._modelos.keys()):
+                self.descargar(clave)
+
+    def contiene(self, clave: str) -> bool:
+        with self._lock:
+            return clave in self._modelos
+
+    def estado(self) -> Dict[str, Any]:
+        """Resumen del registro para auditoría y monitoreo"""
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'presupuesto_mb': self.presupuesto_mb,
+                'memoria_usada_mb': self.memoria_usada_mb,
+                'cargas': self.cargas,
+                'aciertos': self.aciertos,
+                'expulsiones': self.expulsiones,
+                'modelos': [
+                    {
+                        'clave': entrada.clave,
+                        'tamano_mb': entrada.tamano_mb,
+                        'referencias': entrada.referencias,
+                        'usos': entrada.usos,
+                        'ultimo_uso': entrada.ultimo_uso,
+                    }
+                    for entrada in self._modelos.values()
+                ],
+            }
+
+    def _expulsar(self, requerido_mb: float):
+        """Expulsa modelos LRU sin referencias hasta que quepa ``requerido_mb``"""
+        for clave in list(self._modelos.keys()):
+            if self.memoria_usada_mb + requerido_mb <= self.presupuesto_mb:
+                break
+            entrada = self._modelos[clave]
+            if entrada.referencias > 0:
+                continue
+            logger.info(f"🧹 Expulsando modelo {clave} del registro (LRU)")
+            self._descargar_entrada(entrada)
+            self.expulsiones += 1
+
+        if self.memoria_usada_mb + requerido_mb > self.presupuesto_mb:
+            logger.warning(
+                f"⚠️ Presupuesto de modelos excedido: {self.memoria_usada_mb + requerido_mb} MB "
+                f"> {self.presupuesto_mb} MB (modelos en uso no expulsables)"
+            )
+
+    def _descargar_entrada(self, entrada: EntradaModelo):
+        self._modelos.pop(entrada.clave, None)
+        entrada.objeto = None
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        import gc
+        gc.collect()
+
+
+_registro: Optional[RegistroModelos] = None
+_registro_lock = threading.Lock()
+
+
+def get_registro() -> RegistroModelos:
+    """Devuelve el registro único del proceso actual"""
+    global _registro
+    if _registro is None:
+        with _registro_lock:
+            if _registro is None:
+                _registro = RegistroModelos(get_config_modelos()['PRESUPUESTO_RAM_MB'])
+    return _registro
+
+
+_device_resuelto: Optional[str] = None
+
+
+def resolver_device(usar_gpu: bool = True) -> str:
+    """
+    Device de los modelos de transcripción del proceso
+
+    ``DEVICE`` se resuelve una sola vez ('auto' pasa a cuda o cpu) para que la
+    precarga y las tareas usen la misma clave del registro. ``usar_gpu=False``
+    (configuración de la transcripción) fuerza cpu.
+    """
+    global _device_resuelto
+    if _device_resuelto is None:
+        device = get_config_modelos()['DEVICE'] or 'auto'
+        if device == 'auto':
+            try:
+                import torch
+                device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            except ImportError:
+                device = 'cpu'
+        _device_resuelto = device
+    return _device_resuelto if usar_gpu else 'cpu'
+
+
+def clave_whisper(modelo_nombre: str, device: str) -> str:
+    return f"whisper:{modelo_nombre}:{device}"
+
+
+def clave_pyannote(modelo_diarizacion: str) -> str:
+    return f"pyannote:{modelo_diarizacion}"
+
+
+def adquirir_whisper(modelo_nombre: str, device: str = 'cpu') -> Any:
+    """Obtiene un modelo Whisper del registro (lo carga si es necesario)"""
+    import whisper
+
+    return get_registro().adquirir(
+        clave_whisper(modelo_nombre, device),
+        lambda: whisper.load_model(modelo_nombre, device=device),
+        TAMANOS_WHISPER_MB.get(modelo_nombre, TAMANO_DESCONOCIDO_MB),
+    )
+
+
+def liberar_whisper(modelo_nombre: str, device: str = 'cpu'):
+    get_registro().liberar(clave_whisper(modelo_nombre, device))
+
+
+def adquirir_pyannote(modelo_diarizacion: str, token: str) -> Any:
+    """Obtiene el pipeline de pyannote del registro (lo carga si es necesario)"""
+    from pyannote.audio import Pipeline
+
+    return get_registro().adquirir(
+        clave_pyannote(modelo_diarizacion),
+        lambda: Pipeline.from_pretrained(modelo_diarizacion, use_auth_token=token),
+        TAMANO_PYANNOTE_MB,
+    )
+
+
+def liberar_pyannote(modelo_diarizacion: str):
+    get_registro().liberar(clave_pyannote(modelo_diarizacion))
+
+
+def precargar_modelos():
+    """Precarga los modelos configurados en ``TRANSCRIPCION_MODELOS``"""
+    config = get_config_modelos()
+    device = resolver_device()
+
+    for modelo_nombre in config['PRECARGAR_WHISPER']:
+        try:
+            adquirir_whisper(modelo_nombre, device)
+            liberar_whisper(modelo_nombre, device)
+        except Exception as e:
+            logger.error(f"❌ Error precargando Whisper {modelo_nombre}: {str(e)}")
+
+    if config['PRECARGAR_PYANNOTE']:
+        token = os.getenv('HUGGINGFACE_TOKEN')
+        if not token:
+            logger.warning("⚠️ HUGGINGFACE_TOKEN no definido, no se precarga pyannote")
+            return
+        modelo_diarizacion = "pyannote/speaker-diarization@2.1"
+        try:
+            adquirir_pyannote(modelo_diarizacion, token)
+            liberar_pyannote(modelo_diarizacion)
+        except Exception as e:
+            logger.error(f"❌ Error precargando pyannote: {str(e)}")
+
+
+try:
+    from celery.signals import worker_process_init
+
+    @worker_process_init.connect
+    def precargar_modelos_worker(**kwargs):
+        """Precarga modelos al iniciar cada proceso hijo del worker"""
+        global _registro
+        # El registro heredado por fork no debe compartirse entre procesos
+        _registro = None
+        precargar_modelos()
+        logger.info(f"🚀 Registro de modelos listo: {get_registro().estado()}")
+except ImportError:
+    pass
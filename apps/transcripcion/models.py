@@ -36,6 +36,15 @@ class ConfiguracionTranscripcion(models.Model):
         default='base',
         help_text="Modelo de Whisper para transcripción"
     )
+    motor_asr = models.CharField(
+        max_length=30,
+        choices=[
+            ('openai_whisper', 'OpenAI Whisper (PyTorch)'),
+            ('faster_whisper', 'Faster Whisper (CTranslate2 int8) - Recomendado en CPU'),
+        ],
+        default='openai_whisper',
+        help_text="Motor de inferencia usado para ejecutar el modelo Whisper"
+    )
     idioma_principal = models.CharField(
         max_length=10,
         choices=[
@@ -166,6 +175,7 @@ class ConfiguracionTranscripcion(models.Model):
         import json
         return json.dumps({
             'modelo_whisper': self.modelo_whisper,
+            'motor_asr': self.motor_asr,
             'temperatura': float(self.temperatura),
             'idioma_principal': self.idioma_principal,
             'usar_vad': self.usar_vad,
@@ -295,6 +305,10 @@ class Transcripcion(models.Model):
         default=list,
         help_text="Conversación estructurada con hablantes, tiempos y texto"
     )
+    conversacion_desactualizada = models.BooleanField(
+        default=False,
+        help_text="Hay ediciones en los segmentos que aún no se copiaron a conversacion_json"
+    )
     
     # Metadatos de hablantes
     hablantes_detectados = models.JSONField(
@@ -388,6 +402,18 @@ class Transcripcion(models.Model):
             base += f" - {estado_display}"
         return base
 
+    def save(self, *args, **kwargs):
+        # conversacion_desactualizada solo la cambian las ediciones de segmentos con update():
+        # un save() completo de una instancia leída antes de la edición no debe reiniciarla
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.attname not in diferidos
+                and campo.name != 'conversacion_desactualizada'
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def duracion_proceso(self):
         """Calcula la duración del proceso de transcripción"""
@@ -405,6 +431,17 @@ class Transcripcion(models.Model):
         """Verifica si hay errores en la transcripción"""
         return self.estado == EstadoTranscripcion.ERROR
 
+    def sincronizar_conversacion(self):
+        """
+        Devuelve conversacion_json regenerándolo antes desde los segmentos
+        normalizados si hay ediciones pendientes
+        """
+        if self.conversacion_desactualizada:
+            from .segmentos import regenerar_conversacion_json
+            self.conversacion_json = regenerar_conversacion_json(self.pk)
+            self.conversacion_desactualizada = False
+        return self.conversacion_json
+
     def get_nombre_hablante(self, speaker_id):
         """Obtiene el nombre real de un hablante por su ID"""
         return self.hablantes_identificados.get(speaker_id, f"Hablante {speaker_id}")
@@ -419,6 +456,7 @@ class Transcripcion(models.Model):
         if self.configuracion_utilizada:
             config_base = {
                 'modelo_whisper': self.configuracion_utilizada.modelo_whisper,
+                'motor_asr': getattr(self.configuracion_utilizada, 'motor_asr', 'openai_whisper'),
                 'temperatura': self.configuracion_utilizada.temperatura,
                 'idioma_principal': self.configuracion_utilizada.idioma_principal,
                 'usar_vad': self.configuracion_utilizada.usar_vad,
@@ -510,6 +548,43 @@ class HistorialEdicion(models.Model):
         return f"{self.get_tipo_edicion_display()} - v{self.version} por {self.usuario.username}"
 
 
+class SegmentoTranscripcion(models.Model):
+    """
+    Segmento de la conversación editado fila a fila
+
+    ``orden`` es la posición en la conversación (0..n-1). ``version`` se
+    incrementa en cada edición y sirve de control de concurrencia optimista.
+    """
+
+    transcripcion = models.ForeignKey(
+        Transcripcion,
+        on_delete=models.CASCADE,
+        related_name='segmentos'
+    )
+    orden = models.IntegerField()
+    inicio = models.FloatField(default=0)
+    fin = models.FloatField(default=0)
+    hablante = models.CharField(max_length=200, blank=True)
+    hablante_id = models.CharField(max_length=100, blank=True)
+    texto = models.TextField(blank=True)
+    datos = models.JSONField(
+        default=dict,
+        help_text="Resto de claves del segmento original (confianza, color, marcas de edición...)"
+    )
+    version = models.IntegerField(default=1)
+
+    class Meta:
+        verbose_name = "Segmento de Transcripción"
+        verbose_name_plural = "Segmentos de Transcripción"
+        ordering = ['orden', 'id']
+        indexes = [
+            models.Index(fields=['transcripcion', 'orden']),
+        ]
+
+    def __str__(self):
+        return f"{self.orden}: {self.hablante} ({self.inicio:.1f}s-{self.fin:.1f}s)"
+
+
 class ConfiguracionHablante(models.Model):
     """Configuración y metadatos de hablantes para una transcripción"""
     
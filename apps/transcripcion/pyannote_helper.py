@@ -13,6 +13,10 @@ from typing import Dict, Any, Optional, List, Tuple
 import json
 import numpy as np
 
+from django.conf import settings
+
+from .alineacion_hablantes import asignar_hablantes
+
 try:
     from pyannote.audio import Pipeline
     from pyannote.core import Annotation, Segment
@@ -25,11 +29,20 @@ except ImportError:
 try:
     from resemblyzer import VoiceEncoder, preprocess_wav
     import soundfile as sf
-    from sklearn.cluster import AgglomerativeClustering
+    import torch
+    from sklearn.cluster import AgglomerativeClustering, MiniBatchKMeans
     RESEMBLYZER_AVAILABLE = True
 except ImportError:
     RESEMBLYZER_AVAILABLE = False
 
+# Internos de resemblyzer para el cálculo de embeddings por lotes
+try:
+    from resemblyzer.audio import wav_to_mel_spectrogram
+    from resemblyzer.hparams import mel_window_step, partials_n_frames, sampling_rate as RESEMBLYZER_SR
+    RESEMBLYZER_LOTES_AVAILABLE = True
+except ImportError:
+    RESEMBLYZER_LOTES_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 # ✅ CONFIGURACIÓN OPTIMIZADA (del ejemplo)
@@ -42,6 +55,16 @@ _pipeline_cache = {}
 _encoder_cache = None
 
 
+def get_config_resemblyzer() -> Dict[str, Any]:
+    config = {
+        'TAMANO_LOTE': 64,
+        'MAX_FRAMES_AGLOMERATIVO': 4000,
+        'MICRO_CLUSTERS': 256,
+    }
+    config.update(getattr(settings, 'TRANSCRIPCION_RESEMBLYZER', {}) or {})
+    return config
+
+
 class PyannoteProcessor:
     """Procesador de diarización con mejores prácticas adoptadas del ejemplo"""
     
@@ -87,25 +110,18 @@ class PyannoteProcessor:
             except Exception:
                 pass
 
-            # Extraer embeddings por frames
-            times = []
-            embeds = []
-            for t, frame in self._frame_signal(wav, sr, frame_ms=1000, hop_ms=500):
-                try:
-                    emb = _encoder_cache.embed_utterance(frame)
-                    embeds.append(emb)
-                    times.append(t)
-                except Exception:
-                    continue
+            config = get_config_resemblyzer()
 
-            if len(embeds) == 0:
+            # Extraer embeddings por frames (por lotes sobre un único mel-espectrograma)
+            times, X = self._embeddings_por_lotes(wav, sr, config['TAMANO_LOTE'])
+            if X is None:
+                times, X = self._embeddings_por_frame(wav, sr)
+
+            if len(times) == 0:
                 return {"num_speakers": 0, "speakers": [], "segments": [], "backend": "resemblyzer"}
 
-            X = np.vstack(embeds)
             n_speakers = max_speakers or min(_MAX_SPEAKERS, 5)
-
-            clustering = AgglomerativeClustering(n_clusters=max(1, int(n_speakers)))
-            labels = clustering.fit_predict(X)
+            labels = self._agrupar_embeddings(X, max(1, int(n_speakers)), config)
 
             # Construir segmentos por etiqueta
             segments = []
@@ -135,6 +151,87 @@ class PyannoteProcessor:
             logger.error(f"Error en fallback resemblyzer: {str(e)}")
             return {"num_speakers": 0, "speakers": [], "segments": [], "backend": "error"}
     
+    def _embeddings_por_frame(self, wav: np.ndarray, sr: int) -> Tuple[List[float], Optional[np.ndarray]]:
+        """Ruta original: un ``embed_utterance`` por frame de 1s"""
+        times = []
+        embeds = []
+        for t, frame in self._frame_signal(wav, sr, frame_ms=1000, hop_ms=500):
+            try:
+                emb = _encoder_cache.embed_utterance(frame)
+                embeds.append(emb)
+                times.append(t)
+            except Exception:
+                continue
+        return times, (np.vstack(embeds) if embeds else None)
+
+    def _embeddings_por_lotes(self, wav: np.ndarray, sr: int, tamano_lote: int,
+                              frame_ms=1000, hop_ms=500) -> Tuple[List[float], Optional[np.ndarray]]:
+        """
+        Embeddings de los mismos frames que ``_frame_signal`` pero calculando el
+        mel-espectrograma del archivo una sola vez y pasando los frames por el
+        encoder en lotes de ``tamano_lote``.
+
+        Cada frame se rellena con ceros hasta ``partials_n_frames`` como hace
+        ``embed_utterance`` con audios cortos. Devuelve ``(times, None)`` si la
+        ruta por lotes no está disponible.
+        """
+        if not RESEMBLYZER_LOTES_AVAILABLE or sr != RESEMBLYZER_SR:
+            return [], None
+
+        try:
+            mel = wav_to_mel_spectrogram(wav)  # (n_frames_mel, mel_n_channels)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo calcular el mel-espectrograma completo: {str(e)}")
+            return [], None
+
+        pasos_por_segundo = 1000 / mel_window_step
+        frame_len = int(round(frame_ms / 1000 * pasos_por_segundo))
+        hop_len = int(round(hop_ms / 1000 * pasos_por_segundo))
+        ventana = max(frame_len, partials_n_frames)
+        n_frames = (len(wav) - int(sr * frame_ms / 1000)) // int(sr * hop_ms / 1000) + 1
+        if n_frames <= 0:
+            return [], np.empty((0, 0))
+
+        # Relleno al final para que todos los frames tengan ``ventana`` pasos
+        mel = np.pad(mel, ((0, max(0, (n_frames - 1) * hop_len + ventana - len(mel))), (0, 0)))
+        mascara = np.zeros((ventana, 1), dtype=mel.dtype)
+        mascara[:frame_len] = 1.0
+
+        times = [i * hop_ms / 1000 for i in range(n_frames)]
+        embeds = []
+        tamano_lote = max(1, int(tamano_lote))
+        with torch.no_grad():
+            for inicio in range(0, n_frames, tamano_lote):
+                indices = range(inicio, min(n_frames, inicio + tamano_lote))
+                lote = np.stack([mel[i * hop_len:i * hop_len + ventana] * mascara for i in indices])
+                salida = _encoder_cache(torch.from_numpy(lote).to(_encoder_cache.device))
+                embeds.append(salida.cpu().numpy())
+
+        logger.info(f"🧮 Resemblyzer: {n_frames} embeddings en {len(embeds)} lotes de hasta {tamano_lote}")
+        return times, np.vstack(embeds)
+
+    def _agrupar_embeddings(self, X: np.ndarray, n_speakers: int, config: Dict[str, Any]) -> np.ndarray:
+        """
+        Clustering de embeddings en ``n_speakers`` grupos.
+
+        Con pocos frames se usa ``AgglomerativeClustering`` directo. En
+        grabaciones largas su matriz de distancias O(n²) no cabe en memoria, así
+        que primero se resumen los frames con ``MiniBatchKMeans`` en micro-clusters
+        y luego se aglomeran sus centroides.
+        """
+        n_speakers = min(n_speakers, len(X))
+        if len(X) <= config['MAX_FRAMES_AGLOMERATIVO']:
+            return AgglomerativeClustering(n_clusters=n_speakers).fit_predict(X)
+
+        n_micro = max(n_speakers, min(config['MICRO_CLUSTERS'], len(X)))
+        logger.info(f"🧮 Clustering escalable: {len(X)} frames → {n_micro} micro-clusters → {n_speakers} hablantes")
+        micro = MiniBatchKMeans(n_clusters=n_micro, batch_size=1024, n_init=3, random_state=0)
+        micro_labels = micro.fit_predict(X)
+        centroides = micro.cluster_centers_
+        centroides = centroides / np.maximum(np.linalg.norm(centroides, axis=1, keepdims=True), 1e-8)
+        labels_centroides = AgglomerativeClustering(n_clusters=n_speakers).fit_predict(centroides)
+        return labels_centroides[micro_labels]
+
     def _merge_contiguous_segments(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         ✅ MERGE INTELIGENTE DE SEGMENTOS CONTIGUOS (del ejemplo)
@@ -227,30 +324,19 @@ class PyannoteProcessor:
         """
         diar_segs = diarization.get("segments", [])
         tx_segs = transcription.get("segments", [])
+        asignaciones = asignar_hablantes(tx_segs, diar_segs)
 
         labeled = []
-        for tx in tx_segs:
+        for tx, asignacion in zip(tx_segs, asignaciones):
             t_start = tx["start"]
             t_end = tx["end"]
             
-            # ✅ ENCONTRAR SPEAKER DOMINANTE POR OVERLAP (del ejemplo)
-            best_speaker = None
-            best_overlap = 0.0
-            total_overlap = 0.0
-            
-            for ds in diar_segs:
-                start = max(t_start, ds["start"])
-                end = min(t_end, ds["end"])
-                overlap = max(0.0, end - start)
-                if overlap > best_overlap:
-                    best_overlap = overlap
-                    best_speaker = ds["speaker"]
-                total_overlap += overlap
+            # ✅ SPEAKER DOMINANTE POR OVERLAP (índice de intervalos compartido)
+            best_speaker = asignacion["hablante"]
             
             # ✅ HEURÍSTICA DE CONFIANZA (del ejemplo)
-            # confianza = overlap máximo / duración del segmento
-            dur = max(1e-6, t_end - t_start)
-            speaker_conf = float(max(0.0, min(1.0, best_overlap / dur)))
+            # confianza = overlap del hablante / duración del segmento
+            speaker_conf = float(asignacion["ratio"])
             speaker_label = f"Speaker {best_speaker}" if best_speaker is not None else "Speaker ?"
             
             labeled.append({
@@ -876,32 +962,22 @@ class PyannoteProcessor:
             segmentos_diarizacion = resultado_diarizacion.get('segmentos', [])
             
             segmentos_combinados = []
-            
-            for seg_whisper in segmentos_whisper:
+            palabra_por_palabra = configuracion.get('palabra_por_palabra', False)
+            asignaciones = asignar_hablantes(
+                segmentos_whisper,
+                segmentos_diarizacion,
+                por_palabras=palabra_por_palabra,
+                umbral_ratio=threshold_overlap,
+            )
+            
+            for seg_whisper, asignacion in zip(segmentos_whisper, asignaciones):
                 inicio_whisper = seg_whisper['inicio']
                 fin_whisper = seg_whisper['fin']
                 texto = seg_whisper['texto']
                 
-                # Buscar speaker más probable por overlap temporal
-                mejor_speaker = 'SPEAKER_00'
-                mejor_overlap = 0.0
-                
-                for seg_diar in segmentos_diarizacion:
-                    inicio_diar = seg_diar['inicio']
-                    fin_diar = seg_diar['fin']
-                    
-                    # Calcular overlap
-                    overlap_inicio = max(inicio_whisper, inicio_diar)
-                    overlap_fin = min(fin_whisper, fin_diar)
-                    
-                    if overlap_fin > overlap_inicio:
-                        overlap_duracion = overlap_fin - overlap_inicio
-                        whisper_duracion = fin_whisper - inicio_whisper
-                        overlap_ratio = overlap_duracion / whisper_duracion if whisper_duracion > 0 else 0
-                        
-                        if overlap_ratio > mejor_overlap and overlap_ratio >= threshold_overlap:
-                            mejor_overlap = overlap_ratio
-                            mejor_speaker = seg_diar['speaker']
+                # Speaker con mayor overlap temporal que supera el threshold
+                mejor_speaker = asignacion['hablante'] if asignacion['hablante'] is not None else 'SPEAKER_00'
+                mejor_overlap = asignacion['ratio']
                 
                 segmento_combinado = {
                     'inicio': inicio_whisper,
@@ -8,14 +8,18 @@ import logging
 from typing import Dict, Any, List, Optional
 from collections import OrderedDict
 
+from .model_registry import adquirir_pyannote, liberar_pyannote
+from helpers.cache_artefactos import get_cache_artefactos, ETAPA_DIARIZACION
+
 logger = logging.getLogger(__name__)
 
 # Configuración pyannote
 HUGGINGFACE_TOKEN = os.getenv('HUGGINGFACE_TOKEN')
+MODELO_DIARIZACION = "pyannote/speaker-diarization@2.1"
 PYANNOTE_AVAILABLE = False
 
 try:
-    from pyannote.audio import Pipeline
+    import pyannote.audio  # noqa: F401 (el pipeline lo carga model_registry)
     from pyannote.core import Annotation
     PYANNOTE_AVAILABLE = True
     logger.info("✅ pyannote-audio disponible")
@@ -63,8 +67,22 @@ class PyannoteProcessor:
             logger.warning(f"⚠️ Usando configuración original: min={min_speakers}, max={max_speakers}")
         
         try:
-            # PASO 1: Ejecutar pyannote
-            resultado_pyannote = self._ejecutar_pyannote(archivo_audio, min_speakers, max_speakers)
+            # PASO 1: Ejecutar pyannote (o recuperar la diarización cruda de la caché)
+            cache = get_cache_artefactos()
+            clave_cache = None
+            if configuracion.get('usar_cache', True):
+                clave_cache = cache.clave(archivo_audio, {
+                    'modelo': MODELO_DIARIZACION,
+                    'min_speakers': min_speakers,
+                    'max_speakers': max_speakers,
+                })
+            entrada = cache.obtener(ETAPA_DIARIZACION, clave_cache)
+            if entrada:
+                resultado_pyannote = entrada.datos
+            else:
+                resultado_pyannote = self._ejecutar_pyannote(archivo_audio, min_speakers, max_speakers)
+                if resultado_pyannote['exito']:
+                    cache.guardar(ETAPA_DIARIZACION, clave_cache, datos=resultado_pyannote)
             
             if not resultado_pyannote['exito']:
                 logger.error("❌ pyannote falló")
@@ -141,14 +159,12 @@ class PyannoteProcessor:
             return {'exito': False}
         
         try:
-            # Cargar pipeline
+            # Obtener pipeline del registro de modelos del proceso (se mantiene caliente)
             if self.pipeline is None:
-                logger.info("🔧 Cargando pipeline de pyannote...")
-                self.pipeline = Pipeline.from_pretrained(
-                    "pyannote/speaker-diarization@2.1",
-                    use_auth_token=HUGGINGFACE_TOKEN
-                )
-                logger.info("✅ Pipeline cargado")
+                logger.info("🔧 Obteniendo pipeline de pyannote del registro...")
+                self.pipeline = adquirir_pyannote(MODELO_DIARIZACION, HUGGINGFACE_TOKEN)
+                self.modelo_cargado = MODELO_DIARIZACION
+                logger.info("✅ Pipeline listo")
             
             # 🔥 DETERMINAR NÚMERO EXACTO DE SPEAKERS ESPERADOS
             num_speakers_esperados = max_speakers if max_speakers == min_speakers else None
@@ -184,6 +200,16 @@ class PyannoteProcessor:
         except Exception as e:
             logger.error(f"❌ Error ejecutando pyannote: {str(e)}")
             return {'exito': False}
+        
+        finally:
+            self.liberar_pipeline()
+    
+    def liberar_pipeline(self):
+        """Devuelve el pipeline al registro; permanece cargado para la siguiente tarea"""
+        if self.pipeline is not None:
+            liberar_pyannote(self.modelo_cargado)
+            self.pipeline = None
+            self.modelo_cargado = None
     
     def _mapear_cronologicamente(self, segmentos: List[Dict], participantes: List[Dict]) -> List[Dict]:
         """
@@ -0,0 +1,597 @@
+"""
+Segmentos normalizados de la conversación (SegmentoTranscripcion)
+
+Antes cada edición cargaba ``conversacion_json`` completo (unos 4.000
+segmentos en una sesión de 3 horas), lo modificaba en Python y reescribía el
+blob entero; la versión se calculaba con ``historial_ediciones.count()``.
+
+Ahora cada segmento es una fila:
+
+- Editar es un UPDATE de una fila. Si el cliente envía la ``version`` que leyó,
+  va en el WHERE y un 0 de filas afectadas es un ``ConflictoVersion``.
+- Insertar y eliminar desplazan ``orden`` con un solo UPDATE, con la fila de
+  la transcripción bloqueada para que las posiciones sigan siendo 0..n-1.
+- Como ``orden`` cambia y toda fila empieza en la versión 1, ``(orden,
+  version)`` no identifica un segmento: quien edita o elimina por posición
+  debe enviar la ``version_actual`` de la transcripción que leyó. Se compara
+  con la fila bloqueada y toda edición la incrementa, así que si coincide las
+  posiciones del cliente son las de las filas.
+- Reasignar o renombrar hablantes es un UPDATE sobre sus segmentos.
+
+``conversacion_json`` se mantiene para los lectores existentes: las ediciones
+solo marcan ``conversacion_desactualizada`` y
+``Transcripcion.sincronizar_conversacion()`` lo regenera desde las filas la
+próxima vez que alguien lo lee.
+
+``aplicar_parche`` acepta un subconjunto de JSON Patch (RFC 6902) sobre
+``/conversacion``:
+
+- ``test`` de ``/version_actual`` (obligatorio)
+- ``test`` de ``/conversacion/N/version`` (o de cualquier campo)
+- ``replace`` de ``/conversacion/N`` o ``/conversacion/N/campo``
+- ``add`` en ``/conversacion/N`` o ``/conversacion/-``
+- ``remove`` de ``/conversacion/N``
+
+Dividir un segmento es ``replace`` + ``add`` en N+1; fusionar dos es
+``replace`` + ``remove`` de N+1.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import SegmentoTranscripcion, Transcripcion
+
+logger = logging.getLogger(__name__)
+
+# Claves del segmento con columna propia; el resto va a ``datos``
+CAMPOS = ('inicio', 'fin', 'hablante', 'hablante_id', 'texto')
+
+
+class ErrorEdicion(Exception):
+    """Edición no válida"""
+    status = 400
+
+
+class SegmentoNoEncontrado(ErrorEdicion):
+    status = 404
+
+
+class ConflictoVersion(ErrorEdicion):
+    """El segmento cambió desde que el cliente lo leyó"""
+    status = 409
+
+
+class PrecondicionRequerida(ErrorEdicion):
+    """Edición por posición sin la ``version_actual`` que leyó el cliente"""
+    status = 428
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def conversacion_de(estructura):
+    """Lista de segmentos de la estructura actual (dict) o de la antigua (lista)"""
+    if isinstance(estructura, dict):
+        estructura = estructura.get('conversacion', [])
+    if not isinstance(estructura, list):
+        return []
+    return [segmento for segmento in estructura if isinstance(segmento, dict)]
+
+
+def fila_desde_segmento(segmento, orden):
+    """Columnas de SegmentoTranscripcion a partir de un segmento del JSON"""
+    return {
+        'orden': orden,
+        'inicio': _numero(segmento.get('inicio')),
+        'fin': _numero(segmento.get('fin')),
+        'hablante': str(segmento.get('hablante') or '')[:200],
+        'hablante_id': str(segmento.get('hablante_id') or '')[:100],
+        'texto': str(segmento.get('texto') or ''),
+        'datos': {clave: valor for clave, valor in segmento.items() if clave not in CAMPOS and clave != 'version'},
+    }
+
+
+def segmentos_desde_json(estructura):
+    """Filas de todos los segmentos de ``conversacion_json`` (la migración 0006 tiene una copia)"""
+    return [fila_desde_segmento(segmento, orden) for orden, segmento in enumerate(conversacion_de(estructura))]
+
+
+def segmento_a_dict(segmento):
+    """Segmento en el formato de ``conversacion_json``, con su versión"""
+    datos = dict(segmento.datos or {})
+    datos.update({
+        'inicio': segmento.inicio,
+        'fin': segmento.fin,
+        'hablante': segmento.hablante,
+        'texto': segmento.texto,
+        'version': segmento.version,
+    })
+    if segmento.hablante_id:
+        datos['hablante_id'] = segmento.hablante_id
+    if 'duracion' in datos:
+        datos['duracion'] = round(segmento.fin - segmento.inicio, 2)
+    if segmento.version > 1:
+        datos['editado'] = True
+    return datos
+
+
+def generar_texto_estructurado(conversacion):
+    """
+    Genera el texto estructurado en formato MM:SS,Hablante,Texto
+    """
+    lineas = []
+    for segmento in conversacion:
+        inicio = segmento.get('inicio', 0)
+        minutos = int(inicio // 60)
+        segundos = int(inicio % 60)
+        tiempo_formateado = f"{minutos:02d}:{segundos:02d}"
+
+        hablante = segmento.get('hablante', 'Desconocido')
+        texto = segmento.get('texto', '').replace('\n', ' ').replace('\r', ' ')
+
+        lineas.append(f"{tiempo_formateado},{hablante},{texto}")
+
+    return '\n'.join(lineas)
+
+
+def reconstruir_segmentos(transcripcion):
+    """
+    Reemplaza las filas con el contenido actual de ``conversacion_json``
+
+    Se llama cuando el JSON se escribe entero (fin de la transcripción,
+    guardado de la estructura completa).
+    """
+    filas = [
+        SegmentoTranscripcion(transcripcion_id=transcripcion.pk, **fila)
+        for fila in segmentos_desde_json(transcripcion.conversacion_json)
+    ]
+    with transaction.atomic():
+        SegmentoTranscripcion.objects.filter(transcripcion_id=transcripcion.pk).delete()
+        SegmentoTranscripcion.objects.bulk_create(filas, batch_size=1000)
+        Transcripcion.objects.filter(pk=transcripcion.pk).update(conversacion_desactualizada=False)
+    transcripcion.conversacion_desactualizada = False
+    return len(filas)
+
+
+def _bloquear(transcripcion_id):
+    """
+    Bloquea la transcripción y devuelve cuántos segmentos tiene
+
+    Si aún no tiene filas (transcripción escrita por un camino que no llama a
+    ``reconstruir_segmentos``) se crean desde ``conversacion_json``.
+    """
+    with transaction.atomic():
+        bloqueada = Transcripcion.objects.select_for_update().filter(pk=transcripcion_id).values_list('id', flat=True)
+        if not list(bloqueada):
+            raise SegmentoNoEncontrado('Transcripción no encontrada')
+        total = SegmentoTranscripcion.objects.filter(transcripcion_id=transcripcion_id).count()
+        if total == 0:
+            transcripcion = Transcripcion.objects.only('id', 'conversacion_json').get(pk=transcripcion_id)
+            total = reconstruir_segmentos(transcripcion)
+            if total:
+                logger.info(f"🧩 Segmentos de la transcripción {transcripcion_id} creados desde conversacion_json ({total})")
+    return total
+
+
+def comprobar_version_actual(transcripcion_id, version_actual):
+    """
+    Bloquea la transcripción y comprueba que sigue en la ``version_actual`` del cliente
+
+    Devuelve cuántos segmentos tiene (como ``_bloquear``).
+    """
+    if version_actual is None:
+        raise PrecondicionRequerida('Las ediciones por posición necesitan la version_actual de la transcripción')
+    try:
+        version_actual = int(version_actual)
+    except (TypeError, ValueError):
+        raise ErrorEdicion('version_actual debe ser un entero')
+    total = _bloquear(transcripcion_id)
+    actual = Transcripcion.objects.filter(pk=transcripcion_id).values_list('version_actual', flat=True).first()
+    if actual != version_actual:
+        raise ConflictoVersion(
+            f'La transcripción fue modificada por otro usuario (versión {actual}, se esperaba {version_actual}); '
+            f'recarga los segmentos'
+        )
+    return total
+
+
+def contar_segmentos(transcripcion_id):
+    """Número de segmentos, creando antes las filas si aún no existen"""
+    return _bloquear(transcripcion_id)
+
+
+def marcar_editada(transcripcion_id, usuario=None, total_segmentos=None):
+    """
+    Un único UPDATE de la transcripción tras una edición de segmentos
+
+    Devuelve el nuevo ``version_actual``.
+    """
+    ahora = timezone.now()
+    campos = {
+        'conversacion_desactualizada': True,
+        'editado_manualmente': True,
+        'fecha_ultima_edicion': ahora,
+        # update() no aplica auto_now y ia_providers usa esta fecha en su clave de caché
+        'fecha_actualizacion': ahora,
+        'version_actual': F('version_actual') + 1,
+    }
+    if usuario is not None and usuario.is_authenticated:
+        campos['usuario_ultima_edicion'] = usuario
+    if total_segmentos is not None:
+        campos['numero_segmentos'] = total_segmentos
+    Transcripcion.objects.filter(pk=transcripcion_id).update(**campos)
+    return Transcripcion.objects.filter(pk=transcripcion_id).values_list('version_actual', flat=True).first()
+
+
+def obtener_segmento(transcripcion_id, orden):
+    """Segmento en la posición ``orden`` o SegmentoNoEncontrado"""
+    segmento = SegmentoTranscripcion.objects.filter(transcripcion_id=transcripcion_id, orden=orden).first()
+    if segmento is None:
+        _bloquear(transcripcion_id)
+        segmento = SegmentoTranscripcion.objects.filter(transcripcion_id=transcripcion_id, orden=orden).first()
+    if segmento is None:
+        raise SegmentoNoEncontrado(f'Segmento {orden} no encontrado')
+    return segmento
+
+
+def _validar_tiempos(inicio, fin):
+    if inicio >= fin:
+        raise ErrorEdicion('El tiempo de inicio debe ser menor al tiempo de fin')
+
+
+def _columnas(cambios):
+    """Cambios del cliente convertidos a columnas del modelo"""
+    columnas = {}
+    for campo in CAMPOS:
+        if campo in cambios:
+            columnas[campo] = _numero(cambios[campo]) if campo in ('inicio', 'fin') else str(cambios[campo] or '')
+    if 'datos' in cambios:
+        columnas['datos'] = cambios['datos']
+    return columnas
+
+
+def _actualizar(transcripcion_id, orden, cambios, version=None):
+    """UPDATE de una fila; devuelve la nueva versión"""
+    columnas = _columnas(cambios)
+    if not columnas:
+        raise ErrorEdicion('No hay campos para actualizar')
+
+    filtro = {'transcripcion_id': transcripcion_id, 'orden': orden}
+    if version is not None:
+        filtro['version'] = int(version)
+    # Si solo llega uno de los tiempos, se valida contra el otro en el mismo UPDATE
+    if 'inicio' in columnas and 'fin' in columnas:
+        _validar_tiempos(columnas['inicio'], columnas['fin'])
+    elif 'inicio' in columnas:
+        filtro['fin__gt'] = columnas['inicio']
+    elif 'fin' in columnas:
+        filtro['inicio__lt'] = columnas['fin']
+
+    actualizados = SegmentoTranscripcion.objects.filter(**filtro).update(version=F('version') + 1, **columnas)
+    if not actualizados:
+        # 0 filas: no existe, otra versión o tiempos inválidos
+        actual = obtener_segmento(transcripcion_id, orden)
+        if version is not None and actual.version != int(version):
+            raise ConflictoVersion(
+                f'El segmento {orden} fue modificado por otro usuario (versión {actual.version}, se esperaba {version})'
+            )
+        _validar_tiempos(columnas.get('inicio', actual.inicio), columnas.get('fin', actual.fin))
+        # Las filas se acababan de crear desde conversacion_json
+        actualizados = SegmentoTranscripcion.objects.filter(**filtro).update(version=F('version') + 1, **columnas)
+        if not actualizados:
+            raise ConflictoVersion(f'El segmento {orden} cambió durante la edición')
+
+    if version is not None:
+        return int(version) + 1
+    return SegmentoTranscripcion.objects.filter(
+        transcripcion_id=transcripcion_id, orden=orden
+    ).values_list('version', flat=True).first()
+
+
+def _insertar(transcripcion_id, posicion, segmento, total):
+    if posicion is None or posicion == '-':
+        posicion = total
+    posicion = int(posicion)
+    if posicion < 0 or posicion > total:
+        raise ErrorEdicion(f'Posición inválida. Debe estar entre 0 y {total}')
+    fila = fila_desde_segmento(segmento, posicion)
+    _validar_tiempos(fila['inicio'], fila['fin'])
+    SegmentoTranscripcion.objects.filter(
+        transcripcion_id=transcripcion_id, orden__gte=posicion
+    ).update(orden=F('orden') + 1)
+    SegmentoTranscripcion.objects.create(transcripcion_id=transcripcion_id, **fila)
+    return posicion
+
+
+def _eliminar(transcripcion_id, orden, version=None):
+    segmento = obtener_segmento(transcripcion_id, orden)
+    if version is not None and segmento.version != int(version):
+        raise ConflictoVersion(
+            f'El segmento {orden} fue modificado por otro usuario (versión {segmento.version}, se esperaba {version})'
+        )
+    segmento.delete()
+    SegmentoTranscripcion.objects.filter(
+        transcripcion_id=transcripcion_id, orden__gt=orden
+    ).update(orden=F('orden') - 1)
+    return segmento
+
+
+def editar_segmento(transcripcion_id, orden, cambios, version=None, usuario=None, version_actual=None):
+    """
+    Edita los campos de un segmento con un UPDATE de su fila
+
+    ``version_actual`` es la de la transcripción que leyó el cliente
+    (obligatoria: ``orden`` solo es fiable si nadie insertó ni eliminó).
+
+    Returns:
+        (nueva versión del segmento, nueva versión de la transcripción)
+    """
+    with transaction.atomic():
+        comprobar_version_actual(transcripcion_id, version_actual)
+        nueva_version = _actualizar(transcripcion_id, orden, cambios, version)
+        return nueva_version, marcar_editada(transcripcion_id, usuario)
+
+
+def insertar_segmento(transcripcion_id, posicion, segmento, usuario=None, version_actual=None):
+    """
+    Inserta un segmento en ``posicion`` (None: al final)
+
+    Insertar no sobrescribe nada, así que ``version_actual`` es opcional; si
+    llega, se comprueba como en las ediciones.
+
+    Returns:
+        (posición final, total de segmentos, versión de la transcripción)
+    """
+    with transaction.atomic():
+        if version_actual is None:
+            total = _bloquear(transcripcion_id)
+        else:
+            total = comprobar_version_actual(transcripcion_id, version_actual)
+        posicion = _insertar(transcripcion_id, posicion, segmento, total)
+        return posicion, total + 1, marcar_editada(transcripcion_id, usuario, total + 1)
+
+
+def eliminar_segmento(transcripcion_id, orden, version=None, usuario=None, version_actual=None):
+    """
+    Elimina un segmento y cierra el hueco en ``orden``
+
+    ``version_actual`` es obligatoria, como en ``editar_segmento``.
+
+    Returns:
+        (segmento eliminado como dict, total de segmentos, versión de la transcripción)
+    """
+    with transaction.atomic():
+        total = comprobar_version_actual(transcripcion_id, version_actual)
+        eliminado = _eliminar(transcripcion_id, orden, version)
+        return segmento_a_dict(eliminado), total - 1, marcar_editada(transcripcion_id, usuario, total - 1)
+
+
+def posicion_por_inicio(transcripcion_id, inicio):
+    """Posición que mantiene la conversación ordenada por tiempo de inicio"""
+    _bloquear(transcripcion_id)
+    return SegmentoTranscripcion.objects.filter(transcripcion_id=transcripcion_id, inicio__lte=inicio).count()
+
+
+def reasignar_hablantes(transcripcion_id, cambios, usuario=None):
+    """
+    Cambia el hablante de los segmentos según ``cambios`` {anterior: nuevo}
+
+    Un único UPDATE con CASE, así un intercambio A↔B no pisa sus propios
+    cambios.
+
+    Returns:
+        Número de segmentos modificados
+    """
+    cambios = {str(anterior): str(nuevo)[:200] for anterior, nuevo in cambios.items() if anterior != nuevo}
+    if not cambios:
+        return 0
+    with transaction.atomic():
+        _bloquear(transcripcion_id)
+        modificados = SegmentoTranscripcion.objects.filter(
+            transcripcion_id=transcripcion_id, hablante__in=list(cambios)
+        ).update(
+            hablante=Case(
+                *[When(hablante=anterior, then=Value(nuevo)) for anterior, nuevo in cambios.items()],
+                default=F('hablante'),
+            ),
+            version=F('version') + 1,
+        )
+        if modificados:
+            marcar_editada(transcripcion_id, usuario)
+    return modificados
+
+
+def contar_segmentos_hablante(transcripcion_id, hablante):
+    _bloquear(transcripcion_id)
+    return SegmentoTranscripcion.objects.filter(transcripcion_id=transcripcion_id, hablante=hablante).count()
+
+
+def modificar_cabecera(transcripcion_id, modificar, usuario=None):
+    """
+    Cambia la cabecera de ``conversacion_json`` (mapeo de hablantes) con la fila bloqueada
+
+    ``modificar(estructura)`` cambia el dict en sitio y su resultado se
+    devuelve junto a la nueva ``version_actual``. No toca
+    ``conversacion_desactualizada``: si hay ediciones pendientes la
+    conversación se regenera igualmente desde los segmentos.
+    """
+    with transaction.atomic():
+        transcripcion = Transcripcion.objects.select_for_update().only('id', 'conversacion_json').get(pk=transcripcion_id)
+        estructura = transcripcion.conversacion_json
+        if not isinstance(estructura, dict):
+            estructura = {'cabecera': {}, 'conversacion': conversacion_de(estructura), 'metadata': {}}
+        if not isinstance(estructura.get('cabecera'), dict):
+            estructura['cabecera'] = {}
+        resultado = modificar(estructura)
+
+        ahora = timezone.now()
+        campos = {
+            'conversacion_json': estructura,
+            'fecha_ultima_edicion': ahora,
+            'fecha_actualizacion': ahora,
+            'version_actual': F('version_actual') + 1,
+        }
+        if usuario is not None and usuario.is_authenticated:
+            campos['usuario_ultima_edicion'] = usuario
+        Transcripcion.objects.filter(pk=transcripcion_id).update(**campos)
+        version = Transcripcion.objects.filter(pk=transcripcion_id).values_list('version_actual', flat=True).first()
+    return resultado, version
+
+
+def _ruta(ruta):
+    """'/conversacion/3/texto' -> (3, 'texto'); '/conversacion/-' -> ('-', None)"""
+    partes = str(ruta or '').split('/')
+    if len(partes) not in (3, 4) or partes[0] != '' or partes[1] != 'conversacion':
+        raise ErrorEdicion(f'Ruta no soportada: {ruta}')
+    indice = partes[2]
+    if indice != '-':
+        if not indice.isdigit():
+            raise ErrorEdicion(f'Índice inválido en la ruta: {ruta}')
+        indice = int(indice)
+    campo = partes[3] if len(partes) == 4 else None
+    if campo is not None and campo not in CAMPOS + ('version',):
+        raise ErrorEdicion(f'Campo no editable: {campo}')
+    return indice, campo
+
+
+def aplicar_parche(transcripcion_id, operaciones, usuario=None):
+    """
+    Aplica una lista de operaciones JSON Patch en una transacción
+
+    Las rutas son posiciones, así que el parche debe incluir un ``test`` de
+    ``/version_actual``; se comprueba con la transcripción bloqueada antes de
+    aplicar nada. Los ``test`` de ``version`` se añaden al WHERE del siguiente
+    ``replace`` o ``remove`` del mismo segmento; los ``replace`` seguidos sobre
+    un mismo segmento se agrupan en un solo UPDATE.
+
+    Returns:
+        dict con las versiones nuevas de los segmentos modificados, el total
+        de segmentos y la versión de la transcripción
+    """
+    if not isinstance(operaciones, list) or not operaciones:
+        raise ErrorEdicion('El parche debe ser una lista de operaciones')
+
+    if not all(isinstance(op, dict) for op in operaciones):
+        raise ErrorEdicion('Cada operación necesita "op" y "path"')
+    pruebas_version = [op for op in operaciones if op.get('op') == 'test' and op.get('path') == '/version_actual']
+    if not pruebas_version:
+        raise PrecondicionRequerida('El parche necesita un test de /version_actual')
+    operaciones = [op for op in operaciones if op not in pruebas_version]
+    version_esperada = pruebas_version[0].get('value')
+    if any(op.get('value') != version_esperada for op in pruebas_version) or not isinstance(version_esperada, int):
+        raise ErrorEdicion('test de /version_actual inválido')
+
+    versiones = {}
+    esperadas = {}
+    pendiente = None  # (indice, cambios) de replaces consecutivos
+
+    def volcar():
+        nonlocal pendiente
+        if pendiente:
+            indice, cambios = pendiente
+            versiones[indice] = _actualizar(transcripcion_id, indice, cambios, esperadas.pop(indice, None))
+            pendiente = None
+
+    with transaction.atomic():
+        total = comprobar_version_actual(transcripcion_id, version_esperada)
+        for op in operaciones:
+            if 'op' not in op or 'path' not in op:
+                raise ErrorEdicion('Cada operación necesita "op" y "path"')
+            tipo = op['op']
+            indice, campo = _ruta(op['path'])
+            if indice == '-' and tipo != 'add':
+                raise ErrorEdicion(f'"-" solo es válido con add: {op["path"]}')
+
+            if tipo == 'replace':
+                if campo == 'version':
+                    raise ErrorEdicion('La versión no se puede reemplazar')
+                if campo is None:
+                    if not isinstance(op.get('value'), dict):
+                        raise ErrorEdicion('replace de un segmento necesita un objeto')
+                    cambios = dict(fila_desde_segmento(op['value'], indice))
+                    del cambios['orden']
+                else:
+                    cambios = {campo: op.get('value')}
+                if pendiente and pendiente[0] == indice:
+                    pendiente[1].update(cambios)
+                else:
+                    volcar()
+                    pendiente = (indice, cambios)
+                continue
+
+            volcar()
+            if tipo == 'test':
+                if campo == 'version':
+                    esperadas[indice] = op.get('value')
+                else:
+                    actual = segmento_a_dict(obtener_segmento(transcripcion_id, indice))
+                    objetivo = actual.get(campo) if campo else actual
+                    if objetivo != op.get('value'):
+                        raise ConflictoVersion(f'test fallido en {op["path"]}')
+            elif tipo == 'add':
+                if campo is not None or not isinstance(op.get('value'), dict):
+                    raise ErrorEdicion('add solo admite un segmento completo en /conversacion/N')
+                versiones[_insertar(transcripcion_id, indice, op['value'], total)] = 1
+                total += 1
+            elif tipo == 'remove':
+                if campo is not None:
+                    raise ErrorEdicion('remove solo admite segmentos completos')
+                _eliminar(transcripcion_id, indice, esperadas.pop(indice, None))
+                versiones.pop(indice, None)
+                total -= 1
+            else:
+                raise ErrorEdicion(f'Operación no soportada: {tipo}')
+        volcar()
+
+        version_actual = marcar_editada(transcripcion_id, usuario, total)
+
+    return {
+        'versiones': versiones,
+        'total_segmentos': total,
+        'version_actual': version_actual,
+    }
+
+
+def regenerar_conversacion_json(transcripcion_id):
+    """
+    Copia los segmentos a ``conversacion_json`` si hay ediciones pendientes
+
+    Conserva cabecera y metadata y regenera ``conversacion`` y
+    ``texto_estructurado``. Devuelve la estructura resultante.
+    """
+    with transaction.atomic():
+        transcripcion = Transcripcion.objects.select_for_update().only(
+            'id', 'conversacion_json', 'conversacion_desactualizada'
+        ).get(pk=transcripcion_id)
+        estructura = transcripcion.conversacion_json
+        if not transcripcion.conversacion_desactualizada:
+            # Otro lector lo regeneró mientras esperábamos el bloqueo
+            return estructura
+
+        if not isinstance(estructura, dict):
+            estructura = {'cabecera': {}, 'conversacion': [], 'texto_estructurado': '', 'metadata': {}}
+        conversacion = [
+            segmento_a_dict(segmento)
+            for segmento in SegmentoTranscripcion.objects.filter(transcripcion_id=transcripcion_id)
+        ]
+        estructura['conversacion'] = conversacion
+        estructura['texto_estructurado'] = generar_texto_estructurado(conversacion)
+        metadata = estructura.get('metadata')
+        if not isinstance(metadata, dict):
+            metadata = estructura['metadata'] = {}
+        metadata.update({
+            'total_segmentos': len(conversacion),
+            'segmentos_editados': sum(1 for segmento in conversacion if segmento.get('editado')),
+        })
+
+        Transcripcion.objects.filter(pk=transcripcion_id).update(
+            conversacion_json=estructura, conversacion_desactualizada=False
+        )
+    logger.info(f"🧩 conversacion_json regenerado desde {len(conversacion)} segmentos (transcripción {transcripcion_id})")
+    return estructura
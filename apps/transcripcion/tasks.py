@@ -1,24 +1,42 @@
 """
 Tareas de Celery para procesamiento de transcripción y diarización
 """
-from celery import shared_task
+from celery import shared_task, chord
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.utils import timezone
 from datetime import datetime
+from contextlib import contextmanager
 import os
 import tempfile
 import shutil
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import json
 
 from .models import Transcripcion, EstadoTranscripcion
-from .whisper_helper import WhisperProcessor
+from .segmentos import reconstruir_segmentos
+from .asr_backends import MOTOR_OPENAI_WHISPER
+from .whisper_helper import WhisperProcessor, opciones_whisper
+from .whisper_chunks import cargar_tramo, get_config_chunks, planificar_audio, transcribir_chunk, unir_chunks
 from .pyannote_helper_simple import crear_processor_simplificado
 from .logging_helper import log_transcripcion_accion, log_transcripcion_error
+from helpers.cache_artefactos import get_cache_artefactos, ETAPA_WHISPER
+from helpers.progreso_eventos import ReportadorProgreso, publicar_progreso
 
 logger = get_task_logger(__name__)
 
 
+def publicar_estado(transcripcion: Transcripcion, progreso: int = None):
+    """Publica el estado actual a los editores suscritos al flujo de progreso"""
+    publicar_progreso(
+        'transcripcion',
+        transcripcion.id,
+        transcripcion.estado,
+        transcripcion.progreso_porcentaje if progreso is None else progreso,
+        getattr(transcripcion, 'mensaje_estado', '') or transcripcion.mensaje_error,
+    )
+
+
 @shared_task(bind=True, max_retries=2)
 def procesar_transcripcion_completa(self, transcripcion_id: int):
     """
@@ -28,6 +46,7 @@ def procesar_transcripcion_completa(self, transcripcion_id: int):
         transcripcion_id: ID de la transcripción a procesar
     """
     transcripcion = None
+    reportador = None
     archivo_temporal = None
     
     try:
@@ -35,16 +54,14 @@ def procesar_transcripcion_completa(self, transcripcion_id: int):
         transcripcion = Transcripcion.objects.get(id=transcripcion_id)
         logger.info(f"Iniciando procesamiento de transcripción {transcripcion_id}")
         
-        # Actualizar estado inicial
-        try:
-            transcripcion.task_id_celery = getattr(self.request, 'id', '') or getattr(transcripcion, 'task_id_celery', '')
-        except Exception:
-            pass
-        transcripcion.estado = EstadoTranscripcion.EN_PROCESO
-        transcripcion.tiempo_inicio_proceso = timezone.now()
-        if hasattr(transcripcion, 'progreso_porcentaje'):
-            transcripcion.progreso_porcentaje = 10
-        transcripcion.save()
+        # Actualizar estado inicial (solo columnas de estado, sin reescribir los JSON)
+        reportador = ReportadorProgreso('transcripcion', transcripcion)
+        reportador.avanzar(
+            10, 'Preparando procesamiento',
+            estado=EstadoTranscripcion.EN_PROCESO,
+            task_id_celery=getattr(self.request, 'id', '') or transcripcion.task_id_celery,
+            tiempo_inicio_proceso=timezone.now(),
+        )
         # Publicar meta en Celery
         try:
             self.update_state(state='PROGRESS', meta={'fase': 'inicio', 'msg': 'Preparando procesamiento', 'pct': 10})
@@ -89,31 +106,6 @@ def procesar_transcripcion_completa(self, transcripcion_id: int):
         archivo_audio_path = archivo_audio.path
         logger.info(f"Procesando archivo: {archivo_audio_path}")
         
-        # Paso 1: Transcripción con Whisper
-        transcripcion.estado = EstadoTranscripcion.TRANSCRIBIENDO
-        if hasattr(transcripcion, 'progreso_porcentaje'):
-            transcripcion.progreso_porcentaje = 20
-        transcripcion.mensaje_estado = "Transcribiendo audio con Whisper..."
-        transcripcion.save()
-        try:
-            self.update_state(state='PROGRESS', meta={'fase': 'whisper', 'msg': 'Transcribiendo con Whisper', 'pct': 20})
-        except Exception:
-            pass
-        
-        resultado_whisper = procesar_con_whisper(archivo_audio_path, configuracion)
-        
-        if not resultado_whisper.get('exito'):
-            raise Exception(f"Error en Whisper: {resultado_whisper.get('error')}")
-        
-        logger.info("Transcripción con Whisper completada")
-        if hasattr(transcripcion, 'progreso_porcentaje'):
-            transcripcion.progreso_porcentaje = 50
-        transcripcion.save()
-        try:
-            self.update_state(state='PROGRESS', meta={'fase': 'whisper', 'msg': 'Whisper completado', 'pct': 50})
-        except Exception:
-            pass
-        
         # Obtener hablantes predefinidos de la configuración
         hablantes_predefinidos = []
         
@@ -131,425 +123,791 @@ def procesar_transcripcion_completa(self, transcripcion_id: int):
         
         logger.info(f"AUDIT - Hablantes predefinidos finales: {len(hablantes_predefinidos)} participantes")
         
-        # Paso 2: Diarización con pyannote
-        transcripcion.estado = EstadoTranscripcion.DIARIZANDO
-        if hasattr(transcripcion, 'progreso_porcentaje'):
-            transcripcion.progreso_porcentaje = 60
-        transcripcion.mensaje_estado = "Identificando hablantes con pyannote..."
-        transcripcion.save()
+        # Audios largos: una tarea por chunk de Whisper, unidas por un chord
+        chunks = planificar_whisper_por_chunks(archivo_audio_path, configuracion)
+        if chunks:
+            return lanzar_whisper_por_chunks(transcripcion, archivo_audio_path, configuracion, hablantes_predefinidos, chunks)
+        
+        # Modo paralelo: Whisper y pyannote en tareas separadas unidas por un chord
+        if usar_modo_paralelo(configuracion):
+            return lanzar_procesamiento_paralelo(transcripcion, archivo_audio_path, configuracion, hablantes_predefinidos)
+        
+        # Paso 1: Transcripción con Whisper
+        reportador.avanzar(20, "Transcribiendo audio con Whisper...", estado=EstadoTranscripcion.TRANSCRIBIENDO)
         try:
-            self.update_state(state='PROGRESS', meta={'fase': 'pyannote', 'msg': 'Diarizando con pyannote', 'pct': 60})
+            self.update_state(state='PROGRESS', meta={'fase': 'whisper', 'msg': 'Transcribiendo con Whisper', 'pct': 20})
         except Exception:
             pass
         
-        resultado_pyannote = procesar_con_pyannote(archivo_audio_path, configuracion, hablantes_predefinidos)
-        
-        if not resultado_pyannote.get('exito'):
-            logger.warning(f"Error en pyannote: {resultado_pyannote.get('error')}")
-            # Continuar sin diarización si falla
-            resultado_pyannote = {
-                'exito': True,
-                'hablantes': {'speaker_0': 'Hablante Único'},
-                'segmentos_hablantes': [],
-                'num_hablantes': 1,
-                'estadisticas': {}
-            }
+        resultado_whisper = procesar_con_whisper(archivo_audio_path, configuracion)
         
-        logger.info("Diarización con pyannote completada")
-        transcripcion.progreso = 80
-        transcripcion.save()
+        if not resultado_whisper.get('exito'):
+            raise Exception(f"Error en Whisper: {resultado_whisper.get('error')}")
         
-        # Paso 3: Combinar resultados con estructura mejorada
-        transcripcion.estado = EstadoTranscripcion.PROCESANDO
-        transcripcion.progreso = 90
-        transcripcion.mensaje_estado = "Generando estructura JSON mejorada..."
-        transcripcion.save()
+        logger.info("Transcripción con Whisper completada")
+        reportador.avanzar(50, "Whisper completado")
+        try:
+            self.update_state(state='PROGRESS', meta={'fase': 'whisper', 'msg': 'Whisper completado', 'pct': 50})
+        except Exception:
+            pass
         
-        logger.info("DEBUG - Iniciando generación de estructura JSON mejorada")
-        logger.info(f"DEBUG - Whisper segmentos: {len(resultado_whisper.get('segmentos', []))}")
-        logger.info(f"DEBUG - Pyannote exitoso: {resultado_pyannote.get('exito', False)}")
-        logger.info(f"DEBUG - Hablantes predefinidos: {len(hablantes_predefinidos)}")
+        # Paso 2: Diarización con pyannote
+        reportador.avanzar(60, "Identificando hablantes con pyannote...", estado=EstadoTranscripcion.DIARIZANDO)
+        try:
+            self.update_state(state='PROGRESS', meta={'fase': 'pyannote', 'msg': 'Diarizando con pyannote', 'pct': 60})
+        except Exception:
+            pass
         
-        # 🔥 USAR ESTRUCTURA SIMPLE Y DIRECTA
-        from .estructura_simple_directa import generar_estructura_simple
+        resultado_pyannote = procesar_con_pyannote(archivo_audio_path, configuracion, hablantes_predefinidos)
         
-        # Obtener referencia al procesamiento_audio ANTES de llamar la función
-        procesamiento_audio = transcripcion.procesamiento_audio
+        return finalizar_transcripcion(transcripcion, resultado_whisper, resultado_pyannote, hablantes_predefinidos)
         
-        logger.info("🔧 Generando estructura JSON con método SIMPLE Y DIRECTO")
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Error procesando transcripción {transcripcion_id}: {error_msg}")
         
-        # Generar la nueva estructura JSON SIMPLE
-        try:
-            conversacion_json = generar_estructura_simple(
-                resultado_whisper=resultado_whisper,
-                resultado_pyannote=resultado_pyannote,
-                procesamiento_audio=procesamiento_audio,
-                transcripcion=transcripcion
+        if transcripcion:
+            reportador = reportador or ReportadorProgreso('transcripcion', transcripcion)
+            reportador.avanzar(
+                transcripcion.progreso_porcentaje, error_msg,
+                estado=EstadoTranscripcion.ERROR,
+                mensaje_error=error_msg,
+            )
+            
+            log_transcripcion_error(
+                transcripcion,
+                'error_procesamiento',
+                error_msg,
+                {'task_id': self.request.id}
             )
-            logger.info("✅ Estructura JSON SIMPLE generada exitosamente")
-        except Exception as e:
-            logger.error(f"❌ Error generando estructura JSON simple: {str(e)}")
-            # Estructura de fallback básica
-            conversacion_json = {
-                "cabecera": {
-                    "audio": {"error": "Error procesando metadata"},
-                    "transcripcion": {"error": "Error procesando transcripción"},
-                    "hablantes": {},
-                    "mapeo_hablantes": {}
-                },
-                "conversacion": [],
-                "metadata": {"error": str(e)}
-            }
         
-        # Debug: Log del resultado 
-        logger.info(f"✅ Conversación JSON generada:")
-        logger.info(f"  - Cabecera: {'cabecera' in conversacion_json}")
-        logger.info(f"  - Conversación: {len(conversacion_json.get('conversacion', []))} segmentos")
-        logger.info(f"  - Hablantes mapeados: {len(conversacion_json.get('cabecera', {}).get('mapeo_hablantes', {}))}")
-        
-        # Paso 4: Guardar resultados con nueva estructura
-        # Extraer datos de la estructura simple
-        conversacion_segmentos = conversacion_json.get('conversacion', [])
-        cabecera = conversacion_json.get('cabecera', {})
-        metadata = conversacion_json.get('metadata', {})
-        
-        # 🎯 EXTRAER TEXTO COMPLETO Y ESTRUCTURADO
-        # Texto completo tradicional (para compatibilidad)
-        transcripcion.texto_completo = ' '.join(seg.get('texto', '') for seg in conversacion_segmentos)
-        
-        # 🔥 NUEVO: Texto estructurado con formato Tiempo,hablante,texto
-        texto_estructurado = conversacion_json.get('texto_estructurado', '')
-        if texto_estructurado:
-            logger.info(f"📝 Texto estructurado disponible: {len(texto_estructurado.splitlines())} líneas")
-            # Guardar en conversacion_json para preservarlo
-            if isinstance(transcripcion.conversacion_json, dict):
-                transcripcion.conversacion_json['texto_estructurado'] = texto_estructurado
-            else:
-                # Si conversacion_json es lista, convertir a dict
-                transcripcion.conversacion_json = {
-                    'conversacion': transcripcion.conversacion_json if isinstance(transcripcion.conversacion_json, list) else [],
-                    'texto_estructurado': texto_estructurado,
-                    'estructura_version': 'v2.0_mejorada'
-                }
-            logger.info(f"💾 Texto estructurado guardado en conversacion_json")
-        
-        # Extraer hablantes desde la cabecera
-        hablantes_info = cabecera.get('hablantes', {})
-        transcripcion.hablantes_detectados = list(hablantes_info.values()) if hablantes_info else []
-        
-        # 🔥 USAR INFORMACIÓN REAL DE PYANNOTE PARA NÚMERO DE HABLANTES
-        num_speakers_pyannote = resultado_pyannote.get('speakers_detectados', resultado_pyannote.get('num_speakers', 1))
-        transcripcion.numero_hablantes = num_speakers_pyannote
-        
-        logger.info(f"📊 HABLANTES FINALES:")
-        logger.info(f"  - Pyannote detectó: {num_speakers_pyannote} speakers")
-        logger.info(f"  - Cabecera tiene: {len(hablantes_info)} hablantes")
-        logger.info(f"  - Conversación tiene: {len(conversacion_segmentos)} segmentos")
-        logger.info(f"  - Resultado final: {transcripcion.numero_hablantes} hablantes")
-        
-        # Generar estadísticas básicas
-        estadisticas = {
-            'total_segmentos': len(conversacion_segmentos),
-            'duracion_total': sum(seg.get('duracion', 0) for seg in conversacion_segmentos),
-            'palabras_total': len(transcripcion.texto_completo.split()) if transcripcion.texto_completo else 0,
-            'hablantes_detectados': transcripcion.numero_hablantes,
-            'texto_estructurado_disponible': bool(texto_estructurado)
+        # Reintentar si es posible
+        if self.request.retries < self.max_retries:
+            logger.info(f"Reintentando transcripción {transcripcion_id} en 60 segundos...")
+            raise self.retry(countdown=60, exc=e)
+        
+        return {
+            'exito': False,
+            'error': error_msg,
+            'transcripcion_id': transcripcion_id
         }
-        transcripcion.estadisticas_procesamiento = estadisticas
-        
-        # Obtener información del modelo Whisper del resultado directo
-        parametros_whisper = resultado_whisper.get('parametros_aplicados', {})
-        metadatos_whisper = resultado_whisper.get('metadatos_modelo', {})
-        
-        # Guardar resultados en campos JSON con estructura completa
-        transcripcion.transcripcion_json = {
-            'texto_completo': transcripcion.texto_completo or '',
-            'texto_estructurado': texto_estructurado,  # 🎯 NUEVO: Formato Tiempo,hablante,texto
-            'segmentos': conversacion_segmentos,       # 🎯 Segmentos con: inicio, hablante, texto
-            'metadatos': {
-                'modelo_whisper': parametros_whisper.get('modelo_whisper', metadatos_whisper.get('modelo', 'unknown')),
-                'idioma_detectado': resultado_whisper.get('idioma_detectado', parametros_whisper.get('idioma_principal', 'es')),
-                'confianza_promedio': metadata.get('confianza_promedio', 0.0),
-                'fecha_procesamiento': timezone.now().isoformat(),
-                'archivo_procesado': str(transcripcion.procesamiento_audio.archivo_audio) if transcripcion.procesamiento_audio and transcripcion.procesamiento_audio.archivo_audio else 'no_disponible',
-                'estructura_mejorada': True,
-                'formato_segmentos': ['inicio', 'fin', 'hablante', 'hablante_id', 'texto', 'duracion']
-            }
+    
+    finally:
+        # Limpiar archivo temporal si existe
+        if archivo_temporal and os.path.exists(archivo_temporal):
+            try:
+                os.unlink(archivo_temporal)
+            except:
+                pass
+
+
+def finalizar_transcripcion(transcripcion: Transcripcion,
+                            resultado_whisper: Dict[str, Any],
+                            resultado_pyannote: Dict[str, Any],
+                            hablantes_predefinidos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combina los resultados de Whisper y pyannote, genera la estructura JSON y
+    guarda la transcripción como completada.
+    
+    Compartido por el modo secuencial y por la unión del modo paralelo.
+    """
+    if not resultado_pyannote.get('exito'):
+        logger.warning(f"Error en pyannote: {resultado_pyannote.get('error')}")
+        # Continuar sin diarización si falla
+        resultado_pyannote = {
+            'exito': True,
+            'hablantes': {'speaker_0': 'Hablante Único'},
+            'segmentos_hablantes': [],
+            'num_hablantes': 1,
+            'estadisticas': {}
         }
-        
-        # ===== GENERAR CONVERSACION_JSON CON CABECERA COMPLETA =====
-        # NUEVA ESTRUCTURA: {cabecera: {...}, conversacion: [...]}
-        
-        # La variable procesamiento_audio ya está definida arriba
-        
-        # Obtener segmentos y hablantes desde diarizacion_json
-        segmentos_json = transcripcion.diarizacion_json.get('segmentos', [])
-        hablantes_json = transcripcion.diarizacion_json.get('hablantes', {})
-        
-        logger.info(f"DEBUG - Convirtiendo diarizacion_json a formato chat: {len(segmentos_json)} segmentos")
-        logger.info(f"DEBUG - Hablantes disponibles: {list(hablantes_json.keys())}")
-        
-        # ===== CREAR CABECERA COMPLETA =====
-        cabecera = {
-            # Información del Audio
-            'audio': {
-                'id': procesamiento_audio.id if procesamiento_audio else None,
-                'titulo': procesamiento_audio.titulo if procesamiento_audio else None,
-                'archivo_original': procesamiento_audio.archivo_audio.name if procesamiento_audio and procesamiento_audio.archivo_audio else None,
-                'archivo_mejorado': procesamiento_audio.archivo_mejorado.name if procesamiento_audio and procesamiento_audio.archivo_mejorado else None,
-                'duracion_segundos': getattr(procesamiento_audio, 'duracion_segundos', None),
-                'fecha_creacion': procesamiento_audio.created_at.isoformat() if procesamiento_audio and hasattr(procesamiento_audio, 'created_at') else None,
-                'metadatos': procesamiento_audio.metadatos_originales if procesamiento_audio else {}
-            },
-            # Información de la Transcripción
-            'transcripcion': {
-                'id': transcripcion.id,
-                'estado': transcripcion.estado,
-                'fecha_creacion': transcripcion.fecha_creacion.isoformat(),
-                'usuario_creacion': transcripcion.usuario_creacion.username if transcripcion.usuario_creacion else None,
-                'modelo_whisper': transcripcion.configuracion_utilizada.modelo_whisper if transcripcion.configuracion_utilizada else None,
-                'idioma': transcripcion.configuracion_utilizada.idioma_principal if transcripcion.configuracion_utilizada else 'es',
-                'configuracion_id': transcripcion.configuracion_utilizada.id if transcripcion.configuracion_utilizada else None
+    
+    logger.info("Diarización con pyannote completada")
+    reportador = ReportadorProgreso('transcripcion', transcripcion)
+    reportador.avanzar(80, "Diarización completada")
+    
+    # Paso 3: Combinar resultados con estructura mejorada
+    reportador.avanzar(90, "Generando estructura JSON mejorada...", estado=EstadoTranscripcion.PROCESANDO)
+    
+    logger.info("DEBUG - Iniciando generación de estructura JSON mejorada")
+    logger.info(f"DEBUG - Whisper segmentos: {len(resultado_whisper.get('segmentos', []))}")
+    logger.info(f"DEBUG - Pyannote exitoso: {resultado_pyannote.get('exito', False)}")
+    logger.info(f"DEBUG - Hablantes predefinidos: {len(hablantes_predefinidos)}")
+    
+    # 🔥 USAR ESTRUCTURA SIMPLE Y DIRECTA
+    from .estructura_simple_directa import generar_estructura_simple
+    
+    # Obtener referencia al procesamiento_audio ANTES de llamar la función
+    procesamiento_audio = transcripcion.procesamiento_audio
+    
+    logger.info("🔧 Generando estructura JSON con método SIMPLE Y DIRECTO")
+    
+    # Generar la nueva estructura JSON SIMPLE
+    try:
+        conversacion_json = generar_estructura_simple(
+            resultado_whisper=resultado_whisper,
+            resultado_pyannote=resultado_pyannote,
+            procesamiento_audio=procesamiento_audio,
+            transcripcion=transcripcion
+        )
+        logger.info("✅ Estructura JSON SIMPLE generada exitosamente")
+    except Exception as e:
+        logger.error(f"❌ Error generando estructura JSON simple: {str(e)}")
+        # Estructura de fallback básica
+        conversacion_json = {
+            "cabecera": {
+                "audio": {"error": "Error procesando metadata"},
+                "transcripcion": {"error": "Error procesando transcripción"},
+                "hablantes": {},
+                "mapeo_hablantes": {}
             },
-            # ✅ MAPEO COMPLETO DE HABLANTES
-            'hablantes': {},
-            'mapeo_hablantes': {},  # Mapeo directo: "Hablante 0" → "Beto"
-            'participantes_configurados': [],
-            'total_hablantes': 0
+            "conversacion": [],
+            "metadata": {"error": str(e)}
         }
-        
-        # Obtener participantes configurados
-        if procesamiento_audio and procesamiento_audio.participantes_detallados:
-            participantes = procesamiento_audio.participantes_detallados
-            cabecera['participantes_configurados'] = participantes
-            cabecera['total_hablantes'] = len(participantes)
-            
-            # Crear mapeo directo Hablante 0/1/2 → Nombres reales
-            for i, participante in enumerate(participantes):
-                nombre_real = participante.get('nombres', f'Participante {i+1}')
-                apellidos = participante.get('apellidos', '')
-                nombre_completo = f"{nombre_real} {apellidos}".strip() if apellidos else nombre_real
-                
-                # Mapeo directo para la UI
-                cabecera['mapeo_hablantes'][f'Hablante {i}'] = {
-                    'nombre': nombre_real,
-                    'apellidos': apellidos,
-                    'nombre_completo': nombre_completo,
-                    'cargo': participante.get('cargo', ''),
-                    'institucion': participante.get('institucion', ''),
-                    'orden': participante.get('orden', i + 1),
-                    'info_completa': participante
-                }
-                
-                # También mapear los speakers detectados si están disponibles
-                speaker_key = f'SPEAKER_{i:02d}'  # SPEAKER_00, SPEAKER_01, etc.
-                if speaker_key in hablantes_json:
-                    cabecera['hablantes'][speaker_key] = cabecera['mapeo_hablantes'][f'Hablante {i}']
-                
-                logger.info(f"🎯 MAPEO CABECERA: Hablante {i} → {nombre_completo}")
-        
-        # Si hay hablantes en el JSON de diarización, incluirlos también
-        if hablantes_json:
-            for speaker_id, info in hablantes_json.items():
-                if speaker_id not in cabecera['hablantes']:
-                    cabecera['hablantes'][speaker_id] = info
-        
-        # ===== GENERAR CONVERSACIÓN CON MAPEO CORRECTO =====
-        conversacion_mensajes = []
-        
-        # Generar paleta de colores para hablantes
-        colores_hablantes = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#17a2b8', '#6f42c1', '#e83e8c', '#fd7e14']
-        hablantes_colores = {}
-        
-        for i, segmento in enumerate(segmentos_json):
-            # Obtener información del speaker (asegurar que sea string)
-            speaker_id = str(segmento.get('speaker', 'unknown'))
-            
-            # 🎯 USAR EL MAPEO DE LA CABECERA PARA OBTENER EL NOMBRE REAL
-            nombre_hablante = f'Hablante {speaker_id}'  # Formato estándar
-            
-            # Buscar en el mapeo de la cabecera
-            if nombre_hablante in cabecera['mapeo_hablantes']:
-                speaker_info = cabecera['mapeo_hablantes'][nombre_hablante]
-                speaker_name = speaker_info['nombre_completo']
-            elif speaker_id in cabecera['hablantes']:
-                speaker_info = cabecera['hablantes'][speaker_id]
-                speaker_name = speaker_info.get('nombre', speaker_info.get('label', f'Hablante {speaker_id}'))
-            else:
-                speaker_name = f'Hablante {speaker_id}'
-                speaker_info = {}
-            
-            # Asignar color consistente por hablante
-            if speaker_id not in hablantes_colores:
-                color_index = len(hablantes_colores) % len(colores_hablantes)
-                hablantes_colores[speaker_id] = colores_hablantes[color_index]
+    
+    # Debug: Log del resultado 
+    logger.info(f"✅ Conversación JSON generada:")
+    logger.info(f"  - Cabecera: {'cabecera' in conversacion_json}")
+    logger.info(f"  - Conversación: {len(conversacion_json.get('conversacion', []))} segmentos")
+    logger.info(f"  - Hablantes mapeados: {len(conversacion_json.get('cabecera', {}).get('mapeo_hablantes', {}))}")
+    
+    # Paso 4: Guardar resultados con nueva estructura
+    # Extraer datos de la estructura simple
+    conversacion_segmentos = conversacion_json.get('conversacion', [])
+    cabecera = conversacion_json.get('cabecera', {})
+    metadata = conversacion_json.get('metadata', {})
+    
+    # 🎯 EXTRAER TEXTO COMPLETO Y ESTRUCTURADO
+    # Texto completo tradicional (para compatibilidad)
+    transcripcion.texto_completo = ' '.join(seg.get('texto', '') for seg in conversacion_segmentos)
+    
+    # 🔥 NUEVO: Texto estructurado con formato Tiempo,hablante,texto
+    texto_estructurado = conversacion_json.get('texto_estructurado', '')
+    if texto_estructurado:
+        logger.info(f"📝 Texto estructurado disponible: {len(texto_estructurado.splitlines())} líneas")
+        # Guardar en conversacion_json para preservarlo
+        if isinstance(transcripcion.conversacion_json, dict):
+            transcripcion.conversacion_json['texto_estructurado'] = texto_estructurado
+        else:
+            # Si conversacion_json es lista, convertir a dict
+            transcripcion.conversacion_json = {
+                'conversacion': transcripcion.conversacion_json if isinstance(transcripcion.conversacion_json, list) else [],
+                'texto_estructurado': texto_estructurado,
+                'estructura_version': 'v2.0_mejorada'
+            }
+        logger.info(f"💾 Texto estructurado guardado en conversacion_json")
+    
+    # Extraer hablantes desde la cabecera
+    hablantes_info = cabecera.get('hablantes', {})
+    transcripcion.hablantes_detectados = list(hablantes_info.values()) if hablantes_info else []
+    
+    # 🔥 USAR INFORMACIÓN REAL DE PYANNOTE PARA NÚMERO DE HABLANTES
+    num_speakers_pyannote = resultado_pyannote.get('speakers_detectados', resultado_pyannote.get('num_speakers', 1))
+    transcripcion.numero_hablantes = num_speakers_pyannote
+    
+    logger.info(f"📊 HABLANTES FINALES:")
+    logger.info(f"  - Pyannote detectó: {num_speakers_pyannote} speakers")
+    logger.info(f"  - Cabecera tiene: {len(hablantes_info)} hablantes")
+    logger.info(f"  - Conversación tiene: {len(conversacion_segmentos)} segmentos")
+    logger.info(f"  - Resultado final: {transcripcion.numero_hablantes} hablantes")
+    
+    # Generar estadísticas básicas
+    estadisticas = {
+        'total_segmentos': len(conversacion_segmentos),
+        'duracion_total': sum(seg.get('duracion', 0) for seg in conversacion_segmentos),
+        'palabras_total': len(transcripcion.texto_completo.split()) if transcripcion.texto_completo else 0,
+        'hablantes_detectados': transcripcion.numero_hablantes,
+        'texto_estructurado_disponible': bool(texto_estructurado)
+    }
+    transcripcion.estadisticas_procesamiento = estadisticas
+    
+    # Obtener información del modelo Whisper del resultado directo
+    parametros_whisper = resultado_whisper.get('parametros_aplicados', {})
+    metadatos_whisper = resultado_whisper.get('metadatos_modelo', {})
+    
+    # Guardar resultados en campos JSON con estructura completa
+    transcripcion.transcripcion_json = {
+        'texto_completo': transcripcion.texto_completo or '',
+        'texto_estructurado': texto_estructurado,  # 🎯 NUEVO: Formato Tiempo,hablante,texto
+        'segmentos': conversacion_segmentos,       # 🎯 Segmentos con: inicio, hablante, texto
+        'metadatos': {
+            'modelo_whisper': parametros_whisper.get('modelo_whisper', metadatos_whisper.get('modelo', 'unknown')),
+            'idioma_detectado': resultado_whisper.get('idioma_detectado', parametros_whisper.get('idioma_principal', 'es')),
+            'confianza_promedio': metadata.get('confianza_promedio', 0.0),
+            'fecha_procesamiento': timezone.now().isoformat(),
+            'archivo_procesado': str(transcripcion.procesamiento_audio.archivo_audio) if transcripcion.procesamiento_audio and transcripcion.procesamiento_audio.archivo_audio else 'no_disponible',
+            'estructura_mejorada': True,
+            'formato_segmentos': ['inicio', 'fin', 'hablante', 'hablante_id', 'texto', 'duracion']
+        }
+    }
+    
+    # ===== GENERAR CONVERSACION_JSON CON CABECERA COMPLETA =====
+    # NUEVA ESTRUCTURA: {cabecera: {...}, conversacion: [...]}
+    
+    # La variable procesamiento_audio ya está definida arriba
+    
+    # Obtener segmentos y hablantes desde diarizacion_json
+    segmentos_json = transcripcion.diarizacion_json.get('segmentos', [])
+    hablantes_json = transcripcion.diarizacion_json.get('hablantes', {})
+    
+    logger.info(f"DEBUG - Convirtiendo diarizacion_json a formato chat: {len(segmentos_json)} segmentos")
+    logger.info(f"DEBUG - Hablantes disponibles: {list(hablantes_json.keys())}")
+    
+    # ===== CREAR CABECERA COMPLETA =====
+    cabecera = {
+        # Información del Audio
+        'audio': {
+            'id': procesamiento_audio.id if procesamiento_audio else None,
+            'titulo': procesamiento_audio.titulo if procesamiento_audio else None,
+            'archivo_original': procesamiento_audio.archivo_audio.name if procesamiento_audio and procesamiento_audio.archivo_audio else None,
+            'archivo_mejorado': procesamiento_audio.archivo_mejorado.name if procesamiento_audio and procesamiento_audio.archivo_mejorado else None,
+            'duracion_segundos': getattr(procesamiento_audio, 'duracion_segundos', None),
+            'fecha_creacion': procesamiento_audio.created_at.isoformat() if procesamiento_audio and hasattr(procesamiento_audio, 'created_at') else None,
+            'metadatos': procesamiento_audio.metadatos_originales if procesamiento_audio else {}
+        },
+        # Información de la Transcripción
+        'transcripcion': {
+            'id': transcripcion.id,
+            'estado': transcripcion.estado,
+            'fecha_creacion': transcripcion.fecha_creacion.isoformat(),
+            'usuario_creacion': transcripcion.usuario_creacion.username if transcripcion.usuario_creacion else None,
+            'modelo_whisper': transcripcion.configuracion_utilizada.modelo_whisper if transcripcion.configuracion_utilizada else None,
+            'idioma': transcripcion.configuracion_utilizada.idioma_principal if transcripcion.configuracion_utilizada else 'es',
+            'configuracion_id': transcripcion.configuracion_utilizada.id if transcripcion.configuracion_utilizada else None
+        },
+        # ✅ MAPEO COMPLETO DE HABLANTES
+        'hablantes': {},
+        'mapeo_hablantes': {},  # Mapeo directo: "Hablante 0" → "Beto"
+        'participantes_configurados': [],
+        'total_hablantes': 0
+    }
+    
+    # Obtener participantes configurados
+    if procesamiento_audio and procesamiento_audio.participantes_detallados:
+        participantes = procesamiento_audio.participantes_detallados
+        cabecera['participantes_configurados'] = participantes
+        cabecera['total_hablantes'] = len(participantes)
+        
+        # Crear mapeo directo Hablante 0/1/2 → Nombres reales
+        for i, participante in enumerate(participantes):
+            nombre_real = participante.get('nombres', f'Participante {i+1}')
+            apellidos = participante.get('apellidos', '')
+            nombre_completo = f"{nombre_real} {apellidos}".strip() if apellidos else nombre_real
             
-            color = hablantes_colores[speaker_id]
+            # Mapeo directo para la UI
+            cabecera['mapeo_hablantes'][f'Hablante {i}'] = {
+                'nombre': nombre_real,
+                'apellidos': apellidos,
+                'nombre_completo': nombre_completo,
+                'cargo': participante.get('cargo', ''),
+                'institucion': participante.get('institucion', ''),
+                'orden': participante.get('orden', i + 1),
+                'info_completa': participante
+            }
             
-            # Validar datos antes de crear mensaje
-            inicio = float(segmento.get('start', 0.0))
-            fin = float(segmento.get('end', 0.0))
-            texto = segmento.get('text', '').strip()
+            # También mapear los speakers detectados si están disponibles
+            speaker_key = f'SPEAKER_{i:02d}'  # SPEAKER_00, SPEAKER_01, etc.
+            if speaker_key in hablantes_json:
+                cabecera['hablantes'][speaker_key] = cabecera['mapeo_hablantes'][f'Hablante {i}']
             
-            # Solo agregar si tiene contenido válido
-            if texto and inicio >= 0 and fin > inicio:
-                mensaje_chat = {
-                    'hablante': speaker_name,  # ✅ NOMBRE REAL desde cabecera
-                    'texto': texto,
-                    'inicio': inicio,
-                    'fin': fin,
-                    'duracion': fin - inicio,
-                    'confianza': segmento.get('speaker_confidence', 0.8),
-                    'speaker_id': speaker_id,
-                    'color': color,
-                    'timestamp': f"{inicio:.1f}s - {fin:.1f}s",
-                    'info_hablante': speaker_info
-                }
-                
-                conversacion_mensajes.append(mensaje_chat)
-            else:
-                logger.warning(f"DEBUG - Segmento inválido omitido: speaker={speaker_id}, texto='{texto}', inicio={inicio}, fin={fin}")
-        
-        # ===== ESTRUCTURA FINAL CON CABECERA =====
-        conversacion_completa = {
-            'cabecera': cabecera,
-            'conversacion': conversacion_mensajes,
-            'metadata': {
-                'total_mensajes': len(conversacion_mensajes),
-                'hablantes_detectados': len(set(msg['speaker_id'] for msg in conversacion_mensajes)),
-                'duracion_total': max([msg['fin'] for msg in conversacion_mensajes]) if conversacion_mensajes else 0,
-                'fecha_generacion': datetime.now().isoformat(),
-                'version_estructura': '2.0'
+            logger.info(f"🎯 MAPEO CABECERA: Hablante {i} → {nombre_completo}")
+    
+    # Si hay hablantes en el JSON de diarización, incluirlos también
+    if hablantes_json:
+        for speaker_id, info in hablantes_json.items():
+            if speaker_id not in cabecera['hablantes']:
+                cabecera['hablantes'][speaker_id] = info
+    
+    # ===== GENERAR CONVERSACIÓN CON MAPEO CORRECTO =====
+    conversacion_mensajes = []
+    
+    # Generar paleta de colores para hablantes
+    colores_hablantes = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#17a2b8', '#6f42c1', '#e83e8c', '#fd7e14']
+    hablantes_colores = {}
+    
+    for i, segmento in enumerate(segmentos_json):
+        # Obtener información del speaker (asegurar que sea string)
+        speaker_id = str(segmento.get('speaker', 'unknown'))
+        
+        # 🎯 USAR EL MAPEO DE LA CABECERA PARA OBTENER EL NOMBRE REAL
+        nombre_hablante = f'Hablante {speaker_id}'  # Formato estándar
+        
+        # Buscar en el mapeo de la cabecera
+        if nombre_hablante in cabecera['mapeo_hablantes']:
+            speaker_info = cabecera['mapeo_hablantes'][nombre_hablante]
+            speaker_name = speaker_info['nombre_completo']
+        elif speaker_id in cabecera['hablantes']:
+            speaker_info = cabecera['hablantes'][speaker_id]
+            speaker_name = speaker_info.get('nombre', speaker_info.get('label', f'Hablante {speaker_id}'))
+        else:
+            speaker_name = f'Hablante {speaker_id}'
+            speaker_info = {}
+        
+        # Asignar color consistente por hablante
+        if speaker_id not in hablantes_colores:
+            color_index = len(hablantes_colores) % len(colores_hablantes)
+            hablantes_colores[speaker_id] = colores_hablantes[color_index]
+        
+        color = hablantes_colores[speaker_id]
+        
+        # Validar datos antes de crear mensaje
+        inicio = float(segmento.get('start', 0.0))
+        fin = float(segmento.get('end', 0.0))
+        texto = segmento.get('text', '').strip()
+        
+        # Solo agregar si tiene contenido válido
+        if texto and inicio >= 0 and fin > inicio:
+            mensaje_chat = {
+                'hablante': speaker_name,  # ✅ NOMBRE REAL desde cabecera
+                'texto': texto,
+                'inicio': inicio,
+                'fin': fin,
+                'duracion': fin - inicio,
+                'confianza': segmento.get('speaker_confidence', 0.8),
+                'speaker_id': speaker_id,
+                'color': color,
+                'timestamp': f"{inicio:.1f}s - {fin:.1f}s",
+                'info_hablante': speaker_info
             }
+            
+            conversacion_mensajes.append(mensaje_chat)
+        else:
+            logger.warning(f"DEBUG - Segmento inválido omitido: speaker={speaker_id}, texto='{texto}', inicio={inicio}, fin={fin}")
+    
+    # ===== ESTRUCTURA FINAL CON CABECERA =====
+    conversacion_completa = {
+        'cabecera': cabecera,
+        'conversacion': conversacion_mensajes,
+        'metadata': {
+            'total_mensajes': len(conversacion_mensajes),
+            'hablantes_detectados': len(set(msg['speaker_id'] for msg in conversacion_mensajes)),
+            'duracion_total': max([msg['fin'] for msg in conversacion_mensajes]) if conversacion_mensajes else 0,
+            'fecha_generacion': datetime.now().isoformat(),
+            'version_estructura': '2.0'
         }
-        
-        # Guardar conversación COMPLETA en formato correcto para el template  
-        # 🔥 USAR LA NUEVA ESTRUCTURA SIMPLE DIRECTAMENTE
-        transcripcion.conversacion_json = conversacion_json  # Estructura completa con cabecera, conversacion, texto_estructurado
-        
-        logger.info(f"💾 ESTRUCTURA COMPLETA GUARDADA:")
-        logger.info(f"  - Tipo: {type(conversacion_json)}")
-        logger.info(f"  - Campos: {list(conversacion_json.keys()) if isinstance(conversacion_json, dict) else 'No es dict'}")
-        if 'conversacion' in conversacion_json:
-            logger.info(f"  - Segmentos conversación: {len(conversacion_json['conversacion'])}")
-        if 'texto_estructurado' in conversacion_json:
-            lineas = conversacion_json['texto_estructurado'].count('\n') + 1
-            logger.info(f"  - Líneas texto estructurado: {lineas}")
-        if 'cabecera' in conversacion_json and 'mapeo_hablantes' in conversacion_json['cabecera']:
-            logger.info(f"  - Mapeos hablantes: {len(conversacion_json['cabecera']['mapeo_hablantes'])}")
-        
-        # COMPATIBILIDAD: También generar formato anterior para templates existentes
-        conversacion_mensajes = conversacion_json.get('conversacion', [])
-        if conversacion_mensajes:
-            primer_mensaje = conversacion_mensajes[0]
-            logger.info(f"🔍 Primer mensaje: hablante='{primer_mensaje.get('hablante')}', texto='{primer_mensaje.get('texto', '')[:50]}...', tiempo={primer_mensaje.get('inicio')}s-{primer_mensaje.get('fin')}s")
-        
-        # También guardar estructura completa en campo separado
-        transcripcion.diarizacion_json = {
-            'segmentos': conversacion_segmentos,
-            'hablantes': hablantes_info,
-            'metadatos': metadata,
-            'cabecera': cabecera,
-            'estado_transcripcion': 'exitosa' if transcripcion.texto_completo else 'sin_texto'
+    }
+    
+    # Guardar conversación COMPLETA en formato correcto para el template  
+    # 🔥 USAR LA NUEVA ESTRUCTURA SIMPLE DIRECTAMENTE
+    transcripcion.conversacion_json = conversacion_json  # Estructura completa con cabecera, conversacion, texto_estructurado
+    
+    logger.info(f"💾 ESTRUCTURA COMPLETA GUARDADA:")
+    logger.info(f"  - Tipo: {type(conversacion_json)}")
+    logger.info(f"  - Campos: {list(conversacion_json.keys()) if isinstance(conversacion_json, dict) else 'No es dict'}")
+    if 'conversacion' in conversacion_json:
+        logger.info(f"  - Segmentos conversación: {len(conversacion_json['conversacion'])}")
+    if 'texto_estructurado' in conversacion_json:
+        lineas = conversacion_json['texto_estructurado'].count('\n') + 1
+        logger.info(f"  - Líneas texto estructurado: {lineas}")
+    if 'cabecera' in conversacion_json and 'mapeo_hablantes' in conversacion_json['cabecera']:
+        logger.info(f"  - Mapeos hablantes: {len(conversacion_json['cabecera']['mapeo_hablantes'])}")
+    
+    # COMPATIBILIDAD: También generar formato anterior para templates existentes
+    conversacion_mensajes = conversacion_json.get('conversacion', [])
+    if conversacion_mensajes:
+        primer_mensaje = conversacion_mensajes[0]
+        logger.info(f"🔍 Primer mensaje: hablante='{primer_mensaje.get('hablante')}', texto='{primer_mensaje.get('texto', '')[:50]}...', tiempo={primer_mensaje.get('inicio')}s-{primer_mensaje.get('fin')}s")
+    
+    # También guardar estructura completa en campo separado
+    transcripcion.diarizacion_json = {
+        'segmentos': conversacion_segmentos,
+        'hablantes': hablantes_info,
+        'metadatos': metadata,
+        'cabecera': cabecera,
+        'estado_transcripcion': 'exitosa' if transcripcion.texto_completo else 'sin_texto'
+    }
+    
+    # ⚠️ PRESERVAR segmentos_hablantes del pyannote helper
+    if 'segmentos_hablantes' in resultado_pyannote:
+        transcripcion.diarizacion_json['segmentos_hablantes'] = resultado_pyannote['segmentos_hablantes']
+        logger.info(f"DEBUG - Preservados {len(resultado_pyannote['segmentos_hablantes'])} segmentos_hablantes del pyannote helper")
+    
+    # Guardar métricas mejoradas
+    transcripcion.estadisticas_json = {
+        **estadisticas,
+        **metadata,
+        'estructura_version': 'simple_directa_v1.0'
+    }
+    
+    # Completar
+    transcripcion.estado = EstadoTranscripcion.COMPLETADO
+    transcripcion.progreso_porcentaje = 100
+    transcripcion.mensaje_estado = "Transcripción completada exitosamente"
+    transcripcion.fecha_completado = timezone.now()
+    
+    # DEBUG: Verificar que conversacion_json tenga la nueva estructura
+    logger.info(f"DEBUG - ANTES DEL SAVE - conversacion_json tipo: {type(transcripcion.conversacion_json)}")
+    if isinstance(transcripcion.conversacion_json, dict):
+        cabecera = transcripcion.conversacion_json.get('cabecera', {})
+        conversacion = transcripcion.conversacion_json.get('conversacion', [])
+        metadata = transcripcion.conversacion_json.get('metadata', {})
+        logger.info(f"DEBUG - ANTES DEL SAVE - estructura completa: cabecera={bool(cabecera)}, conversacion={len(conversacion)} mensajes, metadata={bool(metadata)}")
+        logger.info(f"DEBUG - ANTES DEL SAVE - mapeo_hablantes en cabecera: {len(cabecera.get('mapeo_hablantes', {}))}")
+    else:
+        logger.warning(f"DEBUG - ANTES DEL SAVE - conversacion_json no tiene estructura esperada")
+    
+    transcripcion.save()
+    # Filas editables de la nueva conversación (SegmentoTranscripcion)
+    reconstruir_segmentos(transcripcion)
+    publicar_estado(transcripcion, 100)
+    
+    log_transcripcion_accion(
+        transcripcion, 
+        'transcripcion_completada',
+        {
+            'duracion_procesamiento': (timezone.now() - transcripcion.tiempo_inicio_proceso).total_seconds() if transcripcion.tiempo_inicio_proceso else 0,
+            'num_hablantes': transcripcion.numero_hablantes,
+            'palabras_transcritas': len(transcripcion.texto_completo.split())
         }
+    )
+    
+    logger.info(f"Transcripción {transcripcion.id} completada exitosamente")
+    
+    return {
+        'exito': True,
+        'transcripcion_id': transcripcion.id,
+        'num_hablantes': transcripcion.numero_hablantes,  # 🔥 Ahora usa el número real de pyannote
+        'duracion_texto': len(transcripcion.texto_completo),
+        'speakers_detectados': num_speakers_pyannote,  # 🔥 Info adicional para verificación
+        'participantes_configurados': len(hablantes_predefinidos) if hablantes_predefinidos else 0
+    }
+
+
+# ============================================================================
+# Modo paralelo: Whisper y pyannote leen el mismo WAV, se ejecutan a la vez
+# ============================================================================
+
+def get_config_paralelo() -> Dict[str, Any]:
+    """Configuración del modo paralelo combinando defaults y settings"""
+    config = {
+        'HABILITADO': False,
+        'NUCLEOS_WHISPER': 0,     # 0 = automático según PROPORCION_WHISPER
+        'NUCLEOS_PYANNOTE': 0,
+        'PROPORCION_WHISPER': 0.66,
+    }
+    config.update(getattr(settings, 'TRANSCRIPCION_PARALELO', {}) or {})
+    return config
+
+
+def usar_modo_paralelo(configuracion: Dict[str, Any]) -> bool:
+    """La transcripción puede sobrescribir el valor global con 'whisper_pyannote_paralelo'"""
+    return bool(configuracion.get('whisper_pyannote_paralelo', get_config_paralelo()['HABILITADO']))
+
+
+def repartir_nucleos(configuracion: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    Reparte los núcleos de CPU entre Whisper y pyannote
+    
+    Returns:
+        (nucleos_whisper, nucleos_pyannote)
+    """
+    config = get_config_paralelo()
+    total = os.cpu_count() or 2
+    
+    nucleos_whisper = int(configuracion.get('nucleos_whisper') or config['NUCLEOS_WHISPER'] or 0)
+    nucleos_pyannote = int(configuracion.get('nucleos_pyannote') or config['NUCLEOS_PYANNOTE'] or 0)
+    
+    if not nucleos_whisper and not nucleos_pyannote:
+        nucleos_whisper = max(1, min(total - 1, round(total * config['PROPORCION_WHISPER'])))
+        nucleos_pyannote = max(1, total - nucleos_whisper)
+    elif not nucleos_whisper:
+        nucleos_whisper = max(1, total - nucleos_pyannote)
+    elif not nucleos_pyannote:
+        nucleos_pyannote = max(1, total - nucleos_whisper)
+    
+    return nucleos_whisper, nucleos_pyannote
+
+
+@contextmanager
+def limitar_hilos_torch(nucleos: int):
+    """Limita los hilos intra-op de torch durante una etapa y restaura el valor anterior"""
+    try:
+        import torch
+    except ImportError:
+        yield
+        return
+    
+    anteriores = torch.get_num_threads()
+    if nucleos:
+        torch.set_num_threads(nucleos)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(anteriores)
+
+
+def lanzar_procesamiento_paralelo(transcripcion: Transcripcion,
+                                  archivo_audio_path: str,
+                                  configuracion: Dict[str, Any],
+                                  hablantes_predefinidos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Lanza Whisper y pyannote como un chord de Celery cuya unión llama a
+    finalizar_transcripcion con ambos resultados.
+    """
+    nucleos_whisper, nucleos_pyannote = repartir_nucleos(configuracion)
+    logger.info(f"⚡ Modo paralelo: Whisper={nucleos_whisper} núcleos, pyannote={nucleos_pyannote} núcleos")
+    
+    ReportadorProgreso('transcripcion', transcripcion).avanzar(
+        20, "Transcribiendo y diarizando en paralelo...", estado=EstadoTranscripcion.TRANSCRIBIENDO
+    )
+    
+    resultado_union = chord([
+        transcribir_whisper_task.s(archivo_audio_path, configuracion, nucleos_whisper),
+        diarizar_pyannote_task.s(archivo_audio_path, configuracion, hablantes_predefinidos, nucleos_pyannote),
+    ])(unir_resultados_paralelos.s(transcripcion.id, hablantes_predefinidos))
+    
+    return {
+        'exito': True,
+        'modo': 'paralelo',
+        'transcripcion_id': transcripcion.id,
+        'task_union_id': resultado_union.id,
+        'nucleos_whisper': nucleos_whisper,
+        'nucleos_pyannote': nucleos_pyannote
+    }
+
+
+@shared_task(bind=True)
+def transcribir_whisper_task(self, archivo_audio: str, configuracion: Dict[str, Any], nucleos: int = 0):
+    """Etapa Whisper del modo paralelo"""
+    with limitar_hilos_torch(nucleos):
+        return procesar_con_whisper(archivo_audio, configuracion)
+
+
+@shared_task(bind=True)
+def diarizar_pyannote_task(self, archivo_audio: str, configuracion: Dict[str, Any],
+                           hablantes_predefinidos: List[Dict[str, Any]], nucleos: int = 0):
+    """Etapa pyannote del modo paralelo"""
+    with limitar_hilos_torch(nucleos):
+        return procesar_con_pyannote(archivo_audio, configuracion, hablantes_predefinidos)
+
+
+@shared_task(bind=True)
+def unir_resultados_paralelos(self, resultados: List[Dict[str, Any]], transcripcion_id: int,
+                              hablantes_predefinidos: List[Dict[str, Any]]):
+    """Unión del chord: recibe [resultado_whisper, resultado_pyannote] en ese orden"""
+    transcripcion = None
+    try:
+        transcripcion = Transcripcion.objects.get(id=transcripcion_id)
+        resultado_whisper, resultado_pyannote = resultados
         
-        # ⚠️ PRESERVAR segmentos_hablantes del pyannote helper
-        if 'segmentos_hablantes' in resultado_pyannote:
-            transcripcion.diarizacion_json['segmentos_hablantes'] = resultado_pyannote['segmentos_hablantes']
-            logger.info(f"DEBUG - Preservados {len(resultado_pyannote['segmentos_hablantes'])} segmentos_hablantes del pyannote helper")
+        if not resultado_whisper.get('exito'):
+            raise Exception(f"Error en Whisper: {resultado_whisper.get('error')}")
         
-        # Guardar métricas mejoradas
-        transcripcion.estadisticas_json = {
-            **estadisticas,
-            **metadata,
-            'estructura_version': 'simple_directa_v1.0'
-        }
+        logger.info(f"⚡ Whisper y pyannote completados en paralelo para transcripción {transcripcion_id}")
+        return finalizar_transcripcion(transcripcion, resultado_whisper, resultado_pyannote, hablantes_predefinidos)
         
-        # Completar
-        transcripcion.estado = EstadoTranscripcion.COMPLETADO
-        transcripcion.progreso = 100
-        transcripcion.mensaje_estado = "Transcripción completada exitosamente"
-        transcripcion.fecha_completado = timezone.now()
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Error uniendo resultados paralelos de transcripción {transcripcion_id}: {error_msg}")
         
-        # DEBUG: Verificar que conversacion_json tenga la nueva estructura
-        logger.info(f"DEBUG - ANTES DEL SAVE - conversacion_json tipo: {type(transcripcion.conversacion_json)}")
-        if isinstance(transcripcion.conversacion_json, dict):
-            cabecera = transcripcion.conversacion_json.get('cabecera', {})
-            conversacion = transcripcion.conversacion_json.get('conversacion', [])
-            metadata = transcripcion.conversacion_json.get('metadata', {})
-            logger.info(f"DEBUG - ANTES DEL SAVE - estructura completa: cabecera={bool(cabecera)}, conversacion={len(conversacion)} mensajes, metadata={bool(metadata)}")
-            logger.info(f"DEBUG - ANTES DEL SAVE - mapeo_hablantes en cabecera: {len(cabecera.get('mapeo_hablantes', {}))}")
-        else:
-            logger.warning(f"DEBUG - ANTES DEL SAVE - conversacion_json no tiene estructura esperada")
+        if transcripcion:
+            ReportadorProgreso('transcripcion', transcripcion).avanzar(
+                transcripcion.progreso_porcentaje, error_msg,
+                estado=EstadoTranscripcion.ERROR,
+                mensaje_error=error_msg,
+            )
+            
+            log_transcripcion_error(
+                transcripcion,
+                'error_procesamiento',
+                error_msg,
+                {'task_id': self.request.id, 'modo': 'paralelo'}
+            )
         
-        transcripcion.save()
+        return {
+            'exito': False,
+            'error': error_msg,
+            'transcripcion_id': transcripcion_id
+        }
+
+
+# ============================================================================
+# Audios largos: un chunk de Whisper por tarea
+# ============================================================================
+
+def planificar_whisper_por_chunks(archivo_audio_path: str, configuracion: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Chunks a repartir entre workers, o lista vacía si Whisper va en una sola pasada
+    
+    Un resultado en la caché de artefactos evita trocear de nuevo el audio.
+    """
+    config_chunks = get_config_chunks(configuracion)
+    if not config_chunks['HABILITADO']:
+        return []
+    clave_cache = clave_cache_whisper(archivo_audio_path, configuracion)
+    if clave_cache and get_cache_artefactos().obtener(ETAPA_WHISPER, clave_cache):
+        return []
+    return planificar_audio(archivo_audio_path, config_chunks)
+
+
+def lanzar_whisper_por_chunks(transcripcion: Transcripcion,
+                              archivo_audio_path: str,
+                              configuracion: Dict[str, Any],
+                              hablantes_predefinidos: List[Dict[str, Any]],
+                              chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Lanza un chord con una tarea por chunk; su unión junta los segmentos y termina la transcripción
+    
+    Los workers prefork de Celery son daemon y no pueden crear un pool de
+    procesos propio, así que el paralelismo lo dan los workers (--concurrency).
+    En modo paralelo la diarización va en la misma cabecera del chord.
+    """
+    paralelo = usar_modo_paralelo(configuracion)
+    cabecera = [transcribir_chunk_task.s(archivo_audio_path, chunk, configuracion) for chunk in chunks]
+    if paralelo:
+        _, nucleos_pyannote = repartir_nucleos(configuracion)
+        cabecera.append(diarizar_pyannote_task.s(archivo_audio_path, configuracion, hablantes_predefinidos, nucleos_pyannote))
+    
+    logger.info(f"🔪 Transcripción {transcripcion.id}: {len(chunks)} chunks de Whisper en tareas separadas"
+                f"{' junto a pyannote' if paralelo else ''}")
+    ReportadorProgreso('transcripcion', transcripcion).avanzar(
+        20, f"Transcribiendo {len(chunks)} fragmentos del audio...", estado=EstadoTranscripcion.TRANSCRIBIENDO
+    )
+    
+    resultado_union = chord(cabecera)(
+        unir_chunks_whisper.s(transcripcion.id, archivo_audio_path, configuracion, hablantes_predefinidos, paralelo)
+    )
+    
+    return {
+        'exito': True,
+        'modo': 'chunks',
+        'transcripcion_id': transcripcion.id,
+        'task_union_id': resultado_union.id,
+        'chunks': len(chunks),
+        'paralelo': paralelo
+    }
+
+
+@shared_task(bind=True)
+def transcribir_chunk_task(self, archivo_audio: str, chunk: Dict[str, Any], configuracion: Dict[str, Any]):
+    """
+    Transcribe un chunk de un audio largo
+    
+    El modelo queda en el registro del worker para los chunks siguientes. Tras
+    agotar los reintentos devuelve ``exito: False`` para que el chord se una
+    igualmente y la unión marque el error.
+    """
+    reintentos = int(get_config_chunks(configuracion)['REINTENTOS_CHUNK'])
+    try:
+        whisper_processor = WhisperProcessor()
+        modelo_nombre = configuracion.get('modelo_whisper', 'base')
+        if not whisper_processor.cargar_modelo(modelo_nombre, configuracion.get('usar_gpu', True),
+                                               configuracion.get('motor_asr', MOTOR_OPENAI_WHISPER)):
+            raise Exception(f"No se pudo cargar el modelo {modelo_nombre}")
+        audio_chunk = cargar_tramo(archivo_audio, chunk['inicio'], chunk['fin'])
+        resultado = transcribir_chunk(whisper_processor.motor, audio_chunk, chunk, opciones_whisper(configuracion))
+        logger.info(f"✅ Chunk {chunk['indice']} transcrito ({chunk['inicio']:.0f}-{chunk['fin']:.0f}s)")
+        return {**resultado, 'exito': True}
+    except Exception as e:
+        if self.request.retries < reintentos:
+            logger.warning(f"⚠️ Reintentando chunk {chunk['indice']} ({self.request.retries + 1}/{reintentos}): {e}")
+            raise self.retry(countdown=5, exc=e, max_retries=reintentos)
+        logger.error(f"❌ Chunk {chunk['indice']} falló tras {self.request.retries + 1} intentos: {e}")
+        return {'exito': False, 'indice': chunk['indice'], 'error': str(e)}
+
+
+@shared_task(bind=True)
+def unir_chunks_whisper(self, resultados: List[Dict[str, Any]], transcripcion_id: int, archivo_audio: str,
+                        configuracion: Dict[str, Any], hablantes_predefinidos: List[Dict[str, Any]],
+                        paralelo: bool = False):
+    """Unión del chord de chunks: [chunk_0, ..., chunk_n] y, en modo paralelo, el resultado de pyannote al final"""
+    transcripcion = None
+    try:
+        transcripcion = Transcripcion.objects.get(id=transcripcion_id)
+        resultados = list(resultados)
+        resultado_pyannote = resultados.pop() if paralelo else None
         
-        log_transcripcion_accion(
-            transcripcion, 
-            'transcripcion_completada',
-            {
-                'duracion_procesamiento': (timezone.now() - transcripcion.tiempo_inicio_proceso).total_seconds() if transcripcion.tiempo_inicio_proceso else 0,
-                'num_hablantes': transcripcion.numero_hablantes,
-                'palabras_transcritas': len(transcripcion.texto_completo.split())
-            }
+        fallidos = [r for r in resultados if not r.get('exito')]
+        if fallidos:
+            raise Exception(f"Error en Whisper: chunk {fallidos[0].get('indice')}: {fallidos[0].get('error')}")
+        
+        whisper_processor = WhisperProcessor()
+        whisper_processor.cargar_modelo(
+            configuracion.get('modelo_whisper', 'base'), configuracion.get('usar_gpu', True),
+            configuracion.get('motor_asr', MOTOR_OPENAI_WHISPER)
+        )
+        resultado_whisper = whisper_processor.resultado_auditado(
+            unir_chunks(sorted(resultados, key=lambda r: r['indice'])), configuracion, opciones_whisper(configuracion)
         )
+        get_cache_artefactos().guardar(
+            ETAPA_WHISPER, clave_cache_whisper(archivo_audio, configuracion), datos=resultado_whisper
+        )
+        logger.info(f"🔪 {len(resultados)} chunks unidos para la transcripción {transcripcion_id}")
         
-        logger.info(f"Transcripción {transcripcion_id} completada exitosamente")
+        if not paralelo:
+            ReportadorProgreso('transcripcion', transcripcion).avanzar(
+                60, "Identificando hablantes con pyannote...", estado=EstadoTranscripcion.DIARIZANDO
+            )
+            resultado_pyannote = procesar_con_pyannote(archivo_audio, configuracion, hablantes_predefinidos)
         
-        return {
-            'exito': True,
-            'transcripcion_id': transcripcion_id,
-            'num_hablantes': transcripcion.numero_hablantes,  # 🔥 Ahora usa el número real de pyannote
-            'duracion_texto': len(transcripcion.texto_completo),
-            'speakers_detectados': num_speakers_pyannote,  # 🔥 Info adicional para verificación
-            'participantes_configurados': len(hablantes_predefinidos) if hablantes_predefinidos else 0
-        }
+        return finalizar_transcripcion(transcripcion, resultado_whisper, resultado_pyannote, hablantes_predefinidos)
         
     except Exception as e:
         error_msg = str(e)
-        logger.error(f"Error procesando transcripción {transcripcion_id}: {error_msg}")
+        logger.error(f"Error uniendo chunks de la transcripción {transcripcion_id}: {error_msg}")
         
         if transcripcion:
-            transcripcion.estado = EstadoTranscripcion.ERROR
-            transcripcion.mensaje_error = error_msg
-            transcripcion.fecha_completado = timezone.now()
-            transcripcion.save()
+            ReportadorProgreso('transcripcion', transcripcion).avanzar(
+                transcripcion.progreso_porcentaje, error_msg,
+                estado=EstadoTranscripcion.ERROR,
+                mensaje_error=error_msg,
+            )
             
             log_transcripcion_error(
                 transcripcion,
                 'error_procesamiento',
                 error_msg,
-                {'task_id': self.request.id}
+                {'task_id': self.request.id, 'modo': 'chunks'}
             )
         
-        # Reintentar si es posible
-        if self.request.retries < self.max_retries:
-            logger.info(f"Reintentando transcripción {transcripcion_id} en 60 segundos...")
-            raise self.retry(countdown=60, exc=e)
-        
         return {
             'exito': False,
             'error': error_msg,
             'transcripcion_id': transcripcion_id
         }
-    
-    finally:
-        # Limpiar archivo temporal si existe
-        if archivo_temporal and os.path.exists(archivo_temporal):
-            try:
-                os.unlink(archivo_temporal)
-            except:
-                pass
+
+
+def parametros_cache_whisper(configuracion: Dict[str, Any]) -> Dict[str, Any]:
+    """Parámetros que cambian el resultado de Whisper (forman parte de la clave de caché)"""
+    config_chunks = get_config_chunks(configuracion)
+    return {
+        'modelo_whisper': configuracion.get('modelo_whisper', 'base'),
+        'motor_asr': configuracion.get('motor_asr', MOTOR_OPENAI_WHISPER),
+        'idioma_principal': configuracion.get('idioma_principal', 'es'),
+        'temperatura': configuracion.get('temperatura', 0.0),
+        'palabra_por_palabra': configuracion.get('palabra_por_palabra', False),
+        'mejora_audio': configuracion.get('mejora_audio', False),
+        'chunks': [config_chunks['HABILITADO'], config_chunks['DURACION_CHUNK'], config_chunks['OVERLAP']],
+    }
+
+
+def clave_cache_whisper(archivo_audio: str, configuracion: Dict[str, Any]):
+    """Clave del resultado de Whisper en la caché de artefactos (None si la transcripción no usa caché)"""
+    if not configuracion.get('usar_cache', True):
+        return None
+    return get_cache_artefactos().clave(archivo_audio, parametros_cache_whisper(configuracion))
 
 
 def procesar_con_whisper(archivo_audio: str, configuracion: Dict[str, Any]) -> Dict[str, Any]:
     """
     Procesa audio con Whisper para transcripción
+    
+    El modelo se obtiene del registro del proceso (model_registry), por lo que
+    no se recarga entre tareas del mismo worker. Los segmentos crudos se
+    guardan en la caché de artefactos por hash del audio y parámetros.
     """
     whisper_processor = None
+    cache = get_cache_artefactos()
+    clave_cache = clave_cache_whisper(archivo_audio, configuracion)
+    entrada = cache.obtener(ETAPA_WHISPER, clave_cache)
+    if entrada:
+        return {**entrada.datos, 'desde_cache': True}
+    
     try:
         whisper_processor = WhisperProcessor()
         resultado = whisper_processor.transcribir_audio(archivo_audio, configuracion)
+        if resultado.get('exito'):
+            cache.guardar(ETAPA_WHISPER, clave_cache, datos=resultado)
         return resultado
         
     except Exception as e:
@@ -558,6 +916,7 @@ def procesar_con_whisper(archivo_audio: str, configuracion: Dict[str, Any]) -> D
         
     finally:
         if whisper_processor:
+            # Solo libera la referencia; el modelo sigue caliente en el registro
             whisper_processor.limpiar_modelo()
 
 
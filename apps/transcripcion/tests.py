@@ -1,3 +1,368 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection, models
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.audio_processing.models import ProcesamientoAudio, TipoReunion
+from helpers.progreso_eventos import BrokerMemoria, ReportadorProgreso, flujo_eventos, publicar_progreso
+
+from .alineacion_hablantes import IndiceDiarizacion
+from .models import EstadoTranscripcion, SegmentoTranscripcion, Transcripcion
+from .segmentos import (
+    ConflictoVersion, PrecondicionRequerida, aplicar_parche, editar_segmento, eliminar_segmento,
+    insertar_segmento, reconstruir_segmentos
+)
+
+
+def datos_eventos(eventos):
+    """Datos de los eventos ``progreso`` de un flujo SSE, en orden"""
+    datos = []
+    for evento in eventos:
+        lineas = evento.strip().split('\n')
+        if 'event: progreso' in lineas:
+            datos.append(json.loads(next(l for l in lineas if l.startswith('data: '))[len('data: '):]))
+    return datos
+
+
+def crear_transcripcion(nombre_usuario, reunion, **campos):
+    """Usuario → reunión → audio → transcripción; ``campos`` van a la Transcripcion"""
+    usuario = User.objects.create_user(nombre_usuario, password='clave')
+    audio = ProcesamientoAudio.objects.create(
+        titulo=f'Sesión {reunion.lower()}',
+        tipo_reunion=TipoReunion.objects.create(nombre=reunion),
+        usuario=usuario,
+        archivo_audio=f'audio/{reunion.lower()}.wav',
+    )
+    return Transcripcion.objects.create(procesamiento_audio=audio, usuario_creacion=usuario, **campos)
+
+
+class ProgresoEventosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        segmentos = [{'inicio': i, 'fin': i + 1, 'hablante': 'SPEAKER_00', 'texto': 'x' * 200} for i in range(2000)]
+        cls.transcripcion = crear_transcripcion(
+            'editor', 'Ordinaria',
+            estado=EstadoTranscripcion.EN_PROCESO,
+            progreso_porcentaje=10,
+            conversacion_json={'conversacion': segmentos},
+            diarizacion_json={'segmentos': segmentos},
+        )
+        cls.usuario = cls.transcripcion.usuario_creacion
+
+    def columnas_json(self):
+        return [
+            campo.column for campo in Transcripcion._meta.concrete_fields
+            if isinstance(campo, models.JSONField)
+        ]
+
+    def test_cliente_recibe_progreso_ordenado_sin_cargar_json(self):
+        broker = BrokerMemoria()
+        transcripcion_id = self.transcripcion.id
+        avances = [
+            ('transcribiendo', 20, 'Transcribiendo audio con Whisper...'),
+            ('transcribiendo', 50, 'Whisper completado'),
+            ('diarizando', 60, 'Identificando hablantes con pyannote...'),
+            ('procesando', 90, 'Generando estructura JSON mejorada...'),
+            ('completado', 100, ''),
+        ]
+
+        async def cliente():
+            flujo = flujo_eventos('transcripcion', transcripcion_id, config={
+                'PREFIJO': 'pruebas', 'KEEPALIVE': 1, 'TIEMPO_MAXIMO': 10, 'REINTENTO_MS': 1000,
+            })
+            eventos = [await flujo.__anext__(), await flujo.__anext__()]
+            # La tarea publica después de que el cliente ya recibió el estado inicial
+            for estado, progreso, mensaje in avances:
+                publicar_progreso('transcripcion', transcripcion_id, estado, progreso, mensaje)
+            async for evento in flujo:
+                eventos.append(evento)
+            return eventos
+
+        with mock.patch('helpers.progreso_eventos.get_broker', return_value=broker), \
+                mock.patch('helpers.progreso_eventos.get_config_progreso', return_value={'PREFIJO': 'pruebas'}), \
+                CaptureQueriesContext(connection) as consultas:
+            eventos = async_to_sync(cliente)()
+
+        datos = datos_eventos(eventos)
+        self.assertEqual([d['progreso'] for d in datos], [10, 20, 50, 60, 90, 100])
+        self.assertEqual([d['estado'] for d in datos][-1], 'completado')
+        self.assertEqual(datos[1]['mensaje'], 'Transcribiendo audio con Whisper...')
+
+        # Una sola consulta (el estado inicial) y sin ninguna columna JSON
+        self.assertEqual(len(consultas.captured_queries), 1)
+        for columna in self.columnas_json():
+            self.assertNotIn(columna, consultas.captured_queries[0]['sql'])
+
+        # El flujo terminado ya no deja suscriptores
+        self.assertEqual(dict(broker.suscriptores), {})
+
+    def test_sondeo_compacto_no_carga_json(self):
+        self.client.force_login(self.usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(f'/transcripcion/api/progreso/{self.transcripcion.id}/')
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['progreso'], 10)
+        consultas_transcripcion = [
+            c['sql'] for c in consultas.captured_queries if 'transcripcion_transcripcion' in c['sql']
+        ]
+        self.assertEqual(len(consultas_transcripcion), 1)
+        for columna in self.columnas_json():
+            self.assertNotIn(columna, consultas_transcripcion[0])
+
+    def test_progreso_solo_para_propietario_o_personal(self):
+        sondeo = f'/transcripcion/api/progreso/{self.transcripcion.id}/'
+        flujo = f'/transcripcion/api/progreso/{self.transcripcion.id}/stream/'
+
+        self.client.force_login(User.objects.create_user('otro_editor', password='clave'))
+        self.assertEqual(self.client.get(sondeo).status_code, 404)
+        self.assertEqual(self.client.get(flujo).status_code, 404)
+
+        self.client.force_login(User.objects.create_user('secretaria', password='clave', is_staff=True))
+        self.assertEqual(self.client.get(sondeo).json()['progreso'], 10)
+        respuesta = self.client.get(flujo)
+        self.assertEqual(respuesta.status_code, 200)
+        eventos = b''.join(respuesta.streaming_content).decode().split('\n\n')
+        self.assertEqual(datos_eventos(eventos)[0]['progreso'], 10)
+
+
+class SegmentosTranscripcionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        conversacion = [
+            {'inicio': i * 10, 'fin': i * 10 + 9, 'hablante': 'SPEAKER_00', 'texto': f'Segmento {i}', 'confianza': 0.9}
+            for i in range(100)
+        ]
+        cls.transcripcion = crear_transcripcion(
+            'revisor', 'Extraordinaria',
+            estado=EstadoTranscripcion.COMPLETADO,
+            conversacion_json={'cabecera': {'mapeo_hablantes': {}}, 'conversacion': conversacion, 'metadata': {}},
+        )
+        reconstruir_segmentos(cls.transcripcion)
+
+    def test_editar_es_un_update_de_una_fila_con_version(self):
+        with CaptureQueriesContext(connection) as consultas:
+            version, version_actual = editar_segmento(
+                self.transcripcion.id, 5, {'texto': 'Corregido'}, version=1, version_actual=1
+            )
+
+        self.assertEqual((version, version_actual), (2, 2))
+        sentencias = [c['sql'] for c in consultas.captured_queries]
+        self.assertEqual(len([sql for sql in sentencias if sql.startswith('UPDATE')]), 2)
+        self.assertFalse(any('conversacion_json' in sql for sql in sentencias))
+
+        with self.assertRaises(ConflictoVersion):
+            editar_segmento(self.transcripcion.id, 5, {'texto': 'Otra corrección'}, version=1, version_actual=2)
+        with self.assertRaises(PrecondicionRequerida):
+            editar_segmento(self.transcripcion.id, 5, {'texto': 'Sin versión'})
+
+        respuesta = self.client.post(f'/transcripcion/api/editar-segmento/{self.transcripcion.id}/', {
+            'segmento_id': 5, 'hablante': 'SPEAKER_00', 'texto': 'Tarde', 'inicio': 50, 'fin': 59,
+            'version': 1, 'version_actual': 2,
+        })
+        self.assertEqual(respuesta.status_code, 409)
+
+    def test_posicion_leida_antes_de_un_borrado_es_un_conflicto(self):
+        # Dos clientes leen la versión 1; el primero elimina el segmento 3
+        _, _, version_actual = eliminar_segmento(self.transcripcion.id, 3, version_actual=1)
+        self.assertEqual(version_actual, 2)
+
+        # El segmento 4 del segundo cliente ahora está en la posición 3, también en versión 1
+        with self.assertRaises(ConflictoVersion):
+            editar_segmento(self.transcripcion.id, 4, {'texto': 'Corrección'}, version=1, version_actual=1)
+        with self.assertRaises(ConflictoVersion):
+            eliminar_segmento(self.transcripcion.id, 4, version=1, version_actual=1)
+        with self.assertRaises(ConflictoVersion):
+            aplicar_parche(self.transcripcion.id, [
+                {'op': 'test', 'path': '/version_actual', 'value': 1},
+                {'op': 'test', 'path': '/conversacion/4/version', 'value': 1},
+                {'op': 'replace', 'path': '/conversacion/4/texto', 'value': 'Corrección'},
+            ])
+        textos = SegmentoTranscripcion.objects.filter(transcripcion=self.transcripcion).values_list('texto', flat=True)
+        self.assertEqual(list(textos[3:5]), ['Segmento 4', 'Segmento 5'])
+
+    def test_insertar_eliminar_y_regenerar_json(self):
+        _, _, version_actual = insertar_segmento(
+            self.transcripcion.id, 0, {'inicio': 0, 'fin': 1, 'hablante': 'SPEAKER_01', 'texto': 'Nuevo'}
+        )
+        eliminar_segmento(self.transcripcion.id, 50, version_actual=version_actual)
+
+        ordenes = SegmentoTranscripcion.objects.filter(transcripcion=self.transcripcion).values_list('orden', flat=True)
+        self.assertEqual(list(ordenes), list(range(100)))
+
+        transcripcion = Transcripcion.objects.get(pk=self.transcripcion.pk)
+        self.assertTrue(transcripcion.conversacion_desactualizada)
+        conversacion = transcripcion.sincronizar_conversacion()['conversacion']
+        textos = [segmento['texto'] for segmento in conversacion]
+        self.assertEqual(textos[:2], ['Nuevo', 'Segmento 0'])
+        self.assertNotIn('Segmento 49', textos)
+        self.assertEqual(conversacion[1]['confianza'], 0.9)
+        self.assertFalse(Transcripcion.objects.get(pk=self.transcripcion.pk).conversacion_desactualizada)
+
+    def test_parche_divide_un_segmento_y_detecta_conflictos(self):
+        resultado = aplicar_parche(self.transcripcion.id, [
+            {'op': 'test', 'path': '/version_actual', 'value': 1},
+            {'op': 'test', 'path': '/conversacion/3/version', 'value': 1},
+            {'op': 'replace', 'path': '/conversacion/3/texto', 'value': 'Primera parte'},
+            {'op': 'replace', 'path': '/conversacion/3/fin', 'value': 34},
+            {'op': 'add', 'path': '/conversacion/4', 'value': {
+                'inicio': 34, 'fin': 39, 'hablante': 'SPEAKER_00', 'texto': 'Segunda parte',
+            }},
+        ])
+        self.assertEqual(resultado['total_segmentos'], 101)
+        self.assertEqual(resultado['versiones'][3], 2)
+
+        with self.assertRaises(ConflictoVersion):
+            aplicar_parche(self.transcripcion.id, [
+                {'op': 'test', 'path': '/version_actual', 'value': resultado['version_actual']},
+                {'op': 'test', 'path': '/conversacion/3/version', 'value': 1},
+                {'op': 'remove', 'path': '/conversacion/4'},
+                {'op': 'replace', 'path': '/conversacion/3/texto', 'value': 'Fusionado'},
+            ])
+        # El parche rechazado no deja cambios a medias
+        self.assertEqual(SegmentoTranscripcion.objects.filter(transcripcion=self.transcripcion).count(), 101)
+
+
+class IndiceDiarizacionTests(SimpleTestCase):
+    def test_turnos_solapados_y_turno_de_toda_la_sesion(self):
+        turnos = [{'inicio': 0, 'fin': 3600, 'speaker': 'FONDO'}] + [
+            {'inicio': i * 10, 'fin': i * 10 + 15, 'speaker': i % 3} for i in range(360)
+        ]
+        indice = IndiceDiarizacion(turnos)
+
+        for inicio, fin in [(0, 1), (95, 112), (1800, 1800.5), (3590, 3700), (-10, -1)]:
+            esperados = sorted(
+                (i, min(fin, t['fin']) - max(inicio, t['inicio'])) for i, t in enumerate(turnos)
+                if min(fin, t['fin']) - max(inicio, t['inicio']) > 0
+            )
+            self.assertEqual(sorted(indice.solapamientos(inicio, fin)), esperados)
+        self.assertEqual(indice.contiene(1805), 0)
+        self.assertIsNone(indice.contiene(3606))
+
+
+class WhisperPorChunksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.transcripcion = crear_transcripcion('transcriptor', 'Pleno', estado=EstadoTranscripcion.EN_PROCESO)
+
+    def test_un_chunk_por_tarea_y_pyannote_en_la_misma_cabecera(self):
+        from . import tasks
+
+        chunks = [{'indice': i, 'inicio': i * 300.0, 'fin': i * 300.0 + 305} for i in range(4)]
+        with mock.patch.object(tasks, 'chord') as chord:
+            tasks.lanzar_whisper_por_chunks(
+                self.transcripcion, '/tmp/sesion.wav', {'whisper_pyannote_paralelo': True}, [], chunks
+            )
+
+        cabecera = chord.call_args.args[0]
+        self.assertEqual([firma.task for firma in cabecera], [tasks.transcribir_chunk_task.name] * 4 + [
+            tasks.diarizar_pyannote_task.name
+        ])
+        self.assertEqual([firma.args[1]['indice'] for firma in cabecera[:4]], [0, 1, 2, 3])
+        union = chord.return_value.call_args.args[0]
+        self.assertEqual(union.task, tasks.unir_chunks_whisper.name)
+        self.assertIs(union.args[-1], True)
+
+    def test_un_chunk_fallido_marca_error_en_la_union(self):
+        from . import tasks
+
+        resultados = [
+            {'exito': True, 'indice': 0, 'inicio': 0.0, 'fin': 305.0, 'segments': []},
+            {'exito': False, 'indice': 1, 'error': 'sin memoria'},
+        ]
+        with mock.patch('helpers.progreso_eventos.publicar_progreso'):
+            resultado = tasks.unir_chunks_whisper.run(resultados, self.transcripcion.id, '/tmp/sesion.wav', {}, [])
+
+        self.assertFalse(resultado['exito'])
+        self.assertIn('chunk 1', resultado['error'])
+        self.assertEqual(Transcripcion.objects.get(pk=self.transcripcion.pk).estado, EstadoTranscripcion.ERROR)
+
+
+class ReportadorProgresoTests(TestCase):
+    PASOS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        segmentos = [{'inicio': i, 'fin': i + 1, 'hablante': 'SPEAKER_00', 'texto': 'x' * 200} for i in range(200)]
+        cls.transcripcion = crear_transcripcion(
+            'operador', 'Solemne',
+            estado=EstadoTranscripcion.EN_PROCESO,
+            conversacion_json={'conversacion': segmentos},
+            diarizacion_json={'segmentos': segmentos},
+        )
+
+    def simular_trabajo(self, avanzar):
+        """Trabajo de 200 pasos: sentencias SQL y bytes enviados a la base de datos"""
+        with CaptureQueriesContext(connection) as consultas:
+            for paso in range(1, self.PASOS + 1):
+                avanzar(paso)
+        sentencias = [c['sql'] for c in consultas.captured_queries]
+        return sentencias, sum(len(sql.encode()) for sql in sentencias)
+
+    def test_trabajo_de_200_pasos_agrupa_escrituras(self):
+        transcripcion = Transcripcion.objects.get(pk=self.transcripcion.pk)
+
+        def guardar(paso):
+            transcripcion.progreso_porcentaje = paso * 100 // self.PASOS
+            transcripcion.save()
+
+        sentencias_save, bytes_save = self.simular_trabajo(guardar)
+
+        # El bucle de save() dejó la fila al 100%: el reportador parte de una fila recién puesta a 0
+        Transcripcion.objects.filter(pk=self.transcripcion.pk).update(progreso_porcentaje=0)
+        transcripcion = Transcripcion.objects.get(pk=self.transcripcion.pk)
+        reportador = ReportadorProgreso(
+            'transcripcion', transcripcion,
+            config={'INTERVALO_SEGUNDOS': 5, 'PASO_PORCENTAJE': 5},
+            reloj=lambda: 0.0,
+        )
+
+        def avanzar(paso):
+            final = paso == self.PASOS
+            reportador.avanzar(
+                paso * 100 // self.PASOS, f'Paso {paso} de {self.PASOS}',
+                estado=EstadoTranscripcion.COMPLETADO if final else None,
+            )
+
+        with mock.patch('helpers.progreso_eventos.publicar_progreso') as publicar:
+            sentencias, bytes_escritos = self.simular_trabajo(avanzar)
+
+        # Cada paso llega a los editores, pero solo se escribe cada 5 puntos
+        self.assertEqual(publicar.call_count, self.PASOS)
+        self.assertEqual(len(sentencias_save), self.PASOS)
+        self.assertEqual(len(sentencias), 100 // 5)
+        for sql in sentencias:
+            self.assertTrue(sql.startswith('UPDATE'))
+            for columna in ('conversacion_json', 'diarizacion_json', 'transcripcion_json', 'estadisticas_json'):
+                self.assertNotIn(columna, sql)
+        self.assertLess(bytes_escritos * 100, bytes_save)
+
+        transcripcion.refresh_from_db()
+        self.assertEqual(transcripcion.progreso_porcentaje, 100)
+        self.assertEqual(transcripcion.estado, EstadoTranscripcion.COMPLETADO)
+        self.assertEqual(len(transcripcion.conversacion_json['conversacion']), 200)
+
+    def test_intervalo_y_vaciado_de_pendientes(self):
+        ahora = [0.0]
+        transcripcion = Transcripcion.objects.get(pk=self.transcripcion.pk)
+        reportador = ReportadorProgreso(
+            'transcripcion', transcripcion,
+            config={'INTERVALO_SEGUNDOS': 5, 'PASO_PORCENTAJE': 50},
+            reloj=lambda: ahora[0],
+        )
+
+        with mock.patch('helpers.progreso_eventos.publicar_progreso'):
+            self.assertFalse(reportador.avanzar(3))
+            ahora[0] = 6
+            self.assertTrue(reportador.avanzar(4))
+            self.assertFalse(reportador.avanzar(7))
+            self.assertEqual(Transcripcion.objects.get(pk=transcripcion.pk).progreso_porcentaje, 4)
+
+            self.assertTrue(reportador.vaciar())
+            self.assertFalse(reportador.vaciar())
+        self.assertEqual(Transcripcion.objects.get(pk=transcripcion.pk).progreso_porcentaje, 7)
+        self.assertEqual(reportador.escrituras, 2)
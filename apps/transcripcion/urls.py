@@ -22,9 +22,11 @@ from .api_edicion_avanzada import (
     api_agregar_segmento_avanzado,
     api_eliminar_segmento_avanzado,
     api_gestionar_hablantes_avanzado,
-    api_guardar_estructura_completa
+    api_guardar_estructura_completa,
+    api_aplicar_parche
 )
 from .api_test import api_test_conectividad
+from helpers.progreso_eventos import estado_progreso, stream_progreso
 
 app_name = 'transcripcion'
 
@@ -39,6 +41,8 @@ urlpatterns = [
     
     # API para consultar estado
     path('api/estado/<int:transcripcion_id>/', api_estado_transcripcion, name='api_estado_transcripcion'),
+    path('api/progreso/<int:objeto_id>/', estado_progreso, {'tipo': 'transcripcion'}, name='api_progreso_transcripcion'),
+    path('api/progreso/<int:objeto_id>/stream/', stream_progreso, {'tipo': 'transcripcion'}, name='stream_progreso_transcripcion'),
     
     # APIs para edición de transcripciones (básicas)
     path('api/actualizar-json/<int:transcripcion_id>/', api_actualizar_json, name='api_actualizar_json'),
@@ -59,6 +63,7 @@ urlpatterns = [
     path('api/v2/eliminar-segmento/<int:transcripcion_id>/', api_eliminar_segmento_avanzado, name='api_eliminar_segmento_v2'),
     path('api/v2/gestionar-hablantes/<int:transcripcion_id>/', api_gestionar_hablantes_avanzado, name='api_gestionar_hablantes_v2'),
     path('api/v2/guardar-estructura/<int:transcripcion_id>/', api_guardar_estructura_completa, name='api_guardar_estructura_v2'),
+    path('api/v2/parche/<int:transcripcion_id>/', api_aplicar_parche, name='api_aplicar_parche_v2'),
     
     # API de test (sin autenticación)
     path('api/test/', api_test_conectividad, name='api_test'),
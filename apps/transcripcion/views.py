@@ -15,6 +15,7 @@ from .models import (
     Transcripcion, EstadoTranscripcion, ConfiguracionTranscripcion,
     HistorialEdicion, ConfiguracionHablante
 )
+from .segmentos import reconstruir_segmentos
 from .tasks import procesar_transcripcion_completa
 from .logging_helper import (
     log_transcripcion_navegacion, log_transcripcion_accion,
@@ -274,6 +275,7 @@ def configurar_transcripcion(request, audio_id):
                 # Para configuraciones predefinidas, tomar parámetros del template pero permitir modificaciones
                 parametros_custom = {
                     'modelo_whisper': request.POST.get('modelo_whisper', config_seleccionada.modelo_whisper),
+                    'motor_asr': request.POST.get('motor_asr', config_seleccionada.motor_asr),
                     'idioma_principal': request.POST.get('idioma_principal', config_seleccionada.idioma_principal),
                     'temperatura': float(request.POST.get('temperatura', config_seleccionada.temperatura)),
                     'usar_vad': request.POST.get('usar_vad') == 'on',
@@ -293,6 +295,7 @@ def configurar_transcripcion(request, audio_id):
                 config_seleccionada = None
                 parametros_custom = {
                     'modelo_whisper': request.POST.get('modelo_whisper', 'base'),
+                    'motor_asr': request.POST.get('motor_asr', 'openai_whisper'),
                     'idioma_principal': request.POST.get('idioma_principal', 'es'),
                     'temperatura': float(request.POST.get('temperatura', 0.0)),
                     'usar_vad': request.POST.get('usar_vad') == 'on',
@@ -600,6 +603,7 @@ def detalle_transcripcion(request, transcripcion_id):
         except:
             diarizacion_json_formatted = "{}"
             
+        transcripcion.sincronizar_conversacion()
         try:
             conversacion_json_formatted = json.dumps(transcripcion.conversacion_json or {}, indent=2, ensure_ascii=False)
         except:
@@ -983,6 +987,7 @@ def reiniciar_transcripcion(request, transcripcion_id):
         transcripcion.tiempo_inicio_proceso = None
         transcripcion.tiempo_fin_proceso = None
         transcripcion.save()
+        reconstruir_segmentos(transcripcion)
         
         log_transcripcion_accion(
             transcripcion,
@@ -20,6 +20,10 @@ from .models import (
     Transcripcion, EstadoTranscripcion, ConfiguracionTranscripcion,
     HistorialEdicion, ConfiguracionHablante
 )
+from .segmentos import (
+    ErrorEdicion, editar_segmento, eliminar_segmento, insertar_segmento,
+    modificar_cabecera, posicion_por_inicio, reasignar_hablantes, reconstruir_segmentos
+)
 from .tasks import procesar_transcripcion_completa
 from .logging_helper import (
     log_transcripcion_navegacion, log_transcripcion_accion,
@@ -643,8 +647,8 @@ def detalle_transcripcion_dashboard(request, transcripcion_id):
             id=transcripcion_id
         )
         
-        # Obtener la estructura JSON completa (nueva estructura)
-        estructura = getattr(transcripcion, 'conversacion_json', {}) or {}
+        # Obtener la estructura JSON completa (nueva estructura), con las ediciones de segmentos aplicadas
+        estructura = transcripcion.sincronizar_conversacion() or {}
 
         # Normalización robusta de la estructura esperada
         if not isinstance(estructura, dict):
@@ -869,7 +873,7 @@ def api_estado_transcripcion(request, transcripcion_id):
         # Si está completada, agregar datos adicionales
         if transcripcion.estado in ['completado', 'curada']:
             # Obtener datos de conversación para el chat
-            conversacion_json = getattr(transcripcion, 'conversacion_json', {})
+            conversacion_json = transcripcion.sincronizar_conversacion() or {}
             segmentos_conversacion = conversacion_json.get('segmentos', [])
             
             response_data.update({
@@ -927,6 +931,8 @@ def api_actualizar_json(request, transcripcion_id):
         transcripcion.fecha_ultima_edicion = timezone.now()
         transcripcion.usuario_ultima_edicion = request.user
         transcripcion.save()
+        if 'conversacion' in json_data:
+            reconstruir_segmentos(transcripcion)
         
         return JsonResponse({
             'success': True,
@@ -949,7 +955,7 @@ def api_editar_segmento(request, transcripcion_id):
     API para editar un segmento específico de la conversación
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id'), id=transcripcion_id)
         
         # Debug: Imprimir datos recibidos
         logger.info(f"Datos recibidos: {dict(request.POST)}")
@@ -959,6 +965,10 @@ def api_editar_segmento(request, transcripcion_id):
         texto = request.POST.get('texto', '')
         inicio = float(request.POST.get('inicio', 0))
         fin = float(request.POST.get('fin', 0))
+        # Versión del segmento que tenía el cliente (concurrencia optimista, opcional)
+        version = request.POST.get('version') or None
+        # Versión de la transcripción en la que el cliente leyó las posiciones (obligatoria)
+        version_actual = request.POST.get('version_actual') or None
         
         # Validaciones más específicas
         if segmento_id < 0:
@@ -967,16 +977,6 @@ def api_editar_segmento(request, transcripcion_id):
                 'error': 'ID de segmento no válido'
             })
         
-        # Validar que el segmento existe - CORREGIDO para estructura dict
-        estructura = transcripcion.conversacion_json or {}
-        conversacion = estructura.get('conversacion', []) if isinstance(estructura, dict) else []
-        
-        if segmento_id >= len(conversacion):
-            return JsonResponse({
-                'success': False,
-                'error': f'Segmento {segmento_id} no encontrado. Total segmentos: {len(conversacion)}'
-            })
-        
         if not texto.strip():
             return JsonResponse({
                 'success': False,
@@ -989,28 +989,24 @@ def api_editar_segmento(request, transcripcion_id):
                 'error': 'El tiempo de inicio debe ser menor al tiempo de fin'
             })
         
-        # Actualizar segmento
-        conversacion[segmento_id].update({
-            'hablante': hablante,
-            'texto': texto,
-            'inicio': inicio,
-            'fin': fin,
-            'editado': True,
-            'editado_por': request.user.username if request.user.is_authenticated else 'anonimo',
-            'fecha_edicion': timezone.now().isoformat()
-        })
-        
-        # Guardar estructura completa actualizada
-        estructura['conversacion'] = conversacion
-        transcripcion.conversacion_json = estructura
-        transcripcion.fecha_ultima_edicion = timezone.now()
-        if request.user.is_authenticated:
-            transcripcion.usuario_ultima_edicion = request.user
-        transcripcion.save()
+        # Un UPDATE de la fila del segmento
+        try:
+            version_segmento, version_actual = editar_segmento(
+                transcripcion.id,
+                segmento_id,
+                {'hablante': hablante, 'texto': texto, 'inicio': inicio, 'fin': fin},
+                version=version,
+                usuario=request.user,
+                version_actual=version_actual
+            )
+        except ErrorEdicion as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
         
         return JsonResponse({
             'success': True,
-            'mensaje': 'Segmento editado correctamente'
+            'mensaje': 'Segmento editado correctamente',
+            'version': version_segmento,
+            'version_actual': version_actual
         })
         
     except Exception as e:
@@ -1029,12 +1025,14 @@ def api_eliminar_segmento(request, transcripcion_id):
     API para eliminar un segmento de la conversación
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id'), id=transcripcion_id)
         
         # Debug: Imprimir datos recibidos
         logger.info(f"Datos recibidos para eliminar: {dict(request.POST)}")
         
         segmento_id = int(request.POST.get('segmento_id', -1))
+        version = request.POST.get('version') or None
+        version_actual = request.POST.get('version_actual') or None
         
         # Validaciones más específicas
         if segmento_id < 0:
@@ -1043,31 +1041,20 @@ def api_eliminar_segmento(request, transcripcion_id):
                 'error': 'ID de segmento no válido'
             })
         
-        # Validar que el segmento existe - CORREGIDO para estructura dict
-        estructura = transcripcion.conversacion_json or {}
-        conversacion = estructura.get('conversacion', []) if isinstance(estructura, dict) else []
-        
-        if segmento_id >= len(conversacion):
-            return JsonResponse({
-                'success': False,
-                'error': f'Segmento {segmento_id} no encontrado. Total segmentos: {len(conversacion)}'
-            })
-        
-        # Eliminar segmento
-        conversacion.pop(segmento_id)
-        
-        # Guardar estructura completa actualizada
-        estructura['conversacion'] = conversacion
-        transcripcion.conversacion_json = estructura
-        transcripcion.numero_segmentos = len(conversacion)
-        transcripcion.fecha_ultima_edicion = timezone.now()
-        if request.user.is_authenticated:
-            transcripcion.usuario_ultima_edicion = request.user
-        transcripcion.save()
+        # Borra la fila y desplaza las posteriores
+        try:
+            _, total_segmentos, version_actual = eliminar_segmento(
+                transcripcion.id, segmento_id, version=version, usuario=request.user,
+                version_actual=version_actual
+            )
+        except ErrorEdicion as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
         
         return JsonResponse({
             'success': True,
-            'mensaje': 'Segmento eliminado correctamente'
+            'mensaje': 'Segmento eliminado correctamente',
+            'total_segmentos': total_segmentos,
+            'version_actual': version_actual
         })
         
     except Exception as e:
@@ -1086,7 +1073,7 @@ def api_agregar_segmento(request, transcripcion_id):
     API para agregar un nuevo segmento a la conversación
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id'), id=transcripcion_id)
         
         import json
         mensaje_data = json.loads(request.POST.get('mensaje', '{}'))
@@ -1103,22 +1090,17 @@ def api_agregar_segmento(request, transcripcion_id):
             'fecha_adicion': timezone.now().isoformat()
         }
         
-        # Agregar a la conversación
-        conversacion = transcripcion.conversacion_json or []
-        conversacion.append(nuevo_segmento)
-        
-        # Ordenar por tiempo de inicio
-        conversacion.sort(key=lambda x: x.get('inicio', 0))
-        
-        transcripcion.conversacion_json = conversacion
-        transcripcion.numero_segmentos = len(conversacion)
-        transcripcion.fecha_ultima_edicion = timezone.now()
-        transcripcion.usuario_ultima_edicion = request.user
-        transcripcion.save()
+        # Insertar manteniendo el orden por tiempo de inicio
+        try:
+            posicion = posicion_por_inicio(transcripcion.id, nuevo_segmento['inicio'])
+            _, _, version_actual = insertar_segmento(transcripcion.id, posicion, nuevo_segmento, usuario=request.user)
+        except ErrorEdicion as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
         
         return JsonResponse({
             'success': True,
-            'mensaje': 'Segmento agregado correctamente'
+            'mensaje': 'Segmento agregado correctamente',
+            'version_actual': version_actual
         })
         
     except Exception as e:
@@ -1137,19 +1119,15 @@ def api_renombrar_hablantes(request, transcripcion_id):
     API para renombrar hablantes en la conversación
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(
+            Transcripcion.objects.only('id', 'hablantes_identificados'), id=transcripcion_id
+        )
         
         import json
         cambios = json.loads(request.POST.get('cambios', '{}'))
         
-        # Aplicar cambios a la conversación
-        conversacion = transcripcion.conversacion_json or []
-        for segmento in conversacion:
-            hablante_actual = segmento.get('hablante', '')
-            if hablante_actual in cambios:
-                segmento['hablante'] = cambios[hablante_actual]
-                segmento['hablante_editado'] = True
-                segmento['editado_por'] = request.user.username
+        # Un UPDATE sobre los segmentos de los hablantes renombrados
+        reasignar_hablantes(transcripcion.id, cambios, usuario=request.user)
         
         # Actualizar mapeo de hablantes identificados
         hablantes_identificados = transcripcion.hablantes_identificados or {}
@@ -1163,15 +1141,15 @@ def api_renombrar_hablantes(request, transcripcion_id):
                     'editado_por': request.user.username
                 }
         
-        transcripcion.conversacion_json = conversacion
         transcripcion.hablantes_identificados = hablantes_identificados
-        transcripcion.fecha_ultima_edicion = timezone.now()
-        transcripcion.usuario_ultima_edicion = request.user
-        transcripcion.save()
+        transcripcion.save(update_fields=['hablantes_identificados'])
         
         return JsonResponse({
             'success': True,
-            'mensaje': 'Hablantes renombrados correctamente'
+            'mensaje': 'Hablantes renombrados correctamente',
+            'version_actual': Transcripcion.objects.filter(pk=transcripcion.pk).values_list(
+                'version_actual', flat=True
+            ).first()
         })
         
     except Exception as e:
@@ -1241,7 +1219,7 @@ def api_agregar_hablante_nuevo(request, transcripcion_id):
     API para agregar un nuevo hablante al mapeo de hablantes
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id'), id=transcripcion_id)
         
         # Debug: Imprimir datos recibidos
         logger.info(f"Datos recibidos para agregar hablante: {dict(request.POST)}")
@@ -1256,33 +1234,6 @@ def api_agregar_hablante_nuevo(request, transcripcion_id):
                 'error': 'El nombre del hablante es obligatorio'
             })
         
-        # Obtener estructura actual
-        estructura = transcripcion.conversacion_json or {}
-        if not isinstance(estructura, dict):
-            estructura = {'cabecera': {}, 'conversacion': [], 'metadata': {}}
-        
-        # Obtener mapeo de hablantes actual
-        cabecera = estructura.get('cabecera', {})
-        mapeo_hablantes = cabecera.get('mapeo_hablantes', {})
-        
-        # Verificar si ya existe
-        existe = any(
-            h.get('nombre', '').lower() == nombre.lower() 
-            for h in mapeo_hablantes.values()
-            if isinstance(h, dict)
-        )
-        
-        if existe:
-            return JsonResponse({
-                'success': False,
-                'error': f'Ya existe un hablante con el nombre "{nombre}"'
-            })
-        
-        # Generar nuevo ID
-        ids_existentes = [int(k) for k in mapeo_hablantes.keys() if str(k).isdigit()]
-        nuevo_id = str(max(ids_existentes) + 1 if ids_existentes else 1)
-        
-        # Agregar nuevo hablante
         nuevo_hablante = {
             'nombre': nombre,
             'cargo': cargo,
@@ -1292,23 +1243,32 @@ def api_agregar_hablante_nuevo(request, transcripcion_id):
             'fecha_agregado': timezone.now().isoformat()
         }
         
-        mapeo_hablantes[nuevo_id] = nuevo_hablante
-        
-        # Actualizar estructura
-        cabecera['mapeo_hablantes'] = mapeo_hablantes
-        estructura['cabecera'] = cabecera
+        def agregar(estructura):
+            mapeo_hablantes = estructura['cabecera'].setdefault('mapeo_hablantes', {})
+            
+            # Verificar si ya existe
+            existe = any(
+                h.get('nombre', '').lower() == nombre.lower() 
+                for h in mapeo_hablantes.values()
+                if isinstance(h, dict)
+            )
+            if existe:
+                raise ErrorEdicion(f'Ya existe un hablante con el nombre "{nombre}"')
+            
+            # Generar nuevo ID
+            ids_existentes = [int(k) for k in mapeo_hablantes.keys() if str(k).isdigit()]
+            nuevo_id = str(max(ids_existentes) + 1 if ids_existentes else 1)
+            mapeo_hablantes[nuevo_id] = nuevo_hablante
+            return nuevo_id
         
-        # Guardar
-        transcripcion.conversacion_json = estructura
-        transcripcion.fecha_ultima_edicion = timezone.now()
-        if request.user.is_authenticated:
-            transcripcion.usuario_ultima_edicion = request.user
-        transcripcion.save()
+        try:
+            nuevo_id, version = modificar_cabecera(transcripcion.id, agregar, usuario=request.user)
+        except ErrorEdicion as e:
+            return JsonResponse({'success': False, 'error': str(e)})
         
         # Crear historial (solo si hay usuario)
         try:
             if request.user.is_authenticated:
-                version = transcripcion.historial_ediciones.count() + 1
                 HistorialEdicion.objects.create(
                     transcripcion=transcripcion,
                     usuario=request.user,
@@ -1350,7 +1310,7 @@ def api_insertar_segmento_posicion(request, transcripcion_id):
     API para insertar un nuevo segmento en una posición específica
     """
     try:
-        transcripcion = get_object_or_404(Transcripcion, id=transcripcion_id)
+        transcripcion = get_object_or_404(Transcripcion.objects.only('id'), id=transcripcion_id)
         
         # Debug: Imprimir datos recibidos
         logger.info(f"Datos recibidos para insertar segmento: {dict(request.POST)}")
@@ -1380,20 +1340,19 @@ def api_insertar_segmento_posicion(request, transcripcion_id):
                 'error': 'Debe seleccionar un hablante'
             })
         
-        # Obtener estructura actual
-        estructura = transcripcion.conversacion_json or {}
-        if not isinstance(estructura, dict):
-            estructura = {'cabecera': {}, 'conversacion': [], 'metadata': {}}
-        
-        conversacion = estructura.get('conversacion', [])
-        
         # Validar posición
-        if posicion < 0 or posicion > len(conversacion):
+        if posicion < 0:
             return JsonResponse({
                 'success': False,
-                'error': f'Posición inválida. Debe estar entre 0 y {len(conversacion)}'
+                'error': 'Posición inválida. Debe ser mayor o igual a 0'
             })
         
+        # Solo se lee la cabecera para resolver el hablante
+        estructura = Transcripcion.objects.filter(pk=transcripcion.id).values_list(
+            'conversacion_json__cabecera', flat=True
+        ).first()
+        estructura = {'cabecera': estructura if isinstance(estructura, dict) else {}}
+        
         # Verificar hablante: aceptar tanto ID como nombre
         mapeo_hablantes = estructura.get('cabecera', {}).get('mapeo_hablantes', {})
         # Normalizar llaves a string para comparación robusta
@@ -1431,22 +1390,17 @@ def api_insertar_segmento_posicion(request, transcripcion_id):
             'fecha_agregado': timezone.now().isoformat()
         }
         
-        # Insertar en la posición especificada
-        conversacion.insert(posicion, nuevo_segmento)
-        
-        # Actualizar estructura
-        estructura['conversacion'] = conversacion
-        transcripcion.conversacion_json = estructura
-        transcripcion.numero_segmentos = len(conversacion)
-        transcripcion.fecha_ultima_edicion = timezone.now()
-        if request.user.is_authenticated:
-            transcripcion.usuario_ultima_edicion = request.user
-        transcripcion.save()
+        # Insertar en la posición especificada (desplaza las filas siguientes)
+        try:
+            posicion, total_segmentos, version = insertar_segmento(
+                transcripcion.id, posicion, nuevo_segmento, usuario=request.user
+            )
+        except ErrorEdicion as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
         
         # Crear historial (solo si hay usuario)
         try:
             if request.user.is_authenticated:
-                version = transcripcion.historial_ediciones.count() + 1
                 HistorialEdicion.objects.create(
                     transcripcion=transcripcion,
                     usuario=request.user,
@@ -1466,7 +1420,7 @@ def api_insertar_segmento_posicion(request, transcripcion_id):
             'success': True,
             'mensaje': f'Segmento insertado correctamente en posición {posicion}',
             'nuevo_segmento': nuevo_segmento,
-            'total_segmentos': len(conversacion)
+            'total_segmentos': total_segmentos
         })
         
     except Exception as e:
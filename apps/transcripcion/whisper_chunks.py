@@ -0,0 +1,294 @@
+"""
+Transcripción por chunks para audios largos
+
+Divide el audio en ventanas de duración configurable cortando en silencios
+detectados con webrtcvad, transcribe los chunks (en Celery, una tarea por
+chunk dentro de un chord) y une los segmentos con offsets globales
+corregidos y sin duplicados en las zonas de solapamiento. El resultado tiene el mismo formato que
+``whisper.transcribe()`` para pasar por ``_procesar_resultado_whisper``.
+"""
+import time
+import logging
+import subprocess
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+try:
+    import webrtcvad
+    VAD_AVAILABLE = True
+except ImportError:
+    VAD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+CONFIG_CHUNKS_DEFECTO = {
+    'HABILITADO': False,
+    'DURACION_MINIMA_AUDIO': 900,   # Solo se trocean audios de más de 15 minutos
+    'DURACION_CHUNK': 300,          # Segundos por ventana
+    'OVERLAP': 5,                   # Segundos de solapamiento entre ventanas
+    'VENTANA_BUSQUEDA_CORTE': 30,   # Segundos antes del límite donde buscar silencio
+    'AGRESIVIDAD_VAD': 2,           # 0-3 (webrtcvad)
+    'REINTENTOS_CHUNK': 2,
+}
+
+
+def get_config_chunks(configuracion: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Configuración del modo por chunks (settings + overrides de la transcripción)"""
+    from django.conf import settings
+
+    config = dict(CONFIG_CHUNKS_DEFECTO)
+    config.update(getattr(settings, 'TRANSCRIPCION_CHUNKS', {}) or {})
+
+    configuracion = configuracion or {}
+    if 'transcripcion_por_chunks' in configuracion:
+        config['HABILITADO'] = bool(configuracion['transcripcion_por_chunks'])
+    if configuracion.get('duracion_chunk_whisper'):
+        config['DURACION_CHUNK'] = float(configuracion['duracion_chunk_whisper'])
+    if configuracion.get('overlap_duracion'):
+        config['OVERLAP'] = float(configuracion['overlap_duracion'])
+    return config
+
+
+# ============================================================================
+# Planificación de cortes con VAD
+# ============================================================================
+
+def detectar_silencios(audio: np.ndarray, agresividad: int = 2) -> np.ndarray:
+    """
+    Marca cada frame de 30 ms como voz (True) o silencio (False)
+
+    Sin webrtcvad disponible se usa un umbral de energía como aproximación.
+    """
+    muestras_frame = SAMPLE_RATE * FRAME_MS // 1000
+    num_frames = len(audio) // muestras_frame
+    if num_frames == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = audio[:num_frames * muestras_frame].reshape(num_frames, muestras_frame)
+
+    if not VAD_AVAILABLE:
+        energia = np.sqrt(np.mean(frames ** 2, axis=1))
+        umbral = max(np.percentile(energia, 20) * 2.0, 1e-4)
+        return energia > umbral
+
+    vad = webrtcvad.Vad(agresividad)
+    pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+    return np.array([vad.is_speech(frame.tobytes(), SAMPLE_RATE) for frame in pcm], dtype=bool)
+
+
+def planificar_chunks(audio: np.ndarray, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Calcula las ventanas [inicio, fin) en segundos
+
+    Cada corte se coloca en el centro del silencio más largo dentro de la
+    ventana de búsqueda previa al límite nominal; después se extiende el
+    final de cada chunk con el overlap configurado.
+    """
+    duracion_total = len(audio) / SAMPLE_RATE
+    duracion_chunk = float(config['DURACION_CHUNK'])
+    overlap = float(config['OVERLAP'])
+    ventana = float(config['VENTANA_BUSQUEDA_CORTE'])
+
+    if duracion_total <= duracion_chunk:
+        return [{'indice': 0, 'inicio': 0.0, 'fin': duracion_total}]
+
+    voz = detectar_silencios(audio, config['AGRESIVIDAD_VAD'])
+    segundos_frame = FRAME_MS / 1000.0
+
+    cortes = []
+    inicio = 0.0
+    while duracion_total - inicio > duracion_chunk:
+        limite = inicio + duracion_chunk
+        desde = int(max(inicio + duracion_chunk / 2, limite - ventana) / segundos_frame)
+        hasta = int(limite / segundos_frame)
+        corte = _centro_silencio_mas_largo(voz, desde, hasta)
+        corte = corte * segundos_frame if corte is not None else limite
+        cortes.append(corte)
+        inicio = corte
+
+    chunks = []
+    limites = [0.0] + cortes + [duracion_total]
+    for i in range(len(limites) - 1):
+        chunks.append({
+            'indice': i,
+            'inicio': limites[i],
+            'fin': min(duracion_total, limites[i + 1] + overlap),
+        })
+    return chunks
+
+
+def _centro_silencio_mas_largo(voz: np.ndarray, desde: int, hasta: int) -> Optional[int]:
+    """Devuelve el frame central del tramo de silencio más largo en [desde, hasta)"""
+    mejor_inicio, mejor_largo = None, 0
+    actual_inicio = None
+    for i in range(desde, min(hasta, len(voz))):
+        if not voz[i]:
+            if actual_inicio is None:
+                actual_inicio = i
+            largo = i - actual_inicio + 1
+            if largo > mejor_largo:
+                mejor_inicio, mejor_largo = actual_inicio, largo
+        else:
+            actual_inicio = None
+    if mejor_inicio is None:
+        return None
+    return mejor_inicio + mejor_largo // 2
+
+
+# ============================================================================
+# Ejecución de chunks
+# ============================================================================
+
+def cargar_tramo(archivo_audio: str, inicio: float, fin: float) -> np.ndarray:
+    """
+    Decodifica solo [inicio, fin) del audio a 16 kHz mono, como ``whisper.load_audio``
+
+    Cada tarea de chunk lee su tramo sin decodificar la sesión completa.
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-threads', '0',
+        '-ss', f'{inicio:.3f}', '-t', f'{max(fin - inicio, 0):.3f}',
+        '-i', archivo_audio,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-',
+    ]
+    try:
+        salida = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg no pudo leer el tramo {inicio:.1f}-{fin:.1f}s: {e.stderr.decode(errors='ignore')}")
+    return np.frombuffer(salida, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def planificar_audio(archivo_audio: str, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Chunks de un archivo, o lista vacía si es más corto que DURACION_MINIMA_AUDIO
+
+    Decodifica el audio completo una vez para la detección de silencios; las
+    tareas de cada chunk vuelven a leer solo su tramo con ``cargar_tramo``.
+    """
+    import whisper
+
+    audio = whisper.load_audio(archivo_audio)
+    if len(audio) / SAMPLE_RATE < float(config['DURACION_MINIMA_AUDIO']):
+        return []
+    chunks = planificar_chunks(audio, config)
+    logger.info(f"🔪 Audio de {len(audio) / SAMPLE_RATE:.0f}s dividido en {len(chunks)} chunks")
+    return chunks
+
+
+def transcribir_chunk(motor, audio_chunk: np.ndarray, chunk: Dict[str, Any], opciones: Dict[str, Any]) -> Dict[str, Any]:
+    """Transcribe un chunk y devuelve sus segmentos con tiempos locales"""
+    opciones = dict(opciones)
+    opciones['verbose'] = False
+    resultado = motor.transcribir(audio_chunk, opciones)
+    return {
+        'indice': chunk['indice'],
+        'inicio': chunk['inicio'],
+        'fin': chunk['fin'],
+        'language': resultado.get('language'),
+        'segments': resultado.get('segments', []),
+    }
+
+
+def transcribir_por_chunks(archivo_audio: str,
+                           motor_local,
+                           opciones: Dict[str, Any],
+                           config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Transcribe un audio largo por chunks en este proceso y devuelve un
+    resultado con el formato de ``whisper.transcribe()`` (text, segments, language).
+
+    Es el camino secuencial (llamadas directas a WhisperProcessor). Las tareas
+    de Celery reparten los chunks entre workers con un chord
+    (``tasks.lanzar_whisper_por_chunks``): los procesos prefork son daemon y
+    no pueden crear un pool propio.
+    """
+    import whisper
+
+    audio = whisper.load_audio(archivo_audio)
+    if len(audio) / SAMPLE_RATE < float(config['DURACION_MINIMA_AUDIO']):
+        logger.info("Audio corto: transcripción en una sola pasada")
+        return motor_local.transcribir(audio, opciones)
+
+    chunks = planificar_chunks(audio, config)
+    logger.info(f"🔪 Audio de {len(audio) / SAMPLE_RATE:.0f}s dividido en {len(chunks)} chunks")
+    reintentos = int(config['REINTENTOS_CHUNK'])
+    inicio_proceso = time.time()
+
+    resultados = []
+    for chunk in chunks:
+        audio_chunk = audio[int(chunk['inicio'] * SAMPLE_RATE):int(chunk['fin'] * SAMPLE_RATE)]
+        for intento in range(reintentos + 1):
+            try:
+                resultados.append(transcribir_chunk(motor_local, audio_chunk, chunk, opciones))
+                break
+            except Exception as e:
+                if intento >= reintentos:
+                    raise Exception(f"Chunk {chunk['indice']} falló tras {intento + 1} intentos: {e}")
+                logger.warning(f"⚠️ Reintentando chunk {chunk['indice']} ({intento + 1}/{reintentos}): {e}")
+
+    logger.info(f"⏱️ {len(chunks)} chunks transcritos en {time.time() - inicio_proceso:.1f}s")
+    return unir_chunks(resultados)
+
+
+# ============================================================================
+# Unión de resultados
+# ============================================================================
+
+def unir_chunks(resultados_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Une los resultados de cada chunk en un único resultado global
+
+    Los tiempos locales se desplazan al inicio del chunk. En cada zona de
+    solapamiento se toma como frontera su punto medio: del chunk anterior se
+    conservan los segmentos cuyo centro queda antes y del siguiente los que
+    quedan después, evitando texto duplicado.
+    """
+    segmentos_globales = []
+    idiomas = []
+
+    for posicion, chunk in enumerate(resultados_chunks):
+        offset = chunk['inicio']
+        frontera_inicio = 0.0
+        frontera_fin = float('inf')
+
+        if posicion > 0:
+            anterior = resultados_chunks[posicion - 1]
+            frontera_inicio = (chunk['inicio'] + anterior['fin']) / 2
+        if posicion < len(resultados_chunks) - 1:
+            siguiente = resultados_chunks[posicion + 1]
+            frontera_fin = (siguiente['inicio'] + chunk['fin']) / 2
+
+        if chunk.get('language'):
+            idiomas.append(chunk['language'])
+
+        for segmento in chunk.get('segments', []):
+            inicio = segmento.get('start', 0.0) + offset
+            fin = segmento.get('end', 0.0) + offset
+            centro = (inicio + fin) / 2
+            if centro < frontera_inicio or centro >= frontera_fin:
+                continue
+
+            segmento_global = dict(segmento)
+            segmento_global['start'] = inicio
+            segmento_global['end'] = fin
+            if 'words' in segmento:
+                segmento_global['words'] = [
+                    {**palabra, 'start': palabra.get('start', 0.0) + offset, 'end': palabra.get('end', 0.0) + offset}
+                    for palabra in segmento['words']
+                ]
+            segmentos_globales.append(segmento_global)
+
+    segmentos_globales.sort(key=lambda s: s['start'])
+    for i, segmento in enumerate(segmentos_globales):
+        segmento['id'] = i
+
+    idioma = max(set(idiomas), key=idiomas.count) if idiomas else None
+    return {
+        'text': ' '.join(s.get('text', '').strip() for s in segmentos_globales),
+        'segments': segmentos_globales,
+        'language': idioma,
+        'chunks': len(resultados_chunks),
+    }
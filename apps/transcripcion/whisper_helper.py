@@ -7,16 +7,39 @@ import logging
 from typing import Dict, Any, Optional, List
 import tempfile
 
+from .asr_backends import crear_motor, MOTOR_OPENAI_WHISPER, OPENAI_WHISPER_AVAILABLE
+from .model_registry import resolver_device
+from .whisper_chunks import get_config_chunks, transcribir_por_chunks
+
 try:
-    import whisper
     import torch
-    WHISPER_AVAILABLE = True
+    WHISPER_AVAILABLE = OPENAI_WHISPER_AVAILABLE
 except ImportError:
     WHISPER_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
 
+def opciones_whisper(configuracion: Dict[str, Any]) -> Dict[str, Any]:
+    """Opciones de ``transcribe()`` a partir de la configuración del usuario"""
+    opciones = {
+        "language": configuracion.get('idioma_principal', 'es'),  # Del usuario, no hardcodeado
+        "temperature": configuracion.get('temperatura', 0.0),  # Del usuario, no hardcodeado
+        "task": "transcribe",
+        "verbose": True,
+        "word_timestamps": configuracion.get('palabra_por_palabra', False)  # Flag del usuario
+    }
+    
+    # Si mejora de audio está activa, agregar parámetros adicionales
+    if configuracion.get('mejora_audio', False):
+        opciones.update({
+            "condition_on_previous_text": True,
+            "compression_ratio_threshold": 2.4,
+            "logprob_threshold": -1.0
+        })
+    return opciones
+
+
 class WhisperProcessor:
     """Procesador de transcripción usando Whisper de OpenAI con auditoría completa"""
     
@@ -25,7 +48,8 @@ class WhisperProcessor:
             logger.warning("Whisper no está disponible. Funcionalidad limitada.")
             
         self.modelo = None
-        self.device = "cuda" if WHISPER_AVAILABLE and torch.cuda.is_available() else "cpu"
+        self.motor = None
+        self.device = resolver_device()
         self.modelo_cargado = None
         
     def get_model_info(self) -> Dict[str, Any]:
@@ -64,6 +88,7 @@ class WhisperProcessor:
                 'device': self.device,
                 'version': getattr(self.modelo, '__version__', 'whisper-1.0'),
                 'size_mb': model_sizes.get(self.modelo_cargado, 'unknown'),
+                'motor_asr': self.motor.info() if self.motor else None,
                 'hash': getattr(self.modelo, 'sha256', 'N/A'),
                 'path': getattr(self.modelo, 'path', 'cached'),
                 'parametros_soportados': ['temperature', 'language', 'task', 'word_timestamps', 'verbose'],
@@ -83,27 +108,35 @@ class WhisperProcessor:
                 'error': str(e)
             }
             
-    def cargar_modelo(self, modelo_nombre: str = "base", usar_gpu: bool = True) -> bool:
+    def cargar_modelo(self, modelo_nombre: str = "base", usar_gpu: bool = True,
+                      motor: str = MOTOR_OPENAI_WHISPER) -> bool:
         """
         Carga el modelo de Whisper especificado
         
         Args:
             modelo_nombre: tiny, base, small, medium, large, large-v2, large-v3
             usar_gpu: Si usar GPU cuando esté disponible
+            motor: Motor ASR (openai_whisper, faster_whisper)
             
         Returns:
             bool: True si se cargó exitosamente
         """
         try:
-            if not usar_gpu:
-                self.device = "cpu"
+            # Mismo device que la precarga del registro (cpu si la transcripción no quiere GPU)
+            self.device = resolver_device(usar_gpu)
                 
-            if self.modelo_cargado == modelo_nombre and self.modelo is not None:
+            nuevo_motor = crear_motor(motor, modelo_nombre, self.device)
+            if self.motor is not None and self.motor.clave == nuevo_motor.clave:
                 logger.info(f"Modelo {modelo_nombre} ya está cargado")
                 return True
                 
-            logger.info(f"Cargando modelo Whisper: {modelo_nombre} en {self.device}")
-            self.modelo = whisper.load_model(modelo_nombre, device=self.device)
+            # Soltar la referencia al modelo anterior antes de cambiar
+            if self.motor is not None:
+                self.limpiar_modelo()
+                
+            logger.info(f"Obteniendo modelo del registro: {nuevo_motor.clave}")
+            self.motor = nuevo_motor
+            self.modelo = self.motor.cargar()
             self.modelo_cargado = modelo_nombre
             
             logger.info(f"Modelo {modelo_nombre} cargado exitosamente")
@@ -162,6 +195,7 @@ class WhisperProcessor:
         try:
             # ===== AUDITORÍA: Extraer configuración del usuario =====
             modelo_nombre = configuracion.get('modelo_whisper', 'base')
+            motor_asr = configuracion.get('motor_asr', MOTOR_OPENAI_WHISPER)
             idioma = configuracion.get('idioma_principal', 'es')
             temperatura = configuracion.get('temperatura', 0.0)
             usar_gpu = configuracion.get('usar_gpu', True)
@@ -171,6 +205,7 @@ class WhisperProcessor:
             # Log de auditoría: mostrar que parámetros se recibieron del usuario
             logger.info(f"AUDIT - Parámetros recibidos del usuario:")
             logger.info(f"  - modelo_whisper: {modelo_nombre}")
+            logger.info(f"  - motor_asr: {motor_asr}")
             logger.info(f"  - idioma_principal: {idioma}")
             logger.info(f"  - temperatura: {temperatura}")
             logger.info(f"  - usar_gpu: {usar_gpu}")
@@ -178,7 +213,7 @@ class WhisperProcessor:
             logger.info(f"  - mejora_audio: {mejora_audio}")
             
             # Cargar modelo si es necesario
-            if not self.cargar_modelo(modelo_nombre, usar_gpu):
+            if not self.cargar_modelo(modelo_nombre, usar_gpu, motor_asr):
                 raise Exception(f"No se pudo cargar el modelo {modelo_nombre}")
             
             # Verificar que el archivo existe
@@ -188,66 +223,22 @@ class WhisperProcessor:
             logger.info(f"Iniciando transcripción de {archivo_audio}")
             
             # ===== AUDITORÍA: Configurar opciones usando parámetros recibidos =====
-            opciones = {
-                "language": idioma,  # Del usuario, no hardcodeado
-                "temperature": temperatura,  # Del usuario, no hardcodeado
-                "task": "transcribe",
-                "verbose": True,
-                "word_timestamps": palabra_por_palabra  # Flag del usuario
-            }
-            
-            # Si mejora de audio está activa, agregar parámetros adicionales
-            if mejora_audio:
-                opciones.update({
-                    "condition_on_previous_text": True,
-                    "compression_ratio_threshold": 2.4,
-                    "logprob_threshold": -1.0
-                })
+            opciones = opciones_whisper(configuracion)
             
             # Log de auditoría: mostrar opciones que se envían a Whisper
             logger.info(f"AUDIT - Opciones enviadas a Whisper: {opciones}")
             
-            # Ejecutar transcripción
-            resultado = self.modelo.transcribe(archivo_audio, **opciones)
-            
-            # Obtener información del modelo cargado
-            model_info = self.get_model_info()
-            
-            # Procesar resultado
-            transcripcion_procesada = self._procesar_resultado_whisper(resultado)
+            # Ejecutar transcripción (por chunks en este proceso para audios largos)
+            config_chunks = get_config_chunks(configuracion)
+            if config_chunks['HABILITADO']:
+                logger.info(f"AUDIT - Transcripción por chunks: {config_chunks}")
+                resultado = transcribir_por_chunks(
+                    archivo_audio, self.motor, opciones, config_chunks
+                )
+            else:
+                resultado = self.motor.transcribir(archivo_audio, opciones)
             
-            logger.info(f"Transcripción completada. {len(transcripcion_procesada['segmentos'])} segmentos")
-            
-            # ===== AUDITORÍA: Retornar con todos los parámetros usados =====
-            return {
-                'exito': True,
-                'texto_completo': transcripcion_procesada['texto_completo'],
-                'segmentos': transcripcion_procesada['segmentos'],
-                'idioma_detectado': resultado.get('language', idioma),
-                'duracion_total': transcripcion_procesada['duracion_total'],
-                'configuracion_original': configuracion,
-                'parametros_aplicados': {
-                    'modelo_whisper': modelo_nombre,
-                    'idioma_principal': idioma,
-                    'temperatura': temperatura,
-                    'usar_gpu': usar_gpu,
-                    'palabra_por_palabra': palabra_por_palabra,
-                    'mejora_audio': mejora_audio,
-                    'opciones_whisper_reales': opciones,
-                    'device_usado': self.device
-                },
-                'metadatos_modelo': model_info,
-                'auditoria': {
-                    'parametros_hardcodeados': False,
-                    'parametros_del_usuario': True,
-                    'modelo_solicitado': modelo_nombre,
-                    'modelo_usado': self.modelo_cargado,
-                    'flags_aplicados': {
-                        'palabra_por_palabra': palabra_por_palabra,
-                        'mejora_audio': mejora_audio
-                    }
-                }
-            }
+            return self.resultado_auditado(resultado, configuracion, opciones)
             
         except Exception as e:
             logger.error(f"Error en transcripción: {str(e)}")
@@ -261,6 +252,61 @@ class WhisperProcessor:
                 }
             }
     
+    def resultado_auditado(self, resultado: Dict[str, Any], configuracion: Dict[str, Any],
+                           opciones: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resultado de ``transcribir_audio`` a partir de la salida cruda de Whisper
+        
+        También lo usa la unión de los chunks repartidos entre workers de Celery.
+        """
+        modelo_nombre = configuracion.get('modelo_whisper', 'base')
+        idioma = configuracion.get('idioma_principal', 'es')
+        temperatura = configuracion.get('temperatura', 0.0)
+        usar_gpu = configuracion.get('usar_gpu', True)
+        palabra_por_palabra = configuracion.get('palabra_por_palabra', False)
+        mejora_audio = configuracion.get('mejora_audio', False)
+        
+        # Obtener información del modelo cargado
+        model_info = self.get_model_info()
+        
+        # Procesar resultado
+        transcripcion_procesada = self._procesar_resultado_whisper(resultado)
+        
+        logger.info(f"Transcripción completada. {len(transcripcion_procesada['segmentos'])} segmentos")
+        
+        # ===== AUDITORÍA: Retornar con todos los parámetros usados =====
+        return {
+            'exito': True,
+            'texto_completo': transcripcion_procesada['texto_completo'],
+            'segmentos': transcripcion_procesada['segmentos'],
+            'idioma_detectado': resultado.get('language', idioma),
+            'duracion_total': transcripcion_procesada['duracion_total'],
+            'configuracion_original': configuracion,
+            'parametros_aplicados': {
+                'modelo_whisper': modelo_nombre,
+                'motor_asr': self.motor.nombre,
+                'idioma_principal': idioma,
+                'temperatura': temperatura,
+                'usar_gpu': usar_gpu,
+                'palabra_por_palabra': palabra_por_palabra,
+                'mejora_audio': mejora_audio,
+                'opciones_whisper_reales': opciones,
+                'device_usado': self.device,
+                'chunks_procesados': resultado.get('chunks', 1)
+            },
+            'metadatos_modelo': model_info,
+            'auditoria': {
+                'parametros_hardcodeados': False,
+                'parametros_del_usuario': True,
+                'modelo_solicitado': modelo_nombre,
+                'modelo_usado': self.modelo_cargado,
+                'flags_aplicados': {
+                    'palabra_por_palabra': palabra_por_palabra,
+                    'mejora_audio': mejora_audio
+                }
+            }
+        }
+    
     def _procesar_resultado_whisper(self, resultado: Dict[str, Any]) -> Dict[str, Any]:
         """
         Procesa el resultado raw de Whisper para formato estándar
@@ -313,14 +359,15 @@ class WhisperProcessor:
     
     def limpiar_modelo(self):
         """
-        Libera memoria del modelo cargado
+        Libera la referencia al modelo cargado.
+        
+        El modelo permanece en el registro del proceso para la siguiente tarea;
+        el registro decide cuándo descargarlo según su presupuesto de RAM.
         """
-        if self.modelo:
-            del self.modelo
+        if self.motor:
+            self.motor.liberar()
+            self.motor = None
             self.modelo = None
             self.modelo_cargado = None
             
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-                
-            logger.info("Modelo Whisper liberado de memoria")
\ No newline at end of file
+            logger.info("Referencia al modelo Whisper liberada")
@@ -3,6 +3,11 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+In docker-compose the ``sse`` service runs it with uvicorn and nginx routes
+only the ``.../stream/`` URLs to it: the progress streams of
+``helpers.progreso_eventos`` are async views and hold one connection per open
+editor without tying up a WSGI worker.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 """
@@ -101,13 +101,12 @@ MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
     "apps.auditoria.session_middleware.AdvancedSessionMiddleware",  # Middleware de sesiones avanzado
-    "apps.audio_processing.middleware.AuditMiddleware",  # Middleware de auditoría general
     "apps.audio_processing.middleware.AudioProcessingAuditMiddleware",  # Middleware específico de audio
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "allauth.account.middleware.AccountMiddleware",  # Middleware requerido para allauth
-    "helpers.auditoria_middleware.AuditoriaMiddleware",  # Middleware de auditoría personalizado
+    "helpers.auditoria_middleware.AuditoriaMiddleware",  # Auditoría (logs.*) con escritura por lotes; sustituye a AuditMiddleware
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -245,6 +244,26 @@ CELERY_TASK_SERIALIZER    = 'json'
 CELERY_RESULT_SERIALIZER  = 'json'
 ########################################
 
+# ### Caché compartida ###
+# Redis (base 1, separada del broker) para que web y workers compartan la caché;
+# sin CACHE_REDIS_URL se usa memoria local por proceso
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'actas',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+########################################
+
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -284,6 +303,141 @@ ACTAS_CONFIG = {
     'directorio_pdfs': 'media/pdfs/',
 }
 
+# Pipeline de mejora de audio por bloques (apps.audio_processing.services.audio_streaming)
+AUDIO_PIPELINE_STREAMING = {
+    'HABILITADO': str2bool(os.environ.get('AUDIO_PIPELINE_STREAMING', 'False')),
+    'DURACION_MINIMA': int(os.environ.get('AUDIO_STREAMING_DURACION_MINIMA', 1800)),  # segundos
+    'DURACION_BLOQUE': int(os.environ.get('AUDIO_STREAMING_DURACION_BLOQUE', 30)),
+}
+
+# Caché de artefactos por contenido (helpers.cache_artefactos): WAV 16k, audio mejorado,
+# segmentos crudos de Whisper y diarización
+CACHE_ARTEFACTOS = {
+    'HABILITADO': str2bool(os.environ.get('CACHE_ARTEFACTOS', 'True')),
+    'DIRECTORIO': os.environ.get('CACHE_ARTEFACTOS_DIR') or os.path.join(BASE_DIR, 'cache', 'artefactos'),
+    'PRESUPUESTO_MB': int(os.environ.get('CACHE_ARTEFACTOS_PRESUPUESTO_MB', 10240)),
+}
+
+# Registro de modelos de los workers de transcripción (apps.transcripcion.model_registry)
+TRANSCRIPCION_MODELOS = {
+    'PRESUPUESTO_RAM_MB': int(os.environ.get('TRANSCRIPCION_PRESUPUESTO_RAM_MB', 4096)),
+    'PRECARGAR_WHISPER': [m for m in os.environ.get('TRANSCRIPCION_PRECARGAR_WHISPER', '').split(',') if m],
+    'PRECARGAR_PYANNOTE': str2bool(os.environ.get('TRANSCRIPCION_PRECARGAR_PYANNOTE', 'False')),
+    'DEVICE': os.environ.get('TRANSCRIPCION_DEVICE', 'auto'),  # auto, cpu o cuda
+}
+
+# Whisper y pyannote en paralelo (chord de Celery); requiere worker con concurrency >= 2
+TRANSCRIPCION_PARALELO = {
+    'HABILITADO': str2bool(os.environ.get('TRANSCRIPCION_PARALELO', 'False')),
+    'NUCLEOS_WHISPER': int(os.environ.get('TRANSCRIPCION_NUCLEOS_WHISPER', 0)),  # 0 = automático
+    'NUCLEOS_PYANNOTE': int(os.environ.get('TRANSCRIPCION_NUCLEOS_PYANNOTE', 0)),
+    'PROPORCION_WHISPER': 0.66,
+}
+
+# Transcripción por chunks (cortes en silencios con webrtcvad) para audios largos
+TRANSCRIPCION_CHUNKS = {
+    'HABILITADO': str2bool(os.environ.get('TRANSCRIPCION_CHUNKS', 'False')),
+    'DURACION_MINIMA_AUDIO': 900,
+    'DURACION_CHUNK': int(os.environ.get('TRANSCRIPCION_DURACION_CHUNK', 300)),
+    'OVERLAP': 5,
+    'VENTANA_BUSQUEDA_CORTE': 30,
+    'AGRESIVIDAD_VAD': 2,
+    'REINTENTOS_CHUNK': 2,
+}
+
+# Motores ASR (apps.transcripcion.asr_backends)
+TRANSCRIPCION_ASR = {
+    'TIPO_COMPUTO_CPU': os.environ.get('TRANSCRIPCION_TIPO_COMPUTO_CPU', 'int8'),
+    'TIPO_COMPUTO_GPU': os.environ.get('TRANSCRIPCION_TIPO_COMPUTO_GPU', 'float16'),
+    'HILOS_CPU': int(os.environ.get('TRANSCRIPCION_HILOS_CPU', 0)),  # 0 = automático
+}
+
+# Diarización de respaldo con resemblyzer (embeddings por lotes y clustering escalable)
+TRANSCRIPCION_RESEMBLYZER = {
+    'TAMANO_LOTE': int(os.environ.get('TRANSCRIPCION_RESEMBLYZER_LOTE', 64)),
+    'MAX_FRAMES_AGLOMERATIVO': int(os.environ.get('TRANSCRIPCION_RESEMBLYZER_MAX_FRAMES', 4000)),
+    'MICRO_CLUSTERS': 256,
+}
+
+# Segmentos dinámicos de actas en paralelo (apps.generador_actas.llamadas_paralelas)
+GENERADOR_ACTAS_PARALELO = {
+    'HABILITADO': str2bool(os.environ.get('GENERADOR_ACTAS_PARALELO', 'True')),
+    'MAX_HILOS': int(os.environ.get('GENERADOR_ACTAS_MAX_HILOS', 4)),
+    'CONCURRENCIA_POR_TIPO': {'ollama': 1, 'lmstudio': 1},
+    'REINTENTOS_LIMITE': int(os.environ.get('GENERADOR_ACTAS_REINTENTOS_LIMITE', 4)),
+    'ESPERA_BASE': 2.0,
+    'ESPERA_MAXIMA': 60.0,
+}
+
+# Empaquetado de la transcripción para prompts (apps.generador_actas.ia_providers)
+IA_CONTEXTO = {
+    'VENTANAS': {},  # {prefijo_modelo: tokens} para modelos que no estén en VENTANAS_CONTEXTO
+    'VENTANA_DEFECTO': int(os.environ.get('IA_CONTEXTO_VENTANA_DEFECTO', 8192)),
+    'MARGEN_TOKENS': 512,
+    'CACHE_TIMEOUT': 24 * 3600,
+}
+
+# Estadísticas del portal ciudadano (apps.pages.estadisticas)
+PORTAL_ESTADISTICAS = {
+    'CACHE_TIMEOUT': int(os.environ.get('PORTAL_ESTADISTICAS_CACHE_TIMEOUT', 300)),  # segundos
+}
+
+# Contadores de visualizaciones/descargas del portal (apps.pages.contadores)
+PORTAL_CONTADORES = {
+    'BUFFER': str2bool(os.environ.get('PORTAL_CONTADORES_BUFFER', 'True')),
+    'LOTE': int(os.environ.get('PORTAL_CONTADORES_LOTE', 1000)),
+    'MAX_INTENTOS': int(os.environ.get('PORTAL_CONTADORES_MAX_INTENTOS', 3)),
+}
+
+# Descargas de archivos (helpers.descargas): con el nginx de docker-compose
+# los archivos de MEDIA_ROOT se envían con X-Accel-Redirect
+DESCARGAS = {
+    'X_ACCEL': str2bool(os.environ.get('DESCARGAS_X_ACCEL', 'False')),
+    'X_ACCEL_PREFIJO': '/protected-media/',
+}
+
+# Motor SMTP (apps.config_system.motor_smtp): sesiones persistentes por
+# proveedor y cupo diario repartido con un cubo de tokens
+MOTOR_SMTP = {
+    'CONEXIONES_POR_PROVEEDOR': int(os.environ.get('MOTOR_SMTP_CONEXIONES', 2)),
+    'MENSAJES_POR_SESION': int(os.environ.get('MOTOR_SMTP_MENSAJES_POR_SESION', 100)),
+    'RAFAGA': int(os.environ.get('MOTOR_SMTP_RAFAGA', 50)),
+    'ENVIOS_POR_MINUTO': int(os.environ.get('MOTOR_SMTP_ENVIOS_POR_MINUTO', 60)),
+    'TAMANO_LOTE': int(os.environ.get('MOTOR_SMTP_TAMANO_LOTE', 50)),
+    'COLA': 'emails',
+}
+
+# Pipeline de publicación de actas (gestion_actas.tasks): una publicación que
+# sigue "en curso" pasado este tiempo se da por abandonada y puede reintentarse
+PUBLICACION_ACTAS = {
+    'TIMEOUT_MINUTOS': int(os.environ.get('PUBLICACION_ACTAS_TIMEOUT_MINUTOS', 30)),
+}
+
+# Buffer de auditoría (helpers.auditoria_buffer): los registros de logs.* del
+# middleware se escriben por lotes desde un hilo de fondo
+AUDITORIA_BUFFER = {
+    'ACTIVO': str2bool(os.environ.get('AUDITORIA_BUFFER', 'True')),
+    'CAPACIDAD': int(os.environ.get('AUDITORIA_BUFFER_CAPACIDAD', 10000)),
+    'LOTE': int(os.environ.get('AUDITORIA_BUFFER_LOTE', 500)),
+    'INTERVALO_MS': int(os.environ.get('AUDITORIA_BUFFER_INTERVALO_MS', 1000)),
+    # descartar_antiguos | descartar_nuevos | bloquear
+    'POLITICA': os.environ.get('AUDITORIA_BUFFER_POLITICA', 'descartar_antiguos'),
+}
+
+# Progreso en vivo (helpers.progreso_eventos): las tareas publican deltas en
+# Redis pub/sub y el servicio ASGI los reenvía como Server-Sent Events
+PROGRESO_EVENTOS = {
+    'REDIS_URL': os.environ.get('PROGRESO_EVENTOS_REDIS_URL', CACHE_REDIS_URL),
+    'KEEPALIVE': int(os.environ.get('PROGRESO_EVENTOS_KEEPALIVE', 15)),
+    'TIEMPO_MAXIMO': int(os.environ.get('PROGRESO_EVENTOS_TIEMPO_MAXIMO', 600)),
+}
+
+# Escrituras de progreso de las tareas largas (ReportadorProgreso)
+PROGRESO_REPORTADOR = {
+    'INTERVALO_SEGUNDOS': float(os.environ.get('PROGRESO_REPORTADOR_INTERVALO_SEGUNDOS', 5)),
+    'PASO_PORCENTAJE': int(os.environ.get('PROGRESO_REPORTADOR_PASO_PORCENTAJE', 5)),
+}
+
 # Configuración de APIs de IA
 IA_CONFIG = {
     'openai_api_key': os.environ.get('OPENAI_API_KEY', ''),
@@ -430,6 +584,20 @@ CELERY_ROUTES = {
     'apps.tasks.tasks.generar_transcripcion': {'queue': 'transcription'},
     'apps.tasks.tasks.enviar_notificacion_email': {'queue': 'notifications'},
     'apps.tasks.tasks.generar_pdf_acta': {'queue': 'pdf_generation'},
+    'apps.config_system.tasks.enviar_lote_emails': {'queue': 'emails'},
+    'gestion_actas.tasks.notificar_publicacion': {'queue': 'emails'},
+}
+
+# Tareas periódicas (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    'volcar-contadores-portal': {
+        'task': 'apps.pages.tasks.volcar_contadores_portal',
+        'schedule': float(os.environ.get('PORTAL_CONTADORES_INTERVALO', 30)),  # segundos
+    },
+    'mantener-particiones-auditoria': {
+        'task': 'apps.auditoria.tasks.mantener_particiones_auditoria',
+        'schedule': 24 * 60 * 60.0,  # diario
+    },
 }
 
 # ### CONFIGURACIÓN PARA RENDER (DEPLOYMENT) ###
@@ -694,6 +862,26 @@ AUDITORIA_CONFIG = {
     'RETENTION_DAYS_ERROR_LOGS': 180,  # 6 meses
 }
 
+# Triggers de auditoría (setup_auditoria): columnas que no generan registro
+# en auditoria.cambios_bd cuando son lo único que cambia
+AUDITORIA_TRIGGERS = {
+    'COLUMNAS_EXCLUIDAS': ['fecha_actualizacion', 'fecha_modificacion', 'updated_at'],
+    'COLUMNAS_EXCLUIDAS_POR_TABLA': {
+        'transcripcion_transcripcion': ['progreso_porcentaje', 'task_id_celery'],
+        'generador_actas_actagenerada': ['progreso', 'task_id_celery'],
+        'generador_actas_operacionsistema': ['progreso'],
+        'audio_processing_procesamientoaudio': ['progreso', 'mensaje_estado'],
+        'gestion_actas_gestionacta': ['progreso_publicacion', 'mensaje_publicacion', 'tarea_publicacion_id'],
+        'config_system_configuracionsmtp': ['emails_enviados_hoy', 'ultima_actualizacion_contador'],
+    },
+}
+
+# Tablas de logs particionadas por mes (setup_auditoria --particionar): la
+# retención de AUDITORIA_CONFIG elimina particiones completas
+AUDITORIA_PARTICIONES = {
+    'PARTICIONES_FUTURAS': int(os.environ.get('AUDITORIA_PARTICIONES_FUTURAS', 3)),
+}
+
 # Lista de campos sensibles que no se deben loggear
 SENSITIVE_FIELDS = [
     'password', 'password1', 'password2', 'old_password', 'new_password',
@@ -18,6 +18,7 @@ from django.urls import include, path,re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.static import serve
+from helpers.descargas import servir_media
 from apps.pages import views
 from django.conf.urls.i18n import i18n_patterns
 from .native_admin import native_admin_site
@@ -52,7 +53,7 @@ urlpatterns = [
     path("generador-actas/", include("apps.generador_actas.urls")),
 
     # Archivos estáticos y media
-    re_path(r'^media/(?P<path>.*)$', serve,{'document_root': settings.MEDIA_ROOT}), 
+    re_path(r'^media/(?P<path>.*)$', servir_media), 
     re_path(r'^static/(?P<path>.*)$', serve,{'document_root': settings.STATIC_ROOT}), 
 
     # Debug toolbar
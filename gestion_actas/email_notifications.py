@@ -55,20 +55,22 @@ def enviar_notificacion_publicacion(acta_gestion, acta_portal, usuario_publicado
         contenido_html = generar_contenido_email(contexto)
         contenido_texto = generar_contenido_texto(contexto)
         
-        # Enviar email a cada destinatario
-        emails_enviados = 0
-        for destinatario in destinatarios:
-            if enviar_email_smtp(
-                destinatario['email'], 
-                asunto, 
-                contenido_html, 
-                contenido_texto
-            ):
-                emails_enviados += 1
-                logger.info(f"Notificación enviada a {destinatario['email']}")
-            else:
-                logger.error(f"Error enviando notificación a {destinatario['email']}")
+        # Un solo lote: una sesión SMTP por proveedor para todos los destinatarios
+        from apps.config_system.smtp_service import smtp_service
         
+        resultados = smtp_service.enviar_lote(
+            [destinatario['email'] for destinatario in destinatarios],
+            asunto,
+            contenido_html=contenido_html,
+            contenido_texto=contenido_texto,
+            usuario_solicitante=usuario_publicador,
+        )
+        
+        for email, (exito, mensaje) in resultados.items():
+            if not exito:
+                logger.error(f"Error enviando notificación a {email}: {mensaje}")
+        
+        emails_enviados = sum(1 for exito, _ in resultados.values() if exito)
         logger.info(f"Notificaciones de publicación enviadas: {emails_enviados}/{len(destinatarios)}")
         return emails_enviados > 0
         
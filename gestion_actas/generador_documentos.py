@@ -11,12 +11,14 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def generar_documentos_acta_mejorados(acta_portal):
+def generar_documentos_acta_mejorados(acta_portal, directorio=None, nombre_base=None):
     """
     Genera documentos en múltiples formatos con calidad profesional
     
     Args:
         acta_portal: Instancia de ActaMunicipal
+        directorio: Directorio de salida (por defecto media/actas_publicadas/AAAA/MM/DD)
+        nombre_base: Nombre de los archivos sin extensión (por defecto número de acta + timestamp)
         
     Returns:
         dict: Rutas de archivos generados
@@ -26,12 +28,14 @@ def generar_documentos_acta_mejorados(acta_portal):
         
         # Crear directorio para documentos
         fecha_str = datetime.now().strftime('%Y/%m/%d')
-        directorio_docs = os.path.join(settings.MEDIA_ROOT, 'actas_publicadas', fecha_str)
+        directorio_docs = directorio or os.path.join(settings.MEDIA_ROOT, 'actas_publicadas', fecha_str)
         os.makedirs(directorio_docs, exist_ok=True)
+        url_base = '/media/' + os.path.relpath(directorio_docs, settings.MEDIA_ROOT).replace(os.sep, '/')
         
         # Nombre base para archivos
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        nombre_base = f"{acta_portal.numero_acta}_{timestamp}"
+        if not nombre_base:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            nombre_base = f"{acta_portal.numero_acta}_{timestamp}"
         
         documentos_generados = {}
         
@@ -47,7 +51,7 @@ def generar_documentos_acta_mejorados(acta_portal):
                 'ruta': archivo_txt,
                 'nombre': f"{nombre_base}.txt",
                 'tipo': 'text/plain',
-                'url': f"/media/actas_publicadas/{fecha_str}/{nombre_base}.txt"
+                'url': f"{url_base}/{nombre_base}.txt"
             }
             logger.info(f"Archivo TXT generado: {archivo_txt}")
             
@@ -210,7 +214,7 @@ def generar_documentos_acta_mejorados(acta_portal):
                 'ruta': archivo_html,
                 'nombre': f"{nombre_base}.html",
                 'tipo': 'text/html',
-                'url': f"/media/actas_publicadas/{fecha_str}/{nombre_base}.html"
+                'url': f"{url_base}/{nombre_base}.html"
             }
             logger.info(f"Archivo HTML generado: {archivo_html}")
             
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_actas', '0004_gestionacta_acta_portal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gestionacta',
+            name='estado_publicacion',
+            field=models.CharField(blank=True, choices=[('pendiente', 'En cola'), ('sincronizando', 'Sincronizando con el portal'), ('generando_documentos', 'Generando documentos'), ('notificando', 'Enviando notificaciones'), ('completada', 'Publicación completada'), ('error', 'Error en la publicación')], help_text='Paso actual del pipeline de publicación', max_length=25),
+        ),
+        migrations.AddField(
+            model_name='gestionacta',
+            name='progreso_publicacion',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gestionacta',
+            name='mensaje_publicacion',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='gestionacta',
+            name='tarea_publicacion_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_actas', '0005_gestionacta_estado_publicacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gestionacta',
+            name='inicio_publicacion',
+            field=models.DateTimeField(blank=True, help_text='Cuándo se encoló el pipeline de publicación actual', null=True),
+        ),
+    ]
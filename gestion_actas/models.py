@@ -6,6 +6,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
+from datetime import timedelta
 import uuid
 
 
@@ -116,6 +117,30 @@ class GestionActa(models.Model):
         help_text="Referencia al acta publicada en el portal ciudadano"
     )
     
+    # Pipeline de publicación en segundo plano (gestion_actas.tasks)
+    ESTADOS_PUBLICACION = [
+        ('pendiente', 'En cola'),
+        ('sincronizando', 'Sincronizando con el portal'),
+        ('generando_documentos', 'Generando documentos'),
+        ('notificando', 'Enviando notificaciones'),
+        ('completada', 'Publicación completada'),
+        ('error', 'Error en la publicación'),
+    ]
+    estado_publicacion = models.CharField(
+        max_length=25,
+        choices=ESTADOS_PUBLICACION,
+        blank=True,
+        help_text="Paso actual del pipeline de publicación"
+    )
+    progreso_publicacion = models.PositiveSmallIntegerField(default=0)
+    mensaje_publicacion = models.CharField(max_length=255, blank=True)
+    tarea_publicacion_id = models.CharField(max_length=255, blank=True)
+    inicio_publicacion = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Cuándo se encoló el pipeline de publicación actual"
+    )
+    
     class Meta:
         verbose_name = "Gestión de Acta"
         verbose_name_plural = "Gestión de Actas"
@@ -154,6 +179,24 @@ class GestionActa(models.Model):
             return self.acta_generada.fecha_sesion
         return self.fecha_creacion
     
+    @property
+    def publicacion_vencida(self):
+        """En curso desde hace más de PUBLICACION_ACTAS['TIMEOUT_MINUTOS']: se da por abandonada"""
+        from .tasks import ESTADOS_EN_CURSO, get_config_publicacion
+
+        if self.estado_publicacion not in ESTADOS_EN_CURSO:
+            return False
+        if not self.inicio_publicacion:
+            return True
+        limite = timedelta(minutes=get_config_publicacion()['TIMEOUT_MINUTOS'])
+        return timezone.now() - self.inicio_publicacion > limite
+    
+    @property
+    def publicacion_en_curso(self):
+        from .tasks import ESTADOS_EN_CURSO
+
+        return self.estado_publicacion in ESTADOS_EN_CURSO and not self.publicacion_vencida
+    
     def get_url_exportar_pdf(self):
         return reverse('gestion_actas:exportar_pdf', kwargs={'pk': self.pk})
     
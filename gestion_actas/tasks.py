@@ -0,0 +1,184 @@
+"""
+Tareas Celery del pipeline de publicación de actas
+
+``publicar_acta`` solo confirma el cambio de estado del acta; el resto se
+encadena en segundo plano::
+
+    sincronizar con el portal → generar documentos → notificar por email
+
+Cada paso deja su avance en ``GestionActa.estado_publicacion`` /
+``progreso_publicacion`` / ``mensaje_publicacion`` para que el listado de
+gestión lo muestre mientras se ejecuta. Una publicación que sigue en curso
+más de ``PUBLICACION_ACTAS['TIMEOUT_MINUTOS']`` después de
+``inicio_publicacion`` se da por abandonada y puede reintentarse.
+"""
+import logging
+import os
+
+from celery import chain, shared_task
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+PROGRESO_PASOS = {
+    'pendiente': 0,
+    'sincronizando': 10,
+    'generando_documentos': 35,
+    'notificando': 75,
+    'completada': 100,
+}
+
+# Pasos en los que la cadena todavía no terminó
+ESTADOS_EN_CURSO = ('pendiente', 'sincronizando', 'generando_documentos', 'notificando')
+
+
+def get_config_publicacion():
+    """Configuración del pipeline con valores por defecto (settings.PUBLICACION_ACTAS)"""
+    config = {
+        'TIMEOUT_MINUTOS': 30,
+    }
+    config.update(getattr(settings, 'PUBLICACION_ACTAS', {}) or {})
+    return config
+
+
+def actualizar_publicacion(gestion_acta_id, estado, mensaje='', **extra):
+    """Guarda el paso actual sin tocar ``fecha_ultima_edicion`` ni disparar señales"""
+    from .models import GestionActa
+
+    campos = {'estado_publicacion': estado, 'mensaje_publicacion': mensaje[:255], **extra}
+    if estado in PROGRESO_PASOS:
+        campos['progreso_publicacion'] = PROGRESO_PASOS[estado]
+    GestionActa.objects.filter(pk=gestion_acta_id).update(**campos)
+
+
+def _registrar_historial(gestion_acta_id, usuario_id, tipo_cambio, descripcion, datos):
+    from .models import HistorialCambios
+
+    HistorialCambios.objects.create(
+        gestion_acta_id=gestion_acta_id,
+        usuario_id=usuario_id,
+        tipo_cambio=tipo_cambio,
+        descripcion=descripcion,
+        datos_adicionales=datos,
+    )
+
+
+def _fallo(gestion_acta_id, paso, error):
+    logger.error(f"❌ Publicación del acta {gestion_acta_id} falló en '{paso}': {error}")
+    actualizar_publicacion(gestion_acta_id, 'error', f"{paso}: {error}")
+
+
+@shared_task(bind=True)
+def sincronizar_publicacion(self, gestion_acta_id, usuario_id):
+    """Paso 1: crea o actualiza el ActaMunicipal del portal ciudadano"""
+    from django.contrib.auth.models import User
+    from .models import GestionActa
+    from .views import _sincronizar_con_portal_ciudadano
+
+    actualizar_publicacion(gestion_acta_id, 'sincronizando', 'Sincronizando con el portal ciudadano')
+    try:
+        gestion_acta = GestionActa.objects.select_related('acta_generada', 'acta_portal').get(pk=gestion_acta_id)
+        usuario = User.objects.get(pk=usuario_id)
+        with transaction.atomic():
+            acta_portal = _sincronizar_con_portal_ciudadano(gestion_acta, usuario)
+        if acta_portal is None:
+            raise RuntimeError("No se pudo sincronizar el acta con el portal ciudadano")
+    except Exception as e:
+        _fallo(gestion_acta_id, 'sincronización', e)
+        raise
+
+    logger.info(f"🌐 Acta {gestion_acta_id} sincronizada con el portal (ActaMunicipal {acta_portal.pk})")
+    return acta_portal.pk
+
+
+@shared_task(bind=True, max_retries=20, default_retry_delay=15)
+def generar_documentos_publicacion(self, acta_portal_id, gestion_acta_id, usuario_id):
+    """Paso 2: genera (o reutiliza) los documentos PDF/TXT/Word/HTML del acta"""
+    from apps.pages.artefactos import FORMATOS, construir_artefactos, hash_contenido
+    from apps.pages.models import ActaMunicipal
+
+    actualizar_publicacion(gestion_acta_id, 'generando_documentos', 'Generando documentos PDF, Word y TXT')
+    try:
+        acta = ActaMunicipal.objects.select_related('tipo_sesion', 'estado', 'secretario').get(pk=acta_portal_id)
+        directorio = construir_artefactos(acta, esperar=False)
+    except Exception as e:
+        _fallo(gestion_acta_id, 'documentos', e)
+        raise
+
+    if directorio is None:
+        # Otro proceso está generando el mismo juego de documentos
+        if self.request.retries >= self.max_retries:
+            _fallo(gestion_acta_id, 'documentos', 'tiempo de espera agotado')
+            raise RuntimeError("Tiempo de espera agotado generando documentos")
+        raise self.retry()
+
+    formatos = [f for f, (nombre, _) in FORMATOS.items() if os.path.exists(os.path.join(directorio, nombre))]
+    _registrar_historial(
+        gestion_acta_id, usuario_id, 'documentos_generados',
+        f'Documentos generados: {", ".join(formatos)}',
+        {'formatos': formatos, 'hash': hash_contenido(acta)},
+    )
+    return acta_portal_id
+
+
+@shared_task(bind=True)
+def notificar_publicacion(self, acta_portal_id, gestion_acta_id, usuario_id):
+    """Paso 3: avisa por email a los funcionarios (un lote SMTP por proveedor)"""
+    from django.contrib.auth.models import User
+    from apps.pages.models import ActaMunicipal
+    from .email_notifications import enviar_notificacion_publicacion
+    from .models import GestionActa
+
+    actualizar_publicacion(gestion_acta_id, 'notificando', 'Enviando notificaciones por email')
+    try:
+        resultado = enviar_notificacion_publicacion(
+            acta_gestion=GestionActa.objects.get(pk=gestion_acta_id),
+            acta_portal=ActaMunicipal.objects.get(pk=acta_portal_id),
+            usuario_publicador=User.objects.get(pk=usuario_id),
+        )
+    except Exception as e:
+        # El acta ya está publicada: un fallo de correo no invalida la publicación
+        logger.error(f"Error enviando notificaciones de la publicación {gestion_acta_id}: {e}")
+        resultado = False
+
+    if resultado:
+        _registrar_historial(
+            gestion_acta_id, usuario_id, 'notificacion_enviada',
+            'Notificaciones de publicación enviadas por email',
+            {'emails_enviados': True},
+        )
+        mensaje = 'Publicada en el Portal Ciudadano y notificada por email'
+    else:
+        mensaje = 'Publicada en el Portal Ciudadano (notificaciones por email no disponibles)'
+
+    actualizar_publicacion(gestion_acta_id, 'completada', mensaje)
+    return acta_portal_id
+
+
+def iniciar_pipeline_publicacion(gestion_acta_id, usuario_id):
+    """
+    Encola la cadena sincronizar → documentos → notificar
+
+    Llamar después de confirmar la transacción del cambio de estado (que ya
+    dejó ``estado_publicacion='pendiente'``). Sin broker disponible la cadena
+    se ejecuta en el propio proceso.
+    """
+    flujo = chain(
+        sincronizar_publicacion.si(gestion_acta_id, usuario_id),
+        generar_documentos_publicacion.s(gestion_acta_id, usuario_id),
+        notificar_publicacion.s(gestion_acta_id, usuario_id),
+    )
+    try:
+        resultado = flujo.apply_async()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo encolar la publicación {gestion_acta_id}, se ejecuta en el proceso: {e}")
+        try:
+            flujo.apply()
+        except Exception as error:
+            logger.error(f"Error ejecutando la publicación {gestion_acta_id}: {error}")
+        return None
+
+    from .models import GestionActa
+    GestionActa.objects.filter(pk=gestion_acta_id).update(tarea_publicacion_id=resultado.id)
+    return resultado.id
@@ -21,4 +21,5 @@ urlpatterns = [
     # APIs AJAX
     path('api/acta/<int:acta_id>/cambiar-estado/', views.cambiar_estado_acta, name='cambiar_estado'),
     path('api/acta/<int:acta_id>/autoguardar/', views.autoguardar_contenido, name='autoguardar'),
+    path('api/publicacion/estado/', views.api_estado_publicacion, name='api_estado_publicacion'),
 ]
\ No newline at end of file
@@ -848,6 +848,26 @@ def dashboard_revision(request):
     return render(request, 'gestion_actas/dashboard_revision.html', context)
 
 
+# Vista AJAX para el progreso de publicaciones en segundo plano
+@login_required
+def api_estado_publicacion(request):
+    """Estado del pipeline de publicación de las actas indicadas en ?ids=1,2,3"""
+    ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.strip().isdigit()][:100]
+    actas = GestionActa.objects.filter(id__in=ids).values(
+        'id', 'estado_publicacion', 'progreso_publicacion', 'mensaje_publicacion'
+    )
+    return JsonResponse({
+        'actas': {
+            str(acta['id']): {
+                'estado': acta['estado_publicacion'],
+                'progreso': acta['progreso_publicacion'],
+                'mensaje': acta['mensaje_publicacion'],
+            }
+            for acta in actas
+        }
+    })
+
+
 # Vista AJAX para autoguardado
 @csrf_exempt
 @login_required
@@ -893,23 +913,37 @@ def publicar_acta(request, acta_id):
     """Vista para publicar un acta aprobada en el portal ciudadano"""
     
     try:
-        acta = get_object_or_404(GestionActa, id=acta_id)
-        
-        # Verificar que el acta esté lista para publicación
-        if acta.estado.codigo != 'lista_publicacion':
-            messages.error(request, 'Esta acta no está lista para publicación.')
-            return redirect('gestion_actas:listado')
-        
         # Solo superusuarios pueden publicar por ahora
         if not request.user.is_superuser:
             messages.error(request, 'No tienes permisos para publicar actas.')
             return redirect('gestion_actas:listado')
         
         with transaction.atomic():
+            # Fila bloqueada hasta confirmar: un doble clic espera aquí y ve la publicación ya en curso
+            acta = get_object_or_404(
+                GestionActa.objects.select_for_update(of=('self',)).select_related('estado'), id=acta_id
+            )
+            
+            # Verificar que el acta esté lista para publicación (o reintentar una fallida o abandonada)
+            reintento = acta.estado.codigo == 'publicada' and (
+                acta.estado_publicacion == 'error' or acta.publicacion_vencida
+            )
+            if acta.estado.codigo != 'lista_publicacion' and not reintento:
+                messages.error(request, 'Esta acta no está lista para publicación.')
+                return redirect('gestion_actas:listado')
+            
+            if acta.publicacion_en_curso:
+                messages.info(request, 'La publicación de esta acta ya está en curso.')
+                return redirect('gestion_actas:listado')
+            
             # Cambiar estado a publicada
             estado_publicada = EstadoGestionActa.objects.get(codigo='publicada')
             acta.estado = estado_publicada
             acta.fecha_publicacion = timezone.now()
+            acta.estado_publicacion = 'pendiente'
+            acta.progreso_publicacion = 0
+            acta.mensaje_publicacion = 'Publicación en cola'
+            acta.inicio_publicacion = timezone.now()
             acta.save()
             
             # Registrar en historial
@@ -924,62 +958,16 @@ def publicar_acta(request, acta_id):
                 }
             )
             
-            # Sincronizar con el portal ciudadano
-            acta_portal = _sincronizar_con_portal_ciudadano(acta, request.user)
-            
-            # Generar documentos en múltiples formatos
-            documentos_generados = _generar_documentos_publicacion(acta, acta_portal)
-            
-            # Registrar actividad adicional
-            if documentos_generados:
-                HistorialCambios.objects.create(
-                    gestion_acta=acta,
-                    usuario=request.user,
-                    tipo_cambio='documentos_generados',
-                    descripcion=f'Documentos generados: {", ".join(documentos_generados.keys())}',
-                    datos_adicionales=documentos_generados
-                )
-            
-            # Enviar notificaciones por email
-            try:
-                from .email_notifications import enviar_notificacion_publicacion
-                
-                resultado_email = enviar_notificacion_publicacion(
-                    acta_gestion=acta,
-                    acta_portal=acta_portal,
-                    usuario_publicador=request.user
-                )
-                
-                if resultado_email:
-                    HistorialCambios.objects.create(
-                        gestion_acta=acta,
-                        usuario=request.user,
-                        tipo_cambio='notificacion_enviada',
-                        descripcion='Notificaciones de publicación enviadas por email',
-                        datos_adicionales={
-                            'emails_enviados': True,
-                            'fecha_envio': timezone.now().isoformat()
-                        }
-                    )
-                    messages.success(
-                        request, 
-                        f'¡Acta "{acta.titulo}" publicada exitosamente en el Portal Ciudadano! '
-                        f'Se han enviado notificaciones por email a los funcionarios municipales.'
-                    )
-                else:
-                    messages.warning(
-                        request,
-                        f'Acta "{acta.titulo}" publicada exitosamente, pero hubo problemas enviando las notificaciones por email.'
-                    )
-                    
-            except Exception as e:
-                logger.error(f'Error enviando notificaciones por email: {str(e)}')
-                messages.success(
-                    request, 
-                    f'¡Acta "{acta.titulo}" publicada exitosamente en el Portal Ciudadano! '
-                    f'(Notificaciones por email no disponibles)'
-                )
-            
+            # Sincronización, documentos y emails en segundo plano (gestion_actas.tasks)
+            from .tasks import iniciar_pipeline_publicacion
+            acta_id, usuario_id = acta.id, request.user.id
+            transaction.on_commit(lambda: iniciar_pipeline_publicacion(acta_id, usuario_id))
+        
+        messages.success(
+            request,
+            f'Acta "{acta.titulo}" aprobada para publicación. La sincronización con el Portal Ciudadano, '
+            f'los documentos y las notificaciones se completan en segundo plano; el progreso se muestra en el listado.'
+        )
         return redirect('gestion_actas:listado')
         
     except EstadoGestionActa.DoesNotExist:
@@ -1071,146 +1059,30 @@ def _sincronizar_con_portal_ciudadano(gestion_acta, usuario):
 
 
 def _generar_documentos_publicacion(gestion_acta, acta_portal):
-    """Generar documentos mejorados en múltiples formatos para descarga"""
+    """
+    Programar los documentos de descarga (PDF, TXT, Word, HTML) del acta publicada
+
+    Se generan una sola vez por contenido en la tarea Celery
+    ``construir_artefactos_acta`` (ver ``apps.pages.artefactos``), no dentro
+    de la petición de publicación.
+    """
     try:
-        from .generador_documentos import generar_documentos_acta_mejorados
-        from django.core.files import File
-        from django.core.files.base import ContentFile
-        import os
-        
-        # Usar el nuevo sistema de generación de documentos
-        documentos_generados = generar_documentos_acta_mejorados(acta_portal)
-        
-        logger.info(f'Documentos generados para acta {acta_portal.numero_acta}: {list(documentos_generados.keys())}')
-        
-        # Guardar archivos en los campos del modelo ActaMunicipal
-        archivos_guardados = {}
-        
-        # Guardar archivo PDF
-        if 'pdf' in documentos_generados:
-            pdf_info = documentos_generados['pdf']
-            if os.path.exists(pdf_info['ruta']):
-                with open(pdf_info['ruta'], 'rb') as pdf_file:
-                    acta_portal.archivo_pdf.save(
-                        pdf_info['nombre'],
-                        ContentFile(pdf_file.read()),
-                        save=False
-                    )
-                archivos_guardados['pdf'] = pdf_info['nombre']
-                logger.info(f'PDF guardado en modelo: {pdf_info["nombre"]}')
-        
-        # Guardar archivo Word
-        if 'word' in documentos_generados:
-            word_info = documentos_generados['word']
-            if os.path.exists(word_info['ruta']):
-                with open(word_info['ruta'], 'rb') as word_file:
-                    acta_portal.archivo_word.save(
-                        word_info['nombre'],
-                        ContentFile(word_file.read()),
-                        save=False
-                    )
-                archivos_guardados['word'] = word_info['nombre']
-                logger.info(f'Word guardado en modelo: {word_info["nombre"]}')
-        
-        # Guardar archivo TXT
-        if 'txt' in documentos_generados:
-            txt_info = documentos_generados['txt']
-            if os.path.exists(txt_info['ruta']):
-                with open(txt_info['ruta'], 'r', encoding='utf-8') as txt_file:
-                    acta_portal.archivo_txt.save(
-                        txt_info['nombre'],
-                        ContentFile(txt_file.read().encode('utf-8')),
-                        save=False
-                    )
-                archivos_guardados['txt'] = txt_info['nombre']
-                logger.info(f'TXT guardado en modelo: {txt_info["nombre"]}')
+        from apps.pages.artefactos import FORMATOS, hash_contenido, programar_artefactos
         
-        # Guardar el modelo una sola vez con todos los archivos
-        if archivos_guardados:
-            acta_portal.save()
-            logger.info(f'Archivos guardados en ActaMunicipal {acta_portal.id}: {archivos_guardados}')
-        
-        return documentos_generados
-        
-    except Exception as e:
-        logger.error(f'Error generando documentos mejorados: {str(e)}')
-        return {}
-        
-        # 2. Generar archivo HTML
-        nombre_html = f"{gestion_acta.numero_acta or 'ACTA'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-        archivo_html = os.path.join(directorio_docs, nombre_html)
-        
-        contenido_html = f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <title>{gestion_acta.titulo}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 40px; line-height: 1.6; }}
-        h1 {{ color: #2c3e50; border-bottom: 2px solid #3498db; }}
-        h2 {{ color: #34495e; margin-top: 30px; }}
-        .metadata {{ background: #f8f9fa; padding: 15px; border-left: 4px solid #007bff; }}
-    </style>
-</head>
-<body>
-    <h1>ACTA MUNICIPAL</h1>
-    <div class="metadata">
-        <strong>Número:</strong> {gestion_acta.numero_acta or 'N/A'}<br>
-        <strong>Fecha:</strong> {gestion_acta.fecha_creacion.strftime('%d/%m/%Y %H:%M')}<br>
-        <strong>Estado:</strong> Publicada<br>
-    </div>
-    <h2>Título</h2>
-    <p>{gestion_acta.titulo}</p>
-    <h2>Contenido</h2>
-    <div>{contenido_completo.replace(chr(10), '<br>')}</div>
-    <hr>
-    <p><em>Documento generado automáticamente el {datetime.now().strftime('%d/%m/%Y a las %H:%M:%S')}</em></p>
-</body>
-</html>"""
+        if not acta_portal:
+            return {}
         
-        with open(archivo_html, 'w', encoding='utf-8') as f:
-            f.write(contenido_html)
+        programar_artefactos(acta_portal)
+        hash_actual = hash_contenido(acta_portal)
+        logger.info(f'Documentos programados para acta {acta_portal.numero_acta} ({hash_actual})')
         
-        documentos_generados['html'] = {
-            'ruta': archivo_html,
-            'nombre': nombre_html,
-            'tipo': 'text/html'
+        return {
+            formato: {'nombre': nombre, 'tipo': tipo, 'hash': hash_actual}
+            for formato, (nombre, tipo) in FORMATOS.items()
         }
         
-        # 3. Si existe WeasyPrint, generar PDF
-        try:
-            import weasyprint
-            nombre_pdf = f"{gestion_acta.numero_acta or 'ACTA'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            archivo_pdf = os.path.join(directorio_docs, nombre_pdf)
-            
-            # Generar PDF desde HTML
-            html_doc = weasyprint.HTML(string=contenido_html)
-            html_doc.write_pdf(archivo_pdf)
-            
-            documentos_generados['pdf'] = {
-                'ruta': archivo_pdf,
-                'nombre': nombre_pdf,
-                'tipo': 'application/pdf'
-            }
-            
-            # Asignar PDF al acta del portal
-            if acta_portal:
-                with open(archivo_pdf, 'rb') as pdf_file:
-                    acta_portal.archivo_pdf.save(
-                        nombre_pdf,
-                        ContentFile(pdf_file.read()),
-                        save=True
-                    )
-                    
-        except ImportError:
-            logger.warning("WeasyPrint no disponible - no se generará PDF")
-        except Exception as pdf_error:
-            logger.error(f"Error generando PDF: {str(pdf_error)}")
-        
-        return documentos_generados
-        
     except Exception as e:
-        logger.error(f'Error generando documentos: {str(e)}')
+        logger.error(f'Error programando documentos del acta: {str(e)}')
         return {}
 
 
@@ -0,0 +1,260 @@
+# ============================================================================
+# Buffer de Auditoría - Actas Municipales
+# Descripción: Cola en memoria para los registros de logs.* que genera el
+# middleware; un hilo de fondo los escribe con INSERT de varias filas
+# ============================================================================
+"""
+Escritura diferida de los logs de auditoría
+
+El middleware ya no ejecuta SQL en el hilo de la petición: ``registrar``
+añade una tupla compacta a un buffer circular del proceso y un hilo de fondo
+la escribe en ``logs.navegacion_usuarios``, ``logs.sistema_logs`` o
+``logs.errores_sistema`` con un INSERT de varias filas cada
+``INTERVALO_MS`` milisegundos o en cuanto se juntan ``LOTE`` registros.
+
+Si el buffer se llena se aplica ``POLITICA``:
+
+- ``descartar_antiguos``: se pierde el registro más antiguo (buffer circular)
+- ``descartar_nuevos``: se pierde el registro entrante
+- ``bloquear``: la petición escribe el buffer antes de continuar
+
+Si el INSERT de un lote falla, el lote se reintenta fila a fila para que solo
+se pierda el registro que la base de datos rechaza. ``ip_address`` se valida
+al encolar (las columnas son ``inet``): un valor que no es una IP queda NULL.
+"""
+import atexit
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('auditoria')
+
+TABLAS = {
+    'navegacion': ('logs.navegacion_usuarios', (
+        'timestamp', 'usuario_id', 'session_id', 'url_visitada', 'url_anterior', 'metodo_http',
+        'accion_realizada', 'ip_address', 'parametros_get', 'parametros_post', 'codigo_respuesta',
+    )),
+    'sistema': ('logs.sistema_logs', (
+        'timestamp', 'nivel', 'categoria', 'subcategoria', 'mensaje', 'usuario_id', 'session_id',
+        'ip_address', 'user_agent', 'datos_extra', 'modulo', 'url_solicitada', 'metodo_http',
+        'tiempo_respuesta_ms', 'codigo_respuesta',
+    )),
+    'errores': ('logs.errores_sistema', (
+        'timestamp', 'nivel_error', 'codigo_error', 'mensaje_error', 'stack_trace', 'url_error',
+        'usuario_id', 'session_id', 'ip_address', 'user_agent', 'datos_request',
+    )),
+}
+
+CAMPOS_JSON = {'parametros_get', 'parametros_post', 'datos_extra', 'datos_request'}
+
+POLITICAS = ('descartar_antiguos', 'descartar_nuevos', 'bloquear')
+
+
+def get_config_auditoria_buffer():
+    config = {
+        'ACTIVO': True,
+        'CAPACIDAD': 10000,    # registros en memoria por proceso
+        'LOTE': 500,           # filas por INSERT
+        'INTERVALO_MS': 1000,  # cada cuánto escribe el hilo de fondo
+        'POLITICA': 'descartar_antiguos',
+    }
+    config.update(getattr(settings, 'AUDITORIA_BUFFER', {}) or {})
+    if config['POLITICA'] not in POLITICAS:
+        config['POLITICA'] = 'descartar_antiguos'
+    return config
+
+
+def escribir_registros(tipo, filas):
+    """INSERT de varias filas en la tabla de ``tipo``; devuelve las filas escritas"""
+    if not filas:
+        return 0
+    tabla, columnas = TABLAS[tipo]
+    fila_sql = '(' + ', '.join(['%s'] * len(columnas)) + ')'
+    sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES " + ', '.join([fila_sql] * len(filas))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [valor for fila in filas for valor in fila])
+    return len(filas)
+
+
+def escribir_fila_a_fila(tipo, filas):
+    """Reintento de un lote rechazado: cada fila en su savepoint, se descartan solo las que fallan"""
+    escritas = 0
+    for fila in filas:
+        try:
+            with transaction.atomic():
+                escritas += escribir_registros(tipo, [fila])
+        except Exception as e:
+            logger.error(f"Registro de auditoría ({tipo}) descartado: {e} {fila!r}")
+    return escritas
+
+
+class BufferAuditoria:
+    """Buffer circular del proceso con un hilo que lo vuelca por lotes"""
+
+    def __init__(self, config):
+        self.config = config
+        politica = config['POLITICA']
+        # Con descartar_antiguos el propio deque hace de buffer circular
+        self.cola = deque(maxlen=config['CAPACIDAD'] if politica == 'descartar_antiguos' else None)
+        self.lock = threading.Lock()
+        self.escritura = threading.Lock()
+        self.despertar = threading.Event()
+        self.descartados = 0
+        self.hilo = None
+        self.pid = None
+
+    def _iniciar_hilo(self):
+        # Tras un fork (gunicorn, celery) el hilo del proceso padre no existe
+        if self.hilo is not None and self.hilo.is_alive() and self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.hilo = threading.Thread(target=self._bucle, name='auditoria-buffer', daemon=True)
+        self.hilo.start()
+
+    def agregar(self, tipo, fila):
+        capacidad = self.config['CAPACIDAD']
+        with self.lock:
+            self._iniciar_hilo()
+            if len(self.cola) >= capacidad:
+                politica = self.config['POLITICA']
+                if politica == 'descartar_nuevos':
+                    self.descartados += 1
+                    return
+                if politica == 'descartar_antiguos':
+                    # append() expulsa el más antiguo (maxlen)
+                    self.descartados += 1
+            self.cola.append((tipo, fila))
+            pendientes = len(self.cola)
+        if pendientes >= capacidad and self.config['POLITICA'] == 'bloquear':
+            # Contrapresión: la petición espera a que el buffer se escriba
+            self.volcar()
+        elif pendientes >= self.config['LOTE']:
+            self.despertar.set()
+
+    def extraer(self, cantidad):
+        with self.lock:
+            return [self.cola.popleft() for _ in range(min(cantidad, len(self.cola)))]
+
+    def pendientes(self):
+        return len(self.cola)
+
+    def volcar(self):
+        """Escribe todo lo pendiente; devuelve el número de registros escritos"""
+        total = 0
+        with self.escritura:
+            while True:
+                registros = self.extraer(self.config['LOTE'])
+                if not registros:
+                    break
+                por_tipo = {}
+                for tipo, fila in registros:
+                    por_tipo.setdefault(tipo, []).append(fila)
+                for tipo, filas in por_tipo.items():
+                    try:
+                        with transaction.atomic():
+                            total += escribir_registros(tipo, filas)
+                    except Exception as e:
+                        logger.warning(
+                            f"⚠️ Error escribiendo {len(filas)} registros de auditoría ({tipo}), "
+                            f"se reintenta fila a fila: {e}"
+                        )
+                        total += escribir_fila_a_fila(tipo, filas)
+                if len(registros) < self.config['LOTE']:
+                    break
+        if self.descartados:
+            with self.lock:
+                descartados, self.descartados = self.descartados, 0
+            logger.warning(f"⚠️ Buffer de auditoría lleno: {descartados} registros descartados")
+        return total
+
+    def _bucle(self):
+        intervalo = self.config['INTERVALO_MS'] / 1000.0
+        while True:
+            self.despertar.wait(intervalo)
+            self.despertar.clear()
+            if not self.cola and not self.descartados:
+                continue
+            close_old_connections()
+            try:
+                self.volcar()
+            except Exception as e:
+                logger.error(f"Error volcando el buffer de auditoría: {e}")
+                time.sleep(intervalo)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Buffer único del proceso (None si está desactivado)"""
+    global _buffer
+    config = get_config_auditoria_buffer()
+    if not config['ACTIVO']:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = BufferAuditoria(config)
+        return _buffer
+
+
+def ip_valida(valor):
+    """La IP en forma canónica, o None si ``valor`` no es una dirección"""
+    try:
+        return str(ipaddress.ip_address((valor or '').strip()))
+    except ValueError:
+        return None
+
+
+def _fila(tipo, campos):
+    campos.setdefault('timestamp', timezone.now())
+    campos['ip_address'] = ip_valida(campos.get('ip_address'))
+    fila = []
+    for columna in TABLAS[tipo][1]:
+        valor = campos.get(columna)
+        if columna in CAMPOS_JSON and valor is not None and not isinstance(valor, str):
+            valor = json.dumps(valor, default=str)
+        fila.append(valor)
+    return tuple(fila)
+
+
+def registrar(tipo, **campos):
+    """
+    Encola un registro para ``logs.*``
+
+    Args:
+        tipo: 'navegacion', 'sistema' o 'errores'
+        **campos: Columnas de la tabla (los dict/list se serializan a JSON)
+    """
+    fila = _fila(tipo, campos)
+    buffer = get_buffer()
+    if buffer is None:
+        try:
+            escribir_registros(tipo, [fila])
+        except Exception as e:
+            logger.error(f"Error registrando auditoría ({tipo}): {e}")
+        return
+    buffer.agregar(tipo, fila)
+
+
+def volcar_buffer():
+    """Escribe lo pendiente del proceso (al terminar, o desde comandos y pruebas)"""
+    if _buffer is None:
+        return 0
+    return _buffer.volcar()
+
+
+@atexit.register
+def _volcar_al_salir():
+    try:
+        volcar_buffer()
+    except Exception:
+        pass
@@ -5,7 +5,6 @@
 
 import json
 import time
-import hashlib
 from django.db import connection
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
@@ -21,14 +20,57 @@ except ImportError:
     USER_AGENTS_AVAILABLE = False
     parse = None
 import logging
+from functools import lru_cache
 from typing import Optional, Dict, Any
 
+from helpers.auditoria_buffer import ip_valida, registrar
+
 # Configurar logger
 logger = logging.getLogger('auditoria')
 
+CABECERAS_OMITIDAS = {'HTTP_COOKIE', 'HTTP_AUTHORIZATION', 'HTTP_X_CSRFTOKEN'}
+
+
+@lru_cache(maxsize=512)
+def _parse_user_agent_cache(user_agent_string):
+    """Parsear información del User Agent (los navegadores se repiten mucho)"""
+    try:
+        if not USER_AGENTS_AVAILABLE:
+            return {
+                'browser': 'Desconocido',
+                'os': 'Desconocido', 
+                'device': 'Desconocido',
+                'is_mobile': False,
+                'is_tablet': False,
+                'is_pc': True,
+                'is_bot': False
+            }
+        
+        user_agent = parse(user_agent_string)
+        return {
+            'browser': f"{user_agent.browser.family} {user_agent.browser.version_string}",
+            'os': f"{user_agent.os.family} {user_agent.os.version_string}",
+            'device': user_agent.device.family,
+            'is_mobile': user_agent.is_mobile,
+            'is_tablet': user_agent.is_tablet,
+            'is_pc': user_agent.is_pc,
+            'is_bot': user_agent.is_bot
+        }
+    except Exception:
+        return {'raw': user_agent_string}
+
+
+def _parse_user_agent(user_agent_string):
+    # Copia: el dict cacheado no debe modificarse
+    return dict(_parse_user_agent_cache(user_agent_string or ''))
+
+
 class AuditoriaMiddleware(MiddlewareMixin):
     """
     Middleware para capturar automáticamente todas las actividades del sistema
+    
+    Los registros se encolan en ``helpers.auditoria_buffer`` y un hilo de
+    fondo los escribe por lotes: la petición no espera a la base de datos.
     """
     
     def __init__(self, get_response):
@@ -39,13 +81,6 @@ class AuditoriaMiddleware(MiddlewareMixin):
         """Procesar la petición entrante"""
         # Marcar tiempo de inicio
         request._start_time = time.time()
-        
-        # Configurar variables de auditoría en la BD
-        self._set_audit_context(request)
-        
-        # Registrar navegación
-        self._log_navigation(request)
-        
         return None
     
     def process_response(self, request, response):
@@ -56,12 +91,15 @@ class AuditoriaMiddleware(MiddlewareMixin):
         else:
             response_time_ms = None
         
-        # Registrar log del sistema
-        self._log_system_activity(request, response, response_time_ms)
+        contexto = self._contexto(request)
+        
+        # Registrar navegación y log del sistema
+        self._log_navigation(request, response, contexto)
+        self._log_system_activity(request, response, response_time_ms, contexto)
         
         # Si es una respuesta de error, registrarlo específicamente
         if response.status_code >= 400:
-            self._log_error_response(request, response)
+            self._log_error_response(request, response, contexto)
         
         return response
     
@@ -70,142 +108,96 @@ class AuditoriaMiddleware(MiddlewareMixin):
         self._log_system_exception(request, exception)
         return None
     
-    def _set_audit_context(self, request):
-        """Configurar contexto de auditoría en la base de datos"""
-        try:
-            with connection.cursor() as cursor:
-                # Configurar variables de sesión para auditoría
-                if hasattr(request, 'user') and request.user.is_authenticated:
-                    cursor.execute("SELECT set_config('audit.user_id', %s, true)", [str(request.user.id)])
-                    cursor.execute("SELECT set_config('audit.username', %s, true)", [request.user.username])
-                
-                if hasattr(request, 'session') and request.session.session_key:
-                    cursor.execute("SELECT set_config('audit.session_id', %s, true)", [request.session.session_key])
-                
-                ip_address = self._get_client_ip(request)
-                if ip_address:
-                    cursor.execute("SELECT set_config('audit.ip_address', %s, true)", [ip_address])
-                    
-                # ID de transacción único para esta request
-                transaction_id = hashlib.md5(f"{time.time()}_{request.path}".encode()).hexdigest()[:16]
-                cursor.execute("SELECT set_config('audit.transaction_id', %s, true)", [transaction_id])
-                
-        except Exception as e:
-            logger.error(f"Error configurando contexto de auditoría: {e}")
+    def _contexto(self, request):
+        """Usuario, sesión e IP comunes a todos los registros de la petición"""
+        usuario_autenticado = hasattr(request, 'user') and request.user.is_authenticated
+        return {
+            'usuario_id': request.user.id if usuario_autenticado else None,
+            'session_id': request.session.session_key if hasattr(request, 'session') else None,
+            'ip_address': self._get_client_ip(request),
+        }
     
-    def _log_navigation(self, request):
+    def _log_navigation(self, request, response, contexto):
         """Registrar navegación del usuario"""
         try:
-            with connection.cursor() as cursor:
-                # Preparar datos
-                usuario_id = request.user.id if hasattr(request, 'user') and request.user.is_authenticated else None
-                session_id = request.session.session_key if hasattr(request, 'session') else None
-                url_visitada = request.get_full_path()
-                url_anterior = request.META.get('HTTP_REFERER')
-                metodo_http = request.method
-                ip_address = self._get_client_ip(request)
-                
-                # Parámetros GET y POST (sin datos sensibles)
-                parametros_get = dict(request.GET) if request.GET else None
-                parametros_post = self._clean_sensitive_data(dict(request.POST)) if request.POST else None
-                
-                # Determinar acción realizada
-                accion = self._determine_action(request)
-                
-                # Ejecutar función de logging
-                cursor.execute("""
-                    SELECT logs.registrar_navegacion(%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, [
-                    usuario_id, session_id, url_visitada, url_anterior, metodo_http,
-                    accion, ip_address, 
-                    json.dumps(parametros_get) if parametros_get else None,
-                    json.dumps(parametros_post) if parametros_post else None
-                ])
-                
+            # Parámetros GET y POST (sin datos sensibles)
+            parametros_get = dict(request.GET) if request.GET else None
+            parametros_post = self._clean_sensitive_data(dict(request.POST)) if request.method == 'POST' and request.POST else None
+            
+            registrar(
+                'navegacion',
+                url_visitada=request.get_full_path(),
+                url_anterior=request.META.get('HTTP_REFERER'),
+                metodo_http=request.method,
+                accion_realizada=self._determine_action(request),
+                parametros_get=parametros_get,
+                parametros_post=parametros_post,
+                codigo_respuesta=response.status_code,
+                **contexto
+            )
         except Exception as e:
             logger.error(f"Error registrando navegación: {e}")
     
-    def _log_system_activity(self, request, response, response_time_ms):
+    def _log_system_activity(self, request, response, response_time_ms, contexto):
         """Registrar actividad general del sistema"""
         try:
-            with connection.cursor() as cursor:
-                # Determinar nivel de log
-                if response.status_code >= 500:
-                    nivel = 'ERROR'
-                elif response.status_code >= 400:
-                    nivel = 'WARNING'
-                else:
-                    nivel = 'INFO'
-                
-                # Determinar categoría
-                categoria = self._determine_category(request)
-                subcategoria = self._determine_subcategory(request, response)
-                
-                # Preparar mensaje
-                mensaje = f"{request.method} {request.path} - {response.status_code}"
-                
-                # Datos extra
-                user_agent_info = self._parse_user_agent(request.META.get('HTTP_USER_AGENT', ''))
-                datos_extra = {
-                    'user_agent_info': user_agent_info,
-                    'content_type': response.get('Content-Type'),
-                    'content_length': response.get('Content-Length'),
-                    'request_size': len(request.body) if hasattr(request, 'body') else 0
-                }
-                
-                # Determinar módulo basado en la URL
-                modulo = self._determine_module(request.path)
-                
-                # Ejecutar función de logging
-                cursor.execute("""
-                    SELECT logs.registrar_log_sistema(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, [
-                    nivel, categoria, subcategoria, mensaje,
-                    request.user.id if hasattr(request, 'user') and request.user.is_authenticated else None,
-                    request.session.session_key if hasattr(request, 'session') else None,
-                    self._get_client_ip(request),
-                    json.dumps(datos_extra),
-                    modulo,
-                    request.get_full_path(),
-                    request.method,
-                    response_time_ms,
-                    response.status_code
-                ])
-                
+            # Determinar nivel de log
+            if response.status_code >= 500:
+                nivel = 'ERROR'
+            elif response.status_code >= 400:
+                nivel = 'WARNING'
+            else:
+                nivel = 'INFO'
+            
+            user_agent = request.META.get('HTTP_USER_AGENT', '')
+            datos_extra = {
+                'user_agent_info': self._parse_user_agent(user_agent),
+                'content_type': response.get('Content-Type'),
+                'content_length': response.get('Content-Length'),
+                # Tamaño declarado: leer request.body cargaría en memoria las subidas de audio
+                'request_size': int(request.META.get('CONTENT_LENGTH') or 0),
+            }
+            
+            registrar(
+                'sistema',
+                nivel=nivel,
+                categoria=self._determine_category(request),
+                subcategoria=self._determine_subcategory(request, response),
+                mensaje=f"{request.method} {request.path} - {response.status_code}",
+                user_agent=user_agent,
+                datos_extra=datos_extra,
+                modulo=self._determine_module(request.path),
+                url_solicitada=request.get_full_path(),
+                metodo_http=request.method,
+                tiempo_respuesta_ms=response_time_ms,
+                codigo_respuesta=response.status_code,
+                **contexto
+            )
         except Exception as e:
             logger.error(f"Error registrando actividad del sistema: {e}")
     
-    def _log_error_response(self, request, response):
+    def _log_error_response(self, request, response, contexto):
         """Registrar respuestas de error específicamente"""
         try:
-            with connection.cursor() as cursor:
-                nivel_error = 'CRITICAL' if response.status_code >= 500 else 'ERROR'
-                codigo_error = f"HTTP_{response.status_code}"
-                mensaje_error = f"Error {response.status_code} en {request.path}"
-                
-                # Datos del request para debugging
-                datos_request = {
-                    'method': request.method,
-                    'path': request.path,
-                    'get_params': dict(request.GET),
-                    'post_params': self._clean_sensitive_data(dict(request.POST)),
-                    'headers': dict(request.META)
-                }
-                
-                cursor.execute("""
-                    INSERT INTO logs.errores_sistema (
-                        nivel_error, codigo_error, mensaje_error, url_error,
-                        usuario_id, session_id, ip_address, user_agent, datos_request
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, [
-                    nivel_error, codigo_error, mensaje_error, request.get_full_path(),
-                    request.user.id if hasattr(request, 'user') and request.user.is_authenticated else None,
-                    request.session.session_key if hasattr(request, 'session') else None,
-                    self._get_client_ip(request),
-                    request.META.get('HTTP_USER_AGENT'),
-                    json.dumps(datos_request)
-                ])
-                
+            # Datos del request para debugging (solo cabeceras HTTP, sin cookies ni credenciales)
+            datos_request = {
+                'method': request.method,
+                'path': request.path,
+                'get_params': dict(request.GET),
+                'post_params': self._clean_sensitive_data(dict(request.POST)) if request.method == 'POST' else {},
+                'headers': self._cabeceras(request),
+            }
+            
+            registrar(
+                'errores',
+                nivel_error='CRITICAL' if response.status_code >= 500 else 'ERROR',
+                codigo_error=f"HTTP_{response.status_code}",
+                mensaje_error=f"Error {response.status_code} en {request.path}",
+                url_error=request.get_full_path(),
+                user_agent=request.META.get('HTTP_USER_AGENT'),
+                datos_request=datos_request,
+                **contexto
+            )
         except Exception as e:
             logger.error(f"Error registrando error de respuesta: {e}")
     
@@ -214,64 +206,33 @@ class AuditoriaMiddleware(MiddlewareMixin):
         try:
             import traceback
             
-            with connection.cursor() as cursor:
-                stack_trace = traceback.format_exc()
-                
-                cursor.execute("""
-                    INSERT INTO logs.errores_sistema (
-                        nivel_error, codigo_error, mensaje_error, stack_trace, url_error,
-                        usuario_id, session_id, ip_address, user_agent
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, [
-                    'CRITICAL',
-                    type(exception).__name__,
-                    str(exception),
-                    stack_trace,
-                    request.get_full_path(),
-                    request.user.id if hasattr(request, 'user') and request.user.is_authenticated else None,
-                    request.session.session_key if hasattr(request, 'session') else None,
-                    self._get_client_ip(request),
-                    request.META.get('HTTP_USER_AGENT')
-                ])
-                
+            registrar(
+                'errores',
+                nivel_error='CRITICAL',
+                codigo_error=type(exception).__name__,
+                mensaje_error=str(exception),
+                stack_trace=traceback.format_exc(),
+                url_error=request.get_full_path(),
+                user_agent=request.META.get('HTTP_USER_AGENT'),
+                **self._contexto(request)
+            )
         except Exception as e:
             logger.error(f"Error registrando excepción del sistema: {e}")
     
+    def _cabeceras(self, request):
+        """Cabeceras HTTP de la petición sin cookies ni credenciales"""
+        return {
+            clave: valor for clave, valor in request.META.items()
+            if clave.startswith('HTTP_') and clave not in CABECERAS_OMITIDAS
+        }
+    
     def _get_client_ip(self, request):
         """Obtener IP del cliente"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
     
     def _parse_user_agent(self, user_agent_string):
         """Parsear información del User Agent"""
-        try:
-            if not USER_AGENTS_AVAILABLE:
-                return {
-                    'browser': 'Desconocido',
-                    'os': 'Desconocido', 
-                    'device': 'Desconocido',
-                    'is_mobile': False,
-                    'is_tablet': False,
-                    'is_pc': True,
-                    'is_bot': False
-                }
-            
-            user_agent = parse(user_agent_string)
-            return {
-                'browser': f"{user_agent.browser.family} {user_agent.browser.version_string}",
-                'os': f"{user_agent.os.family} {user_agent.os.version_string}",
-                'device': user_agent.device.family,
-                'is_mobile': user_agent.is_mobile,
-                'is_tablet': user_agent.is_tablet,
-                'is_pc': user_agent.is_pc,
-                'is_bot': user_agent.is_bot
-            }
-        except Exception:
-            return {'raw': user_agent_string}
+        return _parse_user_agent(user_agent_string)
     
     def _clean_sensitive_data(self, data_dict):
         """Remover datos sensibles de los logs"""
@@ -460,13 +421,18 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
         logger.error(f"Error registrando login fallido: {e}")
 
 def get_client_ip(request):
-    """Función auxiliar para obtener IP del cliente"""
+    """
+    Función auxiliar para obtener IP del cliente
+
+    X-Forwarded-For lo escribe el cliente: si su primer valor no es una IP se
+    usa REMOTE_ADDR, y si tampoco lo es, None (las columnas son inet).
+    """
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+        ip = ip_valida(x_forwarded_for.split(',')[0])
+        if ip:
+            return ip
+    return ip_valida(request.META.get('REMOTE_ADDR'))
 
 
 # ============================================================================
@@ -489,28 +455,22 @@ def log_activity(categoria='ACCION', subcategoria=None, mensaje=None):
             response_time = int((time.time() - start_time) * 1000)
             
             try:
-                with connection.cursor() as cursor:
-                    mensaje_final = mensaje or f"Ejecutada función {func.__name__}"
-                    subcategoria_final = subcategoria or func.__name__.upper()
-                    
-                    cursor.execute("""
-                        SELECT logs.registrar_log_sistema(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, [
-                        'INFO',
-                        categoria,
-                        subcategoria_final,
-                        mensaje_final,
-                        request.user.id if hasattr(request, 'user') and request.user.is_authenticated else None,
-                        request.session.session_key if hasattr(request, 'session') else None,
-                        get_client_ip(request),
-                        json.dumps({'function': func.__name__, 'module': func.__module__}),
-                        func.__module__.split('.')[-1] if '.' in func.__module__ else func.__module__,
-                        request.get_full_path() if hasattr(request, 'get_full_path') else None,
-                        request.method if hasattr(request, 'method') else None,
-                        response_time,
-                        200
-                    ])
-                    
+                registrar(
+                    'sistema',
+                    nivel='INFO',
+                    categoria=categoria,
+                    subcategoria=subcategoria or func.__name__.upper(),
+                    mensaje=mensaje or f"Ejecutada función {func.__name__}",
+                    usuario_id=request.user.id if hasattr(request, 'user') and request.user.is_authenticated else None,
+                    session_id=request.session.session_key if hasattr(request, 'session') else None,
+                    ip_address=get_client_ip(request),
+                    datos_extra={'function': func.__name__, 'module': func.__module__},
+                    modulo=func.__module__.split('.')[-1] if '.' in func.__module__ else func.__module__,
+                    url_solicitada=request.get_full_path() if hasattr(request, 'get_full_path') else None,
+                    metodo_http=request.method if hasattr(request, 'method') else None,
+                    tiempo_respuesta_ms=response_time,
+                    codigo_respuesta=200
+                )
             except Exception as e:
                 logger.error(f"Error en decorador de logging: {e}")
             
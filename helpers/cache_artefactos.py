@@ -0,0 +1,247 @@
+"""
+Caché direccionada por contenido para artefactos de audio y transcripción
+
+Cada entrada se identifica por el SHA-256 del audio de origen más un hash de
+los parámetros de la etapa (versión del pipeline, modelo, idioma...), de modo
+que reprocesar la misma grabación con los mismos parámetros reutiliza el
+resultado en lugar de repetir FFmpeg, la mejora de audio, Whisper o pyannote.
+
+Estructura en disco::
+
+    <DIRECTORIO>/<etapa>/<clave[:2]>/<clave>/datos.json
+    <DIRECTORIO>/<etapa>/<clave[:2]>/<clave>/artefacto<ext>   (opcional)
+
+La fecha de modificación del directorio de cada entrada marca su último uso
+y la expulsión es LRU hasta respetar el presupuesto de disco.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ETAPA_WAV_16K = 'wav_16k'
+ETAPA_AUDIO_MEJORADO = 'audio_mejorado'
+ETAPA_WHISPER = 'whisper'
+ETAPA_DIARIZACION = 'diarizacion'
+
+ARCHIVO_DATOS = 'datos.json'
+PREFIJO_ARTEFACTO = 'artefacto'
+
+
+def get_config_cache() -> Dict[str, Any]:
+    config = {
+        'HABILITADO': True,
+        'DIRECTORIO': os.path.join(settings.BASE_DIR, 'cache', 'artefactos'),
+        'PRESUPUESTO_MB': 10240,
+    }
+    config.update(getattr(settings, 'CACHE_ARTEFACTOS', {}) or {})
+    return config
+
+
+_hashes_audio: Dict[tuple, str] = {}
+_hashes_lock = threading.Lock()
+
+
+def hash_archivo(ruta: str, tamano_bloque: int = 1024 * 1024) -> str:
+    """
+    SHA-256 del contenido del archivo, memorizado por (ruta, tamaño, mtime)
+    para no releer el audio en cada etapa de la misma tarea.
+    """
+    estado = os.stat(ruta)
+    clave = (os.path.abspath(ruta), estado.st_size, estado.st_mtime_ns)
+    with _hashes_lock:
+        if clave in _hashes_audio:
+            return _hashes_audio[clave]
+
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as fh:
+        for bloque in iter(lambda: fh.read(tamano_bloque), b''):
+            sha.update(bloque)
+    resultado = sha.hexdigest()
+
+    with _hashes_lock:
+        _hashes_audio[clave] = resultado
+    return resultado
+
+
+def hash_parametros(parametros: Dict[str, Any]) -> str:
+    serializado = json.dumps(parametros, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def clave_artefacto(hash_audio: str, parametros: Dict[str, Any]) -> str:
+    return hashlib.sha256(f"{hash_audio}:{hash_parametros(parametros)}".encode('utf-8')).hexdigest()
+
+
+class EntradaCache:
+    """Artefacto recuperado de la caché"""
+
+    def __init__(self, ruta: str, datos: Dict[str, Any], archivo: Optional[str]):
+        self.ruta = ruta
+        self.datos = datos
+        self.archivo = archivo
+
+
+class CacheArtefactos:
+    """Caché de artefactos en disco con expulsión LRU por presupuesto"""
+
+    def __init__(self, directorio: str, presupuesto_mb: float, habilitado: bool = True):
+        self.directorio = directorio
+        self.presupuesto_bytes = int(presupuesto_mb * 1024 * 1024)
+        self.habilitado = habilitado
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _ruta_entrada(self, etapa: str, clave: str) -> str:
+        return os.path.join(self.directorio, etapa, clave[:2], clave)
+
+    def clave(self, archivo_audio: str, parametros: Dict[str, Any]) -> Optional[str]:
+        """Clave de la entrada o None si la caché está deshabilitada o el audio no existe"""
+        if not self.habilitado or not archivo_audio or not os.path.exists(archivo_audio):
+            return None
+        try:
+            return clave_artefacto(hash_archivo(archivo_audio), parametros)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo calcular el hash de {archivo_audio}: {e}")
+            return None
+
+    def obtener(self, etapa: str, clave: Optional[str]) -> Optional[EntradaCache]:
+        if not clave:
+            return None
+        ruta = self._ruta_entrada(etapa, clave)
+        try:
+            with open(os.path.join(ruta, ARCHIVO_DATOS), encoding='utf-8') as fh:
+                contenido = json.load(fh)
+        except (OSError, ValueError):
+            self.fallos += 1
+            return None
+
+        archivo = None
+        if contenido.get('archivo'):
+            archivo = os.path.join(ruta, contenido['archivo'])
+            if not os.path.exists(archivo):
+                self.fallos += 1
+                return None
+
+        # Marcar uso para el LRU
+        try:
+            os.utime(ruta, None)
+        except OSError:
+            pass
+        self.aciertos += 1
+        logger.info(f"♻️ Caché de artefactos: acierto en {etapa} ({clave[:12]})")
+        return EntradaCache(ruta, contenido.get('datos') or {}, archivo)
+
+    def guardar(self, etapa: str, clave: Optional[str], datos: Optional[Dict[str, Any]] = None,
+                archivo: Optional[str] = None) -> Optional[EntradaCache]:
+        """
+        Guarda ``datos`` (serializable a JSON) y opcionalmente una copia de
+        ``archivo``. La entrada se escribe en un directorio temporal y se mueve
+        al final para que un lector concurrente nunca vea una entrada a medias.
+        """
+        if not clave:
+            return None
+        ruta = self._ruta_entrada(etapa, clave)
+        padre = os.path.dirname(ruta)
+        temporal = None
+        try:
+            os.makedirs(padre, exist_ok=True)
+            temporal = tempfile.mkdtemp(prefix='.tmp_', dir=padre)
+            nombre_archivo = None
+            if archivo:
+                nombre_archivo = PREFIJO_ARTEFACTO + os.path.splitext(archivo)[1]
+                shutil.copyfile(archivo, os.path.join(temporal, nombre_archivo))
+            with open(os.path.join(temporal, ARCHIVO_DATOS), 'w', encoding='utf-8') as fh:
+                json.dump({
+                    'etapa': etapa,
+                    'creado': time.time(),
+                    'archivo': nombre_archivo,
+                    'datos': datos or {},
+                }, fh, ensure_ascii=False, default=str)
+
+            if os.path.exists(ruta):
+                shutil.rmtree(ruta, ignore_errors=True)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo guardar {etapa} en la caché de artefactos: {e}")
+            if temporal:
+                shutil.rmtree(temporal, ignore_errors=True)
+            return None
+
+        logger.info(f"💾 Caché de artefactos: guardado {etapa} ({clave[:12]})")
+        self.expulsar()
+        return EntradaCache(ruta, datos or {}, os.path.join(ruta, nombre_archivo) if nombre_archivo else None)
+
+    def _entradas(self):
+        """(ultimo_uso, tamaño, ruta) de todas las entradas"""
+        if not os.path.isdir(self.directorio):
+            return []
+        entradas = []
+        for etapa in os.listdir(self.directorio):
+            dir_etapa = os.path.join(self.directorio, etapa)
+            if not os.path.isdir(dir_etapa):
+                continue
+            for prefijo in os.listdir(dir_etapa):
+                dir_prefijo = os.path.join(dir_etapa, prefijo)
+                if not os.path.isdir(dir_prefijo):
+                    continue
+                for nombre in os.listdir(dir_prefijo):
+                    if nombre.startswith('.tmp_'):
+                        continue
+                    ruta = os.path.join(dir_prefijo, nombre)
+                    try:
+                        tamano = sum(e.stat().st_size for e in os.scandir(ruta) if e.is_file())
+                        entradas.append((os.stat(ruta).st_mtime, tamano, ruta))
+                    except OSError:
+                        continue
+        return entradas
+
+    def expulsar(self) -> int:
+        """Elimina las entradas menos usadas hasta quedar dentro del presupuesto"""
+        with self._lock:
+            entradas = sorted(self._entradas())
+            total = sum(tamano for _, tamano, _ in entradas)
+            eliminadas = 0
+            for _, tamano, ruta in entradas:
+                if total <= self.presupuesto_bytes:
+                    break
+                shutil.rmtree(ruta, ignore_errors=True)
+                total -= tamano
+                eliminadas += 1
+            if eliminadas:
+                logger.info(f"🧹 Caché de artefactos: {eliminadas} entradas expulsadas (LRU)")
+            return eliminadas
+
+    def estado(self) -> Dict[str, Any]:
+        entradas = self._entradas()
+        return {
+            'directorio': self.directorio,
+            'habilitado': self.habilitado,
+            'entradas': len(entradas),
+            'uso_mb': round(sum(tamano for _, tamano, _ in entradas) / (1024 * 1024), 1),
+            'presupuesto_mb': round(self.presupuesto_bytes / (1024 * 1024), 1),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+        }
+
+
+_cache: Optional[CacheArtefactos] = None
+
+
+def get_cache_artefactos() -> CacheArtefactos:
+    """Devuelve la caché única del proceso"""
+    global _cache
+    if _cache is None:
+        config = get_config_cache()
+        _cache = CacheArtefactos(config['DIRECTORIO'], config['PRESUPUESTO_MB'], config['HABILITADO'])
+    return _cache
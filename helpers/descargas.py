@@ -0,0 +1,173 @@
+"""
+Respuestas de descarga de archivos sin cargarlos en memoria
+
+``respuesta_archivo`` sustituye al patrón ``HttpResponse(fh.read())``:
+
+- Envía el archivo con ``FileResponse`` (el servidor WSGI puede usar
+  ``sendfile``) o en bloques para las respuestas parciales.
+- Atiende cabeceras ``Range`` de un solo intervalo con 206 Partial Content,
+  para que los reproductores y el editor de audio puedan saltar a cualquier
+  punto de grabaciones largas.
+- Responde 304 a las peticiones condicionales (ETag / Last-Modified).
+- Con ``DESCARGAS['X_ACCEL']`` activo y el archivo dentro de MEDIA_ROOT,
+  delega el envío (incluidos los rangos) al nginx de ``nginx/`` mediante
+  ``X-Accel-Redirect``.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+RANGO_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_config_descargas():
+    config = {
+        'X_ACCEL': False,
+        'X_ACCEL_PREFIJO': '/protected-media/',
+        'TAMANO_BLOQUE': 256 * 1024,
+    }
+    config.update(getattr(settings, 'DESCARGAS', {}) or {})
+    return config
+
+
+def _etag_archivo(estado):
+    return f'"{estado.st_size:x}-{estado.st_mtime_ns:x}"'
+
+
+def parsear_rango(cabecera, tamano):
+    """
+    Devuelve (inicio, fin) inclusivos para ``Range: bytes=...``
+
+    None si la cabecera no existe o no se puede atender (varios intervalos,
+    otras unidades): en ese caso se responde el archivo completo. Lanza
+    ValueError si el intervalo queda fuera del archivo (416).
+    """
+    if not cabecera:
+        return None
+    coincidencia = RANGO_RE.match(cabecera.strip())
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if tamano == 0:
+        raise ValueError('Archivo vacío')
+    if not inicio:
+        # Sufijo: los últimos N bytes
+        sufijo = int(fin)
+        if sufijo == 0:
+            raise ValueError('Rango vacío')
+        return max(0, tamano - sufijo), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise ValueError('Rango fuera del archivo')
+    return inicio, fin
+
+
+def _if_range_valido(request, etag, modificado):
+    """Sin If-Range el rango vale; con él, solo si el archivo no cambió"""
+    valor = request.META.get('HTTP_IF_RANGE')
+    if not valor:
+        return True
+    if valor.startswith('"') or valor.startswith('W/'):
+        return valor == etag
+    fecha = parse_http_date_safe(valor)
+    return fecha is not None and int(modificado) <= fecha
+
+
+def _leer_bloques(ruta, inicio, longitud, tamano_bloque):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        restante = longitud
+        while restante > 0:
+            bloque = archivo.read(min(tamano_bloque, restante))
+            if not bloque:
+                break
+            restante -= len(bloque)
+            yield bloque
+
+
+def _ruta_x_accel(ruta, config):
+    """URI interna de nginx para archivos bajo MEDIA_ROOT, o None"""
+    if not config['X_ACCEL']:
+        return None
+    media = os.path.realpath(settings.MEDIA_ROOT)
+    real = os.path.realpath(ruta)
+    if os.path.commonpath([media, real]) != media:
+        return None
+    return config['X_ACCEL_PREFIJO'] + os.path.relpath(real, media).replace(os.sep, '/')
+
+
+def respuesta_archivo(request, ruta, content_type=None, nombre=None, adjunto=True, etag=None):
+    """
+    Respuesta HTTP para servir ``ruta``
+
+    Args:
+        request: Petición (se leen Range, If-Range y las cabeceras condicionales)
+        ruta: Ruta absoluta del archivo (debe existir)
+        content_type: Tipo MIME; por defecto se deduce de la extensión
+        nombre: Nombre para Content-Disposition; None para no enviar la cabecera
+        adjunto: ``attachment`` (True) o ``inline`` (False)
+        etag: ETag entre comillas; por defecto tamaño + fecha de modificación
+
+    Returns:
+        200 con el archivo completo, 206 con el intervalo pedido, 304, 412 o 416
+    """
+    config = get_config_descargas()
+    estado = os.stat(ruta)
+    tamano = estado.st_size
+    modificado = int(estado.st_mtime)
+    etag = etag or _etag_archivo(estado)
+    if not content_type:
+        content_type = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if respuesta is None:
+        ruta_interna = _ruta_x_accel(ruta, config)
+        rango = None
+        if ruta_interna is None and _if_range_valido(request, etag, modificado):
+            try:
+                rango = parsear_rango(request.META.get('HTTP_RANGE'), tamano)
+            except ValueError:
+                respuesta = HttpResponse(status=416)
+                respuesta['Content-Range'] = f'bytes */{tamano}'
+                return respuesta
+
+        if ruta_interna is not None:
+            # nginx atiende también los Range y el envío con sendfile
+            respuesta = HttpResponse(content_type=content_type)
+            respuesta['X-Accel-Redirect'] = ruta_interna
+        elif rango is not None:
+            inicio, fin = rango
+            longitud = fin - inicio + 1
+            respuesta = StreamingHttpResponse(
+                _leer_bloques(ruta, inicio, longitud, config['TAMANO_BLOQUE']),
+                status=206, content_type=content_type,
+            )
+            respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+            respuesta['Content-Length'] = str(longitud)
+        else:
+            respuesta = FileResponse(open(ruta, 'rb'), content_type=content_type)
+
+        if nombre:
+            respuesta['Content-Disposition'] = content_disposition_header(adjunto, nombre)
+
+    respuesta['Accept-Ranges'] = 'bytes'
+    respuesta['ETag'] = etag
+    respuesta['Last-Modified'] = http_date(modificado)
+    return respuesta
+
+
+def servir_media(request, path):
+    """Sustituye a ``django.views.static.serve`` para MEDIA_ROOT (audio con saltos, 304)"""
+    ruta = safe_join(settings.MEDIA_ROOT, path)
+    if not os.path.isfile(ruta):
+        raise Http404("Archivo no encontrado")
+    return respuesta_archivo(request, ruta, nombre=None)
@@ -0,0 +1,405 @@
+"""
+Progreso en vivo de transcripciones y actas (Server-Sent Events)
+
+Los editores ya no consultan cada pocos segundos el estado completo de la
+fila (con ``conversacion_json``, ``segmentos_procesados``...). Las tareas de
+Celery publican deltas pequeños ``{id, estado, progreso, mensaje}`` en un
+canal de Redis por objeto con ``publicar_progreso`` y la vista
+``stream_progreso`` (servida por ``config/asgi.py``) los reenvía al navegador
+como ``text/event-stream``.
+
+El primer evento es el estado actual, leído con ``.only()`` sobre las columnas
+de estado; el flujo termina al llegar a un estado final. ``estado_progreso``
+es el sondeo compacto para clientes sin EventSource o detrás de WSGI. Ambas
+vistas solo muestran el objeto a su propietario o al personal (``is_staff``),
+igual que las vistas de detalle; para el resto responde como si no existiera.
+
+Sin Redis se usa un broker en memoria del proceso (desarrollo con Celery en
+modo eager y pruebas).
+
+``ReportadorProgreso`` es el lado de escritura para las tareas largas: agrupa
+los avances y los guarda con un ``UPDATE`` de las columnas de estado en lugar
+de un ``save()`` de la fila completa.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# tipo -> (modelo, columna de progreso, columna de mensaje, estados finales)
+TIPOS = {
+    'transcripcion': (
+        'transcripcion.Transcripcion', 'progreso_porcentaje', 'mensaje_error',
+        {'completado', 'error', 'cancelado'},
+    ),
+    'acta': (
+        'generador_actas.ActaGenerada', 'progreso', 'mensajes_error',
+        {'revision', 'aprobado', 'publicado', 'rechazado', 'error'},
+    ),
+    'audio': (
+        'audio_processing.ProcesamientoAudio', 'progreso', 'mensaje_estado',
+        {'completado', 'error', 'cancelado'},
+    ),
+}
+
+# tipo -> campo del usuario propietario, el único que ve el progreso además del personal
+PROPIETARIOS = {
+    'transcripcion': 'usuario_creacion',
+    'acta': 'usuario_creacion',
+    'audio': 'usuario',
+}
+
+# tipo -> (columna donde se guarda el mensaje de avance o None, columna auto_now)
+# mensaje_error / mensajes_error son para errores: el avance solo se publica
+COLUMNAS_REPORTADOR = {
+    'transcripcion': (None, 'fecha_actualizacion'),
+    'acta': (None, 'fecha_actualizacion'),
+    'audio': ('mensaje_estado', 'updated_at'),
+}
+
+
+def get_config_progreso():
+    config = {
+        'REDIS_URL': getattr(settings, 'CACHE_REDIS_URL', '') or '',
+        'PREFIJO': 'actas:progreso',
+        'KEEPALIVE': 15,         # segundos entre comentarios para mantener viva la conexión
+        'TIEMPO_MAXIMO': 600,    # duración máxima de un flujo; el navegador se reconecta solo
+        'REINTENTO_MS': 3000,    # retry: que se indica al EventSource
+    }
+    config.update(getattr(settings, 'PROGRESO_EVENTOS', {}) or {})
+    return config
+
+
+def get_config_reportador():
+    config = {
+        'INTERVALO_SEGUNDOS': 5,   # como mucho una escritura cada N segundos...
+        'PASO_PORCENTAJE': 5,      # ...salvo que el progreso avance N puntos
+    }
+    config.update(getattr(settings, 'PROGRESO_REPORTADOR', {}) or {})
+    return config
+
+
+def nombre_canal(tipo, objeto_id, config=None):
+    config = config or get_config_progreso()
+    return f"{config['PREFIJO']}:{tipo}:{objeto_id}"
+
+
+class SuscripcionMemoria:
+    def __init__(self, broker, canal):
+        self.broker = broker
+        self.canal = canal
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue()
+
+    def entregar(self, mensaje):
+        # publicar() puede llamarse desde otro hilo (tarea eager, pruebas)
+        self.loop.call_soon_threadsafe(self.cola.put_nowait, mensaje)
+
+    async def siguiente(self, timeout):
+        try:
+            return json.loads(await asyncio.wait_for(self.cola.get(), timeout))
+        except asyncio.TimeoutError:
+            return None
+
+    async def cerrar(self):
+        self.broker.retirar(self)
+
+
+class BrokerMemoria:
+    """Pub/sub del proceso"""
+
+    def __init__(self):
+        self.suscriptores = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def publicar(self, canal, mensaje):
+        with self.lock:
+            suscriptores = list(self.suscriptores.get(canal, ()))
+        for suscripcion in suscriptores:
+            suscripcion.entregar(mensaje)
+        return len(suscriptores)
+
+    async def suscribir(self, canal):
+        suscripcion = SuscripcionMemoria(self, canal)
+        with self.lock:
+            self.suscriptores[canal].add(suscripcion)
+        return suscripcion
+
+    def retirar(self, suscripcion):
+        with self.lock:
+            self.suscriptores[suscripcion.canal].discard(suscripcion)
+            if not self.suscriptores[suscripcion.canal]:
+                del self.suscriptores[suscripcion.canal]
+
+
+class SuscripcionRedis:
+    def __init__(self, cliente, pubsub):
+        self.cliente = cliente
+        self.pubsub = pubsub
+
+    async def siguiente(self, timeout):
+        limite = time.monotonic() + timeout
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            mensaje = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=restante)
+            if mensaje and mensaje.get('type') == 'message':
+                return json.loads(mensaje['data'])
+
+    async def cerrar(self):
+        try:
+            await self.pubsub.unsubscribe()
+            await self.pubsub.aclose()
+        finally:
+            await self.cliente.aclose()
+
+
+class BrokerRedis:
+    """PUBLISH síncrono desde las tareas; SUBSCRIBE asíncrono desde la vista"""
+
+    def __init__(self, url):
+        import redis
+        self.url = url
+        self.cliente = redis.Redis.from_url(url, socket_timeout=1)
+
+    def publicar(self, canal, mensaje):
+        return self.cliente.publish(canal, mensaje)
+
+    async def suscribir(self, canal):
+        import redis.asyncio as redis_async
+        cliente = redis_async.Redis.from_url(self.url)
+        pubsub = cliente.pubsub()
+        await pubsub.subscribe(canal)
+        return SuscripcionRedis(cliente, pubsub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Broker único del proceso"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            url = get_config_progreso()['REDIS_URL']
+            if url:
+                try:
+                    _broker = BrokerRedis(url)
+                except ImportError:
+                    logger.warning("⚠️ Librería redis no disponible; progreso en memoria")
+            if _broker is None:
+                _broker = BrokerMemoria()
+        return _broker
+
+
+def publicar_progreso(tipo, objeto_id, estado, progreso, mensaje=''):
+    """
+    Publica un delta de progreso; nunca interrumpe la tarea que lo llama
+
+    Args:
+        tipo: 'transcripcion', 'acta' o 'audio'
+        objeto_id: ID del objeto
+        estado: Estado actual
+        progreso: Porcentaje 0-100
+        mensaje: Texto corto para mostrar al usuario
+    """
+    delta = {'id': objeto_id, 'estado': estado, 'progreso': int(progreso or 0), 'mensaje': mensaje or ''}
+    try:
+        get_broker().publicar(nombre_canal(tipo, objeto_id), json.dumps(delta))
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo publicar el progreso de {tipo} {objeto_id}: {e}")
+
+
+class ReportadorProgreso:
+    """
+    Progreso de una tarea larga sin guardar la fila completa
+
+    Cada ``avanzar`` publica el delta en el canal del objeto, pero solo se
+    escribe en la base de datos cuando pasaron ``INTERVALO_SEGUNDOS`` desde la
+    última escritura, el progreso se movió ``PASO_PORCENTAJE`` puntos, cambia
+    el estado o se pasan columnas adicionales. La escritura es un
+    ``QuerySet.update()`` de las columnas de estado: no reescribe los JSON de
+    la fila ni dispara las señales ``post_save``.
+
+    El objeto recibido se mantiene al día para que un ``save()`` posterior de
+    la tarea no devuelva el progreso a un valor antiguo.
+
+    Uso:
+        reportador = ReportadorProgreso('transcripcion', transcripcion)
+        reportador.avanzar(20, 'Transcribiendo audio...', estado='transcribiendo')
+        reportador.avanzar(35, 'Bloque 3 de 10')
+    """
+
+    def __init__(self, tipo, objeto, config=None, reloj=time.monotonic):
+        modelo, self.campo_progreso, _, self.estados_finales = TIPOS[tipo]
+        self.campo_mensaje, self.campo_fecha = COLUMNAS_REPORTADOR[tipo]
+        self.modelo = apps.get_model(modelo)
+        self.tipo = tipo
+        self.objeto = objeto
+        self.config = config or get_config_reportador()
+        self.reloj = reloj
+        self.pendiente = {}
+        self.progreso_escrito = getattr(objeto, self.campo_progreso) or 0
+        self.ultima_escritura = reloj()
+        self.escrituras = 0
+
+    def avanzar(self, progreso, mensaje='', estado=None, forzar=False, **columnas):
+        """
+        Registra un avance; devuelve True si se escribió en la base de datos
+
+        Args:
+            progreso: Porcentaje 0-100
+            mensaje: Texto corto para mostrar al usuario
+            estado: Nuevo estado (un cambio de estado se escribe siempre)
+            forzar: Escribir aunque no toque por intervalo ni por paso
+            **columnas: Otras columnas de estado a escribir ya (fechas, task_id...)
+        """
+        progreso = int(progreso or 0)
+        cambio_estado = estado is not None and estado != self.objeto.estado
+
+        cambios = {self.campo_progreso: progreso, **columnas}
+        if estado is not None:
+            cambios['estado'] = estado
+        if self.campo_mensaje and mensaje:
+            cambios[self.campo_mensaje] = mensaje
+        for campo, valor in cambios.items():
+            setattr(self.objeto, campo, valor)
+        self.pendiente.update(cambios)
+
+        publicar_progreso(self.tipo, self.objeto.pk, self.objeto.estado, progreso, mensaje)
+
+        if (forzar or columnas or cambio_estado
+                or self.objeto.estado in self.estados_finales
+                or abs(progreso - self.progreso_escrito) >= self.config['PASO_PORCENTAJE']
+                or self.reloj() - self.ultima_escritura >= self.config['INTERVALO_SEGUNDOS']):
+            return self.vaciar()
+        return False
+
+    def vaciar(self):
+        """Escribe los cambios pendientes, si los hay"""
+        if not self.pendiente:
+            return False
+        cambios, self.pendiente = self.pendiente, {}
+        if self.campo_fecha:
+            cambios[self.campo_fecha] = timezone.now()
+            setattr(self.objeto, self.campo_fecha, cambios[self.campo_fecha])
+        self.modelo.objects.filter(pk=self.objeto.pk).update(**cambios)
+        self.progreso_escrito = getattr(self.objeto, self.campo_progreso) or 0
+        self.ultima_escritura = self.reloj()
+        self.escrituras += 1
+        return True
+
+
+def estado_compacto(tipo, objeto_id, usuario=None):
+    """
+    Estado actual leyendo solo las columnas de estado
+
+    Con ``usuario`` que no es del personal solo encuentra sus propios objetos.
+    None si no existe o no es visible.
+    """
+    modelo, campo_progreso, campo_mensaje, _ = TIPOS[tipo]
+    filtro = {'pk': objeto_id}
+    if usuario is not None and not (usuario.is_staff or usuario.is_superuser):
+        filtro[f'{PROPIETARIOS[tipo]}_id'] = usuario.id
+    objeto = apps.get_model(modelo).objects.filter(**filtro).only(
+        'id', 'estado', campo_progreso, campo_mensaje
+    ).first()
+    if objeto is None:
+        return None
+    return {
+        'id': objeto.id,
+        'estado': objeto.estado,
+        'progreso': getattr(objeto, campo_progreso) or 0,
+        'mensaje': getattr(objeto, campo_mensaje) or '',
+    }
+
+
+def evento_sse(datos, numero, evento='progreso'):
+    return f"id: {numero}\nevent: {evento}\ndata: {json.dumps(datos)}\n\n"
+
+
+async def flujo_eventos(tipo, objeto_id, broker=None, config=None, usuario=None):
+    """
+    Generador asíncrono del ``text/event-stream`` de un objeto
+
+    Se suscribe antes de leer el estado inicial para no perder deltas
+    publicados entre la lectura y la suscripción. ``usuario`` limita el
+    objeto como en ``estado_compacto``.
+    """
+    config = config or get_config_progreso()
+    broker = broker or get_broker()
+    estados_finales = TIPOS[tipo][3]
+    suscripcion = await broker.suscribir(nombre_canal(tipo, objeto_id, config))
+    try:
+        yield f"retry: {config['REINTENTO_MS']}\n\n"
+        actual = await sync_to_async(estado_compacto)(tipo, objeto_id, usuario)
+        if actual is None:
+            yield evento_sse({'id': objeto_id, 'error': 'No encontrado'}, 0, 'error')
+            return
+        numero = 1
+        yield evento_sse(actual, numero)
+        if actual['estado'] in estados_finales:
+            return
+
+        limite = time.monotonic() + config['TIEMPO_MAXIMO']
+        while time.monotonic() < limite:
+            delta = await suscripcion.siguiente(config['KEEPALIVE'])
+            if delta is None:
+                yield ": keepalive\n\n"
+                continue
+            numero += 1
+            yield evento_sse(delta, numero)
+            if delta.get('estado') in estados_finales:
+                return
+    finally:
+        await suscripcion.cerrar()
+
+
+async def stream_progreso(request, tipo, objeto_id):
+    """Flujo SSE del progreso de una transcripción o un acta"""
+    usuario = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if usuario is None:
+        return JsonResponse({'error': 'No autenticado'}, status=401)
+
+    # Permiso comprobado antes de abrir el flujo: nada se envía sobre objetos ajenos
+    actual = await sync_to_async(estado_compacto)(tipo, objeto_id, usuario)
+    if actual is None:
+        return JsonResponse({'error': 'No encontrado'}, status=404)
+
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI el flujo ocuparía un worker: se envía el estado y el cliente pasa a sondeo
+        respuesta = StreamingHttpResponse(
+            [evento_sse(actual, 1), evento_sse({'id': objeto_id}, 2, 'sondeo')],
+            content_type='text/event-stream'
+        )
+    else:
+        respuesta = StreamingHttpResponse(
+            flujo_eventos(tipo, objeto_id, usuario=usuario), content_type='text/event-stream'
+        )
+    respuesta['Cache-Control'] = 'no-cache'
+    # nginx no debe acumular el flujo
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+@login_required
+def estado_progreso(request, tipo, objeto_id):
+    """Sondeo compacto: mismo contenido que un evento del flujo"""
+    actual = estado_compacto(tipo, objeto_id, request.user)
+    if actual is None:
+        return JsonResponse({'error': 'No encontrado'}, status=404)
+    return JsonResponse(actual)
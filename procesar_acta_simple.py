@@ -58,7 +58,7 @@ def procesar_acta_simple_task(self, acta_id):
                 'descripcion': f'Segmento {i} procesado exitosamente',
                 'progreso': progreso
             }
-            acta.historial_cambios.append(historial_entry)
+            acta.registrar_eventos(historial_entry)
             acta.save()
         
         # Unificar contenido final
@@ -123,7 +123,7 @@ Se da por terminada la sesión a las [hora] del día [fecha].
             'progreso': 100,
             'task_id': str(self.request.id)
         }
-        acta.historial_cambios.append(historial_final)
+        acta.registrar_eventos(historial_final)
         acta.save()
         
         logger.info(f"✅ Procesamiento de acta {acta.numero_acta} completado exitosamente")
@@ -52,7 +52,6 @@ def revertir_actas_procesadas():
             acta.estado = 'borrador'
             acta.progreso = 0
             acta.segmentos_procesados = {}
-            acta.historial_cambios = []
             acta.contenido_borrador = ''
             acta.contenido_final = ''
             acta.contenido_html = ''
@@ -63,6 +62,7 @@ def revertir_actas_procesadas():
             acta.fecha_procesamiento = None
             
             acta.save()
+            acta.eventos_historial.all().delete()
             revertidas += 1
             print(f"   ✅ {acta.numero_acta} revertida")
             
@@ -5,6 +5,7 @@
 
 // Variables globales
 let transcripcionId = null;
+let versionActual = null;  // versión de la transcripción en la que se leyeron las posiciones
 let audio = null;
 let editandoJSON = false;
 let mensajeEditando = null;
@@ -13,6 +14,7 @@ let conversacionData = [];
 $(document).ready(function() {
     // Inicializar
     transcripcionId = $('#transcripcion-id').data('id');
+    versionActual = $('#transcripcion-id').data('version');
     audio = document.getElementById('main-audio');
     
     console.log('Detalle transcripción cargado, ID:', transcripcionId);
@@ -351,6 +353,7 @@ function guardarSegmentoEditado() {
         data: {
             'csrfmiddlewaretoken': $('[name=csrfmiddlewaretoken]').val(),
             'segmento_id': mensajeEditando,
+            'version_actual': versionActual,
             'hablante': nuevoHablante,
             'texto': nuevoTexto,
             'inicio': nuevoInicio,
@@ -358,6 +361,7 @@ function guardarSegmentoEditado() {
         },
         success: function(response) {
             if (response.success) {
+                versionActual = response.version_actual;
                 actualizarChat();
                 $('#modal-editar-segmento').modal('hide');
                 mensajeEditando = null;
@@ -366,7 +370,8 @@ function guardarSegmentoEditado() {
             }
         },
         error: function(xhr, status, error) {
-            alert('Error al guardar: ' + error);
+            // 409: otro usuario cambió la transcripción; las posiciones locales ya no valen
+            alert('Error al guardar: ' + ((xhr.responseJSON && xhr.responseJSON.error) || error));
         }
     });
 }
@@ -377,10 +382,12 @@ function eliminarSegmento(mensajeId) {
         method: 'POST',
         data: {
             'csrfmiddlewaretoken': $('[name=csrfmiddlewaretoken]').val(),
-            'segmento_id': mensajeId
+            'segmento_id': mensajeId,
+            'version_actual': versionActual
         },
         success: function(response) {
             if (response.success) {
+                versionActual = response.version_actual;
                 conversacionData.splice(mensajeId, 1);
                 actualizarChat();
             } else {
@@ -388,7 +395,8 @@ function eliminarSegmento(mensajeId) {
             }
         },
         error: function(xhr, status, error) {
-            alert('Error al eliminar: ' + error);
+            // 409: otro usuario cambió la transcripción; las posiciones locales ya no valen
+            alert('Error al eliminar: ' + ((xhr.responseJSON && xhr.responseJSON.error) || error));
         }
     });
 }
@@ -421,8 +429,8 @@ function agregarNuevoMensaje() {
         },
         success: function(response) {
             if (response.success) {
-                actualizarChat();
-                $('#nuevo-mensaje-texto').val('');
+                // El servidor lo coloca por tiempo de inicio: recargar para tener sus posiciones
+                location.reload();
             } else {
                 alert('Error: ' + response.error);
             }
@@ -505,6 +513,7 @@ function guardarHablantes() {
                         mensaje.hablante = cambios[mensaje.hablante];
                     }
                 });
+                versionActual = response.version_actual;
                 
                 actualizarChat();
                 $('#modal-hablantes').modal('hide');
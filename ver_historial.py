@@ -2,7 +2,7 @@ from apps.generador_actas.models import ActaGenerada
 import json
 
 acta = ActaGenerada.objects.get(id=4)
-print(f'Total entradas historial: {len(acta.historial_cambios)}')
+print(f'Total entradas historial: {acta.eventos_historial.count()}')
 print('\n=== ÚLTIMAS 5 ENTRADAS DEL HISTORIAL ===')
 
 for h in acta.historial_cambios[-5:]: